@@ -1,6 +1,38 @@
 #!.venv/bin/python3
-from models.manager.keyboard import KeyboardInputHandler
+from models.manager.control import ControlServer
+from models.metrics.exporter import MetricsServer
+from models.metrics.pipeline import PipelineMetrics  # registered before any fork
+from models.metrics.tracing import TraceMetrics  # registered before any fork
+from typing import List, Optional
+import argparse
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Run the data logger.
+
+    Args:
+    - argv (Optional[List[str]]): The command line arguments, sys.argv by default.
+    """
+    parser = argparse.ArgumentParser(description="Run the data logger")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="only accept commands on the control socket (no keyboard hotkeys)",
+    )
+    cli_args = parser.parse_args(argv)
+
+    MetricsServer().serve_in_background()
+    control_server = ControlServer()
+    if cli_args.headless:
+        control_server.serve_forever()
+    else:
+        from models.manager.keyboard import KeyboardInputHandler
+
+        control_server.serve_in_background()
+        keyboard = KeyboardInputHandler()
+        keyboard.listen()
+
 
 if __name__ == "__main__":
-    keyboard = KeyboardInputHandler()
-    keyboard.listen()
+    main()
@@ -0,0 +1,301 @@
+#!.venv/bin/python3
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+import argparse
+import asyncio
+import random
+import struct
+import threading
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def encode_length(length: int) -> bytes:
+    """
+    Encode the remaining length of an MQTT packet.
+    """
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+
+def encode_packet(packet_type: int, body: bytes = b"", flags: int = 0) -> bytes:
+    return bytes([packet_type << 4 | flags]) + encode_length(len(body)) + body
+
+
+def encode_string(value: bytes) -> bytes:
+    return struct.pack("!H", len(value)) + value
+
+
+def read_string(body: bytes, offset: int) -> Tuple[bytes, int]:
+    (length,) = struct.unpack_from("!H", body, offset)
+    return body[offset + 2 : offset + 2 + length], offset + 2 + length
+
+
+async def read_packet(reader: asyncio.StreamReader) -> Tuple[int, int, bytes]:
+    """
+    Read one MQTT packet.
+
+    Returns:
+    - Tuple[int, int, bytes]: The packet type, the flags and the body.
+    """
+    header = (await reader.readexactly(1))[0]
+    length, multiplier = 0, 1
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length += (byte & 0x7F) * multiplier
+        multiplier *= 128
+        if not byte & 0x80:
+            break
+    return header >> 4, header & 0x0F, await reader.readexactly(length)
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[index]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class StandInBroker:
+    """
+    StandInBroker is a small MQTT 3.1.1 broker for testing and benchmarking uploads offline.
+
+    It accepts plain TCP connections, acknowledges QoS 1 publishes and
+    forwards messages to subscribers. Faults of a real link can be injected:
+    a delay before every acknowledgement, lost publishes (neither stored nor
+    acknowledged) and dropped connections, after every N publishes or at
+    random. Only what the cloud transfer uses is implemented: no QoS 2,
+    retained messages, wills or persistent sessions.
+
+    Attributes:
+    - host (str): The address to listen on.
+    - port (int): The port to listen on, the one bound once started if 0 was given.
+    - latency (float): The delay before a publish is acknowledged, in seconds.
+    - loss (float): The probability that a publish is lost.
+    - disconnect_every (int): Drop the connection after this many publishes, never if 0.
+    - disconnect_rate (float): The probability to drop the connection on a publish.
+    - messages (Deque[Tuple[str, bytes]]): The latest messages received.
+    - stats (Dict[str, int]): Counts of connections, publishes, acks, losses and disconnects.
+
+    Methods:
+    - serve_in_background() -> threading.Thread: Run the broker in a daemon thread.
+    - serve_forever() -> None: Run the broker in the calling thread.
+    - stop() -> None: Stop a running broker.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 1883,
+        latency: float = 0.0,
+        loss: float = 0.0,
+        disconnect_every: int = 0,
+        disconnect_rate: float = 0.0,
+        seed: Optional[int] = None,
+        keep: int = 10000,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.loss = loss
+        self.disconnect_every = disconnect_every
+        self.disconnect_rate = disconnect_rate
+        self.random = random.Random(seed)
+        self.messages: Deque[Tuple[str, bytes]] = deque(maxlen=keep)
+        self.stats = {
+            "connections": 0,
+            "publishes": 0,
+            "acks": 0,
+            "lost": 0,
+            "disconnects": 0,
+        }
+        self.subscriptions: Dict[asyncio.StreamWriter, Set[str]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.ready = threading.Event()
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Serve one client connection until it closes or is dropped.
+        """
+        self.subscriptions[writer] = set()
+        try:
+            while True:
+                packet_type, flags, body = await read_packet(reader)
+                if packet_type == CONNECT:
+                    self.stats["connections"] += 1
+                    writer.write(encode_packet(CONNACK, b"\x00\x00"))
+                elif packet_type == PUBLISH:
+                    if not self.handle_publish(writer, flags, body):
+                        break
+                elif packet_type == SUBSCRIBE:
+                    self.handle_subscribe(writer, body)
+                elif packet_type == UNSUBSCRIBE:
+                    offset = 2
+                    while offset < len(body):
+                        topic, offset = read_string(body, offset)
+                        self.subscriptions[writer].discard(topic.decode())
+                    writer.write(encode_packet(UNSUBACK, body[:2]))
+                elif packet_type == PINGREQ:
+                    writer.write(encode_packet(PINGRESP))
+                elif packet_type == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.subscriptions.pop(writer, None)
+            writer.close()
+
+    def handle_publish(
+        self, writer: asyncio.StreamWriter, flags: int, body: bytes
+    ) -> bool:
+        """
+        Handle a PUBLISH packet.
+
+        Returns:
+        - bool: False if the connection must be dropped.
+        """
+        qos = flags >> 1 & 0x03
+        topic, offset = read_string(body, 0)
+        packet_id = body[offset : offset + 2] if qos else b""
+        payload = body[offset + len(packet_id) :]
+
+        self.stats["publishes"] += 1
+        if (
+            self.disconnect_every
+            and self.stats["publishes"] % self.disconnect_every == 0
+        ):
+            self.stats["disconnects"] += 1
+            return False
+        if self.disconnect_rate and self.random.random() < self.disconnect_rate:
+            self.stats["disconnects"] += 1
+            return False
+        if self.loss and self.random.random() < self.loss:
+            self.stats["lost"] += 1
+            return True
+
+        self.messages.append((topic.decode(), payload))
+        for subscriber, topic_filters in self.subscriptions.items():
+            if any(
+                topic_matches(topic_filter, topic.decode())
+                for topic_filter in topic_filters
+            ):
+                subscriber.write(encode_packet(PUBLISH, encode_string(topic) + payload))
+        if qos:
+            if self.latency:
+                self.loop.call_later(self.latency, self.acknowledge, writer, packet_id)
+            else:
+                self.acknowledge(writer, packet_id)
+        return True
+
+    def acknowledge(self, writer: asyncio.StreamWriter, packet_id: bytes) -> None:
+        if not writer.is_closing():
+            writer.write(encode_packet(PUBACK, packet_id))
+            self.stats["acks"] += 1
+
+    def handle_subscribe(self, writer: asyncio.StreamWriter, body: bytes) -> None:
+        granted = bytearray()
+        offset = 2
+        while offset < len(body):
+            topic, offset = read_string(body, offset)
+            requested_qos = body[offset]
+            offset += 1
+            self.subscriptions[writer].add(topic.decode())
+            granted.append(min(requested_qos, 1))
+        writer.write(encode_packet(SUBACK, body[:2] + bytes(granted)))
+
+    async def _serve(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(
+            self.handle_client, self.host, self.port
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+    def serve_forever(self) -> None:
+        asyncio.run(self._serve())
+
+    def serve_in_background(self) -> threading.Thread:
+        thread = threading.Thread(
+            target=self.serve_forever, name="stand-in-broker", daemon=True
+        )
+        thread.start()
+        self.ready.wait(5)
+        return thread
+
+    def stop(self) -> None:
+        if self.loop and self.server:
+            self.loop.call_soon_threadsafe(self._close)
+
+    def _close(self) -> None:
+        self.server.close()
+        for writer in list(self.subscriptions):
+            writer.close()
+
+    def received_payloads(self) -> List[bytes]:
+        return [payload for _, payload in self.messages]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run a stand-in MQTT broker, to upload without AWS (transport=mqtt)"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds before a PUBACK"
+    )
+    parser.add_argument(
+        "--loss", type=float, default=0.0, help="probability a publish is lost"
+    )
+    parser.add_argument(
+        "--disconnect-every",
+        type=int,
+        default=0,
+        help="drop the connection every N publishes",
+    )
+    parser.add_argument(
+        "--disconnect-rate",
+        type=float,
+        default=0.0,
+        help="probability to drop on a publish",
+    )
+    parser.add_argument("--seed", type=int)
+    cli_args = parser.parse_args()
+    broker = StandInBroker(
+        cli_args.host,
+        cli_args.port,
+        cli_args.latency,
+        cli_args.loss,
+        cli_args.disconnect_every,
+        cli_args.disconnect_rate,
+        cli_args.seed,
+    )
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        print(broker.stats)
+
+
+if __name__ == "__main__":
+    main()
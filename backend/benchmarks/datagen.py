@@ -0,0 +1,230 @@
+#!.venv/bin/python3
+from datetime import date, datetime, timedelta
+from multiprocessing import Pool
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import json
+import math
+import os
+import random
+import sys
+
+# Where the generated vehicle is based
+HOME = (6.8429, 7.3733)
+METERS_PER_DEGREE = 111_320
+# (data path, day, interval, seed, gaps per hour)
+DayTask = Tuple[str, date, float, int, float]
+
+
+def day_path(data_path: str, day: date) -> str:
+    return os.path.join(
+        data_path,
+        "{:04d}".format(day.year),
+        "{:02d}".format(day.month),
+        "{:02d}.txt".format(day.day),
+    )
+
+
+def day_records(
+    day: date, interval: float, rng: random.Random, gap_rate: float
+) -> Iterator[Dict]:
+    """
+    Generate the records of a day, as stored from the registered sensors.
+
+    The vehicle alternates between parked and driving stretches, with a GPS
+    that loses its fix now and then (None position, altitude and speed) and
+    an ultrasonic sensor that occasionally fails (None distance).
+
+    Args:
+    - day (date): The day of the records.
+    - interval (float): The time between two records, in seconds.
+    - rng (random.Random): The random generator of the day.
+    - gap_rate (float): The average number of GPS gaps per hour.
+
+    Yields:
+    - Dict: The records, keyed like the sensor data.
+    """
+    latitude = HOME[0] + rng.uniform(-0.05, 0.05)
+    longitude = HOME[1] + rng.uniform(-0.05, 0.05)
+    altitude = rng.uniform(180, 260)
+    heading = rng.uniform(0, 2 * math.pi)
+    speed = 0.0
+    moving = False
+    gap = 0
+    midnight = int(datetime.combine(day, datetime.min.time()).timestamp()) * 10**9
+    for step in range(int(24 * 60 * 60 // interval)):
+        if rng.random() < interval / (1800 if moving else 3600):
+            moving = not moving
+        if moving:
+            speed = min(max(speed + rng.gauss(0, 1.5), 0.0), 25.0)
+            heading += rng.gauss(0, 0.2)
+        else:
+            speed = max(speed - 3.0, 0.0)
+        meters = speed * interval
+        latitude += meters * math.cos(heading) / METERS_PER_DEGREE
+        longitude += (
+            meters
+            * math.sin(heading)
+            / (METERS_PER_DEGREE * math.cos(math.radians(latitude)))
+        )
+        altitude += rng.gauss(0, 0.3)
+
+        if not gap and rng.random() < gap_rate * interval / 3600:
+            gap = rng.randint(1, max(1, int(1800 // interval)))
+        fix = not gap
+        gap = max(gap - 1, 0)
+
+        yield {
+            "ts": midnight + round(step * interval * 10**9),
+            "seq": step,
+            "altitude": round(altitude, 1) if fix else None,
+            "longitude": round(longitude, 6) if fix else None,
+            "latitude": round(latitude, 6) if fix else None,
+            "speed": round(speed, 2) if fix else None,
+            "distance": (
+                None if rng.random() < 0.005 else round(rng.uniform(20, 400), 2)
+            ),
+        }
+
+
+def generate_day(task: DayTask) -> Tuple[str, int, int]:
+    """
+    Write the data file of a day.
+
+    Args:
+    - task (DayTask): The data path, day, interval, seed and gap rate.
+
+    Returns:
+    - Tuple[str, int, int]: The path, number of records and size of the file.
+    """
+    from models.db_engine.db import FileDB
+
+    data_path, day, interval, seed, gap_rate = task
+    rng = random.Random(seed * 1_000_003 + day.toordinal())
+    path = day_path(data_path, day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    records = 0
+    with FileDB(path, "w") as db:
+        for record in day_records(day, interval, rng, gap_rate):
+            db.write_data_line(record)
+            records += 1
+    return path, records, os.path.getsize(path)
+
+
+def write_meta(root: str, last_upload_file: str, offset: int = 0) -> str:
+    """
+    Write the meta file of a generated backend directory.
+
+    Returns:
+    - str: The path of the meta file.
+    """
+    path = os.path.join(root, "config", "meta.txt")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as meta_file:
+        meta_file.write(
+            "LastUploadFile={}\nOffset={}\n".format(last_upload_file, offset)
+        )
+    return path
+
+
+def generate(
+    root: str,
+    start: date,
+    days: int,
+    interval: float = 20.0,
+    seed: int = 0,
+    gap_rate: float = 0.5,
+    workers: Optional[int] = None,
+) -> List[Tuple[str, int, int]]:
+    """
+    Generate the data/YYYY/MM/DD.txt tree and meta file of consecutive days.
+
+    Days are written in parallel and each has its own random generator, so
+    the output only depends on the arguments. The meta file points at the
+    first day with a zero offset: nothing is uploaded yet.
+
+    Args:
+    - root (str): The backend directory to generate, holding data/ and config/.
+    - start (date): The first day.
+    - days (int): The number of days.
+    - interval (float): The time between two records, in seconds.
+    - seed (int): The seed of the random generators.
+    - gap_rate (float): The average number of GPS gaps per hour.
+    - workers (Optional[int]): The number of processes, one per CPU by default.
+
+    Returns:
+    - List[Tuple[str, int, int]]: The path, number of records and size of every day file, oldest first.
+    """
+    data_path = os.path.join(root, "data")
+    tasks = [
+        (data_path, start + timedelta(days=day), interval, seed, gap_rate)
+        for day in range(days)
+    ]
+    if workers == 1 or days == 1:
+        files = [generate_day(task) for task in tasks]
+    else:
+        with Pool(workers) as pool:
+            files = pool.map(generate_day, tasks, chunksize=1)
+    write_meta(root, files[0][0])
+    return files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate a data/YYYY/MM/DD.txt tree of plausible records and its meta.txt"
+    )
+    parser.add_argument(
+        "root", help="backend directory to write data/ and config/meta.txt into"
+    )
+    parser.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        default=date(2024, 1, 1),
+        help="first day, YYYY-MM-DD",
+    )
+    parser.add_argument("--days", type=int, default=30, help="number of days")
+    parser.add_argument(
+        "--interval", type=float, default=20.0, help="seconds between records"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gap-rate", type=float, default=0.5, help="GPS gaps per hour")
+    parser.add_argument(
+        "--workers", type=int, help="number of processes, one per CPU by default"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="write into a data directory that is not empty",
+    )
+    cli_args = parser.parse_args()
+
+    data_path = os.path.join(cli_args.root, "data")
+    if os.path.isdir(data_path) and os.listdir(data_path) and not cli_args.force:
+        sys.exit("{} is not empty, use --force to write into it".format(data_path))
+    start = perf_counter()
+    files = generate(
+        cli_args.root,
+        cli_args.start,
+        cli_args.days,
+        cli_args.interval,
+        cli_args.seed,
+        cli_args.gap_rate,
+        cli_args.workers,
+    )
+    elapsed = perf_counter() - start
+    size = sum(file[2] for file in files)
+    summary = {
+        "days": len(files),
+        "records": sum(file[1] for file in files),
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+        "megabytes_per_second": round(size / elapsed / 1e6, 1),
+        "first_file": files[0][0],
+        "last_file": files[-1][0],
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
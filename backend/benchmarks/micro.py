@@ -0,0 +1,265 @@
+#!.venv/bin/python3
+from benchmarks.datagen import day_records, generate
+from benchmarks.report import finish, load_report, make_report
+from benchmarks.sandbox import BACKEND_DIR, Sandbox
+from datetime import date
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+import argparse
+import os
+import random
+import shutil
+import sys
+
+# A sample every 20 seconds
+RECORDS_PER_DAY = 24 * 60 * 60 // 20
+SIZES = {"day": 1, "month": 30, "year": 365}
+START_DATE = date(2024, 1, 1)
+THRESHOLDS_PATH = os.path.join(BACKEND_DIR, "benchmarks", "thresholds", "micro.json")
+
+
+def per_op(function: Callable[[], int], repeat: int = 3) -> float:
+    """
+    Time a function doing a number of operations, best of `repeat` runs.
+
+    Args:
+    - function (Callable[[], int]): Does the work and returns the number of operations done.
+
+    Returns:
+    - float: The time per operation, in microseconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        ops = function()
+        best = min(best, (perf_counter() - start) / max(ops, 1))
+    return best * 1e6
+
+
+def bench_size(
+    sandbox: Sandbox, size: str, ops: int, records_per_day: int
+) -> Dict[str, float]:
+    """
+    Run every micro-benchmark against a data tree of a given size.
+
+    Functions that work on the whole data set (reading, parsing and listing
+    files) process all of it; the per record ones run `ops` times on top of it.
+
+    Returns:
+    - Dict[str, float]: The microseconds per operation of every benchmark.
+    """
+    from models.data_manager.cloud_transfer import CloudTransferManager
+    from models.data_manager.encoders import DictEncoder, PassThroughEncoder
+    from models.db_engine.bulk import read_columns
+    from models.db_engine.db import FileDB, MetaDB, TempDB
+    from models.sensors.sample import Projection, Sample, SampleReader
+    from models.sensors.schema import STAMP_FIELDS
+    from util import modify_data_to_dict
+
+    data_path = sandbox.path("data")
+    shutil.rmtree(data_path)
+    files = generate(
+        sandbox.root, START_DATE, SIZES[size], 24 * 60 * 60 / records_per_day
+    )
+    paths = [file[0] for file in files]
+    last_path = paths[-1]
+    record = next(day_records(date.today(), 20, random.Random(0), 0))
+
+    def write_data_line() -> int:
+        # as StorageManager.save_collected_data, which reopens the file every record
+        for _ in range(ops):
+            with FileDB(last_path, "a") as db:
+                db.write_data_line(record)
+        return ops
+
+    def readlines() -> int:
+        count = 0
+        for path in paths:
+            with FileDB(path, "r") as db:
+                count += len(db.readlines())
+        return count
+
+    lines = []
+    for path in paths:
+        with open(path) as day_file:
+            lines.extend(day_file.readlines())
+
+    def parse() -> int:
+        for line in lines:
+            modify_data_to_dict(line)
+        return len(lines)
+
+    def bulk_parse() -> int:
+        for path in paths:
+            read_columns(path)
+        return len(lines)
+
+    def encoder_batches(encoder) -> Callable[[], int]:
+        # as HttpSink.send, 100 records a batch
+        def encode() -> int:
+            for start in range(0, len(lines), 100):
+                encoder.encode_batch(lines[start : start + 100])
+            return len(lines)
+
+        return encode
+
+    # one dict per sensor, as they return them
+    gps_keys = ("longitude", "latitude", "altitude", "speed")
+    readings = [
+        {"ts": record["ts"], "seq": record["seq"]},
+        {key: record[key] for key in gps_keys},
+        {"distance": record["distance"]},
+    ]
+    reader = SampleReader()
+    projection = Projection(["latitude", "longitude"], keep=STAMP_FIELDS)
+
+    def read_sample() -> int:
+        # from the sensor dicts to the stored line, without the pipe and the file
+        for _ in range(ops):
+            sample = Sample.unpack(reader.read(readings).pack())
+            projection(sample).to_line()
+        return ops
+
+    meta_db = MetaDB()
+    offset = os.path.getsize(last_path) // 2
+
+    def save_metadata() -> int:
+        for _ in range(ops):
+            meta_db.save_metadata(meta={"LastUploadFile": last_path, "Offset": offset})
+        return ops
+
+    def retrieve_metadata() -> int:
+        for _ in range(ops):
+            meta_db.retrieve_metadata()
+        return ops
+
+    tmp_db = TempDB()
+
+    def save_to_tmp_db() -> int:
+        # as SensorDataManager.run, which cleans up every MAX_DB_LINES records
+        for index in range(ops):
+            tmp_db.save_to_tmp_db(record)
+            if index % TempDB.MAX_DB_LINES == TempDB.MAX_DB_LINES - 1:
+                tmp_db.clean_up_tmp_db()
+        return ops
+
+    def clean_up_tmp_db() -> int:
+        for _ in range(ops // TempDB.MAX_DB_LINES):
+            for _ in range(TempDB.MAX_DB_LINES):
+                tmp_db.save_to_tmp_db(record)
+            tmp_db.clean_up_tmp_db()
+        return ops // TempDB.MAX_DB_LINES
+
+    manager = CloudTransferManager()
+    db_path = os.path.join(sandbox.root, "data/")
+    first_upload = os.path.relpath(paths[0], db_path).split(os.sep)
+
+    def get_unuploaded_files() -> int:
+        files = manager.get_unuploaded_files(first_upload, db_path)
+        return len(files)
+
+    benchmarks: List[Tuple[str, Callable[[], int]]] = [
+        ("file_db_write_data_line", write_data_line),
+        ("file_db_readlines", readlines),
+        ("modify_data_to_dict", parse),
+        ("bulk_read_columns", bulk_parse),
+        ("dict_encode_batch", encoder_batches(DictEncoder())),
+        ("passthrough_encode_batch", encoder_batches(PassThroughEncoder())),
+        ("sample_read_project", read_sample),
+        ("meta_db_save_metadata", save_metadata),
+        ("meta_db_retrieve_metadata", retrieve_metadata),
+        ("temp_db_save_to_tmp_db", save_to_tmp_db),
+        ("temp_db_clean_up_tmp_db", clean_up_tmp_db),
+        ("get_unuploaded_files", get_unuploaded_files),
+    ]
+    # the data set functions are only timed once on the larger sizes
+    repeat = 3 if SIZES[size] < 30 else 1
+    return {
+        "{}_{}_us".format(name, size): per_op(function, repeat)
+        for name, function in benchmarks
+    }
+
+
+def check_thresholds(
+    results: Dict[str, float], thresholds: Dict[str, float]
+) -> List[str]:
+    """
+    List the results above their threshold.
+
+    Args:
+    - results (Dict[str, float]): The microseconds per operation of every benchmark.
+    - thresholds (Dict[str, float]): The highest acceptable value of each result.
+
+    Returns:
+    - List[str]: A message for every result above its threshold.
+    """
+    return [
+        "{}: {:.3f}us > {:.3f}us".format(name, results[name], limit)
+        for name, limit in sorted(thresholds.items())
+        if name in results and results[name] > limit
+    ]
+
+
+def run(
+    sizes: List[str], ops: int = 2000, records_per_day: int = RECORDS_PER_DAY
+) -> dict:
+    """
+    Run the micro-benchmarks at each size in a sandbox.
+
+    Returns:
+    - dict: The report.
+    """
+    results = {}
+    with Sandbox() as sandbox:
+        for size in sizes:
+            results.update(bench_size(sandbox, size, ops, records_per_day))
+    details = {
+        "sizes": {size: SIZES[size] for size in sizes},
+        "ops": ops,
+        "records_per_day": records_per_day,
+    }
+    return make_report("micro", results, details)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time the FileDB, MetaDB, TempDB, parsing and encoding hot paths "
+        "on data sets of a day, a month and a year"
+    )
+    parser.add_argument(
+        "--sizes",
+        default=",".join(SIZES),
+        help="comma separated sizes among " + ", ".join(SIZES),
+    )
+    parser.add_argument(
+        "--ops", type=int, default=2000, help="operations per record benchmark"
+    )
+    parser.add_argument("--records-per-day", type=int, default=RECORDS_PER_DAY)
+    parser.add_argument(
+        "--thresholds",
+        default=THRESHOLDS_PATH,
+        help="JSON file of the highest acceptable results, empty to skip the check",
+    )
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="compare against this JSON report")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="relative slowdown counted as a regression",
+    )
+    cli_args = parser.parse_args()
+    report = run(cli_args.sizes.split(","), cli_args.ops, cli_args.records_per_day)
+    status = finish(report, cli_args.output, cli_args.compare, cli_args.tolerance)
+
+    failures = []
+    if cli_args.thresholds:
+        thresholds = load_report(cli_args.thresholds)["results"]
+        failures = check_thresholds(report["results"], thresholds)
+    for failure in failures:
+        print("THRESHOLD EXCEEDED " + failure)
+    sys.exit(1 if failures else status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+#!.venv/bin/python3
+from benchmarks.broker import StandInBroker
+from benchmarks.report import finish, make_report, percentiles
+from benchmarks.sandbox import Sandbox
+from benchmarks.startup import wait_until
+from benchmarks.stubs import SyntheticSensor, install_stubs
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from time import perf_counter, sleep
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import resource
+import sys
+
+
+def get_usage() -> Dict[str, float]:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "max_rss_kb": usage.ru_maxrss,
+    }
+
+
+def run_component(
+    instance, comm_pipe: Connection, data_pipe: Connection, usage_pipe: Connection
+) -> None:
+    """
+    Run a pipeline component and report the resources it used once it stops.
+
+    Args:
+    - instance: A SensorDataManager or StorageManager.
+    - comm_pipe (Connection): The command pipe of the component.
+    - data_pipe (Connection): The data pipe of the component.
+    - usage_pipe (Connection): Where to send the resource usage.
+    """
+    try:
+        instance.run(comm_pipe, data_pipe)
+    finally:
+        usage_pipe.send(get_usage())
+
+
+def run_in_child(function: Callable, *args) -> Tuple[Any, Dict[str, float]]:
+    """
+    Call a function in a forked process.
+
+    Returns:
+    - Tuple[Any, Dict[str, float]]: The result of the function and the resources the process used.
+    """
+
+    def target(result_pipe: Connection) -> None:
+        result = function(*args)
+        result_pipe.send((result, get_usage()))
+
+    recv_result, send_result = Pipe(duplex=False)
+    process = Process(target=target, args=(send_result,))
+    process.start()
+    send_result.close()
+    try:
+        result = recv_result.recv()
+    except EOFError:
+        raise RuntimeError("{} failed in the child process".format(function.__name__))
+    finally:
+        process.join()
+    return result
+
+
+def measure_pipeline(
+    sensors: int,
+    width: int,
+    rate: float,
+    duration: float,
+    read_time: float,
+    batch_size: int = 1,
+    batch_interval: float = 1.0,
+) -> Tuple[Dict[str, float], Dict[str, Any]]:
+    """
+    Stream synthetic samples through SensorDataManager, a pipe and StorageManager.
+
+    The collection runs for `duration` seconds; the storage process is then
+    given the time to store every sample that was collected.
+
+    Args:
+    - sensors (int): The number of synthetic sensors, polled after stamping every sample.
+    - width (int): The number of fields of every synthetic sensor.
+    - rate (float): The collection rate in samples per second, 0 for as fast as possible.
+    - duration (float): How long to collect, in seconds.
+    - read_time (float): How long reading one synthetic sensor takes, in seconds.
+    - batch_size (int): The samples sent to the StorageManager in one message.
+    - batch_interval (float): The longest a sample waits for its batch, in seconds.
+
+    Returns:
+    - Tuple[Dict[str, float], Dict[str, Any]]: The results and the details of the run.
+    """
+    from models.data_manager.storage_manager import StorageManager
+    from models.metrics.pipeline import PipelineMetrics
+    from models.metrics.tracing import latency_report
+    from models.sensor_mgmt.sensor_manager import SensorDataManager
+
+    SensorDataManager.COLLECTION_INTERVAL = 1 / rate if rate else 0
+    SensorDataManager.BATCH_SIZE = batch_size
+    SensorDataManager.BATCH_INTERVAL = batch_interval
+    collector = SensorDataManager()
+    collector.sensors = [
+        SyntheticSensor(index, width, read_time) for index in range(sensors)
+    ]
+    storage = StorageManager()
+
+    send_cmd_sdm, recv_cmd_sdm = Pipe()
+    send_cmd_dsm, recv_cmd_dsm = Pipe()
+    send_data_sdm, recv_data_dsm = Pipe()
+    recv_collector_usage, send_collector_usage = Pipe(duplex=False)
+    recv_storage_usage, send_storage_usage = Pipe(duplex=False)
+    storage_process = Process(
+        target=run_component,
+        args=(storage, recv_cmd_dsm, recv_data_dsm, send_storage_usage),
+    )
+    collector_process = Process(
+        target=run_component,
+        args=(collector, recv_cmd_sdm, send_data_sdm, send_collector_usage),
+    )
+    depth = PipelineMetrics.pipe_queue_depth.labels("sensor_to_storage")
+
+    send_cmd_sdm.send("START")
+    start = perf_counter()
+    storage_process.start()
+    collector_process.start()
+    max_depth = 0.0
+    while perf_counter() - start < duration:
+        max_depth = max(max_depth, depth.get())
+        sleep(0.01)
+    send_cmd_sdm.send("END")
+    collector_usage = recv_collector_usage.recv()
+    collector_process.join()
+    collected_in = perf_counter() - start
+    collected = PipelineMetrics.samples_collected.get()
+    wait_until(
+        lambda: PipelineMetrics.samples_stored.get() >= collected, timeout=60 + duration
+    )
+    stored_in = perf_counter() - start
+    send_cmd_dsm.send("END")
+    storage_usage = recv_storage_usage.recv()
+    storage_process.join()
+
+    stored = PipelineMetrics.samples_stored.get()
+    ages = latency_report().get("stored", {})
+    results = {
+        "collection_samples_per_second": collected / collected_in,
+        "pipeline_samples_per_second": stored / stored_in,
+        "collector_cpu_us_per_sample": collector_usage["cpu_seconds"] / collected * 1e6,
+        "storage_cpu_us_per_sample": storage_usage["cpu_seconds"] / stored * 1e6,
+        "collector_max_rss_kb": collector_usage["max_rss_kb"],
+        "storage_max_rss_kb": storage_usage["max_rss_kb"],
+        "stored_age_p50_seconds": ages.get("p50", 0.0),
+        "stored_age_p95_seconds": ages.get("p95", 0.0),
+        "stored_age_p99_seconds": ages.get("p99", 0.0),
+    }
+    details = {
+        "samples_collected": collected,
+        "samples_stored": stored,
+        "bytes_per_sample": PipelineMetrics.storage_bytes_written.get() / stored,
+        "max_pipe_queue_depth": max_depth,
+        "db_path": storage.db_path,
+    }
+    return results, details
+
+
+def upload(path: str) -> Tuple[float, List[float]]:
+    """
+    Upload a data file with CloudTransferManager.upload_file.
+
+    Returns:
+    - Tuple[float, List[float]]: The upload time and the latency of every publish, in seconds.
+    """
+    from models.data_manager.cloud_transfer import CloudTransferManager
+
+    manager = CloudTransferManager()
+    manager.cloud_transfer.connect()
+    publish = manager.cloud_transfer.publish
+    latencies = []
+
+    def timed_publish(data: dict, timeout: int = 2) -> None:
+        publish_start = perf_counter()
+        publish(data, timeout)
+        latencies.append(perf_counter() - publish_start)
+
+    manager.cloud_transfer.publish = timed_publish
+    start = perf_counter()
+    manager.upload_file(path)
+    return perf_counter() - start, latencies
+
+
+def measure_upload(
+    sandbox: Sandbox, db_path: str, records: int
+) -> Tuple[Dict[str, float], Dict[str, Any]]:
+    """
+    Publish stored records through the fake MQTT connection.
+
+    Args:
+    - sandbox (Sandbox): The sandbox of the run.
+    - db_path (str): A data file written by the pipeline, recycled to make up `records` lines.
+    - records (int): The number of records to upload.
+
+    Returns:
+    - Tuple[Dict[str, float], Dict[str, Any]]: The results and the details of the run.
+    """
+    with open(db_path) as db:
+        lines = db.readlines()
+    path = sandbox.path("data", "upload.txt")
+    with open(path, "w") as upload_file:
+        for index in range(records):
+            upload_file.write(lines[index % len(lines)])
+
+    (elapsed, latencies), usage = run_in_child(upload, path)
+    latency = percentiles(latencies)
+    results = {
+        "upload_records_per_second": len(latencies) / elapsed,
+        "upload_cpu_us_per_record": usage["cpu_seconds"] / len(latencies) * 1e6,
+        "upload_max_rss_kb": usage["max_rss_kb"],
+        "publish_p50_seconds": latency["p50"],
+        "publish_p99_seconds": latency["p99"],
+    }
+    return results, {"records_uploaded": len(latencies), "publish_latency": latency}
+
+
+def run(
+    sensors: int = 4,
+    width: int = 4,
+    rate: float = 0,
+    duration: float = 5,
+    read_time: float = 0.0,
+    mqtt_latency: float = 0.0,
+    records: int = 2000,
+    broker: bool = False,
+    batch_size: int = 1,
+    batch_interval: float = 1.0,
+) -> dict:
+    """
+    Run the pipeline throughput benchmark in a sandbox.
+
+    With `broker`, records are uploaded over TCP to a StandInBroker
+    acknowledging after `mqtt_latency`, instead of the fake MQTT connection.
+
+    Returns:
+    - dict: The report.
+    """
+    config = {
+        "sensors": sensors,
+        "width": width,
+        "rate": rate,
+        "duration": duration,
+        "read_time": read_time,
+        "mqtt_latency": mqtt_latency,
+        "records": records,
+        "broker": broker,
+        "batch_size": batch_size,
+        "batch_interval": batch_interval,
+    }
+    env = {}
+    if broker:
+        stand_in = StandInBroker(port=0, latency=mqtt_latency)
+        stand_in.serve_in_background()
+        env = {
+            "transport": "mqtt",
+            "mqtt_port": str(stand_in.port),
+            "message_topic": "datalogger/benchmark",
+        }
+    with Sandbox(env) as sandbox:
+        install_stubs(mqtt_latency, fake_mqtt=not broker)
+        results, details = measure_pipeline(
+            sensors, width, rate, duration, read_time, batch_size, batch_interval
+        )
+        upload_results, upload_details = measure_upload(
+            sandbox, details.pop("db_path"), records
+        )
+    if broker:
+        stand_in.stop()
+    results.update(upload_results)
+    details.update(upload_details, config=config)
+    return make_report("pipeline", results, details)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure the throughput of the data pipeline with synthetic "
+        "sensors and a fake MQTT connection"
+    )
+    parser.add_argument(
+        "--sensors", type=int, default=4, help="number of synthetic sensors"
+    )
+    parser.add_argument(
+        "--width", type=int, default=4, help="fields per synthetic sensor"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0,
+        help="samples per second, 0 for as fast as possible",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=5, help="collection time in seconds"
+    )
+    parser.add_argument(
+        "--read-time",
+        type=float,
+        default=0.0,
+        help="time to read one sensor, in seconds",
+    )
+    parser.add_argument(
+        "--mqtt-latency",
+        type=float,
+        default=0.0,
+        help="delay of every MQTT operation, in seconds",
+    )
+    parser.add_argument(
+        "--records", type=int, default=2000, help="number of records to upload"
+    )
+    parser.add_argument(
+        "--broker",
+        action="store_true",
+        help="upload over TCP to a stand-in MQTT broker instead of the fake connection",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="samples sent from the collector to the storage in one message",
+    )
+    parser.add_argument(
+        "--batch-interval",
+        type=float,
+        default=1.0,
+        help="longest time a sample waits for its batch, in seconds",
+    )
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="compare against this JSON report")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="relative slowdown counted as a regression",
+    )
+    cli_args = parser.parse_args()
+    report = run(
+        cli_args.sensors,
+        cli_args.width,
+        cli_args.rate,
+        cli_args.duration,
+        cli_args.read_time,
+        cli_args.mqtt_latency,
+        cli_args.records,
+        cli_args.broker,
+        cli_args.batch_size,
+        cli_args.batch_interval,
+    )
+    sys.exit(finish(report, cli_args.output, cli_args.compare, cli_args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
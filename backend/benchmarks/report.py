@@ -0,0 +1,164 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from benchmarks.sandbox import BACKEND_DIR
+
+# Results whose name ends with one of these are better when higher
+HIGHER_IS_BETTER = ("_per_second",)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """
+    The p50, p95, p99 and maximum of a list of values, by nearest rank.
+    """
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {
+        "p50": ordered[round(0.5 * last)],
+        "p95": ordered[round(0.95 * last)],
+        "p99": ordered[round(0.99 * last)],
+        "max": ordered[last],
+    }
+
+
+def get_commit() -> str:
+    """
+    The commit the benchmarks ran on, "unknown" outside of a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def make_report(
+    benchmark: str, results: Dict[str, float], details: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """
+    Wrap benchmark results with the context needed to compare them later.
+
+    Args:
+    - benchmark (str): The name of the benchmark.
+    - results (Dict[str, float]): The headline numbers, compared across runs.
+    - details (Dict[str, Any]): Supporting data that is recorded but not compared.
+
+    Returns:
+    - Dict[str, Any]: The report.
+    """
+    return {
+        "benchmark": benchmark,
+        "commit": get_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+        "details": details or {},
+    }
+
+
+def write_report(report: Dict[str, Any], path: str) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+        report_file.write("\n")
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path) as report_file:
+        return json.load(report_file)
+
+
+def compare_reports(
+    baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2
+) -> List[Tuple[str, float, float, float, bool]]:
+    """
+    Compare the results of two reports.
+
+    Args:
+    - baseline (Dict[str, Any]): The reference report.
+    - current (Dict[str, Any]): The new report.
+    - tolerance (float): The relative change tolerated before a result counts as a regression.
+
+    Returns:
+    - List[Tuple[str, float, float, float, bool]]: For every result in both reports,
+      its name, baseline and current value, relative change and whether it regressed.
+    """
+    rows = []
+    for name, current_value in current["results"].items():
+        base_value = baseline["results"].get(name)
+        if base_value is None or current_value is None:
+            continue
+        change = (current_value - base_value) / base_value if base_value else 0.0
+        if name.endswith(HIGHER_IS_BETTER):
+            regressed = change < -tolerance
+        else:
+            regressed = change > tolerance
+        rows.append((name, base_value, current_value, change, regressed))
+    return rows
+
+
+def print_comparison(
+    rows: List[Tuple[str, float, float, float, bool]], file=sys.stdout
+) -> None:
+    width = max([len(row[0]) for row in rows] + [6])
+    print(
+        "{:<{w}}  {:>12}  {:>12}  {:>8}".format(
+            "result", "baseline", "current", "change", w=width
+        ),
+        file=file,
+    )
+    for name, base_value, current_value, change, regressed in rows:
+        print(
+            "{:<{w}}  {:>12.6g}  {:>12.6g}  {:>+7.1%}{}".format(
+                name,
+                base_value,
+                current_value,
+                change,
+                "  REGRESSED" if regressed else "",
+                w=width,
+            ),
+            file=file,
+        )
+
+
+def finish(
+    report: Dict[str, Any],
+    output: str = None,
+    compare: str = None,
+    tolerance: float = 0.2,
+) -> int:
+    """
+    Print a report, write it and compare it to a baseline.
+
+    Args:
+    - report (Dict[str, Any]): The report.
+    - output (str): Where to write the report as JSON, if anywhere.
+    - compare (str): The path of a baseline report, if any.
+    - tolerance (float): See compare_reports().
+
+    Returns:
+    - int: The exit status, 1 when a result regressed.
+    """
+    if output:
+        write_report(report, output)
+    if not compare:
+        print(json.dumps(report["results"], indent=2, sort_keys=True))
+        return 0
+    rows = compare_reports(load_report(compare), report, tolerance)
+    print_comparison(rows)
+    return 1 if any(row[4] for row in rows) else 0
@@ -0,0 +1,91 @@
+from typing import Dict, Optional
+import os
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Sandbox:
+    """
+    Sandbox is a throwaway backend directory the benchmarks run in.
+
+    The models resolve their data, logs, config and tmp directories from the
+    working directory (see util.get_base_path), so a benchmark that works in a
+    sandbox never touches the data of the real installation. Entering the
+    sandbox creates the directories, an .env file and an empty temporary
+    database and meta file, then changes into it; leaving it changes back and
+    removes it.
+
+    Attributes:
+    - root (str): The backend directory of the sandbox.
+    - env (Dict[str, str]): The variables written to config/.env.
+
+    Methods:
+    - path(*parts: str) -> str: Join a path inside the sandbox.
+    - environ(**extra: str) -> Dict[str, str]: The environment of a benchmarked subprocess.
+    """
+
+    def __init__(
+        self, env: Optional[Dict[str, str]] = None, keep: bool = False
+    ) -> None:
+        """
+        Initialize the Sandbox.
+
+        Args:
+        - env (Optional[Dict[str, str]]): Variables added to, or overriding, the default .env.
+        - keep (bool): Keep the directory on exit, e.g. to inspect the logs.
+        """
+        self.keep = keep
+        self.extra_env = env or {}
+        self.root = ""
+        self.env: Dict[str, str] = {}
+        self._tmpdir = ""
+        self._cwd = ""
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def environ(self, **extra: str) -> Dict[str, str]:
+        """
+        The environment of a subprocess that runs backend code in the sandbox.
+
+        Args:
+        - extra: Additional environment variables.
+
+        Returns:
+        - Dict[str, str]: A copy of os.environ with the backend on the PYTHONPATH.
+        """
+        pythonpath = os.pathsep.join(
+            filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")])
+        )
+        return dict(os.environ, PYTHONPATH=pythonpath, **extra)
+
+    def __enter__(self) -> "Sandbox":
+        self._tmpdir = tempfile.mkdtemp(prefix="datalogger-bench-")
+        self.root = os.path.join(self._tmpdir, "backend")
+        for directory in ("config", "data", "logs", "tmp"):
+            os.makedirs(self.path(directory))
+        self.env = {
+            "tmp_db_path": self.path("tmp", "tmp_db"),
+            "control_socket_path": self.path("tmp", "control.sock"),
+            "metrics_port": "0",
+        }
+        self.env.update(self.extra_env)
+        with open(self.path("config", ".env"), "w") as env_file:
+            for key, value in self.env.items():
+                env_file.write("{}={}\n".format(key, value))
+        for empty_file in (self.env["tmp_db_path"], self.path("config", "meta.txt")):
+            open(empty_file, "a").close()
+
+        self._cwd = os.getcwd()
+        os.chdir(self.root)
+        if BACKEND_DIR not in sys.path:
+            sys.path.insert(0, BACKEND_DIR)
+        return self
+
+    def __exit__(self, exc_type, exc_value, trace) -> None:
+        os.chdir(self._cwd)
+        if not self.keep:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
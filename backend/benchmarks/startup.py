@@ -0,0 +1,238 @@
+#!.venv/bin/python3
+from benchmarks.report import finish, make_report
+from benchmarks.sandbox import Sandbox
+from typing import Callable, Dict, List, Tuple
+from util.importtime import measure_import, total_import_time
+import argparse
+import glob
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Commands timed in this order: data saving first, so that the collection
+# process streams its very first sample to the storage process
+SPAWN_COMMANDS = ["START-DATA_SAVING", "START-CLOUD_TRANSFER", "START-DATA_COLLECTION"]
+TOP_MODULES = 20
+
+
+def wait_until(
+    predicate: Callable[[], bool], timeout: float = 30, interval: float = 0.001
+) -> float:
+    """
+    Poll a predicate until it holds.
+
+    Args:
+    - predicate (Callable[[], bool]): The condition to wait for.
+    - timeout (float): How long to wait, in seconds.
+    - interval (float): The polling interval, in seconds.
+
+    Returns:
+    - float: The time it took, in seconds.
+
+    Raises:
+    - TimeoutError: If the predicate does not hold within the timeout.
+    """
+    start = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError("Benchmark condition not met within {}s".format(timeout))
+        time.sleep(interval)
+    return time.perf_counter() - start
+
+
+def bytecode_env(sandbox: Sandbox, pycache: str) -> Dict[str, str]:
+    """
+    The environment of an interpreter caching its bytecode in a given directory.
+    """
+    return sandbox.environ(PYTHONPYCACHEPREFIX=pycache, PYTHONDONTWRITEBYTECODE="")
+
+
+def file_has_data(path: str) -> bool:
+    try:
+        return os.path.getsize(path) > 0
+    except OSError:
+        return False
+
+
+def stored_data(sandbox: Sandbox) -> bool:
+    return any(
+        file_has_data(path)
+        for path in glob.glob(sandbox.path("data", "*", "*", "*.txt"))
+    )
+
+
+def control_ready(socket_path: str) -> bool:
+    from models.manager.control import ControlClient
+
+    try:
+        with ControlClient(socket_path, timeout=5) as client:
+            return client.request("PING").get("status") == "success"
+    except OSError:
+        return False
+
+
+def measure_startup(sandbox: Sandbox, pycache: str) -> Dict[str, float]:
+    """
+    Start the stubbed application and time it up to the first stored sample.
+
+    Args:
+    - sandbox (Sandbox): The sandbox to run the application in.
+    - pycache (str): The bytecode cache directory of the interpreter.
+
+    Returns:
+    - Dict[str, float]: The timings of the run, in seconds.
+    """
+    from models.manager.control import ControlClient
+
+    socket_path = sandbox.env["control_socket_path"]
+    timings = {}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_app"],
+        cwd=sandbox.root,
+        env=bytecode_env(sandbox, pycache),
+        stdout=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        timings["ready"] = wait_until(lambda: control_ready(socket_path))
+        with ControlClient(socket_path) as client:
+            for command in SPAWN_COMMANDS:
+                command_start = time.perf_counter()
+                response = client.request(command)
+                name = "spawn_" + command.split("-", 1)[1].lower()
+                timings[name] = time.perf_counter() - command_start
+                if response.get("status") != "success":
+                    raise RuntimeError("{} failed: {}".format(command, response))
+                if command == "START-CLOUD_TRANSFER":
+                    # the upload loop has nothing to do here and would only compete for the CPU
+                    client.request("STOP-CLOUD_TRANSFER")
+        wait_until(lambda: file_has_data(sandbox.env["tmp_db_path"]))
+        timings["first_tempdb_write"] = time.perf_counter() - command_start
+        wait_until(lambda: stored_data(sandbox))
+        timings["first_sample_stored"] = time.perf_counter() - start
+    finally:
+        # the managed processes are forked children in the same session
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+    return timings
+
+
+def measure_imports(
+    sandbox: Sandbox, pycache: str
+) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """
+    Import app.py in a fresh interpreter.
+
+    Args:
+    - sandbox (Sandbox): The sandbox to import in.
+    - pycache (str): The bytecode cache directory of the interpreter.
+
+    Returns:
+    - Tuple[float, Dict[str, Tuple[int, int]]]: The import time of app.py in seconds,
+      and the self and cumulative time of every module imported, in microseconds.
+    """
+    report = measure_import(
+        ["app"], cwd=sandbox.root, env=bytecode_env(sandbox, pycache)
+    )
+    return total_import_time(report, ["app"]) / 1e6, report
+
+
+def top_modules(
+    report: Dict[str, Tuple[int, int]], count: int = TOP_MODULES
+) -> List[dict]:
+    modules = sorted(report.items(), key=lambda item: item[1][0], reverse=True)
+    return [
+        {"module": name, "self_us": self_us, "cumulative_us": cumulative_us}
+        for name, (self_us, cumulative_us) in modules[:count]
+    ]
+
+
+def median(runs: List[Dict[str, float]], name: str) -> float:
+    return statistics.median(run[name] for run in runs)
+
+
+def run(runs: int = 5) -> dict:
+    """
+    Run the startup benchmark.
+
+    The first run starts without a bytecode cache (cold); the following runs
+    reuse the cache it wrote (warm). Each run gets a fresh sandbox.
+
+    Args:
+    - runs (int): The number of warm runs.
+
+    Returns:
+    - dict: The report.
+    """
+    pycache = tempfile.mkdtemp(prefix="datalogger-bench-pycache-")
+    try:
+        with Sandbox() as sandbox:
+            cold_import, _ = measure_imports(sandbox, pycache)
+            warm_import, modules = measure_imports(sandbox, pycache)
+        shutil.rmtree(pycache)
+        os.makedirs(pycache)
+
+        with Sandbox() as sandbox:
+            cold = measure_startup(sandbox, pycache)
+        warm = []
+        for _ in range(runs):
+            with Sandbox() as sandbox:
+                warm.append(measure_startup(sandbox, pycache))
+    finally:
+        shutil.rmtree(pycache, ignore_errors=True)
+
+    results = {
+        "cold_import_seconds": cold_import,
+        "warm_import_seconds": warm_import,
+        "cold_start_seconds": cold["ready"],
+        "warm_start_seconds": median(warm, "ready"),
+        "cold_first_sample_stored_seconds": cold["first_sample_stored"],
+        "warm_first_sample_stored_seconds": median(warm, "first_sample_stored"),
+        "first_tempdb_write_seconds": median(warm, "first_tempdb_write"),
+    }
+    for command in SPAWN_COMMANDS:
+        name = "spawn_" + command.split("-", 1)[1].lower()
+        results[name + "_seconds"] = median(warm, name)
+    details = {
+        "cold_run": cold,
+        "warm_runs": warm,
+        "top_modules_by_self_time": top_modules(modules),
+        "backend_modules": {
+            name: {"self_us": self_us, "cumulative_us": cumulative_us}
+            for name, (self_us, cumulative_us) in sorted(modules.items())
+            if name.split(".")[0] in ("app", "models", "util")
+        },
+    }
+    return make_report("startup", results, details)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure startup, import and child process spawn times "
+        "of the application, with stubbed sensors and MQTT connection"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="number of warm runs")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="compare against this JSON report")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="relative slowdown counted as a regression",
+    )
+    cli_args = parser.parse_args()
+    sys.exit(
+        finish(
+            run(cli_args.runs), cli_args.output, cli_args.compare, cli_args.tolerance
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+#!.venv/bin/python3
+from benchmarks.stubs import install_stubs
+import os
+import sys
+
+if __name__ == "__main__":
+    # app.py with stubbed sensors and MQTT connection, for the benchmarks
+    install_stubs(mqtt_latency=float(os.environ.get("BENCH_MQTT_LATENCY") or 0))
+    import app
+
+    app.main(["--headless"] + sys.argv[1:])
@@ -0,0 +1,184 @@
+from models.sensors.sensor import Sensor
+from typing import Dict, List, Optional, Tuple
+import sys
+import threading
+import time
+import types
+
+STUB_SENSOR_MODULES = [
+    "benchmarks.stubs.StubGPS",
+    "models.sensors.time.Time",
+    "models.sensors.date.Date",
+    "benchmarks.stubs.StubUltrasonic",
+]
+
+
+class StubGPS(Sensor):
+    """
+    A GPS that always reports the same position, without gpsd or network access.
+    """
+
+    def get_data(self) -> Dict[str, Optional[float]]:
+        return {
+            "longitude": 7.3733,
+            "latitude": 6.8429,
+            "altitude": None,
+            "speed": None,
+        }
+
+
+class StubUltrasonic(Sensor):
+    """
+    An ultrasonic sensor that always measures the same distance, without GPIO.
+    """
+
+    def get_data(self) -> Dict[str, Optional[float]]:
+        return {"distance": 42.0}
+
+
+class SyntheticSensor(Sensor):
+    """
+    A sensor producing a configurable number of numeric fields.
+
+    Attributes:
+    - fields (List[str]): The names of the fields, unique per sensor index.
+    - read_time (float): How long a reading takes, in seconds.
+    """
+
+    def __init__(self, index: int = 0, width: int = 4, read_time: float = 0.0) -> None:
+        self.fields = ["s{}_v{}".format(index, field) for field in range(width)]
+        self.read_time = read_time
+        self.readings = 0
+
+    def get_data(self) -> Dict[str, float]:
+        if self.read_time:
+            time.sleep(self.read_time)
+        self.readings += 1
+        value = self.readings / 1000
+        return {
+            field: round(value + offset, 3) for offset, field in enumerate(self.fields)
+        }
+
+
+class FakeFuture:
+    """
+    A future of the fake MQTT connection that completes after a delay.
+
+    Methods:
+    - result(timeout: Optional[float] = None): Wait for the future, like concurrent.futures.Future.
+    """
+
+    def __init__(self, delay: float = 0.0, value=None) -> None:
+        self.done_at = time.monotonic() + delay
+        self.value = value
+
+    def result(self, timeout: Optional[float] = None):
+        remaining = self.done_at - time.monotonic()
+        if timeout is not None and remaining > timeout:
+            time.sleep(timeout)
+            raise TimeoutError
+        if remaining > 0:
+            time.sleep(remaining)
+        return self.value
+
+    def add_done_callback(self, callback) -> None:
+        callback(self)
+
+
+class FakeMqttConnection:
+    """
+    An in-process stand-in for awscrt.mqtt.Connection.
+
+    Every operation completes after `latency` seconds; the connection keeps
+    the published messages so benchmarks can count them.
+
+    Attributes:
+    - latency (float): The delay of connect, publish and disconnect, in seconds.
+    - published (List[Tuple[str, str]]): The topic and payload of every message.
+    """
+
+    latency: float = 0.0
+
+    def __init__(self, **kwargs) -> None:
+        self.options = kwargs
+        self.published: List[Tuple[str, str]] = []
+        self.packet_id = 0
+        self.lock = threading.Lock()
+
+    def connect(self) -> FakeFuture:
+        return FakeFuture(self.latency, {"session_present": False})
+
+    def disconnect(self) -> FakeFuture:
+        return FakeFuture(self.latency, {})
+
+    def publish(self, topic: str, payload: str, qos=None) -> Tuple[FakeFuture, int]:
+        with self.lock:
+            self.packet_id += 1
+            self.published.append((topic, payload))
+            return (
+                FakeFuture(self.latency, {"packet_id": self.packet_id}),
+                self.packet_id,
+            )
+
+    def resubscribe_existing_topics(self) -> Tuple[FakeFuture, int]:
+        return FakeFuture(0, {"topics": []}), 0
+
+
+def mtls_from_path(**kwargs) -> FakeMqttConnection:
+    return FakeMqttConnection(**kwargs)
+
+
+def make_fake_mqtt_modules() -> Dict[str, types.ModuleType]:
+    """
+    Build modules standing in for the parts of the AWS IoT SDK the models use.
+
+    Returns:
+    - Dict[str, types.ModuleType]: The fake modules keyed by their import name.
+    """
+    awscrt = types.ModuleType("awscrt")
+    mqtt = types.ModuleType("awscrt.mqtt")
+    mqtt.QoS = types.SimpleNamespace(AT_MOST_ONCE=0, AT_LEAST_ONCE=1)
+    mqtt.ConnectReturnCode = types.SimpleNamespace(ACCEPTED=0)
+    mqtt.OnConnectionSuccessData = types.SimpleNamespace
+    mqtt.OnConnectionFailureData = types.SimpleNamespace
+    mqtt.Client = lambda bootstrap=None, tls_ctx=None: None
+    mqtt.Connection = FakeMqttConnection
+    awscrt.mqtt = mqtt
+
+    awsiot = types.ModuleType("awsiot")
+    builder = types.ModuleType("awsiot.mqtt_connection_builder")
+    builder.mtls_from_path = mtls_from_path
+    awsiot.mqtt_connection_builder = builder
+    return {
+        "awscrt": awscrt,
+        "awscrt.mqtt": mqtt,
+        "awsiot": awsiot,
+        "awsiot.mqtt_connection_builder": builder,
+    }
+
+
+def install_stubs(
+    mqtt_latency: float = 0.0,
+    sensor_modules: Optional[List[str]] = None,
+    fake_mqtt: bool = True,
+) -> None:
+    """
+    Replace the hardware and the cloud with stubs, in this process and the ones it forks.
+
+    Must be called before the cloud transfer module is imported: the fake AWS
+    IoT SDK is picked up by its lazy imports, and the internet check it
+    imports from util always succeeds.
+
+    Args:
+    - mqtt_latency (float): The delay of every MQTT operation, in seconds.
+    - sensor_modules (Optional[List[str]]): The sensors to poll, STUB_SENSOR_MODULES by default.
+    - fake_mqtt (bool): False to keep the real MQTT client, e.g. to upload to the stand-in broker.
+    """
+    import util
+    from models.sensor_mgmt.register_sensor import SensorModule
+
+    if fake_mqtt:
+        sys.modules.update(make_fake_mqtt_modules())
+    FakeMqttConnection.latency = mqtt_latency
+    util.is_internet_connected = lambda: True
+    SensorModule.MODULES = list(sensor_modules or STUB_SENSOR_MODULES)
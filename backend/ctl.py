@@ -0,0 +1,26 @@
+#!.venv/bin/python3
+from models.manager.control import ControlClient
+import argparse
+import json
+import sys
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Send a command to a running data logger",
+        epilog="example: ctl.py START-DATA_SAVING longitude latitude",
+    )
+    parser.add_argument("command", help="e.g. START-DATA_COLLECTION, STOP-CLOUD_TRANSFER or STATUS")
+    parser.add_argument("args", nargs="*", help="arguments passed on to the command")
+    parser.add_argument("--socket", default=None, help="path of the control socket")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for a response")
+    cli_args = parser.parse_args()
+
+    try:
+        with ControlClient(cli_args.socket, cli_args.timeout) as client:
+            response = client.request(cli_args.command, *cli_args.args)
+    except (OSError, ConnectionError) as e:
+        print(f"Could not reach the data logger: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    print(json.dumps(response, indent=2))
+    sys.exit(0 if response.get("status") == "success" else 1)
@@ -1,29 +1,114 @@
 from util.logger import BaseLogger
 from util import get_base_path
+from typing import Dict, Optional
 import logging
 import os
+import threading
+
+
+def get_log_path(filename: Optional[str] = None) -> str:
+    """
+    Resolve a log file name against the logs directory of the backend.
+
+    Args:
+    - filename (Optional[str]): A file name, or an absolute path which is returned unchanged.
+
+    Returns:
+    - str: The path of the log file, models.log when no name is given.
+    """
+    return os.path.join(get_base_path(), "logs", filename or "models.log")
 
 
 class ModelLogger(BaseLogger):
+    """
+    Logger of the models.
+
+    Loggers are normally obtained with ModelLogger.lazy() as a class attribute
+    or ModelLogger.get(); both configure a named logger once, on first use,
+    and share the file handlers between loggers writing to the same file.
+    """
+
+    _loggers: Dict[str, "ModelLogger"] = {}
+    _lock = threading.Lock()
+
     def __init__(self, name=None):
+        self.log_files = set()
         super().__init__(name)
 
+    @classmethod
+    def get(cls, name: str, filename: Optional[str] = None, **kwargs) -> "ModelLogger":
+        """
+        Get the logger of a name, configuring it the first time.
+
+        Args:
+        - name (str): The name of the logger.
+        - filename (Optional[str]): The log file, relative to the logs directory.
+        - kwargs: Passed on to customiseLogger().
+
+        Returns:
+        - ModelLogger: The configured logger.
+        """
+        logger = cls._loggers.get(name)
+        if logger is None:
+            with cls._lock:
+                logger = cls._loggers.get(name)
+                if logger is None:
+                    logger = cls(name).customiseLogger(
+                        filename=get_log_path(filename), **kwargs
+                    )
+                    cls._loggers[name] = logger
+        return logger
+
+    @classmethod
+    def lazy(cls, name: str, filename: Optional[str] = None, **kwargs) -> "LazyLogger":
+        """
+        Declare a logger that is configured on first use.
+
+        Args:
+        - name (str): The name of the logger.
+        - filename (Optional[str]): The log file, relative to the logs directory.
+        - kwargs: Passed on to customiseLogger().
+
+        Returns:
+        - LazyLogger: A descriptor to assign to a class attribute.
+        """
+        return LazyLogger(name, filename, **kwargs)
+
     def customiseLogger(
         self,
         level=logging.DEBUG,
-        filename=os.path.join("{}".format(get_base_path()), "logs", "models.log"),
+        filename=None,
         format=None,
     ):
         self.setLevel(level)
 
-        if not os.path.exists(filename):
-            with open(filename, "w") as fd:
-                fd.write("")
+        if not filename:
+            filename = get_log_path()
 
-        self.setFileHandler(filename)
+        if filename not in self.log_files:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            self.setFileHandler(filename)
+            self.log_files.add(filename)
         # self.setStreamHandler()
 
         if format:
             self.setFormatter(format)
 
         return self
+
+
+class LazyLogger:
+    """
+    Class attribute giving access to a ModelLogger configured on first use.
+
+    Importing a module declaring one touches neither the file system nor the
+    logging configuration.
+    """
+
+    def __init__(self, name: str, filename: Optional[str] = None, **kwargs) -> None:
+        self.name = name
+        self.filename = filename
+        self.kwargs = kwargs
+
+    def __get__(self, instance, owner) -> ModelLogger:
+        return ModelLogger.get(self.name, self.filename, **self.kwargs)
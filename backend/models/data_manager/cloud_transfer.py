@@ -1,5 +1,3 @@
-from awscrt import mqtt
-from awsiot import mqtt_connection_builder
 from models.exceptions.exception import (
     AWSCloudConnectionError,
     AWSCloudDisconnectError,
@@ -7,20 +5,31 @@ from models.exceptions.exception import (
     AWSCloudUploadError,
 )
 from models.db_engine.db import MetaDB
+from models.data_manager.encoders import build_encoder
+from models.data_manager.rate_control import Backoff, RateController
+from models.data_manager.scheduler import UploadScheduler
+from models.data_manager.sinks import Sink, SinkWorker, build_sinks
+from models.metrics.pipeline import PipelineMetrics
+from models.metrics.tracing import record_age_from_data
 from models import ModelLogger
 from multiprocessing.connection import Connection, Pipe
 from multiprocessing import Process
-from typing import List, Dict, Union, Optional
-from time import sleep
+from typing import Iterable, List, Dict, Union, Optional
+from time import perf_counter, sleep
 from util import (
     get_base_path,
     is_internet_connected,
     env_variables,
     modify_data_to_dict,
 )
+from util.lazy import lazy_import
 import sys
 import json
 import os
+import threading
+
+mqtt = lazy_import("awscrt.mqtt")
+mqtt_connection_builder = lazy_import("awsiot.mqtt_connection_builder")
 
 
 class CTFlogger:
@@ -28,11 +37,42 @@ class CTFlogger:
     Class for logging cloud transfer activities.
     """
 
-    logger = ModelLogger("cloud-transfer").customiseLogger(
-        filename=os.path.join(
-            "{}".format(get_base_path()), "logs", "cloud_transfer.log"
-        )
-    )
+    logger = ModelLogger.lazy("cloud-transfer", "cloud_transfer.log")
+
+
+class ConnectionState:
+    """
+    States of the MQTT connection of a CloudTransfer.
+
+    - disconnected: No connection; connect() must be called.
+    - connecting: connect() is waiting for the broker.
+    - connected: Publishes can be sent.
+    - interrupted: The link was lost; awscrt reconnects by itself and the
+      connection resumes without being rebuilt.
+    """
+
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    INTERRUPTED = "interrupted"
+    STATES = (DISCONNECTED, CONNECTING, CONNECTED, INTERRUPTED)
+
+
+# The CloudTransfer owning each connection, for the callbacks to update its state
+_transfers: Dict[int, "CloudTransfer"] = {}
+
+
+def set_connection_state(connection, state: str) -> None:
+    """
+    Set the state of the CloudTransfer owning a connection, if any.
+
+    Parameters:
+        - connection: The MQTT connection object.
+        - state (str): One of the ConnectionState values.
+    """
+    transfer = _transfers.get(id(connection))
+    if transfer is not None:
+        transfer.set_state(state)
 
 
 def on_connection_interrupted(connection, error, **kwargs):
@@ -46,6 +86,8 @@ def on_connection_interrupted(connection, error, **kwargs):
     """
 
     CTFlogger.logger.error("Connection interrupted. error: {}".format(error))
+    PipelineMetrics.connection_interruptions.inc()
+    set_connection_state(connection, ConnectionState.INTERRUPTED)
 
 
 def on_connection_resumed(connection, return_code, session_present, **kwargs):
@@ -63,6 +105,7 @@ def on_connection_resumed(connection, return_code, session_present, **kwargs):
             return_code, session_present
         )
     )
+    set_connection_state(connection, ConnectionState.CONNECTED)
 
     if return_code == mqtt.ConnectReturnCode.ACCEPTED and not session_present:
         CTFlogger.logger.info(
@@ -119,6 +162,7 @@ def on_connection_success(connection, callback_data):
             callback_data.return_code, callback_data.session_present
         )
     )
+    set_connection_state(connection, ConnectionState.CONNECTED)
 
 
 def on_connection_failure(connection, callback_data):
@@ -133,6 +177,10 @@ def on_connection_failure(connection, callback_data):
     CTFlogger.logger.warning(
         "Connection failed with error code: {}".format(callback_data.error)
     )
+    transfer = _transfers.get(id(connection))
+    if transfer is not None and transfer.state != ConnectionState.INTERRUPTED:
+        # while interrupted, failures are the attempts of awscrt to reconnect
+        transfer.set_state(ConnectionState.DISCONNECTED)
 
 
 def on_connection_closed(connection, callback_data):
@@ -144,11 +192,31 @@ def on_connection_closed(connection, callback_data):
     - callback_data: Additional data associated with the callback.
     """
     CTFlogger.logger.warning("Connection closed")
+    set_connection_state(connection, ConnectionState.DISCONNECTED)
 
 
 class CloudTransfer:
     """
     CloudTransfer is responsible for establishing and managing MQTT connections for cloud data transfer.
+
+    The `transport` environment variable selects how the connection is built:
+    - aws (default): mTLS connection to AWS IoT, from the endpoint and certificate variables.
+    - mqtt: Plain TCP connection to any MQTT broker at `mqtt_host`:`mqtt_port`, e.g. a local
+      broker or the stand-in broker of the benchmarks, to upload without AWS credentials.
+
+    Publishes are paced per topic by a RateController: `publish_rate` and `publish_byte_rate`
+    cap the messages and bytes per second (no cap if unset), and the message rate backs off
+    when acknowledgements take longer than `publish_target_latency` seconds or time out.
+
+    One connection object is built and kept for the life of the instance. When the link
+    drops, awscrt reconnects it by itself (`on_connection_interrupted`/`on_connection_resumed`);
+    when connecting fails, the next attempt should wait `backoff.next_delay()`, which grows
+    from `reconnect_min_delay` to `reconnect_max_delay` seconds. The connection state
+    (see ConnectionState) can be read from `state` and waited for with wait_for_state().
+
+    `encoder` selects how CloudTransferManager turns stored lines into messages: dict
+    (default) parses them, passthrough rewrites them into JSON directly
+    (see models.data_manager.encoders).
     """
 
     endpoint = ""
@@ -157,14 +225,80 @@ class CloudTransfer:
     ca_filepath = ""
     client_id = ""
     message_topic = ""
+    transport = "aws"
+    mqtt_host = "127.0.0.1"
+    mqtt_port = "1883"
+    publish_rate = ""
+    publish_byte_rate = ""
+    publish_target_latency = ""
+    publish_retries = "2"
+    reconnect_min_delay = ""
+    reconnect_max_delay = ""
+    encoder = "dict"
 
     def __init__(self) -> None:
         """
         Initialize the CloudTransfer instance and load environment variables.
         """
         self.mqtt_connection = None
-        self.connected = False
+        self.connect_future = None
+        self.state = ConnectionState.DISCONNECTED
+        self.state_changed = threading.Condition()
         self._load_env()
+        self.backoff = Backoff(
+            float(self.reconnect_min_delay or 1),
+            float(self.reconnect_max_delay or 300),
+        )
+        self.rate_controller = RateController(
+            messages_per_second=float(self.publish_rate or 0),
+            bytes_per_second=float(self.publish_byte_rate or 0),
+            target_latency=float(self.publish_target_latency or 1.0),
+        )
+        self.transport_map = {
+            "aws": self.build_aws_connection,
+            "mqtt": self.build_mqtt_connection,
+        }
+
+    @property
+    def connected(self) -> bool:
+        return self.state == ConnectionState.CONNECTED
+
+    @connected.setter
+    def connected(self, value: bool) -> None:
+        self.set_state(
+            ConnectionState.CONNECTED if value else ConnectionState.DISCONNECTED
+        )
+
+    def set_state(self, state: str) -> None:
+        """
+        Move the connection to a new state.
+
+        Parameters:
+        - state (str): One of the ConnectionState values.
+        """
+        with self.state_changed:
+            if state == self.state:
+                return
+            previous, self.state = self.state, state
+            self.state_changed.notify_all()
+        for name in ConnectionState.STATES:
+            PipelineMetrics.connection_state.labels(name).set(int(name == state))
+        CTFlogger.logger.info("Connection {} -> {}".format(previous, state))
+
+    def wait_for_state(self, states: Iterable[str], timeout: float) -> bool:
+        """
+        Wait until the connection is in one of some states.
+
+        Parameters:
+        - states (Iterable[str]): The awaited ConnectionState values.
+        - timeout (float): The longest wait, in seconds.
+
+        Returns:
+        - bool: True if the connection reached one of the states.
+        """
+        states = set(states)
+        with self.state_changed:
+            return self.state_changed.wait_for(lambda: self.state in states, timeout)
 
     @classmethod
     def _load_env(cls) -> None:
@@ -174,11 +308,27 @@ class CloudTransfer:
         for key, value in env_variables().items():
             setattr(CloudTransfer, key, value)
 
-    def connect(self) -> None:
+    def build_connection(self):
         """
-        Establish a connection to the MQTT broker.
+        Build the MQTT connection of the configured transport.
+
+        Returns:
+        - mqtt.Connection: The connection, not connected yet.
+
+        Raises:
+        - ValueError: If the transport is unknown.
+        """
+        try:
+            builder = self.transport_map[self.transport]
+        except KeyError:
+            raise ValueError("Unknown transport {}".format(self.transport))
+        return builder()
+
+    def build_aws_connection(self):
+        """
+        Build an mTLS connection to AWS IoT.
         """
-        self.mqtt_connection = mqtt_connection_builder.mtls_from_path(
+        return mqtt_connection_builder.mtls_from_path(
             endpoint=self.endpoint,
             cert_filepath=self.cert_filepath,
             pri_key_filepath=self.pri_key_filepath,
@@ -194,14 +344,60 @@ class CloudTransfer:
             on_connection_closed=on_connection_closed,
         )
 
+    def build_mqtt_connection(self):
+        """
+        Build a plain TCP connection to an MQTT broker, without TLS or credentials.
+        """
+        return mqtt.Connection(
+            client=mqtt.Client(None, None),
+            host_name=self.mqtt_host,
+            port=int(self.mqtt_port),
+            client_id=self.client_id or "datalogger",
+            on_connection_interrupted=on_connection_interrupted,
+            on_connection_resumed=on_connection_resumed,
+            clean_session=False,
+            keep_alive_secs=30,
+            on_connection_success=on_connection_success,
+            on_connection_failure=on_connection_failure,
+            on_connection_closed=on_connection_closed,
+        )
+
+    def connect(self) -> None:
+        """
+        Establish a connection to the MQTT broker.
+
+        The connection object is built on the first call and reused by the
+        next ones. An interrupted connection is not rebuilt: the call waits
+        for awscrt to resume it.
+
+        Raises:
+        - AWSCloudConnectionError: If the broker could not be reached within 2 seconds.
+        """
+        if self.state == ConnectionState.INTERRUPTED:
+            if self.wait_for_state([ConnectionState.CONNECTED], 2):
+                return
+            raise AWSCloudConnectionError("Connection not resumed yet")
+
+        if self.mqtt_connection is None:
+            self.mqtt_connection = self.build_connection()
+            _transfers[id(self.mqtt_connection)] = self
+
         try:
-            mqtt_future = self.mqtt_connection.connect()
+            # a connect that timed out may still be in progress
+            if self.connect_future is None or self.connect_future.done():
+                self.set_state(ConnectionState.CONNECTING)
+                self.connect_future = self.mqtt_connection.connect()
             # Future.result() waits until a result is available
-            mqtt_future.result(timeout=2)
+            self.connect_future.result(timeout=2)
             CTFlogger.logger.info("Connection sucessfully established")
             self.connected = True
+            self.backoff.reset()
+        except TimeoutError:
+            CTFlogger.logger.error("Failed to establish connection in time")
+            raise AWSCloudConnectionError
         except Exception:
             CTFlogger.logger.error("Failed to establish connection")
+            self.connected = False
             raise AWSCloudConnectionError
 
     def disconnect(self) -> None:
@@ -216,26 +412,57 @@ class CloudTransfer:
         except Exception:
             raise AWSCloudDisconnectError
 
-    def publish(self, data: dict, timeout: int = 2) -> None:
+    def publish(self, data: Union[dict, str], timeout: int = 2) -> None:
         """
         Publish data to the specified MQTT topic.
 
+        Publishes are paced by the rate controller, and retried up to
+        `publish_retries` times when they are not acknowledged in time.
+
         Parameters:
-        - data (Dict[str, Any]): The data to be published.
+        - data (Union[Dict[str, Any], str]): The data to be published, or its JSON
+          (see models.data_manager.encoders), whose age is then not recorded.
         - timeout (int): Timeout duration for the publish operation.
+
+        Raises:
+        - AWSCloudUploadError: If no attempt was acknowledged in time.
         """
-        try:
-            message_json = json.dumps(data)
-            pub_future, id = self.mqtt_connection.publish(
-                topic=self.message_topic,
-                payload=message_json,
-                qos=mqtt.QoS.AT_LEAST_ONCE,
+        traced = not isinstance(data, str)
+        message_json = json.dumps(data) if traced else data
+        topic = self.message_topic
+        for attempt in range(int(self.publish_retries) + 1):
+            PipelineMetrics.publish_pacing_seconds.inc(
+                self.rate_controller.acquire(topic, len(message_json))
             )
-            pub_future.result(timeout)
-            CTFlogger.logger.info("Data Published successfully")
-        except TimeoutError:
-            CTFlogger.logger.info("Data failed to publish")
-            raise AWSCloudUploadError("Data failed to publish")
+            try:
+                pub_future, id = self.mqtt_connection.publish(
+                    topic=topic,
+                    payload=message_json,
+                    qos=mqtt.QoS.AT_LEAST_ONCE,
+                )
+                PipelineMetrics.publishes.inc()
+                if traced:
+                    record_age_from_data("published", data)
+                start = perf_counter()
+                pub_future.result(timeout)
+            except TimeoutError:
+                PipelineMetrics.publish_failures.inc()
+                rate = self.rate_controller.on_timeout(topic)
+                PipelineMetrics.publish_rate.labels(topic).set(rate)
+                CTFlogger.logger.info(
+                    "Data failed to publish, slowing down to {:.1f}/s".format(rate)
+                )
+                continue
+            rate = self.rate_controller.on_ack(topic, perf_counter() - start)
+            PipelineMetrics.publish_rate.labels(topic).set(rate)
+            PipelineMetrics.acks.inc()
+            if traced:
+                record_age_from_data("acked", data)
+            CTFlogger.logger.debug(
+                "Data Published successfully", extra={"per_second": 1}
+            )
+            return
+        raise AWSCloudUploadError("Data failed to publish")
 
     def subscribe(self, topic):
         """
@@ -250,6 +477,9 @@ class CloudTransfer:
 class CloudTransferManager:
     """
     CloudTransferManager is responsible for managing the batch upload process of data and also concurrent upload of data to the cloud
+
+    When the `sinks` environment variable lists upload sinks (see models.data_manager.sinks),
+    the data is shipped to all of them in parallel instead of the single MQTT topic.
     """
 
     collection_interval: Optional[int] = None
@@ -262,6 +492,7 @@ class CloudTransferManager:
         - lock (Optional[object]): An optional lock object for resource synchronization.
         """
         self.cloud_transfer = CloudTransfer()
+        self.encoder = build_encoder(self.cloud_transfer.encoder)
         self.meta_db = MetaDB()
         self.lock = lock
 
@@ -304,13 +535,15 @@ class CloudTransferManager:
         - base_path (str): The base path for file storage.
         - files (List[str]): A list of files to upload.
         """
-        for file in files:
+        for index, file in enumerate(files):
             filepath = os.path.join(base_path, file)
+            PipelineMetrics.upload_backlog_files.set(len(files) - index)
             try:
                 self.upload_file(filepath)
             except Exception:
                 CTFlogger.logger.error("File: {} Uploading Failed".format(filepath))
                 raise AWSCloudUploadError(f"Could not upload file: {filepath}")
+        PipelineMetrics.upload_backlog_files.set(0)
 
     def upload_file(self, filepath: str) -> None:
         """
@@ -341,10 +574,34 @@ class CloudTransferManager:
         """
         Check if the cloud transfer is connected.
 
+        The MQTT keep-alive and the interruption callback track the link, so
+        the internet connection is only probed before connecting.
+
         Returns:
         - bool: True if connected, False otherwise.
         """
-        return is_internet_connected() and self.cloud_transfer.connected
+        return self.cloud_transfer.connected
+
+    def reconnect(self, recv_cmd_pipe: Connection) -> None:
+        """
+        Try to connect, and wait for the backoff delay if that fails.
+
+        Commands arriving during the wait end it early.
+
+        Parameters:
+        - recv_cmd_pipe (Connection): Pipe to receive commands.
+        """
+        try:
+            if not is_internet_connected():
+                raise AWSCloudConnectionError("No internet connection")
+            self.cloud_transfer.connect()
+            PipelineMetrics.reconnect_delay_seconds.set(0)
+        except AWSCloudConnectionError:
+            PipelineMetrics.connect_failures.inc()
+            delay = self.cloud_transfer.backoff.next_delay()
+            PipelineMetrics.reconnect_delay_seconds.set(delay)
+            CTFlogger.logger.info("Connecting again in {:.1f}s".format(delay))
+            recv_cmd_pipe.poll(delay)
 
     def get_unuploaded_files(
         self, last_upload_file_date: List[str], db_path: str
@@ -381,22 +638,39 @@ class CloudTransferManager:
             # Filter files based on LastUploadFile
             filter_dirs_or_files(files, 2)  # Day
 
-            # Append the remaining files to files_to_be_uploaded
+            # Append the remaining files to files_to_be_uploaded, not the
+            # files being compressed or block files next to them
             files_to_be_uploaded.extend(
-                os.path.join(root[-7:], file) for file in files
+                os.path.join(root[-7:], file) for file in files if file.endswith(".txt")
             )  # Fix magic number 7
 
         return files_to_be_uploaded
 
+    def publish_line(self, line: str) -> None:
+        """
+        Publish one line of a data file.
+
+        Parameters:
+        - line (str): The stored line.
+        """
+        self.cloud_transfer.publish(self.encoder.message(line))
+
     def run(self, recv_cmd_pipe: Connection, data_pipe: Connection = None):
         """
         Logic for transferring data to cloud.
 
+        New data is uploaded first and the history after it, see UploadScheduler.
+
         Parameters:
         - recv_cmd_pipe (Connection): Pipe to receive commands.
         - data_pipe (Optional[Connection]): Unused for now.
         """
-        db = MetaDB()
+        sinks = build_sinks()
+        if sinks:
+            self.run_sinks(recv_cmd_pipe, sinks)
+            return
+
+        scheduler = UploadScheduler.from_env(self.publish_line)
 
         while True:
             if recv_cmd_pipe.poll():
@@ -406,28 +680,41 @@ class CloudTransferManager:
                     break
 
             if self._is_connected():
-                db.set_target(db.get_db_filepath())
-                if db.target != self.meta_db.retrieve_metadata(
-                    path=db.get_metadata_path()
-                ).get("LastUploadFile"):
-                    try:
-                        self.batch_upload()
-                    except AWSCloudUploadError:
-                        continue
-                else:
-                    db.retrieve_metadata()
-                    db.set_target(db.get_db_filepath())
-                    with db as db_connection:
-                        line = db_connection.readline()
-                    if line:
-                        data = modify_data_to_dict(line)
-                        self.cloud_transfer.publish(data)  # fix publish timeout
-                        db.save_metadata()
-            else:
                 try:
-                    self.cloud_transfer.connect()
-                except AWSCloudConnectionError:
-                    pass
+                    if not scheduler.step():
+                        recv_cmd_pipe.poll(scheduler.idle_time())
+                except AWSCloudUploadError:
+                    PipelineMetrics.upload_retries.inc()
+            elif self.cloud_transfer.state == ConnectionState.INTERRUPTED:
+                # awscrt is reconnecting by itself
+                self.cloud_transfer.wait_for_state([ConnectionState.CONNECTED], 1)
+            else:
+                self.reconnect(recv_cmd_pipe)
+
+    def run_sinks(self, recv_cmd_pipe: Connection, sinks: List[Sink]) -> None:
+        """
+        Ship the stored data to several sinks at once, until told to stop.
+
+        Every sink gets its own SinkWorker thread and cursor, so the sinks
+        progress independently.
+
+        Parameters:
+        - recv_cmd_pipe (Connection): Pipe to receive commands.
+        - sinks (List[Sink]): The destinations.
+        """
+        workers = [SinkWorker(sink) for sink in sinks]
+        for worker in workers:
+            worker.start()
+        CTFlogger.logger.info(
+            "Uploading to sinks: {}".format(", ".join(sink.name for sink in sinks))
+        )
+        while recv_cmd_pipe.recv() != "END":
+            pass
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.join(5)
+        CTFlogger.logger.info("Cloud Transfer Stopped")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+from typing import Dict, Iterable, Optional, Union
+from models.sensors.schema import RecordSchema, record_schema
+from util import modify_data_to_dict
+import json
+
+
+class DictEncoder:
+    """
+    Encoder turning stored lines into JSON by parsing them into dicts.
+
+    Stored lines are `key=value` pairs joined by commas. Every line is parsed
+    by modify_data_to_dict and serialized by json.dumps, so any line valid for
+    the parser is encoded.
+
+    Methods:
+    - encode(line: str) -> str: The JSON object of a stored line.
+    - encode_batch(lines: Iterable[str]) -> str: The JSON array of stored lines.
+    - message(line: str) -> Union[Dict, str]: The message CloudTransfer.publish takes for a line.
+    """
+
+    name = "dict"
+
+    def message(self, line: str) -> Union[Dict, str]:
+        return modify_data_to_dict(line)
+
+    def encode(self, line: str) -> str:
+        return json.dumps(modify_data_to_dict(line))
+
+    def encode_batch(self, lines: Iterable[str]) -> str:
+        return json.dumps([modify_data_to_dict(line) for line in lines])
+
+
+class PassThroughEncoder(DictEncoder):
+    """
+    Encoder rewriting stored lines into JSON without parsing them.
+
+    A stored line is already one text substitution away from its JSON
+    object: `a=1,b=None` becomes `{"a": "1", "b": null}` by replacing the
+    separators, which str.replace does in C, with no dict or list per record.
+    A batch is joined first and rewritten as one string.
+
+    The rewrite only holds for plain lines: no quote, backslash or control
+    character, one `=` per field and no spaces around keys and values, which
+    is what FileDB writes. Other lines go through DictEncoder, so the result
+    always decodes to what modify_data_to_dict gives. Non-ASCII characters
+    are kept as UTF-8 instead of being escaped.
+    """
+
+    name = "passthrough"
+
+    def message(self, line: str) -> Union[Dict, str]:
+        return self.encode(line)
+
+    @staticmethod
+    def is_plain(body: str) -> bool:
+        """
+        Check that a line, without its newline, can be rewritten.
+
+        Args:
+        - body (str): The stored line, without its newline.
+
+        Returns:
+        - bool: True if the rewrite gives the same record as the parser.
+        """
+        if (
+            not body.isprintable()
+            or '"' in body
+            or "\\" in body
+            or body.count("=") != body.count(",") + 1
+        ):
+            return False
+        if " " not in body:
+            return True
+        return not (
+            body[0] == " "
+            or body[-1] == " "
+            or " =" in body
+            or "= " in body
+            or " ," in body
+            or ", " in body
+        )
+
+    @staticmethod
+    def rewrite(body: str) -> str:
+        return body.replace("=", '": "').replace(",", '", "')
+
+    def encode(self, line: str) -> str:
+        body = line.rstrip("\n")
+        if not self.is_plain(body):
+            return super().encode(line)
+        return ('{"' + self.rewrite(body) + '"}').replace('": "None"', '": null')
+
+    def encode_batch(self, lines: Iterable[str]) -> str:
+        bodies = [line.rstrip("\n") for line in lines]
+        if not bodies:
+            return "[]"
+        if not all(map(self.is_plain, bodies)):
+            return super().encode_batch(bodies)
+        return (
+            ('[{"' + self.rewrite("\n".join(bodies)) + '"}]')
+            .replace("\n", '"}, {"')
+            .replace('": "None"', '": null')
+        )
+
+
+class TypedEncoder(DictEncoder):
+    """
+    Encoder parsing stored lines with the record schema.
+
+    The values of the numeric fields are published as JSON numbers instead
+    of strings, each converted once, while the line is parsed.
+
+    Attributes:
+    - schema (RecordSchema): The record schema, merged from the registered sensors by default.
+    """
+
+    name = "typed"
+
+    def __init__(self, schema: Optional[RecordSchema] = None) -> None:
+        self.schema = schema if schema is not None else record_schema()
+
+    def message(self, line: str) -> Union[Dict, str]:
+        return self.schema.parse_line(line)
+
+    def encode(self, line: str) -> str:
+        return json.dumps(self.schema.parse_line(line))
+
+    def encode_batch(self, lines: Iterable[str]) -> str:
+        return json.dumps([self.schema.parse_line(line) for line in lines])
+
+
+ENCODERS = {
+    "dict": DictEncoder,
+    "passthrough": PassThroughEncoder,
+    "typed": TypedEncoder,
+}
+
+
+def build_encoder(name: Optional[str] = None) -> DictEncoder:
+    """
+    Build an encoder by name.
+
+    Args:
+    - name (Optional[str]): "dict", "passthrough" or "typed", "dict" if empty.
+
+    Returns:
+    - DictEncoder: The encoder.
+
+    Raises:
+    - ValueError: If the name is unknown.
+    """
+    name = (name or "dict").strip()
+    if name not in ENCODERS:
+        raise ValueError("Unknown encoder {}".format(name))
+    return ENCODERS[name]()
@@ -0,0 +1,256 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+from time import monotonic, sleep
+import random
+import threading
+
+
+class TokenBucket:
+    """
+    TokenBucket limits the rate of an operation.
+
+    The bucket fills at `rate` tokens per second up to `burst` tokens, and
+    every operation takes as many tokens as its cost. Tokens are reserved:
+    the bucket may go into debt and an operation waits until the tokens it
+    took have been added, so costs larger than the burst cannot block
+    forever and the operations after it queue behind.
+
+    Attributes:
+    - rate (float): Tokens added per second, 0 for no limit.
+    - burst (float): The most tokens the bucket holds, a second worth of tokens by default.
+
+    Methods:
+    - reserve(amount: float = 1) -> float: Take tokens, returning how long to wait before using them.
+    - acquire(amount: float = 1) -> float: Take tokens, waiting until they are available.
+    - set_rate(rate: float) -> None: Change the rate, keeping the tokens already in the bucket.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.fixed_burst = burst is not None
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.tokens = self.burst
+        self.last = monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def reserve(self, amount: float = 1) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            self._refill(monotonic())
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def acquire(self, amount: float = 1) -> float:
+        wait = self.reserve(amount)
+        if wait > 0:
+            sleep(wait)
+        return wait
+
+    def set_rate(self, rate: float) -> None:
+        with self.lock:
+            self._refill(monotonic())
+            self.rate = rate
+            if not self.fixed_burst:
+                self.burst = max(rate, 1)
+                self.tokens = min(self.tokens, self.burst)
+
+
+class TopicPacer:
+    """
+    Pacing state of one topic: its buckets, its adapted rate and its recent sends.
+    """
+
+    def __init__(self, max_rate: float, bytes_per_second: float) -> None:
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.messages = TokenBucket(max_rate)
+        self.bytes = TokenBucket(bytes_per_second)
+        self.sent: Deque[float] = deque(maxlen=64)
+        self.last_decrease = float("-inf")
+
+    def measured_rate(self) -> float:
+        """
+        The rate messages were actually sent at recently, 0 if unknown.
+        """
+        if len(self.sent) < 2 or self.sent[-1] <= self.sent[0]:
+            return 0.0
+        return (len(self.sent) - 1) / (self.sent[-1] - self.sent[0])
+
+
+class RateController:
+    """
+    RateController paces the publishes of every topic.
+
+    Each topic has a token bucket for messages and one for bytes, so the
+    publisher stays under the limits of the broker. The message rate is also
+    adapted to the link (AIMD): every publish acknowledged within
+    `target_latency` raises it by `increase` messages per second, spread over
+    a second of publishes, up to the configured rate, while a slow
+    acknowledgement or a timeout cuts it by `decrease` (a timeout counting
+    twice), down to `min_rate`. The rate is cut at most once per
+    `target_latency`, as the publishes in flight during a congestion all
+    report it. With no configured message rate the topic is
+    not paced until the link first shows congestion; the rate then starts
+    from the rate publishes were actually going out at.
+
+    Attributes:
+    - messages_per_second (float): The configured message rate of a topic, 0 for no limit.
+    - bytes_per_second (float): The configured byte rate of a topic, 0 for no limit.
+    - target_latency (float): The acknowledgement latency considered congested, in seconds.
+    - min_rate (float): The lowest message rate adaptation goes down to.
+    - increase (float): The message rate added per second of timely acknowledgements.
+    - decrease (float): The factor the message rate is multiplied by on congestion.
+
+    Methods:
+    - acquire(topic: str, size: int) -> float: Wait until a message may be published.
+    - on_ack(topic: str, latency: float) -> float: Adapt the rate to an acknowledgement.
+    - on_timeout(topic: str) -> float: Adapt the rate to a publish that timed out.
+    - rate(topic: str) -> float: The current message rate of a topic.
+    """
+
+    def __init__(
+        self,
+        messages_per_second: float = 0,
+        bytes_per_second: float = 0,
+        target_latency: float = 1.0,
+        min_rate: float = 1.0,
+        increase: float = 10.0,
+        decrease: float = 0.5,
+    ) -> None:
+        self.messages_per_second = messages_per_second
+        self.bytes_per_second = bytes_per_second
+        self.target_latency = target_latency
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.pacers: Dict[str, TopicPacer] = {}
+        self.lock = threading.Lock()
+
+    def pacer(self, topic: str) -> TopicPacer:
+        pacer = self.pacers.get(topic)
+        if pacer is None:
+            with self.lock:
+                pacer = self.pacers.setdefault(
+                    topic, TopicPacer(self.messages_per_second, self.bytes_per_second)
+                )
+        return pacer
+
+    def acquire(self, topic: str, size: int) -> float:
+        """
+        Wait until a message may be published on a topic.
+
+        Args:
+        - topic (str): The topic.
+        - size (int): The size of the payload in bytes.
+
+        Returns:
+        - float: The time waited, in seconds.
+        """
+        pacer = self.pacer(topic)
+        wait = max(pacer.messages.reserve(1), pacer.bytes.reserve(size))
+        if wait > 0:
+            sleep(wait)
+        pacer.sent.append(monotonic())
+        return wait
+
+    def on_ack(self, topic: str, latency: float) -> float:
+        """
+        Adapt the rate of a topic to an acknowledged publish.
+
+        Args:
+        - topic (str): The topic.
+        - latency (float): The time the broker took to acknowledge, in seconds.
+
+        Returns:
+        - float: The new message rate, 0 if not paced.
+        """
+        if latency > self.target_latency:
+            return self._decrease(topic, self.decrease)
+        pacer = self.pacer(topic)
+        with self.lock:
+            if pacer.rate > 0:
+                rate = pacer.rate + self.increase / pacer.rate
+                if pacer.max_rate > 0:
+                    rate = min(rate, pacer.max_rate)
+                pacer.rate = rate
+                pacer.messages.set_rate(rate)
+        return pacer.rate
+
+    def on_timeout(self, topic: str) -> float:
+        """
+        Adapt the rate of a topic to a publish that was not acknowledged in time.
+
+        Args:
+        - topic (str): The topic.
+
+        Returns:
+        - float: The new message rate.
+        """
+        return self._decrease(topic, self.decrease**2)
+
+    def _decrease(self, topic: str, factor: float) -> float:
+        pacer = self.pacer(topic)
+        with self.lock:
+            now = monotonic()
+            if now - pacer.last_decrease < self.target_latency:
+                return pacer.rate
+            pacer.last_decrease = now
+            rate = pacer.rate
+            measured = pacer.measured_rate()
+            if measured and (rate <= 0 or measured < rate):
+                rate = measured
+            if rate <= 0:
+                rate = self.min_rate / factor
+            pacer.rate = max(self.min_rate, rate * factor)
+            pacer.messages.set_rate(pacer.rate)
+        return pacer.rate
+
+    def rate(self, topic: str) -> float:
+        return self.pacer(topic).rate
+
+
+class Backoff:
+    """
+    Backoff spaces out the retries of an operation that keeps failing.
+
+    The delays grow exponentially from `base` up to `cap`, with equal jitter:
+    each delay is half its exponential value plus a random part of the other
+    half, so devices that lost the link together do not retry in lockstep,
+    yet never retry in a tight loop.
+
+    Attributes:
+    - base (float): The first delay, in seconds.
+    - cap (float): The longest delay, in seconds.
+    - factor (float): The growth of the delay after every failure.
+    - attempts (int): The failures since the last reset.
+
+    Methods:
+    - next_delay() -> float: Count a failure and get the delay before the next attempt.
+    - reset() -> None: Start over after a success.
+    """
+
+    def __init__(
+        self,
+        base: float = 1.0,
+        cap: float = 300.0,
+        factor: float = 2.0,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.attempts = 0
+        self.random = rng or random.Random()
+
+    def next_delay(self) -> float:
+        ceiling = min(self.cap, self.base * self.factor ** min(self.attempts, 64))
+        self.attempts += 1
+        return ceiling / 2 + self.random.uniform(0, ceiling / 2)
+
+    def reset(self) -> None:
+        self.attempts = 0
@@ -0,0 +1,301 @@
+from models.data_manager.sinks import DataCursor
+from models.db_engine.db import MetaDB
+from models.metrics.pipeline import PipelineMetrics
+from models import ModelLogger
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from time import monotonic, perf_counter
+from util import env_variables, get_base_path
+import os
+
+
+class Schedulerlogger:
+    """
+    Class for logging the upload scheduler.
+    """
+
+    logger = ModelLogger.lazy("upload-scheduler", "cloud_transfer.log")
+
+
+class UploadScheduler:
+    """
+    UploadScheduler uploads the stored data in two lanes, live data first.
+
+    The live lane follows the data files from where it started, so new
+    samples go out as soon as they are stored. The backlog lane drains the
+    history, from the cursor of the cloud transfer (`LastUploadFile` and
+    `Offset`) up to where the live lane started, and only sends when the
+    live lane has nothing to send. Its batches are sized so that one takes
+    about `latency_target` seconds, which bounds how long a new sample waits
+    behind history. It can also be held to a share of the time
+    (`backlog_share`) or to a number of records per second (`backlog_rate`),
+    to leave room on the link for other traffic.
+
+    Each lane has its own cursor in the meta file. The live lane keeps its
+    position in `Live.LastUploadFile` and `Live.Offset` and where it started
+    in `Live.StartFile` and `Live.StartOffset`. Once the backlog is drained,
+    `LastUploadFile` and `Offset` follow the live lane. After a restart on
+    the same day both lanes resume. After a longer stop, the live lane
+    starts again at the end of the current file and the backlog lane covers
+    everything before it, but for what the previous live lane sent: that
+    range is kept in `Backlog.Sent` and the backlog lane skips it.
+
+    Attributes:
+    - publish (Callable[[str], None]): Sends one stored line; raises when it fails.
+    - latency_target (float): The longest a new sample should wait behind history, in seconds.
+    - backlog_share (float): The largest share of the time the backlog lane may send, 1 for no limit.
+    - backlog_rate (float): The most backlog records per second, 0 for no limit.
+    - batch_size (int): The most lines sent in a batch.
+    - live (DataCursor): The cursor of the live lane.
+    - backlog (DataCursor): The cursor of the backlog lane, bounded by the next range already sent or the start of the live lane.
+    - live_start (Tuple[str, int]): Where the live lane started.
+    - sent (List[Tuple[Tuple[str, int], Tuple[str, int]]]): The ranges of the backlog sent by earlier live lanes, in order.
+    - backlog_done (bool): Whether the history has been drained.
+
+    Methods:
+    - step() -> bool: Send one batch, live first.
+    - idle_time() -> float: How long to wait when step() had nothing to send.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[str], None],
+        db_path: Optional[str] = None,
+        meta_path: Optional[str] = None,
+        latency_target: float = 2.0,
+        backlog_share: float = 1.0,
+        backlog_rate: float = 0.0,
+        batch_size: int = 100,
+    ) -> None:
+        self.publish = publish
+        self.db_path = db_path or os.path.join(get_base_path(), "data")
+        self.meta_db = MetaDB()
+        self.meta_path = meta_path or self.meta_db.get_metadata_path()
+        self.latency_target = latency_target
+        self.backlog_share = backlog_share
+        self.backlog_rate = backlog_rate
+        self.batch_size = batch_size
+        self.backlog_ready_at = 0.0
+        self.record_seconds = 0.0
+        self.live, self.backlog = self.load_lanes()
+        self.backlog_done = False
+
+    @classmethod
+    def from_env(
+        cls,
+        publish: Callable[[str], None],
+        env: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> "UploadScheduler":
+        """
+        Build a scheduler configured by the .env file.
+
+        Args:
+        - publish (Callable[[str], None]): Sends one stored line.
+        - env (Optional[Dict[str, str]]): The environment variables, read from the .env file by default.
+        - **kwargs: Other arguments of the scheduler.
+
+        Returns:
+        - UploadScheduler: The scheduler.
+        """
+        if env is None:
+            env = env_variables()
+        settings = dict(kwargs)
+        for key, setting, cast in (
+            ("live_latency_target", "latency_target", float),
+            ("backlog_share", "backlog_share", float),
+            ("backlog_rate", "backlog_rate", float),
+            ("upload_batch_size", "batch_size", int),
+        ):
+            if env.get(key):
+                settings[setting] = cast(env[key])
+        return cls(publish, **settings)
+
+    def today_path(self) -> str:
+        return os.path.join(self.db_path, datetime.now().strftime("%Y/%m/%d.txt"))
+
+    def data_position(self, path: Optional[str], offset) -> Tuple[Optional[str], int]:
+        """
+        A position read from the meta file, None if it is not in the data directory.
+        """
+        if not path or not str(path).startswith(self.db_path):
+            return None, 0
+        return path, int(offset or 0)
+
+    def load_sent(self, value) -> List[Tuple[Tuple[str, int], Tuple[str, int]]]:
+        """
+        The ranges already sent, read from `Backlog.Sent`.
+        """
+        sent = []
+        for gap in str(value or "").split(";"):
+            fields = gap.split("|")
+            if len(fields) != 4:
+                continue
+            start = self.data_position(fields[0], fields[1])
+            end = self.data_position(fields[2], fields[3])
+            if start[0] and end[0]:
+                sent.append((start, end))
+        return sent
+
+    def save_sent(self) -> None:
+        self.meta_db.save_metadata(
+            self.meta_path,
+            {
+                "Backlog.Sent": ";".join(
+                    "{}|{}|{}|{}".format(*start, *end) for start, end in self.sent
+                )
+            },
+        )
+
+    def load_lanes(self) -> Tuple[DataCursor, DataCursor]:
+        meta = self.meta_db.retrieve_metadata(self.meta_path)
+        self.sent = self.load_sent(meta.get("Backlog.Sent"))
+        backlog = self.data_position(meta.get("LastUploadFile"), meta.get("Offset"))
+        live = self.data_position(
+            meta.get("Live.LastUploadFile"), meta.get("Live.Offset")
+        )
+        start = self.data_position(
+            meta.get("Live.StartFile"), meta.get("Live.StartOffset")
+        )
+        today = self.today_path()
+        if live[0] != today or start[0] is None:
+            if start[0] and live[0]:
+                if backlog[0] is not None and backlog >= start:
+                    backlog = live  # drained up to where the live lane went
+                    self.sent = []
+                elif live > start:
+                    # sent by the live lane, the backlog lane skips it
+                    self.sent.append((start, live))
+            size = os.path.getsize(today) if os.path.exists(today) else 0
+            start = live = (today, size)
+            Schedulerlogger.logger.info(
+                "Live lane starts at {} offset {}".format(today, size)
+            )
+        self.live_start = start
+        lanes = (
+            DataCursor(self.db_path, live[0], live[1]),
+            DataCursor(
+                self.db_path,
+                backlog[0],
+                backlog[1],
+                end=self.sent[0][0] if self.sent else start,
+            ),
+        )
+        self.meta_db.save_metadata(
+            self.meta_path,
+            {
+                "Live.LastUploadFile": live[0],
+                "Live.Offset": live[1],
+                "Live.StartFile": start[0],
+                "Live.StartOffset": start[1],
+            },
+        )
+        self.save_sent()
+        return lanes
+
+    def save_live(self) -> None:
+        meta = {
+            "Live.LastUploadFile": self.live.path,
+            "Live.Offset": self.live.offset,
+        }
+        if self.backlog_done:
+            meta.update({"LastUploadFile": self.live.path, "Offset": self.live.offset})
+        self.meta_db.save_metadata(self.meta_path, meta)
+
+    def save_backlog(self) -> None:
+        self.meta_db.save_metadata(
+            self.meta_path,
+            {"LastUploadFile": self.backlog.path, "Offset": self.backlog.offset},
+        )
+
+    def send(self, cursor: DataCursor, lines: List[str], lane: str) -> None:
+        """
+        Publish lines in order, moving the cursor past every line sent.
+        """
+        sent = 0
+        try:
+            for line in lines:
+                self.publish(line)
+                cursor.offset += len(line.encode())
+                sent += 1
+        finally:
+            if lane == "live":
+                self.save_live()
+            else:
+                self.save_backlog()
+            PipelineMetrics.lane_records_sent.labels(lane).inc(sent)
+
+    def backlog_batch_size(self) -> int:
+        if not self.record_seconds:
+            return 1
+        return max(
+            1, min(self.batch_size, int(self.latency_target / self.record_seconds))
+        )
+
+    def step(self) -> bool:
+        """
+        Send one batch of the live lane or, if it has none, of the backlog lane.
+
+        Returns:
+        - bool: True if a batch was sent, False if there was nothing to send yet.
+
+        Raises:
+        - Exception: Whatever publish() raised; the cursors stay on the first line not sent.
+        """
+        lines, _ = self.live.read(self.batch_size)
+        if lines:
+            self.send(self.live, lines, "live")
+            return True
+        if self.live.advance():
+            self.save_live()
+            return True
+
+        if self.backlog_done or monotonic() < self.backlog_ready_at:
+            return False
+        lines, _ = self.backlog.read(self.backlog_batch_size())
+        if not lines:
+            if self.backlog.advance():
+                self.save_backlog()
+                return True
+            if self.sent:
+                # skip what an earlier live lane sent
+                start, (path, offset) = self.sent.pop(0)
+                self.backlog.path, self.backlog.offset = path, offset
+                self.backlog.end = self.sent[0][0] if self.sent else self.live_start
+                self.save_backlog()
+                self.save_sent()
+                return True
+            self.backlog_done = True
+            self.save_live()
+            Schedulerlogger.logger.info("Backlog drained")
+            return False
+        start = perf_counter()
+        self.send(self.backlog, lines, "backlog")
+        elapsed = perf_counter() - start
+        per_record = elapsed / len(lines)
+        self.record_seconds = (
+            per_record
+            if not self.record_seconds
+            else 0.8 * self.record_seconds + 0.2 * per_record
+        )
+        ready_at = monotonic()
+        if self.backlog_share < 1:
+            ready_at += elapsed * (1 - self.backlog_share) / self.backlog_share
+        if self.backlog_rate:
+            ready_at = max(
+                ready_at, monotonic() - elapsed + len(lines) / self.backlog_rate
+            )
+        self.backlog_ready_at = ready_at
+        return True
+
+    def idle_time(self) -> float:
+        """
+        How long to wait for new data after step() had nothing to send.
+
+        Returns:
+        - float: The time in seconds, at most half the latency target.
+        """
+        idle = min(1.0, self.latency_target / 2)
+        if not self.backlog_done:
+            idle = min(idle, max(0.0, self.backlog_ready_at - monotonic()))
+        return idle
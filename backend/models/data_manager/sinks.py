@@ -0,0 +1,498 @@
+from models.exceptions.exception import SinkError
+from models.db_engine.db import MetaDB
+from models.db_engine.frames import open_data_file
+from models.metrics.pipeline import PipelineMetrics
+from models.data_manager.encoders import build_encoder
+from models.data_manager.rate_control import Backoff
+from models import ModelLogger
+from typing import Dict, List, Optional, Tuple
+from time import perf_counter, time_ns
+from urllib.parse import urlsplit
+from util import env_variables, get_base_path
+import http.client
+import os
+import threading
+
+
+class Sinklogger:
+    """
+    Class for logging the upload sinks.
+    """
+
+    logger = ModelLogger.lazy("sinks", "cloud_transfer.log")
+
+
+class Sink:
+    """
+    Base class of the destinations stored records are uploaded to.
+
+    A sink receives the stored lines in batches, in the order they were
+    stored, and either delivers the whole batch or raises. Every sink is
+    driven by its own SinkWorker, with its own cursor and retry delay, so a
+    slow or unreachable sink never holds back the others.
+
+    Attributes:
+    - name (str): The name of the sink, used for its cursor, settings and metrics.
+    - batch_size (int): The maximum number of lines handed to send() at once.
+    - retry_delay (float): The delay before the first retry after a failure, in seconds.
+    - max_retry_delay (float): The delay retries back off to, in seconds.
+    - encoder (DictEncoder): Turns the stored lines into JSON, see models.data_manager.encoders.
+
+    Methods:
+    - from_env(name: str, env: Dict[str, str]) -> Sink: Build a sink from its .env settings.
+    - send(lines: List[str]) -> None: Deliver a batch of stored lines.
+    - close() -> None: Release the connections of the sink.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_size: int = 100,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 60.0,
+        encoder: str = "dict",
+    ) -> None:
+        self.name = name
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.encoder = build_encoder(encoder)
+
+    @classmethod
+    def from_env(cls, name: str, env: Dict[str, str]) -> "Sink":
+        """
+        Build a sink from the `<name>_<setting>` variables of the .env file.
+
+        Args:
+        - name (str): The name of the sink.
+        - env (Dict[str, str]): The environment variables.
+
+        Returns:
+        - Sink: The sink.
+        """
+        return cls(name, **cls.settings(name, env))
+
+    @classmethod
+    def settings(cls, name: str, env: Dict[str, str]) -> Dict[str, object]:
+        settings = {}
+        for key, cast in (
+            ("batch_size", int),
+            ("retry_delay", float),
+            ("max_retry_delay", float),
+            ("encoder", str),
+        ):
+            value = env.get("{}_{}".format(name, key))
+            if value:
+                settings[key] = cast(value)
+        return settings
+
+    def send(self, lines: List[str]) -> None:
+        raise NotImplementedError(
+            f"send function for {self.__class__.__name__} is not implemented"
+        )
+
+    def close(self) -> None:
+        pass
+
+
+class MqttSink(Sink):
+    """
+    Sink publishing every record to the MQTT topic of a CloudTransfer.
+
+    The connection is configured as for the cloud transfer (`transport`,
+    `endpoint`, `message_topic`...) and opened on the first send.
+    """
+
+    def __init__(self, name: str = "mqtt", cloud_transfer=None, **kwargs) -> None:
+        super().__init__(name, **kwargs)
+        if cloud_transfer is None:
+            from models.data_manager.cloud_transfer import CloudTransfer
+
+            cloud_transfer = CloudTransfer()
+        self.cloud_transfer = cloud_transfer
+
+    def send(self, lines: List[str]) -> None:
+        if not self.cloud_transfer.connected:
+            self.cloud_transfer.connect()
+        for line in lines:
+            self.cloud_transfer.publish(self.encoder.message(line))
+
+    def close(self) -> None:
+        if self.cloud_transfer.connected:
+            try:
+                self.cloud_transfer.disconnect()
+            except Exception:
+                Sinklogger.logger.warning("{}: disconnect failed".format(self.name))
+
+
+class HttpSink(Sink):
+    """
+    Sink posting batches of records as a JSON array to an HTTP bulk endpoint.
+
+    The sink keeps one HTTP/1.1 connection alive between batches, which is
+    the whole pool its worker thread needs, and reopens it after an error.
+    Any status outside 2xx is a failed send.
+
+    Attributes:
+    - url (str): The endpoint, http:// or https://.
+    - timeout (float): The timeout of a request, in seconds.
+    - headers (Dict[str, str]): The headers of every request.
+    """
+
+    def __init__(
+        self,
+        name: str = "http",
+        url: str = "",
+        timeout: float = 10.0,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(name, **kwargs)
+        if not url:
+            raise ValueError("{}: no url".format(name))
+        self.url = url
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json"}
+        self.headers.update(headers or {})
+        parts = urlsplit(url)
+        self.connection_class = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.path = parts.path or "/"
+        if parts.query:
+            self.path += "?" + parts.query
+        self.connection: Optional[http.client.HTTPConnection] = None
+
+    @classmethod
+    def settings(cls, name: str, env: Dict[str, str]) -> Dict[str, object]:
+        settings = super().settings(name, env)
+        settings["url"] = env.get("{}_url".format(name), "")
+        timeout = env.get("{}_timeout".format(name))
+        if timeout:
+            settings["timeout"] = float(timeout)
+        token = env.get("{}_token".format(name))
+        if token:
+            settings["headers"] = {"Authorization": "Bearer {}".format(token)}
+        return settings
+
+    def send(self, lines: List[str]) -> None:
+        body = self.encoder.encode_batch(lines).encode()
+        if self.connection is None:
+            self.connection = self.connection_class(self.netloc, timeout=self.timeout)
+        try:
+            self.connection.request("POST", self.path, body, self.headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.close()
+            raise SinkError("{}: {}".format(self.name, e))
+        if response.will_close:
+            self.close()
+        if not 200 <= response.status < 300:
+            raise SinkError("{}: HTTP {}".format(self.name, response.status))
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class FileSpoolSink(Sink):
+    """
+    Sink writing batches, as stored, to files of a spool directory.
+
+    Every batch is written to a temporary file and renamed, so another tool
+    (rsync, a USB copy) only ever sees complete files and can delete them
+    once shipped.
+
+    Attributes:
+    - path (str): The spool directory.
+    """
+
+    def __init__(self, name: str = "spool", path: str = "", **kwargs) -> None:
+        super().__init__(name, **kwargs)
+        self.path = path or os.path.join(get_base_path(), "spool")
+        os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def settings(cls, name: str, env: Dict[str, str]) -> Dict[str, object]:
+        settings = super().settings(name, env)
+        settings["path"] = env.get("{}_path".format(name), "")
+        return settings
+
+    def send(self, lines: List[str]) -> None:
+        filename = os.path.join(self.path, "{:020d}.txt".format(time_ns()))
+        try:
+            with open(filename + ".tmp", "w") as spool_file:
+                spool_file.writelines(lines)
+            os.replace(filename + ".tmp", filename)
+        except OSError as e:
+            raise SinkError("{}: {}".format(self.name, e))
+
+
+SINK_TYPES = {"mqtt": MqttSink, "http": HttpSink, "spool": FileSpoolSink}
+
+
+def build_sinks(env: Optional[Dict[str, str]] = None) -> List[Sink]:
+    """
+    Build the sinks listed in the `sinks` variable of the .env file.
+
+    `sinks` is a comma separated list of sink types (mqtt, http, spool), each
+    configured by its `<type>_<setting>` variables.
+
+    Args:
+    - env (Optional[Dict[str, str]]): The environment variables, read from the .env file by default.
+
+    Returns:
+    - List[Sink]: The sinks, none if `sinks` is not set.
+
+    Raises:
+    - ValueError: If a sink type is unknown or misconfigured.
+    """
+    if env is None:
+        env = env_variables()
+    sinks = []
+    for name in (env.get("sinks") or "").split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in SINK_TYPES:
+            raise ValueError("Unknown sink {}".format(name))
+        sinks.append(SINK_TYPES[name].from_env(name, env))
+    return sinks
+
+
+def next_data_file(db_path: str, current: Optional[str] = None) -> Optional[str]:
+    """
+    Find the first data file stored after another one.
+
+    Data files are laid out as YYYY/MM/DD.txt, so their relative paths sort
+    in date order and only the directories from the current file on are
+    listed.
+
+    Args:
+    - db_path (str): The data directory.
+    - current (Optional[str]): The current file, None to get the first file.
+
+    Returns:
+    - Optional[str]: The path of the next file, or None if there is none yet.
+    """
+    after = ""
+    if current:
+        after = os.path.relpath(current, db_path)
+        if after.startswith(".."):
+            after = ""
+
+    def listdir(path: str) -> List[str]:
+        try:
+            return sorted(os.listdir(path))
+        except OSError:
+            return []
+
+    for year in listdir(db_path):
+        if not year.isdigit() or year < after[:4]:
+            continue
+        for month in listdir(os.path.join(db_path, year)):
+            if os.path.join(year, month) < after[:7]:
+                continue
+            for day in listdir(os.path.join(db_path, year, month)):
+                relative = os.path.join(year, month, day)
+                if day.endswith(".txt") and relative > after:
+                    return os.path.join(db_path, relative)
+    return None
+
+
+class DataCursor:
+    """
+    DataCursor is a position in the data files, read forward line by line.
+
+    The position is a file and the byte offset of the next line to read. Only
+    complete lines are read, as the last one may still be being written, and
+    the cursor moves on to the next data file once the current one is done.
+    A cursor may be bounded by an end position it never reads past.
+
+    Attributes:
+    - db_path (str): The data directory.
+    - path (Optional[str]): The current file, None until there is one.
+    - offset (int): The offset of the next line in the current file.
+    - end (Optional[Tuple[str, int]]): The position to stop at, None to follow new data.
+
+    Methods:
+    - read(count: int) -> Tuple[List[str], int]: Read lines after the position, without moving.
+    - advance() -> bool: Move to the next file once the current one is done.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        path: Optional[str] = None,
+        offset: int = 0,
+        end: Optional[Tuple[str, int]] = None,
+    ) -> None:
+        self.db_path = db_path
+        self.path = path if path is not None else next_data_file(db_path)
+        self.offset = offset
+        self.end = end
+
+    @property
+    def position(self) -> Tuple[str, int]:
+        return self.path or "", self.offset
+
+    def read(self, count: int) -> Tuple[List[str], int]:
+        """
+        Read the complete lines after the position, up to a count.
+
+        Args:
+        - count (int): The most lines to read.
+
+        Returns:
+        - Tuple[List[str], int]: The lines and the offset after the last one.
+        """
+        lines = []
+        offset = self.offset
+        if self.path is None:
+            return lines, offset
+        limit = self.end[1] if self.end and self.path == self.end[0] else None
+        try:
+            with open_data_file(self.path) as data_file:
+                data_file.seek(offset)
+                for line in data_file:
+                    if not line.endswith(b"\n"):
+                        break  # still being written
+                    if limit is not None and offset + len(line) > limit:
+                        break
+                    lines.append(line.decode())
+                    offset += len(line)
+                    if len(lines) >= count:
+                        break
+        except OSError:
+            pass
+        return lines, offset
+
+    def advance(self) -> bool:
+        """
+        Move the cursor to the next data file once the current one is done.
+
+        Returns:
+        - bool: True if the cursor moved or the current file got new lines.
+        """
+        if self.end and self.path and self.path >= self.end[0]:
+            return False
+        next_path = next_data_file(self.db_path, self.path)
+        if next_path is None or (self.end and next_path > self.end[0]):
+            return False
+        if self.path is not None and self.read(1)[0]:
+            return True  # written to just before the next file appeared
+        self.path, self.offset = next_path, 0
+        return True
+
+
+_meta_lock = threading.Lock()
+
+
+class SinkWorker(threading.Thread):
+    """
+    Thread shipping the stored records to one sink.
+
+    The worker reads the data files from its cursor, the file and byte
+    offset of the first line the sink has not acknowledged, which is kept in
+    the meta file as `<sink>.LastUploadFile` and `<sink>.Offset`. A new
+    cursor starts from the cursor of the single-destination cloud transfer
+    (`LastUploadFile` and `Offset`), so enabling sinks does not upload
+    everything again. The cursor only moves once a batch is delivered and failed batches are retried with a
+    jittered exponential backoff, so delivery is at least once.
+
+    Attributes:
+    - sink (Sink): The destination.
+    - db_path (str): The data directory.
+    - poll_interval (float): How often to look for new lines once caught up, in seconds.
+    - cursor (DataCursor): The first line the sink has not acknowledged.
+
+    Methods:
+    - stop() -> None: Ask the worker to stop after the current batch.
+    """
+
+    def __init__(
+        self,
+        sink: Sink,
+        db_path: Optional[str] = None,
+        meta_path: Optional[str] = None,
+        poll_interval: float = 1.0,
+    ) -> None:
+        super().__init__(name="sink-{}".format(sink.name), daemon=True)
+        self.sink = sink
+        self.db_path = db_path or os.path.join(get_base_path(), "data")
+        self.meta_db = MetaDB()
+        self.meta_path = meta_path or self.meta_db.get_metadata_path()
+        self.poll_interval = poll_interval
+        self.stopped = threading.Event()
+        self.cursor = self.load_cursor()
+
+    @property
+    def cursor_keys(self) -> Tuple[str, str]:
+        return (
+            "{}.LastUploadFile".format(self.sink.name),
+            "{}.Offset".format(self.sink.name),
+        )
+
+    def load_cursor(self) -> DataCursor:
+        file_key, offset_key = self.cursor_keys
+        with _meta_lock:
+            meta = self.meta_db.retrieve_metadata(self.meta_path)
+        if meta.get(file_key):
+            return DataCursor(
+                self.db_path, meta[file_key], int(meta.get(offset_key) or 0)
+            )
+        if meta.get("LastUploadFile"):
+            return DataCursor(
+                self.db_path, meta["LastUploadFile"], int(meta.get("Offset") or 0)
+            )
+        return DataCursor(self.db_path)
+
+    def save_cursor(self) -> None:
+        file_key, offset_key = self.cursor_keys
+        with _meta_lock:
+            self.meta_db.save_metadata(
+                self.meta_path,
+                {file_key: self.cursor.path, offset_key: self.cursor.offset},
+            )
+
+    def run(self) -> None:
+        backoff = Backoff(self.sink.retry_delay, self.sink.max_retry_delay)
+        try:
+            while not self.stopped.is_set():
+                lines, offset = self.cursor.read(self.sink.batch_size)
+                if not lines:
+                    if self.cursor.advance():
+                        self.save_cursor()
+                    else:
+                        self.stopped.wait(self.poll_interval)
+                    continue
+                start = perf_counter()
+                try:
+                    self.sink.send(lines)
+                except Exception as e:
+                    PipelineMetrics.sink_failures.labels(self.sink.name).inc()
+                    delay = backoff.next_delay()
+                    Sinklogger.logger.warning(
+                        "{}: send failed, retrying in {:.1f}s: {}".format(
+                            self.sink.name, delay, e
+                        )
+                    )
+                    self.stopped.wait(delay)
+                    continue
+                PipelineMetrics.sink_send_seconds.labels(self.sink.name).observe(
+                    perf_counter() - start
+                )
+                PipelineMetrics.sink_records_sent.labels(self.sink.name).inc(len(lines))
+                backoff.reset()
+                self.cursor.offset = offset
+                self.save_cursor()
+        finally:
+            self.sink.close()
+
+    def stop(self) -> None:
+        self.stopped.set()
@@ -1,9 +1,14 @@
 from multiprocessing.connection import Connection
 from models.db_engine.db import FileDB
+from models.db_engine.staging import StagedDB, recover_staged
+from models.metrics.pipeline import PipelineMetrics
+from models.metrics.tracing import unwrap
+from models.sensors.sample import Projection, Sample, SampleChunk, unpack
+from models.sensors.schema import STAMP_FIELDS
 from models import ModelLogger
-from typing import Sequence, Dict
-from util import get_base_path
-import os
+from typing import Sequence, Dict, Union
+from time import perf_counter
+from util import env_variables
 
 
 class DSlogger:
@@ -11,9 +16,7 @@ class DSlogger:
     Class for logging database activities.
     """
 
-    logger = ModelLogger("data-saving").customiseLogger(
-        filename=os.path.join("{}".format(get_base_path()), "logs", "storage.log")
-    )
+    logger = ModelLogger.lazy("data-saving", "storage.log")
 
 
 class StorageManager:
@@ -23,11 +26,16 @@ class StorageManager:
     Attributes:
     - sensor_names (Sequence[str]): Names of sensors to store in the database.
     - db_path (str): Path to the file-based database.
+    - projection (Optional[Projection]): The precompiled selection of the specified sensors, None to keep all. The stamp of the samples is always kept.
+    - staging_path (Optional[str]): The staging directory, the staging_path of the .env file.
+    - staging (Optional[StagedDB]): The staged data file while run() runs with a staging directory, None to append to the data file directly.
 
     Methods:
     - __init__(self, sensor_names: Sequence[str] = [], **kwargs): Initialize the StorageManager instance with specified sensors and additional parameters.
-    - get_data_from_specified_sensor(self, data: Dict[str, str]) -> Dict[str, str]: Filter and return data from the specified sensors.
-    - save_collected_data(self, data: Dict) -> None: Save the collected data to the database.
+    - get_data_from_specified_sensor(self, data: Union[Sample, SampleChunk, Dict[str, str]]) -> Union[Sample, SampleChunk, Dict[str, str]]: Filter and return data from the specified sensors.
+    - save_collected_data(self, data: Union[Sample, SampleChunk, Dict]) -> None: Save the collected data to the database.
+    - write(db: FileDB, data: Union[Sample, SampleChunk, Dict]) -> str: Write a sample or a chunk to a database.
+    - store_message(self, message) -> None: Save the sample or chunk of a message of the data pipe.
     - run(self, recv_cmd_pipe: Connection, data_pipe: Connection) -> None: Main logic for data storage, which runs in a loop until a termination command is received.
     """
 
@@ -40,37 +48,83 @@ class StorageManager:
         - kwargs: Additional parameters (locks, queues, or managers).
         """
         self.sensor_names = sensor_names
+        self.projection = (
+            Projection(sensor_names, keep=STAMP_FIELDS) if sensor_names else None
+        )
         self.db_path = FileDB().create_file()
+        self.staging_path = env_variables().get("staging_path")
+        self.staging = None
         DSlogger.logger.info("Ready to saving to database")
 
-    def get_data_from_specified_sensor(self, data: Dict[str, str]) -> Dict[str, str]:
+    def get_data_from_specified_sensor(
+        self, data: Union[Sample, SampleChunk, Dict[str, str]]
+    ) -> Union[Sample, SampleChunk, Dict[str, str]]:
         """
         Get data from the specified sensors.
 
         Parameters:
-        - data (Dict[str, str]): Data from all available sensors.
+        - data (Union[Sample, SampleChunk, Dict[str, str]]): Data from all available sensors.
 
         Returns:
-        - Dict[str, str]: Filtered data containing only the specified sensors.
+        - Union[Sample, SampleChunk, Dict[str, str]]: Filtered data containing only the specified sensors, of the type of data.
+
+        Raises:
+        - KeyError: If a specified sensor is missing from the data.
         """
-        if not self.sensor_names:
+        if self.projection is None:
             return data
+        return self.projection(data)
 
-        new_data = {}
-        for sensor_name in self.sensor_names:
-            new_data[sensor_name] = data[sensor_name]
+    def save_collected_data(self, data: Union[Sample, SampleChunk, Dict]) -> None:
+        """
+        Save the collected data to the database.
 
-        return new_data
+        The samples of a chunk are appended in a single write. With a
+        staging area, the data is staged and the staged lines are flushed
+        once they are due.
 
-    def save_collected_data(self, data: Dict) -> None:
+        Parameters:
+        - data (Union[Sample, SampleChunk, Dict]): Data to be saved.
         """
-        Save the collected data to the database.
+        start = perf_counter()
+        if self.staging is not None:
+            line = self.write(self.staging, data)
+            if self.staging.due():
+                self.staging.flush()
+        else:
+            with FileDB(self.db_path, "a") as db:
+                line = self.write(db, data)
+        PipelineMetrics.storage_write_seconds.observe(perf_counter() - start)
+        PipelineMetrics.storage_bytes_written.inc(len(line))
+        PipelineMetrics.samples_stored.inc(
+            len(data) if isinstance(data, SampleChunk) else 1
+        )
+
+    @staticmethod
+    def write(db: FileDB, data: Union[Sample, SampleChunk, Dict]) -> str:
+        if isinstance(data, SampleChunk):
+            return db.write_chunk(data)
+        return db.write_data_line(data)
+
+    def store_message(self, message) -> None:
+        """
+        Save the sample or chunk of a message of the data pipe.
 
         Parameters:
-        - data (Dict): Data to be saved.
+        - message: The message, packed data with its trace.
         """
-        with FileDB(self.db_path, "a") as db:
-            db.write_data_line(data)
+        data, trace = unwrap(message)
+        data = unpack(data)
+        PipelineMetrics.pipe_queue_depth.labels("sensor_to_storage").dec()
+        if trace:
+            trace.mark("received")
+        data = self.get_data_from_specified_sensor(data)
+        self.save_collected_data(data)
+        if trace:
+            trace.mark("stored")
+        DSlogger.logger.debug(
+            "Data: %s saved successfully", data, extra={"sample": 100}
+        )
 
     def run(self, recv_cmd_pipe: Connection, data_pipe: Connection) -> None:
         """
@@ -81,16 +135,25 @@ class StorageManager:
         Parameters:
         - recv_cmd_pipe (Connection): Pipe for receiving commands.
         - data_pipe (Connection): Pipe for receiving data.
+
+        With a staging area, the staged file is opened here, in the storage
+        process, once the lines left staged by a crash are recovered.
         """
+        if self.staging_path:
+            recover_staged(self.staging_path)
+            self.staging = StagedDB(self.db_path, self.staging_path)
         while True:
             if data_pipe.poll():
-                data = data_pipe.recv()
-                DSlogger.logger.info(f"Data: {data} polled successfully")
-                data = self.get_data_from_specified_sensor(data)
-                self.save_collected_data(data)
-                DSlogger.logger.info(f"Data: {data} saved successfully")
+                self.store_message(data_pipe.recv())
+            elif self.staging is not None and self.staging.due():
+                self.staging.flush()
             if recv_cmd_pipe.poll():
                 command = recv_cmd_pipe.recv()
                 if command == "END":
+                    # the data sent before END is stored too
+                    while data_pipe.poll():
+                        self.store_message(data_pipe.recv())
+                    if self.staging is not None:
+                        self.staging.close()
                     DSlogger.logger.info(f"Stopped saving data to database")
                     break
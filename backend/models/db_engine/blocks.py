@@ -0,0 +1,309 @@
+from bisect import bisect_right
+from typing import Any, BinaryIO, Dict, Iterator, List, Mapping, Optional, Sequence
+from models.db_engine.codecs import (
+    decode_column,
+    encode_column,
+    read_varint,
+    write_varint,
+)
+from models.db_engine.frames import open_data_file
+from models.sensors.schema import RecordSchema, record_schema
+import os
+import struct
+
+MAGIC = b"DLBLK1\n"
+# offset, size, rows, first and last ts of a block
+ENTRY = struct.Struct("<QIIqq")
+# offset and number of entries of the block directory
+FOOTER = struct.Struct("<QI")
+NO_TIME = (2**63 - 1, -(2**63))
+
+
+class BlockInfo:
+    """
+    The entry of a block in the block directory.
+
+    Attributes:
+    - offset (int): Where the block starts in the file.
+    - size (int): The size of the block in bytes.
+    - rows (int): The number of records of the block.
+    - first_ts (int): The smallest `ts` of the block, the largest int64 if it has none.
+    - last_ts (int): The largest `ts` of the block, the smallest int64 if it has none.
+    """
+
+    __slots__ = ("offset", "size", "rows", "first_ts", "last_ts")
+
+    def __init__(
+        self, offset: int, size: int, rows: int, first_ts: int, last_ts: int
+    ) -> None:
+        self.offset = offset
+        self.size = size
+        self.rows = rows
+        self.first_ts = first_ts
+        self.last_ts = last_ts
+
+
+class BlockWriter:
+    """
+    Write records into a block file, a block of columns every `block_rows` records.
+
+    The columns of a block are encoded on their own by
+    models.db_engine.codecs: delta-of-delta for the stamps, XOR for the
+    floats, bit-packing for small integers and run-length encoding for
+    repeated and None values, whichever makes the column the smallest. A
+    block directory at the end of the file gives the position, the number of
+    records and the time range of every block, so a reader decodes only the
+    blocks, and columns, it needs.
+
+    A new block starts when the fields of the records change, so the fields
+    are stored with every block.
+
+    Attributes:
+    - path (str): The block file.
+    - block_rows (int): The most records of a block.
+
+    Methods:
+    - add(record: Mapping[str, Any]) -> None: Append a record.
+    - close() -> None: Write the last block and the block directory.
+    """
+
+    BLOCK_ROWS = 1024
+
+    def __init__(self, path: str, block_rows: int = BLOCK_ROWS) -> None:
+        self.path = path
+        self.block_rows = block_rows
+        self.file: BinaryIO = open(path, "wb")
+        self.file.write(MAGIC)
+        self.blocks: List[BlockInfo] = []
+        self.fields: Optional[List[str]] = None
+        self.rows: List[List[Any]] = []
+
+    def __enter__(self) -> "BlockWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, trace) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def add(self, record: Mapping[str, Any]) -> None:
+        fields = list(record)
+        if fields != self.fields:
+            self.flush()
+            self.fields = fields
+        self.rows.append(list(record.values()))
+        if len(self.rows) >= self.block_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the records added since the last block as a block.
+        """
+        if not self.rows:
+            return
+        columns = list(zip(*self.rows))
+        block = bytearray()
+        write_varint(block, len(self.fields))
+        encoded = []
+        for name, values in zip(self.fields, columns):
+            column = encode_column(values)
+            encoded.append(column)
+            name = name.encode()
+            write_varint(block, len(name))
+            block += name
+            write_varint(block, len(column))
+        for column in encoded:
+            block += column
+        first_ts, last_ts = NO_TIME
+        if "ts" in self.fields:
+            stamps = [
+                value
+                for value in columns[self.fields.index("ts")]
+                if type(value) is int
+            ]
+            if stamps:
+                first_ts, last_ts = min(stamps), max(stamps)
+        self.blocks.append(
+            BlockInfo(self.file.tell(), len(block), len(self.rows), first_ts, last_ts)
+        )
+        self.file.write(block)
+        self.rows = []
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        self.flush()
+        directory = self.file.tell()
+        for info in self.blocks:
+            self.file.write(
+                ENTRY.pack(
+                    info.offset, info.size, info.rows, info.first_ts, info.last_ts
+                )
+            )
+        self.file.write(FOOTER.pack(directory, len(self.blocks)))
+        self.file.write(MAGIC)
+        self.file.close()
+
+
+class BlockFile:
+    """
+    Read the records of a block file written by BlockWriter.
+
+    Only the block directory is read when the file is opened; blocks are
+    read and decoded when their records are.
+
+    Attributes:
+    - path (str): The block file.
+    - blocks (List[BlockInfo]): The block directory.
+
+    Methods:
+    - read_block(index: int, fields: Optional[Sequence[str]] = None) -> Dict[str, List]: The columns of a block.
+    - records(start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]: The records by position.
+    - time_range(start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Iterator[Dict]: The records of a time range.
+
+    Raises:
+    - ValueError: If the file is not a complete block file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file: BinaryIO = open(path, "rb")
+        try:
+            self.blocks = self.read_directory()
+        except Exception:
+            self.file.close()
+            raise
+        self.starts = [0]
+        for info in self.blocks:
+            self.starts.append(self.starts[-1] + info.rows)
+
+    def __enter__(self) -> "BlockFile":
+        return self
+
+    def __exit__(self, exc_type, exc_value, trace) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.starts[-1]
+
+    def close(self) -> None:
+        self.file.close()
+
+    def read_directory(self) -> List[BlockInfo]:
+        size = os.fstat(self.file.fileno()).st_size
+        tail = FOOTER.size + len(MAGIC)
+        if size < len(MAGIC) + tail or self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a block file".format(self.path))
+        self.file.seek(size - tail)
+        footer = self.file.read(tail)
+        if footer[FOOTER.size :] != MAGIC:
+            raise ValueError("{} has no block directory".format(self.path))
+        directory, count = FOOTER.unpack(footer[: FOOTER.size])
+        self.file.seek(directory)
+        entries = self.file.read(count * ENTRY.size)
+        if len(entries) != count * ENTRY.size:
+            raise ValueError("{} has a truncated block directory".format(self.path))
+        return [BlockInfo(*entry) for entry in ENTRY.iter_unpack(entries)]
+
+    def read_block(
+        self, index: int, fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, List]:
+        """
+        Read and decode the columns of a block.
+
+        Args:
+        - index (int): The position of the block in the directory.
+        - fields (Optional[Sequence[str]]): The columns to decode, all by default.
+
+        Returns:
+        - Dict[str, List]: The columns by field name, in the order they were written.
+        """
+        info = self.blocks[index]
+        self.file.seek(info.offset)
+        data = self.file.read(info.size)
+        count, position = read_varint(data, 0)
+        header = []
+        for _ in range(count):
+            size, position = read_varint(data, position)
+            name = data[position : position + size].decode()
+            length, position = read_varint(data, position + size)
+            header.append((name, length))
+        columns = {}
+        for name, length in header:
+            if fields is None or name in fields:
+                columns[name] = decode_column(data, info.rows, position)
+            position += length
+        return columns
+
+    def block_records(self, index: int) -> List[Dict[str, Any]]:
+        columns = self.read_block(index)
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    def records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]:
+        """
+        The records from position `start` to `stop`, reading only their blocks.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        index = max(bisect_right(self.starts, start) - 1, 0)
+        while index < len(self.blocks) and self.starts[index] < stop:
+            first = self.starts[index]
+            records = self.block_records(index)
+            yield from records[max(start - first, 0) : stop - first]
+            index += 1
+
+    def time_range(
+        self, start_ns: Optional[int] = None, end_ns: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """
+        The records stamped from `start_ns` to before `end_ns`.
+
+        Only the blocks whose time range overlaps are read; records without
+        a stamp are left out.
+        """
+        for index, info in enumerate(self.blocks):
+            if (start_ns is not None and info.last_ts < start_ns) or (
+                end_ns is not None and info.first_ts >= end_ns
+            ):
+                continue
+            for record in self.block_records(index):
+                ts = record.get("ts")
+                if (
+                    type(ts) is int
+                    and (start_ns is None or ts >= start_ns)
+                    and (end_ns is None or ts < end_ns)
+                ):
+                    yield record
+
+
+def compress_day(
+    path: str,
+    target: Optional[str] = None,
+    schema: Optional[RecordSchema] = None,
+    block_rows: int = BlockWriter.BLOCK_ROWS,
+) -> str:
+    """
+    Write the records of a data file into a block file.
+
+    The values are typed by the record schema first, so numbers are encoded
+    as numbers: "7.30" is read back as 7.3. Fields the schema does not know
+    stay text.
+
+    Args:
+    - path (str): The data file.
+    - target (Optional[str]): The block file, the data file with a `.blk` extension by default.
+    - schema (Optional[RecordSchema]): The record schema, see record_schema().
+    - block_rows (int): The most records of a block.
+
+    Returns:
+    - str: The path of the block file.
+    """
+    schema = schema if schema is not None else record_schema()
+    target = target or os.path.splitext(path)[0] + ".blk"
+    with open_data_file(path, "r") as data_file, BlockWriter(
+        target, block_rows
+    ) as writer:
+        for line in data_file:
+            if line.endswith("\n") and line.strip():
+                writer.add(schema.parse_line(line))
+    return target
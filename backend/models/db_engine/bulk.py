@@ -0,0 +1,438 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+from models.db_engine.blocks import BlockFile
+from models.db_engine.frames import FrameReader, is_compressed
+from models.sensors.schema import STAMP, RecordSchema
+from util import modify_data_to_dict
+from util.lazy import lazy_import
+import mmap
+import os
+
+np = lazy_import("numpy")
+
+Buffer = Union[bytes, bytearray, mmap.mmap]
+
+NEWLINE, EQUALS, COMMA, SPACE = (ord(character) for character in "\n=, ")
+
+
+def line_range(
+    buffer: Buffer, start: int = 0, end: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Align a byte range of a data file on its lines.
+
+    A line belongs to the range its first byte is in, so consecutive ranges
+    split a file without losing or repeating lines. A last line without its
+    newline is still being written and is left out.
+
+    Args:
+    - buffer (Buffer): The content of the data file.
+    - start (int): The first byte of the range.
+    - end (Optional[int]): The byte after the range, the end of the buffer by default.
+
+    Returns:
+    - Tuple[int, int]: The first byte of the first line and the byte after the last line.
+    """
+    size = len(buffer)
+    end = size if end is None else min(end, size)
+    if start > 0 and buffer[start - 1] != NEWLINE:
+        newline = buffer.find(b"\n", start)
+        start = size if newline == -1 else newline + 1
+    if end <= start:
+        return start, start
+    newline = buffer.find(b"\n", end - 1)
+    if newline == -1:
+        newline = buffer.rfind(b"\n", start, end)
+        return start, start if newline == -1 else newline + 1
+    return start, newline + 1
+
+
+def gather(data, starts, lengths):
+    """
+    Copy byte spans of an array into a fixed width bytes array.
+
+    Args:
+    - data (np.ndarray): The bytes, as uint8.
+    - starts (np.ndarray): The first byte of every span.
+    - lengths (np.ndarray): The length of every span.
+
+    Returns:
+    - np.ndarray: One `S<width>` item per span.
+    """
+    width = max(int(lengths.max()) if len(lengths) else 0, 1)
+    columns = np.arange(width)
+    spans = data.take(starts[:, None] + columns, mode="clip")
+    spans[columns >= lengths[:, None]] = 0
+    return spans.view("S{}".format(width)).ravel()
+
+
+def typed_column(values, dtype=None, strip=True):
+    """
+    Convert the raw values of a column to their type.
+
+    Without a dtype, a column whose values all parse as numbers is float64,
+    with NaN for None. Any other column is text, masked where it is None.
+    The dtype str keeps a column as text.
+
+    Args:
+    - values (np.ndarray): The values as `S<width>` items.
+    - dtype (Optional): The type to convert to instead.
+    - strip (bool): Whether text values may have spaces to strip.
+
+    Returns:
+    - np.ndarray: The column, a masked array if missing values cannot be NaN.
+    """
+    missing = values == b"None"
+    if dtype is None or (dtype is not str and np.dtype(dtype).kind == "f"):
+        try:
+            return np.where(missing, b"nan", values).astype(dtype or np.float64)
+        except ValueError:
+            if dtype is not None:
+                raise
+    if dtype is None or dtype is str:
+        try:
+            column = values.astype("U")  # ASCII
+        except UnicodeDecodeError:
+            column = np.char.decode(values, "utf-8")
+        if strip:
+            column = np.char.strip(column)
+    else:
+        fill = b"0" if np.dtype(dtype).kind in "iu" else values[:0].dtype.type()
+        column = np.where(missing, fill, values).astype(dtype)
+    return np.ma.masked_array(column, mask=missing)
+
+
+def parse_buffer(
+    buffer: Buffer,
+    start: int = 0,
+    end: Optional[int] = None,
+    dtypes: Optional[Dict[str, object]] = None,
+    schema: Optional[RecordSchema] = None,
+) -> Dict[str, "np.ndarray"]:
+    """
+    Parse the lines of a data file into typed column arrays.
+
+    All the lines are split at once: the positions of every `=`, `,` and
+    newline are found by NumPy, and the values of a field are copied out of
+    the buffer together and converted in one call. When the lines do not all
+    have the same fields, e.g. the day a sensor was added, they are parsed
+    one by one with modify_data_to_dict instead and missing fields are None.
+
+    Args:
+    - buffer (Buffer): The content of the data file, e.g. a memory map.
+    - start (int): The first byte to parse, see line_range().
+    - end (Optional[int]): The byte after the last one to parse.
+    - dtypes (Optional[Dict[str, object]]): Types of some columns, e.g. {"date": "datetime64[D]"}.
+    - schema (Optional[RecordSchema]): The record schema giving the types of the other columns, the stamp is int64 without one.
+
+    Returns:
+    - Dict[str, np.ndarray]: The columns by field name, in the order of the fields.
+
+    Raises:
+    - ValueError: If a line is malformed, or a value does not convert to its dtype.
+    """
+    dtypes = {**(schema or STAMP).dtypes(), **(dtypes or {})}
+    start, end = line_range(buffer, start, end)
+    if end == start:
+        return {}
+    data = np.frombuffer(buffer, dtype=np.uint8, count=end - start, offset=start)
+    ends = np.flatnonzero(data == NEWLINE)
+    if not len(ends):
+        return {}
+    equals = np.flatnonzero(data == EQUALS)
+    separators = np.flatnonzero((data == COMMA) | (data == NEWLINE))
+    fields = len(equals) // len(ends)
+    if len(equals) != len(separators) or len(equals) != fields * len(ends):
+        return parse_lines(bytes(data), dtypes)
+
+    equals = equals.reshape(-1, fields)
+    separators = separators.reshape(-1, fields)
+    key_starts = np.empty_like(equals)
+    key_starts[:, 0] = np.concatenate(([0], ends[:-1] + 1))
+    key_starts[:, 1:] = separators[:, :-1] + 1
+    if (
+        (separators[:, -1] != ends).any()
+        or (equals < key_starts).any()
+        or (separators <= equals).any()
+    ):
+        return parse_lines(bytes(data), dtypes)
+
+    # the keys of every line must be those of the first one, byte for byte
+    key_lengths = equals - key_starts
+    if (key_lengths != key_lengths[0]).any():
+        return parse_lines(bytes(data), dtypes)
+    for field in range(fields):
+        key = data.take(key_starts[:, field, None] + np.arange(key_lengths[0, field]))
+        if (key != key[0]).any():
+            return parse_lines(bytes(data), dtypes)
+    line = bytes(data[: ends[0]])
+    keys = [
+        line[first:last].decode().strip()
+        for first, last in zip(key_starts[0], equals[0])
+    ]
+    strip = bool((data == SPACE).any())
+
+    columns = {}
+    for field, key in enumerate(keys):
+        values = gather(
+            data, equals[:, field] + 1, separators[:, field] - equals[:, field] - 1
+        )
+        columns[key] = typed_column(values, dtypes.get(key), strip)
+    return columns
+
+
+def parse_lines(text: bytes, dtypes: Dict[str, object]) -> Dict[str, "np.ndarray"]:
+    """
+    Parse lines one by one into columns, for lines that differ in their fields.
+    """
+    records = [modify_data_to_dict(line) for line in text.decode().splitlines()]
+    return record_columns(records, dtypes)
+
+
+def record_columns(
+    records: List[Mapping[str, Any]], dtypes: Dict[str, object]
+) -> Dict[str, "np.ndarray"]:
+    """
+    Convert records into columns, None where a record misses a field.
+    """
+    keys: List[str] = []
+    for record in records:
+        keys.extend(key for key in record if key not in keys)
+    columns = {}
+    for key in keys:
+        values = np.array(
+            [
+                b"None" if record.get(key) is None else str(record[key]).encode()
+                for record in records
+            ]
+        )
+        columns[key] = typed_column(values, dtypes.get(key))
+    return columns
+
+
+def read_columns(
+    path: str,
+    start: int = 0,
+    end: Optional[int] = None,
+    dtypes: Optional[Dict[str, object]] = None,
+    schema: Optional[RecordSchema] = None,
+) -> Dict[str, "np.ndarray"]:
+    """
+    Parse a data file, or a byte range of it, into typed column arrays.
+
+    The file is memory mapped, so only the pages of the range are read and
+    a month of files can be parsed without holding their text in memory. Of
+    a compressed data file, only the frames of the range are decompressed.
+    A block file (`.blk`, see models.db_engine.blocks) has no byte ranges
+    and is read as a whole.
+
+    Args:
+    - path (str): The data file.
+    - start (int): The first byte to parse.
+    - end (Optional[int]): The byte after the last one to parse, the end of the file by default.
+    - dtypes (Optional[Dict[str, object]]): Types of some columns, see parse_buffer().
+    - schema (Optional[RecordSchema]): The record schema, see parse_buffer().
+
+    Returns:
+    - Dict[str, np.ndarray]: The columns by field name.
+
+    Raises:
+    - ValueError: If a byte range of a block file is asked for.
+    """
+    if path.endswith(".blk"):
+        if start or end is not None:
+            raise ValueError("{} has no byte ranges".format(path))
+        return read_block_file(path, dtypes=dtypes, schema=schema)
+    if is_compressed(path):
+        # only the frames of the range
+        with FrameReader(path) as frames:
+            base, buffer = frames.read_frames(start, end)
+        end = None if end is None else end - base
+        return parse_buffer(buffer, start - base, end, dtypes, schema)
+    with map_file(path) as buffer:
+        if buffer is None:
+            return {}
+        return parse_buffer(buffer, start, end, dtypes, schema)
+
+
+@contextmanager
+def map_file(path: str) -> Iterator[Optional[Buffer]]:
+    """
+    Memory map a data file for reading, None if it is empty.
+
+    A compressed data file is decompressed instead.
+    """
+    if is_compressed(path):
+        with FrameReader(path) as frames:
+            yield frames.read_frames()[1] or None
+        return
+    with open(path, "rb") as data_file:
+        if os.fstat(data_file.fileno()).st_size == 0:
+            yield None
+            return
+        buffer = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield buffer
+    finally:
+        try:
+            buffer.close()
+        except BufferError:
+            pass  # still referenced by a traceback, closed once collected
+
+
+def line_time(buffer: Buffer, position: int) -> Optional[int]:
+    """
+    The `ts` stamp of the line starting at a position, None if it has none.
+    """
+    end = buffer.find(b"\n", position)
+    for datum in bytes(buffer[position:end]).split(b","):
+        key, _, value = datum.partition(b"=")
+        if key.strip() == b"ts":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def find_time(
+    buffer: Buffer, ts: int, start: int = 0, end: Optional[int] = None
+) -> int:
+    """
+    Binary search the lines of a data file for a time.
+
+    The samples are appended in the order they are captured, so the lines of
+    a data file are sorted by their `ts` stamp, and the lines written before
+    the samples were stamped, which have none, come first. Each step reads
+    the one line around the middle of the range, so a day of samples is
+    searched in about 20 lines.
+
+    Args:
+    - buffer (Buffer): The content of the data file.
+    - ts (int): The time, in nanoseconds since the epoch.
+    - start (int): The first byte of the range to search.
+    - end (Optional[int]): The byte after the range, the end of the buffer by default.
+
+    Returns:
+    - int: The first byte of the first line stamped at or after ts, the end of the range if there is none.
+    """
+    low, high = line_range(buffer, start, end)
+    while low < high:
+        middle = (low + high) // 2
+        line_start = max(buffer.rfind(b"\n", low, middle) + 1, low)
+        stamp = line_time(buffer, line_start)
+        if stamp is not None and stamp >= ts:
+            high = line_start
+        else:
+            low = buffer.find(b"\n", middle) + 1
+    return low
+
+
+def read_time_range(
+    path: str,
+    start_ns: Optional[int] = None,
+    end_ns: Optional[int] = None,
+    dtypes: Optional[Dict[str, object]] = None,
+    schema: Optional[RecordSchema] = None,
+) -> Dict[str, "np.ndarray"]:
+    """
+    Parse the samples of a data file captured in a time range into typed column arrays.
+
+    The range is found by find_time(), so only its lines are read. Of a
+    block file, only the blocks of the range are.
+
+    Args:
+    - path (str): The data file.
+    - start_ns (Optional[int]): The first time of the range, in nanoseconds since the epoch, the start of the file by default.
+    - end_ns (Optional[int]): The time after the range, the end of the file by default.
+    - dtypes (Optional[Dict[str, object]]): Types of some columns, see parse_buffer().
+    - schema (Optional[RecordSchema]): The record schema, see parse_buffer().
+
+    Returns:
+    - Dict[str, np.ndarray]: The columns by field name.
+    """
+    if path.endswith(".blk"):
+        return read_block_file(path, start_ns, end_ns, dtypes, schema)
+    with map_file(path) as buffer:
+        if buffer is None:
+            return {}
+        start = 0 if start_ns is None else find_time(buffer, start_ns)
+        end = None if end_ns is None else find_time(buffer, end_ns, start)
+        return parse_buffer(buffer, start, end, dtypes, schema)
+
+
+def read_block_file(
+    path: str,
+    start_ns: Optional[int] = None,
+    end_ns: Optional[int] = None,
+    dtypes: Optional[Dict[str, object]] = None,
+    schema: Optional[RecordSchema] = None,
+) -> Dict[str, "np.ndarray"]:
+    """
+    Read the records of a block file, or of a time range of it, into typed column arrays.
+    """
+    dtypes = {**(schema or STAMP).dtypes(), **(dtypes or {})}
+    with BlockFile(path) as blocks:
+        if start_ns is None and end_ns is None:
+            records = list(blocks.records())
+        else:
+            records = list(blocks.time_range(start_ns, end_ns))
+    return record_columns(records, dtypes) if records else {}
+
+
+def sort_by_time(
+    columns: Dict[str, "np.ndarray"], unique: bool = True
+) -> Dict[str, "np.ndarray"]:
+    """
+    Sort columns by their stamp, e.g. after concatenating several files.
+
+    Samples are ordered by `ts`, then by `seq` for those captured in the
+    same nanosecond.
+
+    Args:
+    - columns (Dict[str, np.ndarray]): Columns with a `ts` column, and maybe a `seq` column.
+    - unique (bool): Whether to keep only the first of the samples with the same stamp, e.g. replayed twice.
+
+    Returns:
+    - Dict[str, np.ndarray]: The sorted columns.
+
+    Raises:
+    - KeyError: If there is no `ts` column.
+    """
+    keys = [np.ma.getdata(columns["ts"])]
+    if "seq" in columns:
+        keys.insert(0, np.ma.getdata(columns["seq"]))
+    order = np.lexsort(keys)
+    if unique and len(order):
+        stamps = [key[order] for key in keys]
+        keep = np.zeros(len(order), dtype=bool)
+        keep[0] = True
+        for stamp in stamps:
+            keep[1:] |= stamp[1:] != stamp[:-1]
+        order = order[keep]
+    return {name: column[order] for name, column in columns.items()}
+
+
+def to_structured(columns: Dict[str, "np.ndarray"]) -> "np.ma.MaskedArray":
+    """
+    Pack columns into one structured array, a record per line.
+
+    Args:
+    - columns (Dict[str, np.ndarray]): Columns as returned by read_columns().
+
+    Returns:
+    - np.ma.MaskedArray: The records, with the None values masked.
+    """
+    if not columns:
+        return np.ma.masked_array(np.empty(0))
+    dtype = [(key, column.dtype) for key, column in columns.items()]
+    length = len(next(iter(columns.values())))
+    records = np.empty(length, dtype=dtype)
+    mask = np.zeros(length, dtype=[(key, bool) for key in columns])
+    for key, column in columns.items():
+        records[key] = np.ma.getdata(column)
+        if np.ma.isMaskedArray(column):
+            mask[key] = np.ma.getmaskarray(column)
+        elif column.dtype.kind == "f":
+            mask[key] = np.isnan(column)
+    return np.ma.masked_array(records, mask=mask)
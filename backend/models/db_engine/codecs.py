@@ -0,0 +1,509 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from itertools import islice
+import math
+import struct
+
+# Column codecs, by the id stored in the first byte of an encoded column
+PLAIN, RLE, DELTA, XOR, BITPACK, DECIMAL = range(6)
+# Set in the id byte when the null runs of the column precede the values
+NULLS = 0x80
+
+NONE, INT, FLOAT, TEXT = range(4)
+
+# The most decimal places of the floats encoded as scaled integers
+DECIMAL_PLACES = 9
+
+# (prefix, prefix bits, value bits) of the delta-of-delta buckets: the
+# timestamps of a steady collection differ by a few microseconds of jitter
+DELTA_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 14),
+    (0b1110, 4, 21),
+    (0b11110, 5, 32),
+    (0b11111, 5, 64),
+)
+
+
+class BitWriter:
+    """
+    Append values of any bit width to a byte string, most significant bit first.
+    """
+
+    __slots__ = ("data", "pending", "bits")
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.pending = 0
+        self.bits = 0
+
+    def write(self, value: int, width: int) -> None:
+        """
+        Append the `width` low bits of a non-negative value, at most 64.
+        """
+        self.pending = (self.pending << width) | value
+        self.bits += width
+        if self.bits >= 64:
+            self.bits -= 64
+            self.data += (self.pending >> self.bits).to_bytes(8, "big")
+            self.pending &= (1 << self.bits) - 1
+
+    def getvalue(self) -> bytes:
+        """
+        The bytes written, the last one padded with zero bits.
+        """
+        size = (self.bits + 7) // 8
+        return bytes(self.data) + (self.pending << (size * 8 - self.bits)).to_bytes(
+            size, "big"
+        )
+
+
+class BitReader:
+    """
+    Read the values written by a BitWriter.
+    """
+
+    __slots__ = ("data", "position")
+
+    def __init__(self, data: bytes, position: int = 0) -> None:
+        self.data = data
+        self.position = position * 8
+
+    def read(self, width: int) -> int:
+        if not width:
+            return 0
+        start = self.position
+        end = start + width
+        self.position = end
+        last = (end + 7) // 8
+        if last > len(self.data):
+            raise ValueError("Truncated column")
+        span = int.from_bytes(self.data[start // 8 : last], "big")
+        return (span >> (last * 8 - end)) & ((1 << width) - 1)
+
+    def flag(self) -> bool:
+        return self.read(1) == 1
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    """
+    Append a non-negative integer, 7 bits a byte.
+    """
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    """
+    Read an integer written by write_varint().
+
+    Returns:
+    - Tuple[int, int]: The integer and the position after it.
+    """
+    value = shift = 0
+    while True:
+        try:
+            byte = data[position]
+        except IndexError:
+            raise ValueError("Truncated column") from None
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    """
+    Map signed integers to non-negative ones, small magnitudes to small values.
+    """
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def write_value(out: bytearray, value: Any) -> None:
+    """
+    Append a value of any type, tagged with its type.
+    """
+    if value is None:
+        out.append(NONE)
+    elif type(value) is int:
+        out.append(INT)
+        write_varint(out, zigzag(value))
+    elif type(value) is float:
+        out.append(FLOAT)
+        out += struct.pack(">d", value)
+    else:
+        text = str(value).encode()
+        out.append(TEXT)
+        write_varint(out, len(text))
+        out += text
+
+
+def read_value(data: bytes, position: int) -> Tuple[Any, int]:
+    """
+    Read a value written by write_value().
+
+    Returns:
+    - Tuple[Any, int]: The value and the position after it.
+    """
+    tag = data[position]
+    position += 1
+    if tag == NONE:
+        return None, position
+    if tag == INT:
+        value, position = read_varint(data, position)
+        return unzigzag(value), position
+    if tag == FLOAT:
+        return struct.unpack_from(">d", data, position)[0], position + 8
+    if tag == TEXT:
+        size, position = read_varint(data, position)
+        return data[position : position + size].decode(), position + size
+    raise ValueError("Unknown value tag {}".format(tag))
+
+
+def encode_plain(values: Sequence[Any]) -> Optional[bytes]:
+    out = bytearray()
+    for value in values:
+        write_value(out, value)
+    return bytes(out)
+
+
+def decode_plain(data: bytes, position: int, count: int) -> List[Any]:
+    values = []
+    for _ in range(count):
+        value, position = read_value(data, position)
+        values.append(value)
+    return values
+
+
+def runs(values: Sequence[Any]) -> List[Tuple[Any, int]]:
+    """
+    Split values into runs of the same value of the same type.
+
+    Returns:
+    - List[Tuple[Any, int]]: The value and length of every run.
+    """
+    found: List[Tuple[Any, int]] = []
+    previous: Any = object()
+    for value in values:
+        if value is previous or (type(value) is type(previous) and value == previous):
+            found[-1] = (previous, found[-1][1] + 1)
+        else:
+            found.append((value, 1))
+            previous = value
+    return found
+
+
+def encode_rle(values: Sequence[Any]) -> Optional[bytes]:
+    out = bytearray()
+    for value, length in runs(values):
+        write_varint(out, length)
+        write_value(out, value)
+    return bytes(out)
+
+
+def decode_rle(data: bytes, position: int, count: int) -> List[Any]:
+    values: List[Any] = []
+    while len(values) < count:
+        length, position = read_varint(data, position)
+        value, position = read_value(data, position)
+        values.extend([value] * length)
+    return values
+
+
+def encode_delta(values: Sequence[int]) -> Optional[bytes]:
+    """
+    Delta-of-delta: the change of the difference between consecutive values.
+
+    Values sampled at a steady interval, like the stamps of the samples, take
+    one bit each when the interval holds and a few bits for the jitter.
+    """
+    out = bytearray()
+    write_varint(out, zigzag(values[0]))
+    if len(values) == 1:
+        return bytes(out)
+    delta = values[1] - values[0]
+    write_varint(out, zigzag(delta))
+    bits = BitWriter()
+    for previous, value in zip(values[1:], values[2:]):
+        change = value - previous - delta
+        delta = value - previous
+        if not change:
+            bits.write(0, 1)
+            continue
+        encoded = zigzag(change)
+        for prefix, prefix_bits, width in DELTA_BUCKETS:
+            if encoded < 1 << width:
+                bits.write(prefix, prefix_bits)
+                bits.write(encoded, width)
+                break
+        else:
+            return None  # beyond 64 bits
+    return bytes(out) + bits.getvalue()
+
+
+def decode_delta(data: bytes, position: int, count: int) -> List[int]:
+    first, position = read_varint(data, position)
+    values = [unzigzag(first)]
+    if count == 1:
+        return values
+    delta, position = read_varint(data, position)
+    delta = unzigzag(delta)
+    value = values[0] + delta
+    values.append(value)
+    bits = BitReader(data, position)
+    for _ in range(count - 2):
+        if bits.flag():
+            width = DELTA_BUCKETS[-1][2]
+            for _, _, bucket_width in DELTA_BUCKETS[:-1]:
+                if not bits.flag():
+                    width = bucket_width
+                    break
+            delta += unzigzag(bits.read(width))
+        value += delta
+        values.append(value)
+    return values
+
+
+def encode_xor(values: Sequence[float]) -> Optional[bytes]:
+    """
+    Gorilla XOR: every float as the bits that differ from the previous one.
+
+    A repeated value takes one bit, and a slowly changing one only the bits
+    between the first and the last that differ, mostly within the window of
+    the previous value.
+    """
+    words = struct.unpack(
+        ">{}Q".format(len(values)), struct.pack(">{}d".format(len(values)), *values)
+    )
+    bits = BitWriter()
+    bits.write(words[0], 64)
+    leading = trailing = -1
+    for previous, word in zip(words, words[1:]):
+        xor = word ^ previous
+        if not xor:
+            bits.write(0, 1)
+            continue
+        first = min(64 - xor.bit_length(), 31)
+        last = (xor & -xor).bit_length() - 1
+        if leading >= 0 and first >= leading and last >= trailing:
+            bits.write(0b10, 2)
+            bits.write(xor >> trailing, 64 - leading - trailing)
+            continue
+        leading, trailing = first, last
+        size = 64 - leading - trailing
+        bits.write(0b11, 2)
+        bits.write(leading, 5)
+        bits.write(size - 1, 6)
+        bits.write(xor >> trailing, size)
+    return bits.getvalue()
+
+
+def decode_xor(data: bytes, position: int, count: int) -> List[float]:
+    bits = BitReader(data, position)
+    word = bits.read(64)
+    words = [word]
+    leading = trailing = 0
+    for _ in range(count - 1):
+        if bits.flag():
+            if bits.flag():
+                leading = bits.read(5)
+                trailing = 64 - leading - bits.read(6) - 1
+            word ^= bits.read(64 - leading - trailing) << trailing
+        words.append(word)
+    return list(
+        struct.unpack(">{}d".format(count), struct.pack(">{}Q".format(count), *words))
+    )
+
+
+def encode_bitpack(values: Sequence[int]) -> Optional[bytes]:
+    """
+    Bit-packing: every integer as its offset from the smallest, in as many bits as the largest needs.
+    """
+    low = min(values)
+    width = (max(values) - low).bit_length()
+    if width > 64:
+        return None
+    out = bytearray()
+    write_varint(out, zigzag(low))
+    out.append(width)
+    bits = BitWriter()
+    if width:
+        for value in values:
+            bits.write(value - low, width)
+    return bytes(out) + bits.getvalue()
+
+
+def decode_bitpack(data: bytes, position: int, count: int) -> List[int]:
+    low, position = read_varint(data, position)
+    low = unzigzag(low)
+    width = data[position]
+    bits = BitReader(data, position + 1)
+    return [low + bits.read(width) for _ in range(count)]
+
+
+def decimal_places(values: Sequence[float]) -> Optional[int]:
+    """
+    The fewest decimal places every value is written with, None beyond DECIMAL_PLACES.
+    """
+    for places in range(DECIMAL_PLACES + 1):
+        scale = 10**places
+        try:
+            if all(
+                round(value * scale) / scale == value
+                and (value or math.copysign(1, value) > 0)
+                for value in values
+            ):
+                return places
+        except (OverflowError, ValueError):
+            return None  # infinite or NaN
+    return None
+
+
+def encode_decimal(values: Sequence[float]) -> Optional[bytes]:
+    """
+    Decimal: floats read with a few decimal places, as integers scaled by a power of ten.
+
+    Readings like 368.13 have noisy mantissas that XOR poorly, while their
+    hundredths are small integers for delta-of-delta or bit-packing, and
+    they are decoded to the same floats.
+    """
+    places = decimal_places(values)
+    if places is None:
+        return None
+    scale = 10**places
+    scaled = [round(value * scale) for value in values]
+    best: Optional[bytes] = None
+    for codec in (DELTA, BITPACK):
+        encoded = ENCODERS[codec](scaled)
+        if encoded is not None:
+            encoded = bytes([places, codec]) + encoded
+            if best is None or len(encoded) < len(best):
+                best = encoded
+    return best
+
+
+def decode_decimal(data: bytes, position: int, count: int) -> List[float]:
+    places, codec = data[position], data[position + 1]
+    if places > DECIMAL_PLACES or codec not in (DELTA, BITPACK):
+        raise ValueError("Corrupted decimal column")
+    scale = 10**places
+    decoder = DECODERS[codec]
+    return [value / scale for value in decoder(data, position + 2, count)]
+
+
+ENCODERS: Dict[int, Callable[[Sequence[Any]], Optional[bytes]]] = {
+    PLAIN: encode_plain,
+    RLE: encode_rle,
+    DELTA: encode_delta,
+    XOR: encode_xor,
+    BITPACK: encode_bitpack,
+    DECIMAL: encode_decimal,
+}
+
+DECODERS: Dict[int, Callable[[bytes, int, int], List[Any]]] = {
+    PLAIN: decode_plain,
+    RLE: decode_rle,
+    DELTA: decode_delta,
+    XOR: decode_xor,
+    BITPACK: decode_bitpack,
+    DECIMAL: decode_decimal,
+}
+
+
+def candidates(values: Sequence[Any]) -> Tuple[int, ...]:
+    """
+    The codecs that apply to the values of a column, all of them not None.
+    """
+    types = set(map(type, values))
+    if types == {int}:
+        return (DELTA, BITPACK)
+    if types == {float}:
+        return (XOR, DECIMAL)
+    return (PLAIN,)
+
+
+def encode_column(values: Sequence[Any]) -> bytes:
+    """
+    Encode the values of a column with the codec that makes them the smallest.
+
+    Run-length encoding covers every type and the None values; the other
+    codecs take the values that are not None, after the runs of None and
+    other values.
+
+    Args:
+    - values (Sequence[Any]): The values, int, float, str or None.
+
+    Returns:
+    - bytes: The codec id and the encoded values.
+    """
+    present = [value for value in values if value is not None]
+    out = bytearray()
+    if len(present) < len(values):
+        nulls = runs([value is None for value in values])
+        if nulls[0][0]:
+            nulls.insert(0, (False, 0))
+        write_varint(out, len(nulls))
+        for _, length in nulls:
+            write_varint(out, length)
+    best: Optional[bytes] = None
+    if present:
+        for codec in candidates(present):
+            encoded = ENCODERS[codec](present)
+            if encoded is not None and (best is None or len(encoded) < len(best)):
+                best = bytes([codec | (NULLS if out else 0)]) + out + encoded
+    else:
+        best = bytes([PLAIN | NULLS]) + out
+    # runs of the same values, e.g. a stuck sensor or a missing one
+    if len(runs(values)) * 4 <= len(values) or best is None:
+        encoded = bytes([RLE]) + encode_rle(values)
+        if best is None or len(encoded) < len(best):
+            best = encoded
+    return best
+
+
+def decode_column(data: bytes, count: int, position: int = 0) -> List[Any]:
+    """
+    Decode a column encoded by encode_column().
+
+    Args:
+    - data (bytes): The encoded column.
+    - count (int): The number of values.
+    - position (int): Where the column starts in data.
+
+    Returns:
+    - List[Any]: The values.
+
+    Raises:
+    - ValueError: If the column is corrupted.
+    """
+    if not count:
+        return []
+    codec = data[position]
+    position += 1
+    decoder = DECODERS.get(codec & ~NULLS)
+    if decoder is None:
+        raise ValueError("Unknown codec {}".format(codec))
+    if not codec & NULLS:
+        return decoder(data, position, count)
+    lengths = []
+    size, position = read_varint(data, position)
+    for _ in range(size):
+        length, position = read_varint(data, position)
+        lengths.append(length)
+    present = sum(lengths[::2])
+    found = iter(decoder(data, position, present) if present else ())
+    values: List[Any] = []
+    for index, length in enumerate(lengths):
+        if index % 2:
+            values.extend([None] * length)
+        else:
+            values.extend(islice(found, length))
+    if len(values) != count:
+        raise ValueError("Column of {} values, {} expected".format(len(values), count))
+    return values
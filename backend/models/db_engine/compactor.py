@@ -0,0 +1,263 @@
+from datetime import date
+from multiprocessing.connection import Connection
+from models.db_engine.blocks import compress_day
+from models.db_engine.db import MetaDB
+from models.db_engine.frames import compress_file, day_locked, is_compressed
+from models.metrics.pipeline import PipelineMetrics
+from models import ModelLogger
+from typing import Dict, List, Optional, Tuple
+from time import time
+from util import env_variables, get_base_path
+import os
+
+
+class Compactorlogger:
+    """
+    Logger of the compaction process.
+    """
+
+    logger = ModelLogger.lazy("compactor", "compactor.log")
+
+
+def lower_priority() -> None:
+    """
+    Run the calling process at the lowest CPU priority, so the collection and
+    the uploads keep the CPU while it works.
+    """
+    try:
+        os.nice(19)
+    except OSError:
+        pass
+    if hasattr(os, "sched_setscheduler"):
+        try:
+            # only scheduled when the CPU would otherwise be idle
+            os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+        except OSError:
+            pass
+
+
+class Compactor:
+    """
+    Compresses the sealed day files in the background, see models.db_engine.frames.
+
+    A day file is sealed once its day has been over and it has not been
+    written to for SEAL_AFTER seconds, as the StorageManager keeps appending
+    to the file of the day it was started on. A day file is only replaced
+    under the lock of frames.lock_day(), which its appenders take, so no
+    line appended meanwhile is lost. Compressed files keep their name and are
+    read transparently by FileDB, the bulk reader, the upload sinks and the
+    replay, from any offset.
+
+    With the "blocks" format, a sealed day file every upload is past, see
+    is_uploaded(), is written into a block file instead, see
+    models.db_engine.blocks, and removed: its columns are encoded by the
+    time series codecs, about three times smaller than zlib frames, but the
+    records have no byte offsets any more, which only the uploads need.
+    The bulk reader and the replay read block files. Day files still to be
+    uploaded are compressed into frames meanwhile.
+
+    Attributes:
+    - COMPACT_INTERVAL (float): The time between two passes, in seconds.
+    - SEAL_AFTER (float): The time since the last write after which a past day file is sealed, in seconds.
+    - FORMATS (Tuple[str, ...]): The formats sealed day files are compacted into.
+    - db_path (str): The data directory.
+    - meta_path (str): The meta file holding the upload cursors.
+    - interval (float): COMPACT_INTERVAL, or the compact_interval of the .env file.
+    - seal_after (float): SEAL_AFTER, or the compact_seal_after of the .env file.
+    - level (int): The zlib level, 6 or the compact_level of the .env file.
+    - format (str): "frames", or the compact_format of the .env file.
+
+    Methods:
+    - sealed_files(today: Optional[date] = None) -> List[str]: The day files to compress.
+    - upload_meta() -> Dict[str, str]: The meta file holding the upload cursors.
+    - is_uploaded(path: str, meta: Dict[str, str]) -> bool: Whether every upload is past a day file.
+    - write_blocks(path: str) -> Optional[int]: Replace a day file by a block file.
+    - compact(today: Optional[date] = None, comm_pipe: Optional[Connection] = None) -> Tuple[int, int]: Compress the sealed files.
+    - run(comm_pipe: Connection, data_pipe: Optional[Connection] = None) -> None: Compact until "END" is received.
+    """
+
+    COMPACT_INTERVAL: float = 3600
+    SEAL_AFTER: float = 3600
+    FORMATS: Tuple[str, ...] = ("frames", "blocks")
+
+    def __init__(
+        self, db_path: Optional[str] = None, meta_path: Optional[str] = None
+    ) -> None:
+        self.db_path = db_path or os.path.join(get_base_path(), "data")
+        self.meta_path = meta_path or MetaDB().get_metadata_path()
+        env = env_variables()
+        self.interval = float(env.get("compact_interval") or self.COMPACT_INTERVAL)
+        self.seal_after = float(env.get("compact_seal_after") or self.SEAL_AFTER)
+        self.level = int(env.get("compact_level") or 6)
+        self.format = env.get("compact_format") or "frames"
+        if self.format not in self.FORMATS:
+            raise ValueError("Unknown compact_format {}".format(self.format))
+
+    def sealed_files(self, today: Optional[date] = None) -> List[str]:
+        """
+        Find the day files to compress, oldest first.
+
+        Args:
+        - today (Optional[date]): The current day, date.today() by default.
+
+        Returns:
+        - List[str]: The paths of the sealed day files still stored as text, or as frames for the blocks format once uploaded.
+        """
+        now = time()
+        # appends to the file of the current day do not take the lock of
+        # frames.lock_day(), which holds once the day has been over that long
+        today = min(today or date.today(), date.fromtimestamp(now - self.seal_after))
+        meta = self.upload_meta() if self.format == "blocks" else {}
+        files = []
+        for root, dirs, names in os.walk(self.db_path):
+            dirs.sort()
+            for name in sorted(names):
+                if not name.endswith(".txt"):
+                    continue
+                try:
+                    year, month = os.path.relpath(root, self.db_path).split(os.sep)
+                    day = date(int(year), int(month), int(name[:-4]))
+                except ValueError:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    idle = now - os.path.getmtime(path)
+                except OSError:
+                    continue
+                if day >= today or idle < self.seal_after:
+                    continue
+                if self.is_uploaded(path, meta) or not is_compressed(path):
+                    files.append(path)
+        return files
+
+    def upload_meta(self) -> Dict[str, str]:
+        """
+        The meta file holding the upload cursors, empty if it cannot be read.
+        """
+        try:
+            return MetaDB().retrieve_metadata(self.meta_path)
+        except Exception:
+            return {}
+
+    def is_uploaded(self, path: str, meta: Dict[str, str]) -> bool:
+        """
+        Check that the cloud transfer and every sink are past a day file.
+
+        The cloud transfer is past it once its backlog cursor, `LastUploadFile`,
+        is, or once it lies inside a range an earlier live lane sent
+        (`Backlog.Sent`). Without a backlog cursor nothing is uploaded yet: the
+        live lane (`Live.*`) only sends from the day it started on. Every sink
+        cursor (`<sink>.LastUploadFile`) must be past it too.
+
+        Args:
+        - path (str): The day file.
+        - meta (Dict[str, str]): The meta file, see upload_meta().
+
+        Returns:
+        - bool: True if every record of the day file has been uploaded.
+        """
+        backlog = str(meta.get("LastUploadFile") or "")
+        if not backlog.startswith(self.db_path):
+            return False
+        for key, value in meta.items():
+            if (
+                key.endswith(".LastUploadFile")
+                and not key.startswith("Live.")
+                and str(value).startswith(self.db_path)
+                and path >= str(value)
+            ):
+                return False
+        if path < backlog:
+            return True
+        for gap in str(meta.get("Backlog.Sent") or "").split(";"):
+            fields = gap.split("|")
+            if len(fields) == 4 and fields[0] < path < fields[2]:
+                return True
+        return False
+
+    def write_blocks(self, path: str) -> Optional[int]:
+        """
+        Write a day file into a block file next to it, and remove the day file.
+
+        Args:
+        - path (str): The day file.
+
+        Returns:
+        - Optional[int]: The size of the block file, None if the day file changed while it was written.
+        """
+        before = os.stat(path)
+        target = os.path.splitext(path)[0] + ".blk"
+        compress_day(path, target + ".tmp")
+        with open(target + ".tmp", "rb") as block_file:
+            os.fsync(block_file.fileno())
+        # appenders wait until the day file is removed, and then start it again
+        with day_locked(path):
+            after = os.stat(path)
+            if (after.st_size, after.st_mtime_ns) != (
+                before.st_size,
+                before.st_mtime_ns,
+            ):
+                os.remove(target + ".tmp")
+                return None
+            os.replace(target + ".tmp", target)
+            os.remove(path)
+        return os.path.getsize(target)
+
+    def compact(
+        self, today: Optional[date] = None, comm_pipe: Optional[Connection] = None
+    ) -> Tuple[int, int]:
+        """
+        Compress the sealed day files.
+
+        Args:
+        - today (Optional[date]): The current day, date.today() by default.
+        - comm_pipe (Optional[Connection]): A pipe a command arriving on stops the pass, left to be received.
+
+        Returns:
+        - Tuple[int, int]: The number of files compressed and the bytes saved.
+        """
+        compressed = saved = 0
+        meta = self.upload_meta() if self.format == "blocks" else {}
+        for path in self.sealed_files(today):
+            if comm_pipe is not None and comm_pipe.poll():
+                break
+            try:
+                size = os.path.getsize(path)
+                if self.is_uploaded(path, meta):
+                    compressed_size = self.write_blocks(path)
+                else:
+                    compressed_size = compress_file(path, level=self.level)
+            except (OSError, ValueError) as e:
+                Compactorlogger.logger.error(
+                    "Failed to compress {}: {}".format(path, e)
+                )
+                continue
+            if compressed_size is None:
+                Compactorlogger.logger.info("{} changed, left for later".format(path))
+                continue
+            compressed += 1
+            saved += size - compressed_size
+            PipelineMetrics.compacted_files.inc()
+            PipelineMetrics.compacted_bytes_saved.inc(size - compressed_size)
+            Compactorlogger.logger.info(
+                "Compressed {} from {} to {} bytes".format(path, size, compressed_size)
+            )
+        return compressed, saved
+
+    def run(
+        self, comm_pipe: Connection, data_pipe: Optional[Connection] = None
+    ) -> None:
+        """
+        Compact the sealed day files every interval until "END" is received.
+
+        Args:
+        - comm_pipe (Connection): The communication pipe for receiving commands.
+        - data_pipe (Optional[Connection]): Unused, for the manager's process target.
+        """
+        lower_priority()
+        Compactorlogger.logger.info("Compacting {}".format(self.db_path))
+        while True:
+            self.compact(comm_pipe=comm_pipe)
+            if comm_pipe.poll(self.interval) and comm_pipe.recv() == "END":
+                Compactorlogger.logger.info("Compaction stopped")
+                return
@@ -6,6 +6,15 @@ from models.exceptions.exception import (
     CreateDirectoryError,
     RemoveDirectoryError,
 )
+from models.db_engine.frames import (
+    decompress_file,
+    is_compressed,
+    is_past_day_file,
+    lock_day,
+    open_data_file,
+    unlock_day,
+)
+from models.sensors.sample import Sample, SampleChunk
 from models import ModelLogger
 from typing import Optional, Dict, List, Any, Union, Tuple
 from datetime import datetime
@@ -21,7 +30,7 @@ class DBlogger:
     It provides a logger instance for logging database-related events.
     """
 
-    logger = ModelLogger("db").customiseLogger()
+    logger = ModelLogger.lazy("db")
 
 
 class FileDB:
@@ -50,6 +59,7 @@ class FileDB:
     - close() -> None: Close the currently open file.
     - write(data: str) -> int: Write data to the open file.
     - write_data_line(data: Dict[str, Any]) -> int: Write a dictionary as a line to the open file.
+    - write_chunk(chunk: SampleChunk) -> str: Write the samples of a chunk as lines, in one write.
     - readline() -> str: Read a line from the open file.
     - readlines() -> List[str]: Read all lines from the open file.
     """
@@ -68,10 +78,12 @@ class FileDB:
         - target: The target file path.
         - fd: The file descriptor for the open file.
         - mode: The mode in which to open the file.
+        - day_lock: The descriptor holding the lock of a past day file open for writing.
         """
         self.target = target
         self.fd: io.TextIOWrapper = None
         self.mode = mode
+        self.day_lock: Optional[int] = None
 
     def __enter__(self) -> "FileDB":
         """
@@ -229,6 +241,13 @@ class FileDB:
         """
         Open a file for reading or writing.
 
+        A data file compressed by models.db_engine.frames is read as its
+        text, read-only, and turned back into text to be appended to. Only
+        the files of past days can be compressed, so the others are opened
+        as they are. A past day file opened for writing holds the lock of
+        models.db_engine.frames.lock_day() until it is closed, so the
+        compactor does not replace it meanwhile.
+
         Args:
         - path (Optional[str]): The path to the file. If None, self.target is used.
         - mode (str): The mode in which to open the file ('r' for reading, 'w' for writing, etc.).
@@ -242,8 +261,18 @@ class FileDB:
         if path:
             self.set_target(path)
         try:
-            self.fd = open(self.target, mode)
+            past_day = is_past_day_file(self.target)
+            if past_day and (mode[0] != "r" or "+" in mode):
+                self.day_lock = lock_day(self.target)
+            compressed = mode[0] in "ra" and past_day and is_compressed(self.target)
+            if compressed and mode[0] == "r":
+                self.fd = open_data_file(self.target, "r")
+            else:
+                if compressed:
+                    decompress_file(self.target)
+                self.fd = open(self.target, mode)
         except Exception as e:
+            self.release_day_lock()
             raise FileOpenError("Error opening file: {}".format(self.target))
         return self.fd
 
@@ -259,8 +288,15 @@ class FileDB:
                 self.fd.close()
         except Exception as e:
             raise FileCloseError("Error while closing file: {}".format(self.target))
+        finally:
+            self.release_day_lock()
         self.fd = None
 
+    def release_day_lock(self) -> None:
+        if self.day_lock is not None:
+            unlock_day(self.day_lock)
+            self.day_lock = None
+
     def write(self, data: str) -> int:
         """
         Write data to the open file.
@@ -288,7 +324,7 @@ class FileDB:
         Write a dictionary as a line to the open file.
 
         Args:
-        - data (Dict[str, Any]): The data to write as a line.
+        - data (Dict[str, Any]): The data to write as a line, a dict or a Sample.
 
         Returns:
         - The number of bytes written.
@@ -296,9 +332,26 @@ class FileDB:
         Raises:
         - FileWriteError: If an error occurs while writing to the file.
         """
+        if isinstance(data, Sample):
+            return self.write(data.to_line())
         line = ",".join([f"{key}={value}" for key, value in data.items()])
         return self.write(line + "\n")
 
+    def write_chunk(self, chunk: SampleChunk) -> str:
+        """
+        Write the samples of a chunk as lines to the open file, in one write.
+
+        Args:
+        - chunk (SampleChunk): The samples.
+
+        Returns:
+        - The lines written.
+
+        Raises:
+        - FileWriteError: If an error occurs while writing to the file.
+        """
+        return self.write(chunk.to_lines())
+
     def readline(self) -> str:
         """
         Read a line from the open file.
@@ -471,6 +524,7 @@ class MetaDB(FileDB):
         with self as db:
             for line in self.update_metadata_lines(meta):
                 db.write(line + "\n")
+            db.fd.truncate()  # the previous content may have been longer
         DBlogger.logger.info("Updated metadata saved to file")
 
     def clear_metadata(self) -> None:
@@ -553,6 +607,7 @@ class TempDB:
     - get_current_no_of_lines(self) -> int: Get the current number of lines in the temporary database.
     - get_tmp_db_path(self) -> str: Retrieve the temporary database path from environment variables.
     - save_to_tmp_db(self, data) -> None: Save data to the temporary database.
+    - latest_record(self, schema=None) -> Optional[Dict[str, Any]]: Get the last record saved, typed by a record schema.
     - clean_up_tmp_db(self) -> None: Clean up the temporary database by retaining only the minimum required lines.
     """
 
@@ -580,14 +635,21 @@ class TempDB:
         """
         Retrieve the temporary database path from environment variables.
 
+        It only holds the last records, so it is kept in the staging
+        directory when one is set, in RAM rather than on the SD card.
+
         Returns:
         - str: The path to the temporary database.
 
         Raises:
         - ValueError: If the temporary database path is not set in environment variables.
         """
+        env = env_variables()
+        if env.get("staging_path"):
+            os.makedirs(env["staging_path"], exist_ok=True)
+            return os.path.join(env["staging_path"], "tmp_db")
         try:
-            return env_variables()["tmp_db_path"]
+            return env["tmp_db_path"]
         except:
             raise ValueError("No tmp_db in Environment variable")
 
@@ -596,10 +658,33 @@ class TempDB:
         Save data to the temporary database.
 
         Parameters:
-        - data: The data to be saved.
+        - data: The data to be saved, a sample or a chunk of samples.
         """
         with FileDB(self.tmp_db_path, "a") as db:
-            db.write_data_line(data)
+            if isinstance(data, SampleChunk):
+                db.write_chunk(data)
+            else:
+                db.write_data_line(data)
+
+    def latest_record(self, schema=None) -> Optional[Dict[str, Any]]:
+        """
+        Get the last record saved to the temporary database.
+
+        Parameters:
+        - schema (Optional[RecordSchema]): The record schema typing the values, record_schema() by default.
+
+        Returns:
+        - Optional[Dict[str, Any]]: The record, or None if there is none yet.
+        """
+        if schema is None:
+            from models.sensors.schema import record_schema
+
+            schema = record_schema()
+        with FileDB(self.tmp_db_path, "r") as db:
+            lines = db.readlines()
+        if not lines:
+            return None
+        return schema.parse_line(lines[-1])
 
     def clean_up_tmp_db(self) -> None:
         """
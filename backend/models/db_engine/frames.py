@@ -0,0 +1,312 @@
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import date
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+import fcntl
+import io
+import os
+import struct
+import zlib
+
+# A text line never starts with NUL, so a compressed data file is told from
+# a text one by its first bytes and keeps its name
+MAGIC = b"\x00DLZ1\n"
+# compressed offset, compressed size and text size of a frame
+ENTRY = struct.Struct("<QII")
+# offset and number of entries of the frame index, and the text size of the file
+FOOTER = struct.Struct("<QIQ")
+FRAME_SIZE = 64 * 1024
+
+
+def is_compressed(path: str) -> bool:
+    """
+    Check whether a data file was compressed by compress_file().
+    """
+    try:
+        with open(path, "rb") as data_file:
+            return data_file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def is_past_day_file(path: str, today: Optional[date] = None) -> bool:
+    """
+    Check whether a file is the data file of a past day, YYYY/MM/DD.txt.
+
+    Only those are sealed and compressed, see models.db_engine.compactor, so
+    the file of the current day, the meta file and the temp DB are opened
+    without reading their first bytes.
+    """
+    head, name = os.path.split(path)
+    if not name.endswith(".txt"):
+        return False
+    head, month = os.path.split(head)
+    try:
+        day = date(int(os.path.basename(head)), int(month), int(name[:-4]))
+    except ValueError:
+        return False
+    return day < (today or date.today())
+
+
+def lock_day(path: str) -> int:
+    """
+    Take the lock serializing the compaction of a past day file with its appenders.
+
+    The lock is taken on the directory of the file, which stays the same
+    while the compactor replaces the file, and released by unlock_day().
+
+    Returns:
+    - int: The descriptor holding the lock.
+    """
+    fd = os.open(os.path.dirname(path) or os.curdir, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    except OSError:
+        os.close(fd)
+        raise
+    return fd
+
+
+def unlock_day(fd: int) -> None:
+    os.close(fd)
+
+
+@contextmanager
+def day_locked(path: str) -> Iterator[None]:
+    """
+    Hold the lock of lock_day() on a day file.
+    """
+    fd = lock_day(path)
+    try:
+        yield
+    finally:
+        unlock_day(fd)
+
+
+def compress_file(
+    path: str, frame_size: int = FRAME_SIZE, level: int = 6
+) -> Optional[int]:
+    """
+    Compress a data file in place into independently decompressible frames.
+
+    Every frame is a zlib stream of about `frame_size` bytes of text, cut at
+    the end of a line, and a frame index at the end of the file gives where
+    the frames are, so a reader seeks to a text offset by decompressing one
+    frame. The text offsets of the lines are unchanged, so do the upload
+    offsets kept in the meta file. The compressed file replaces the text one
+    once it is written, with the same modification time.
+
+    Args:
+    - path (str): The data file.
+    - frame_size (int): The text size of a frame.
+    - level (int): The zlib compression level.
+
+    The data file is only replaced under the lock of lock_day(), which
+    FileDB takes to append to a past day file, so no line appended is lost.
+
+    Returns:
+    - Optional[int]: The size of the compressed file, None if the data file changed while it was compressed.
+    """
+    before = os.stat(path)
+    tmp_path = path + ".tmp"
+    entries: List[Tuple[int, int, int]] = []
+    size = 0
+    with open(path, "rb") as source, open(tmp_path, "wb") as target:
+        target.write(MAGIC)
+        while True:
+            text = source.read(frame_size)
+            if not text:
+                break
+            if not text.endswith(b"\n"):
+                text += source.readline()
+            frame = zlib.compress(text, level)
+            entries.append((target.tell(), len(frame), len(text)))
+            target.write(frame)
+            size += len(text)
+        index = target.tell()
+        for entry in entries:
+            target.write(ENTRY.pack(*entry))
+        target.write(FOOTER.pack(index, len(entries), size))
+        target.write(MAGIC)
+        target.flush()
+        os.fsync(target.fileno())
+    # appenders wait until the file is replaced, and then append to the
+    # compressed file, which they turn back into text
+    with day_locked(path):
+        after = os.stat(path)
+        if size != before.st_size or (after.st_size, after.st_mtime_ns) != (
+            before.st_size,
+            before.st_mtime_ns,
+        ):
+            os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, path)
+        os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns))
+    return os.path.getsize(path)
+
+
+def decompress_file(path: str) -> None:
+    """
+    Turn a compressed data file back into text, e.g. to append to it.
+
+    Appenders call it holding the lock of lock_day().
+    """
+    tmp_path = path + ".tmp"
+    with FrameReader(path) as source, open(tmp_path, "wb") as target:
+        for index in range(len(source.sizes)):
+            target.write(source.frame(index))
+        target.flush()
+        os.fsync(target.fileno())
+    os.replace(tmp_path, path)
+
+
+class FrameReader(io.RawIOBase):
+    """
+    Read a compressed data file as its text, seeking without decompressing the whole file.
+
+    Only the frame index is read when the file is opened. A read decompresses
+    the frame its position is in, and keeps the last frame for the next one.
+
+    Attributes:
+    - path (str): The compressed data file.
+    - size (int): The size of the text.
+    - starts (List[int]): The text offset of every frame.
+
+    Raises:
+    - ValueError: If the file is not a complete compressed data file.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        self.file: BinaryIO = open(path, "rb")
+        try:
+            self.read_index()
+        except Exception:
+            self.file.close()
+            raise
+        self.position = 0
+        self.cached: Tuple[int, bytes] = (-1, b"")
+
+    def read_index(self) -> None:
+        file_size = os.fstat(self.file.fileno()).st_size
+        tail = FOOTER.size + len(MAGIC)
+        if file_size < len(MAGIC) + tail or self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a compressed data file".format(self.path))
+        self.file.seek(file_size - tail)
+        footer = self.file.read(tail)
+        if footer[FOOTER.size :] != MAGIC:
+            raise ValueError("{} has no frame index".format(self.path))
+        index, count, self.size = FOOTER.unpack(footer[: FOOTER.size])
+        self.file.seek(index)
+        entries = self.file.read(count * ENTRY.size)
+        if len(entries) != count * ENTRY.size:
+            raise ValueError("{} has a truncated frame index".format(self.path))
+        self.offsets: List[int] = []
+        self.lengths: List[int] = []
+        self.sizes: List[int] = []
+        self.starts: List[int] = []
+        start = 0
+        for offset, length, size in ENTRY.iter_unpack(entries):
+            self.offsets.append(offset)
+            self.lengths.append(length)
+            self.sizes.append(size)
+            self.starts.append(start)
+            start += size
+
+    def frame(self, index: int) -> bytes:
+        """
+        The text of a frame.
+        """
+        if self.cached[0] != index:
+            self.file.seek(self.offsets[index])
+            text = zlib.decompress(self.file.read(self.lengths[index]))
+            if len(text) != self.sizes[index]:
+                raise ValueError("{}: corrupted frame {}".format(self.path, index))
+            self.cached = (index, text)
+        return self.cached[1]
+
+    def read_frames(
+        self, start: int = 0, end: Optional[int] = None
+    ) -> Tuple[int, bytes]:
+        """
+        The text of the frames a range of text offsets is in.
+
+        Frames end with their lines, so the text starts and ends on a line.
+
+        Args:
+        - start (int): The first text offset of the range.
+        - end (Optional[int]): The text offset after the range, the end of the text by default.
+
+        Returns:
+        - Tuple[int, bytes]: The text offset of the first frame and the text of the frames.
+        """
+        end = self.size if end is None else min(end, self.size)
+        if start >= end:
+            return start, b""
+        first = bisect_right(self.starts, start) - 1
+        last = bisect_right(self.starts, end - 1)
+        return self.starts[first], b"".join(
+            self.frame(index) for index in range(first, last)
+        )
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position {}".format(offset))
+        self.position = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        if self.position >= self.size:
+            return 0
+        index = bisect_right(self.starts, self.position) - 1
+        start = self.position - self.starts[index]
+        text = self.frame(index)[start : start + len(buffer)]
+        buffer[: len(text)] = text
+        self.position += len(text)
+        return len(text)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.file.close()
+        super().close()
+
+
+def open_data_file(path: str, mode: str = "rb") -> io.IOBase:
+    """
+    Open a data file for reading, compressed or not.
+
+    Args:
+    - path (str): The data file.
+    - mode (str): "rb", or "r" for text.
+
+    Returns:
+    - io.IOBase: The file, seekable to the text offsets of its lines.
+    """
+    if not is_compressed(path):
+        return open(path, mode)
+    data_file = io.BufferedReader(FrameReader(path))
+    return data_file if "b" in mode else io.TextIOWrapper(data_file)
+
+
+def data_size(path: str) -> int:
+    """
+    The size of the text of a data file, compressed or not.
+    """
+    if not is_compressed(path):
+        return os.path.getsize(path)
+    with FrameReader(path) as reader:
+        return reader.size
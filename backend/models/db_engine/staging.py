@@ -0,0 +1,189 @@
+from models.db_engine.db import DBlogger, FileDB
+from models.db_engine.frames import (
+    day_locked,
+    decompress_file,
+    is_compressed,
+    is_past_day_file,
+)
+from contextlib import nullcontext
+from models.metrics.pipeline import PipelineMetrics
+from typing import Optional
+from time import monotonic, perf_counter
+from util import env_variables, get_base_path
+import os
+
+# Written next to a staged file while its lines are appended to the data
+# file, with the size the data file had before
+MARKER = ".flush"
+
+
+def staged_file(staging_path: str, db_path: str, target: str) -> str:
+    """
+    The staged file of a data file, at the same place in the staging directory.
+
+    Raises:
+    - ValueError: If the data file is not in the data directory.
+    """
+    relative = os.path.relpath(target, db_path)
+    if relative.startswith(os.pardir):
+        raise ValueError("{} is not in {}".format(target, db_path))
+    return os.path.join(staging_path, relative)
+
+
+def flush_staged(staged: str, target: str) -> int:
+    """
+    Append the lines of a staged file to its data file, in one synced write, and empty it.
+
+    The size of the data file is written to a marker before, and the marker
+    removed once the staged file is emptied, so a flush interrupted by a
+    crash before the staged file was emptied is undone and done again, and
+    one interrupted after is complete: the lines are appended exactly once.
+    A line left incomplete by a crash is dropped.
+
+    Args:
+    - staged (str): The staged file.
+    - target (str): The data file.
+
+    Returns:
+    - int: The number of bytes appended.
+    """
+    marker = staged + MARKER
+    with open(staged, "rb") as staged_file:
+        data = staged_file.read()
+    data = data[: data.rfind(b"\n") + 1]
+    # the compactor does not replace a past day file while it is appended to
+    past_day = is_past_day_file(target) and os.path.isdir(os.path.dirname(target))
+    with day_locked(target) if past_day else nullcontext():
+        if os.path.exists(marker) and data:
+            with open(marker) as marker_file:
+                size = int(marker_file.read() or 0)
+            if is_compressed(target):
+                decompress_file(target)
+            if os.path.exists(target) and os.path.getsize(target) > size:
+                os.truncate(target, size)
+        # with an empty staged file, the marker is left from a flush that
+        # completed: the lines are in the data file
+        if data:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if is_compressed(target):
+                decompress_file(target)
+            size = os.path.getsize(target) if os.path.exists(target) else 0
+            with open(marker + ".tmp", "w") as marker_file:
+                marker_file.write(str(size))
+            os.replace(marker + ".tmp", marker)
+            with open(target, "ab") as data_file:
+                data_file.write(data)
+                data_file.flush()
+                os.fsync(data_file.fileno())
+    os.truncate(staged, 0)
+    if os.path.exists(marker):
+        os.remove(marker)
+    return len(data)
+
+
+def recover_staged(staging_path: str, db_path: Optional[str] = None) -> int:
+    """
+    Append the lines left in the staging directory, e.g. by a crash, to their data files.
+
+    Args:
+    - staging_path (str): The staging directory.
+    - db_path (Optional[str]): The data directory.
+
+    Returns:
+    - int: The number of bytes recovered.
+    """
+    db_path = db_path or os.path.join(get_base_path(), "data")
+    recovered = 0
+    for root, dirs, names in os.walk(staging_path):
+        for name in names:
+            if not name.endswith(".txt"):
+                continue
+            staged = os.path.join(root, name)
+            target = os.path.join(db_path, os.path.relpath(staged, staging_path))
+            try:
+                recovered += flush_staged(staged, target)
+            except OSError as e:
+                DBlogger.logger.error("Failed to recover {}: {}".format(staged, e))
+    if recovered:
+        DBlogger.logger.info(
+            "Recovered {} staged bytes from {}".format(recovered, staging_path)
+        )
+    return recovered
+
+
+class StagedDB(FileDB):
+    """
+    A data file whose lines are staged in a RAM backed directory and appended to it in batches.
+
+    Every write goes to the staged file, kept open in the staging directory,
+    typically on a tmpfs such as /dev/shm. The staged lines are appended to
+    the data file in one sequential, synced write once they are
+    `flush_size` bytes or `flush_interval` seconds old, instead of the SD
+    card being written to on every sample.
+
+    A power failure loses the lines staged since the last flush, at most
+    `flush_interval` seconds or `flush_size` bytes of samples. A crash of
+    the process loses none: they stay in the staging directory until
+    recover_staged() appends them.
+
+    Attributes:
+    - FLUSH_INTERVAL (float): The longest time lines stay staged, in seconds.
+    - FLUSH_SIZE (int): The most bytes staged before a flush.
+    - durable (str): The data file.
+    - flush_interval (float): FLUSH_INTERVAL, or the staging_flush_interval of the .env file.
+    - flush_size (int): FLUSH_SIZE, or the staging_flush_size of the .env file.
+    - staged (int): The bytes staged since the last flush.
+
+    Methods:
+    - due() -> bool: Whether the staged lines should be flushed.
+    - flush() -> int: Append the staged lines to the data file.
+    - close() -> None: Flush and close the staged file.
+    """
+
+    FLUSH_INTERVAL: float = 5
+    FLUSH_SIZE: int = 256 * 1024
+
+    def __init__(
+        self, target: str, staging_path: str, db_path: Optional[str] = None
+    ) -> None:
+        db_path = db_path or os.path.join(get_base_path(), "data")
+        super().__init__(staged_file(staging_path, db_path, target), "a")
+        self.durable = target
+        env = env_variables()
+        self.flush_interval = float(
+            env.get("staging_flush_interval") or self.FLUSH_INTERVAL
+        )
+        self.flush_size = int(env.get("staging_flush_size") or self.FLUSH_SIZE)
+        self.staged = 0
+        self.staged_at = 0.0
+        self.create_dir(os.path.dirname(self.target))
+        self.open(mode="a")
+
+    def write(self, data: str) -> str:
+        super().write(data)
+        # in the staging directory, where it outlives the process
+        self.fd.flush()
+        if not self.staged:
+            self.staged_at = monotonic()
+        self.staged += len(data)
+        return data
+
+    def due(self) -> bool:
+        return self.staged >= self.flush_size or (
+            self.staged > 0 and monotonic() - self.staged_at >= self.flush_interval
+        )
+
+    def flush(self) -> int:
+        if not self.staged:
+            return 0
+        start = perf_counter()
+        flushed = flush_staged(self.target, self.durable)
+        PipelineMetrics.staging_flush_seconds.observe(perf_counter() - start)
+        PipelineMetrics.staging_bytes_flushed.inc(flushed)
+        self.staged = 0
+        return flushed
+
+    def close(self) -> None:
+        if self.fd:
+            self.flush()
+        super().close()
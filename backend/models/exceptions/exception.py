@@ -40,3 +40,7 @@ class AWSCloudDisconnectError(Exception):
 
 class AWSCloudUploadError(Exception):
     pass
+
+
+class SinkError(Exception):
+    pass
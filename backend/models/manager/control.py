@@ -0,0 +1,381 @@
+from concurrent.futures import ThreadPoolExecutor
+from models import ModelLogger
+from typing import Callable, Dict, List, Optional, Tuple
+from util import get_base_path, env_variables
+import asyncio
+import json
+import os
+import socket
+import threading
+
+
+class Controllogger:
+    """
+    Class for logging control socket activities.
+    """
+
+    logger = ModelLogger.lazy("control", "control.log")
+
+
+def get_control_socket_path() -> str:
+    """
+    Get the path of the control socket.
+
+    The path is read from the `control_socket_path` environment variable and
+    defaults to `tmp/control.sock` in the backend directory.
+
+    Returns:
+    - str: The path of the Unix domain socket.
+    """
+    return env_variables().get("control_socket_path") or os.path.join(
+        get_base_path(), "tmp", "control.sock"
+    )
+
+
+def parse_request(line: str) -> Tuple[str, List[str]]:
+    """
+    Parse a request line received on the control socket.
+
+    A request is either a JSON object ({"command": ..., "args": [...]}) or a
+    plain text line made of the command followed by its arguments, e.g.
+    `START-DATA_SAVING longitude latitude`.
+
+    Args:
+    - line (str): The request line.
+
+    Returns:
+    - Tuple[str, List[str]]: The upper-cased command and its arguments.
+
+    Raises:
+    - ValueError: If the request is empty or malformed.
+    """
+    line = line.strip()
+    if not line:
+        raise ValueError("Empty request")
+    if line.startswith("{"):
+        request = json.loads(line)
+        command = request.get("command")
+        args = request.get("args", [])
+        if not isinstance(command, str) or not isinstance(args, list):
+            raise ValueError("Malformed request")
+    else:
+        command, *args = line.split()
+    return command.upper(), [str(arg) for arg in args]
+
+
+class ControlServer:
+    """
+    ControlServer exposes the Manager over a Unix domain socket.
+
+    Every connection may send any number of newline terminated requests and
+    receives one JSON line per request. Clients are served concurrently on an
+    asyncio event loop; START-/STOP- commands are handed to a single worker
+    thread so that slow commands (which may join processes) never block the
+    loop, while queries are answered straight away.
+
+    Attributes:
+    - manager: The Manager instance commands are forwarded to.
+    - socket_path (str): The path of the Unix domain socket.
+    - query_map (Dict[str, Callable]): Maps query names to the functions answering them.
+
+    Methods:
+    - serve_forever() -> None: Run the server in the calling thread.
+    - serve_in_background() -> threading.Thread: Run the server in a daemon thread.
+    - stop() -> None: Stop a running server.
+    """
+
+    def __init__(self, manager=None, socket_path: Optional[str] = None) -> None:
+        """
+        Initialize the ControlServer.
+
+        Parameters:
+        - manager: The Manager instance to control. Defaults to the Manager singleton.
+        - socket_path (Optional[str]): The path of the socket. Defaults to get_control_socket_path().
+        """
+        if manager is None:
+            from models.manager.manager import Manager
+
+            manager = Manager.get_instance()
+        self.manager = manager
+        self.socket_path = socket_path or get_control_socket_path()
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="control-command"
+        )
+        self.query_map: Dict[str, Callable[[List[str]], dict]] = {
+            "STATUS": self.status,
+            "PING": self.ping,
+            "METRICS": self.metrics,
+            "LATENCY": self.latency,
+            "REPLAY": self.replay,
+            "CONNECTION": self.connection,
+        }
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.clients = set()
+        self.ready = threading.Event()
+
+    def status(self, args: List[str]) -> dict:
+        """
+        Answer a STATUS query.
+
+        Returns:
+        - dict: The Manager status.
+        """
+        return self.manager.get_status()
+
+    def ping(self, args: List[str]) -> dict:
+        """
+        Answer a PING query.
+
+        Returns:
+        - dict: A success status.
+        """
+        return {"status": "success", "message": "pong"}
+
+    def metrics(self, args: List[str]) -> dict:
+        """
+        Answer a METRICS query.
+
+        Returns:
+        - dict: The metrics in the Prometheus text format.
+        """
+        from models.metrics.registry import REGISTRY
+
+        return {"status": "success", "message": REGISTRY.exposition()}
+
+    def latency(self, args: List[str]) -> dict:
+        """
+        Answer a LATENCY query.
+
+        Returns:
+        - dict: The p50/p95/p99 age of samples at every pipeline stage, in seconds.
+        """
+        from models.metrics.tracing import latency_report
+
+        return {"status": "success", "stages": latency_report()}
+
+    def replay(self, args: List[str]) -> dict:
+        """
+        Answer a REPLAY query.
+
+        Returns:
+        - dict: How far a replay is behind its schedule and how far the stages after it fall behind.
+        """
+        from models.metrics.pipeline import PipelineMetrics
+        from models.metrics.tracing import latency_report
+
+        process = self.manager.get_process("data_replay")
+        return {
+            "status": "success",
+            "running": bool(process and process.is_alive()),
+            "samples_sent": PipelineMetrics.replay_samples_sent.get(),
+            "samples_stored": PipelineMetrics.samples_stored.get(),
+            "lag_seconds": PipelineMetrics.replay_lag_seconds.get(),
+            "queue_depth": PipelineMetrics.pipe_queue_depth.labels(
+                "sensor_to_storage"
+            ).get(),
+            "stages": latency_report(),
+        }
+
+    def connection(self, args: List[str]) -> dict:
+        """
+        Answer a CONNECTION query.
+
+        Returns:
+        - dict: The state of the connection to the broker, as last set by the cloud transfer process.
+        """
+        from models.metrics.pipeline import PipelineMetrics
+
+        state = "disconnected"
+        for labels, slot in PipelineMetrics.connection_state.series():
+            if PipelineMetrics.connection_state.values[slot]:
+                state = labels[0][1]
+        process = self.manager.get_process("cloud_transfer")
+        return {
+            "status": "success",
+            "running": bool(process and process.is_alive()),
+            "state": state if process and process.is_alive() else "disconnected",
+            "connect_failures": PipelineMetrics.connect_failures.get(),
+            "interruptions": PipelineMetrics.connection_interruptions.get(),
+            "reconnect_delay_seconds": PipelineMetrics.reconnect_delay_seconds.get(),
+        }
+
+    def run_command(self, command: str, args: List[str]) -> dict:
+        """
+        Execute a command through the Manager and make the result serializable.
+
+        Parameters:
+        - command (str): The command to execute.
+        - args (List[str]): Arguments passed on to the command.
+
+        Returns:
+        - dict: The status of the command execution, without the process object.
+        """
+        status = self.manager.handle_command(command, *args)
+        return {key: value for key, value in status.items() if key != "process"}
+
+    async def dispatch(self, line: str) -> dict:
+        """
+        Dispatch one request line to a query or a command.
+
+        Parameters:
+        - line (str): The request line.
+
+        Returns:
+        - dict: The response to send back to the client.
+        """
+        try:
+            command, args = parse_request(line)
+        except ValueError as e:
+            return {"status": "failed", "message": "Bad request: {}".format(e)}
+
+        Controllogger.logger.info(f"Received request: {command}")
+        if command in self.query_map:
+            return self.query_map[command](args)
+        if command.startswith(("START-", "STOP-")):
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.run_command, command, args
+            )
+        return {"status": "failed", "message": f"Unknown command {command}"}
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Serve a single client connection until it closes.
+
+        Parameters:
+        - reader (asyncio.StreamReader): The stream requests are read from.
+        - writer (asyncio.StreamWriter): The stream responses are written to.
+        """
+        self.clients.add(writer)
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.dispatch(line.decode())
+                except Exception as e:
+                    Controllogger.logger.error(f"Request failed: {e}")
+                    response = {"status": "failed", "message": str(e)}
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def _serve(self) -> None:
+        """
+        Start listening on the socket and serve clients until stopped.
+        """
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # stale socket from a previous run
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_unix_server(
+            self.handle_client, path=self.socket_path
+        )
+        os.chmod(self.socket_path, 0o660)
+        Controllogger.logger.info(f"Control socket listening on {self.socket_path}")
+        self.ready.set()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            Controllogger.logger.info("Control socket closed")
+
+    def serve_forever(self) -> None:
+        """
+        Run the server in the calling thread until stop() is called.
+        """
+        asyncio.run(self._serve())
+
+    def serve_in_background(self) -> threading.Thread:
+        """
+        Run the server in a daemon thread.
+
+        Returns:
+        - threading.Thread: The thread running the server.
+        """
+        thread = threading.Thread(
+            target=self.serve_forever, name="control-server", daemon=True
+        )
+        thread.start()
+        self.ready.wait(5)
+        return thread
+
+    def stop(self) -> None:
+        """
+        Stop a running server.
+        """
+        if self.loop and self.server:
+            self.loop.call_soon_threadsafe(self._close)
+        self.executor.shutdown(wait=False)
+
+    def _close(self) -> None:
+        """
+        Close the listening socket and every client connection.
+        """
+        self.server.close()
+        for writer in list(self.clients):
+            writer.close()
+
+
+class ControlClient:
+    """
+    ControlClient sends requests to a ControlServer.
+
+    Methods:
+    - request(command: str, *args: str) -> dict: Send a request and wait for its response.
+    - close() -> None: Close the connection.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = 30) -> None:
+        """
+        Connect to the control socket.
+
+        Parameters:
+        - socket_path (Optional[str]): The path of the socket. Defaults to get_control_socket_path().
+        - timeout (float): Seconds to wait for a response.
+        """
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path or get_control_socket_path())
+        self.stream = self.sock.makefile("rwb")
+
+    def __enter__(self) -> "ControlClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, trace) -> None:
+        self.close()
+
+    def request(self, command: str, *args: str) -> dict:
+        """
+        Send a request and wait for its response.
+
+        Parameters:
+        - command (str): The command or query, e.g. START-DATA_COLLECTION or STATUS.
+        - args (str): Arguments passed on to the command.
+
+        Returns:
+        - dict: The response of the server.
+        """
+        request = json.dumps({"command": command, "args": list(args)})
+        self.stream.write((request + "\n").encode())
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("Control socket closed the connection")
+        return json.loads(line)
+
+    def close(self) -> None:
+        """
+        Close the connection.
+        """
+        self.stream.close()
+        self.sock.close()
@@ -1,4 +1,4 @@
-from models.db_engine.db import TempDB, FileDB
+from models.db_engine.db import TempDB
 from pynput import keyboard
 from .manager import Manager
 from util import modify_data_to_dict
@@ -29,15 +29,11 @@ def on_ctrl_s():
 
 
 def get_active_sensors(line: str = None):
-    tmp_db = TempDB()
-    path = tmp_db.get_tmp_db_path()
     activate_sensor = []
     if line is None:
-        with FileDB(path, "r") as db:
-            lines = db.readlines()
-        line = lines[-1]
-
-    data = modify_data_to_dict(line)
+        data = TempDB().latest_record() or {}
+    else:
+        data = modify_data_to_dict(line)
     for sensor, value in data.items():
         if value is not None:
             activate_sensor.append(sensor)
@@ -1,19 +1,13 @@
-from models.sensor_mgmt.sensor_manager import SensorDataManager
-from models.data_manager.storage_manager import StorageManager
-from models.data_manager.cloud_transfer import CloudTransferManager
 from models import ModelLogger
 from multiprocessing.connection import Pipe
 from multiprocessing import Process
 from time import sleep
 from typing import Dict
-from util import get_base_path
-import os
+import threading
 
 
 class Managerlogger:
-    logger = ModelLogger("manager").customiseLogger(
-        filename=os.path.join("{}".format(get_base_path()), "logs", "manager.log")
-    )
+    logger = ModelLogger.lazy("manager", "manager.log")
 
 
 class Manager:
@@ -25,7 +19,9 @@ class Manager:
     - send_cmd_dsm, recv_cmd_dsm: Pipes for DSM command communication.
     - send_cmd_sdm, recv_cmd_sdm: Pipes for SDM command communication.
     - send_cmd_ctm, recv_cmd_ctm: Pipes for CTM command communication.
-    - send_data_sdm, recv_data_dsm: Pipes for SDM data communication.
+    - send_cmd_rdm, recv_cmd_rdm: Pipes for replay command communication.
+    - send_cmd_cpm, recv_cmd_cpm: Pipes for compaction command communication.
+    - send_data_sdm, recv_data_dsm: Pipes for SDM data communication, also used by the replay.
     - _instance (Manager): The singleton instance of the Manager class.
     """
 
@@ -33,6 +29,8 @@ class Manager:
     send_cmd_dsm, recv_cmd_dsm = Pipe()
     send_cmd_sdm, recv_cmd_sdm = Pipe()
     send_cmd_ctm, recv_cmd_ctm = Pipe()
+    send_cmd_rdm, recv_cmd_rdm = Pipe()
+    send_cmd_cpm, recv_cmd_cpm = Pipe()
     send_data_sdm, recv_data_dsm = Pipe()
 
     _instance = None
@@ -52,9 +50,11 @@ class Manager:
         Attributes:
         - processes (dict): A dictionary to store processes.
         - cmd_hdlr (CommandHandler): An instance of the CommandHandler class.
+        - lock (threading.RLock): Serializes commands coming from the keyboard and the control socket.
         """
         self.processes = {}
         self.cmd_hdlr = CommandHandler()
+        self.lock = threading.RLock()
 
     @classmethod
     def get_pipes_connections(cls, name):
@@ -94,13 +94,43 @@ class Manager:
         - dict: The status of the command execution.
         """
         Managerlogger.logger.info(f"Handling command: {command}")
-        status = self.cmd_hdlr.execute_command(command, self, *args, **kwargs)
-        self.update_processes(status.get("process_name"), status.get("process"))
+        with self.lock:
+            status = self.cmd_hdlr.execute_command(command, self, *args, **kwargs)
+            if status is None:
+                return self.cmd_hdlr.status_generator(
+                    status="failed",
+                    process=None,
+                    process_name=None,
+                    message=f"Unknown command {command}",
+                )
+            self.update_processes(status.get("process_name"), status.get("process"))
         print(
             f"{status['status']}: ", end=""
         )
         return status
 
+    def get_status(self) -> dict:
+        """
+        Get a snapshot of the managed processes.
+
+        Returns:
+        - dict: The process states keyed by process name, and whether data saving is active.
+        """
+        processes = {}
+        for process_name, process in list(self.processes.items()):
+            if process_name is None:
+                continue
+            alive = bool(process and process.is_alive())
+            processes[process_name] = {
+                "alive": alive,
+                "pid": process.pid if alive else None,
+            }
+        return {
+            "status": "success",
+            "processes": processes,
+            "data_saving": self.cmd_hdlr.data_saving,
+        }
+
     def get_process(self, process_name) -> Process:
         """
         Get a process by its name.
@@ -148,10 +178,15 @@ class CommandHandler:
     and data collection.
 
     Attributes:
+    - STOP_TIMEOUT (float): The longest to wait for the data collection to stop sending data, in seconds.
+    - REPLAY_STOP_TIMEOUT (float): The longest to wait for the replay to end before it is terminated, in seconds.
     - command_map (dict): Maps commands to their corresponding handler methods.
     - data_saving (bool): Indicates if data saving is currently active.
     """
 
+    STOP_TIMEOUT = 5
+    REPLAY_STOP_TIMEOUT = 5
+
     def __init__(self):
         """
         Initializes the CommandHandler with a command map and data saving status.
@@ -163,6 +198,10 @@ class CommandHandler:
             "STOP-CLOUD_TRANSFER": self.stop_cloud_transfer,
             "START-DATA_COLLECTION": self.start_data_collection,
             "STOP-DATA_COLLECTION": self.stop_data_collection,
+            "START-DATA_REPLAY": self.start_data_replay,
+            "STOP-DATA_REPLAY": self.stop_data_replay,
+            "START-COMPACTION": self.start_compaction,
+            "STOP-COMPACTION": self.stop_compaction,
         }
         self.data_saving = False
 
@@ -201,6 +240,8 @@ class CommandHandler:
         if (not caller.get_process(process_name)) or (
             not caller.get_process(process_name).is_alive()
         ):
+            from models.data_manager.storage_manager import StorageManager
+
             dsm_instance = StorageManager(sensor_names=args)
             process = self.process_generator(
                 process_name, dsm_instance, Manager.recv_cmd_dsm, Manager.recv_data_dsm
@@ -251,10 +292,15 @@ class CommandHandler:
         process_name = self.get_process_name_from_command(command)
         process = caller.get_process(process_name)
         if process and process.is_alive():
+            # nothing would read the data the replay sends any more
+            self.stop_data_replay("STOP-DATA_REPLAY", caller)
+            # the pending batch of the data collection is stored first
+            self.stop_sending_data(caller)
             Manager.send_cmd_dsm.send("END")
             Managerlogger.logger.info("Command for termination of saving process sent")
             process.join()
             if process.is_alive():
+                Manager.send_cmd_sdm.send("START")
                 Managerlogger.logger.info("stop-Data_saving command Failed")
                 return self.status_generator(
                     status="failed",
@@ -262,7 +308,6 @@ class CommandHandler:
                     process_name=process_name.lower(),
                     message="DSM Process is still alive",
                 )
-            Manager.send_cmd_sdm.send("STOP")
             self.data_saving = False
             Managerlogger.logger.info("stop-Data_saving command successfully Executed")
             return self.status_generator(
@@ -281,6 +326,29 @@ class CommandHandler:
             message="DSM Process does not exist to be terminated",
         )
 
+    def stop_sending_data(self, caller) -> None:
+        """
+        Stops the data collection sending data to the StorageManager.
+
+        The data collection sends its pending batch and acknowledges the
+        STOP, which is waited for, so the batch is in the data pipe before
+        the StorageManager is ended. The data collection reads its commands
+        between two collections, so STOP_TIMEOUT is kept well below the
+        timeout of the control clients.
+
+        Args:
+        - caller: The manager instance invoking the command.
+        """
+        if not self.is_alive(caller, "data_collection"):
+            return
+        while Manager.send_cmd_sdm.poll():
+            Manager.send_cmd_sdm.recv()  # left by an earlier STOP
+        Manager.send_cmd_sdm.send("STOP")
+        if Manager.send_cmd_sdm.poll(self.STOP_TIMEOUT):
+            Manager.send_cmd_sdm.recv()
+        else:
+            Managerlogger.logger.warning("Data collection did not acknowledge STOP")
+
     def start_data_collection(self, command, caller, *args, **kwargs):
         """
         Starts the data collection process.
@@ -295,9 +363,18 @@ class CommandHandler:
         - dict: The status of the command execution.
         """
         process_name = self.get_process_name_from_command(command)
+        if self.is_alive(caller, "data_replay"):
+            return self.status_generator(
+                status="failed",
+                process=None,
+                process_name=process_name,
+                message="Data replay ongoing",
+            )
         if (not caller.get_process(process_name)) or (
             not caller.get_process(process_name).is_alive()
         ):
+            from models.sensor_mgmt.sensor_manager import SensorDataManager
+
             sdm_instance = SensorDataManager()
             process = self.process_generator(
                 process_name, sdm_instance, Manager.recv_cmd_sdm, Manager.send_data_sdm
@@ -393,6 +470,8 @@ class CommandHandler:
         if (not caller.get_process(process_name)) or (
             not caller.get_process(process_name).is_alive()
         ):
+            from models.data_manager.cloud_transfer import CloudTransferManager
+
             ctm_instance = CloudTransferManager()
             process = self.process_generator(
                 process_name, ctm_instance, Manager.recv_cmd_ctm, None
@@ -458,6 +537,190 @@ class CommandHandler:
             message="CTM Process does not exist to be terminated",
         )
 
+    def start_data_replay(self, command, caller, *args, **kwargs):
+        """
+        Starts replaying stored data through the pipeline, in place of data collection.
+
+        The replayed data is sent to the StorageManager, so data saving must be running.
+
+        Args:
+        - command (str): The command string.
+        - caller: The manager instance invoking this command.
+        - args: key=value replay options, see models.sensor_mgmt.replay.parse_replay_args.
+        - kwargs: Additional keyword arguments for the command handler.
+
+        Returns:
+        - dict: The status of the command execution.
+        """
+        from models.sensor_mgmt.replay import ReplayDataManager, parse_replay_args
+
+        process_name = self.get_process_name_from_command(command)
+        if self.is_alive(caller, "data_collection"):
+            return self.status_generator(
+                status="failed",
+                process=None,
+                process_name=process_name,
+                message="Data collection ongoing",
+            )
+        if not self.is_alive(caller, "data_saving"):
+            return self.status_generator(
+                status="failed",
+                process=None,
+                process_name=process_name,
+                message="Data saving is not running",
+            )
+        if self.is_alive(caller, process_name):
+            return self.status_generator(
+                status="failed",
+                process=caller.get_process(process_name),
+                process_name=process_name,
+                message="Data replay ongoing",
+            )
+        try:
+            rdm_instance = ReplayDataManager(**parse_replay_args(args))
+        except ValueError as e:
+            return self.status_generator(
+                status="failed",
+                process=None,
+                process_name=process_name,
+                message=str(e),
+            )
+        while Manager.recv_cmd_rdm.poll():
+            Manager.recv_cmd_rdm.recv()  # END sent to a replay that had finished
+        process = self.process_generator(
+            process_name, rdm_instance, Manager.recv_cmd_rdm, Manager.send_data_sdm
+        )
+        process.start()
+        Managerlogger.logger.info("start-Data_replay command successfully Executed")
+        return self.status_generator(
+            status="success",
+            process=process,
+            process_name=process.name.lower(),
+            message="Stored data is being replayed",
+        )
+
+    def stop_data_replay(self, command, caller, *args, **kwargs):
+        """
+        Stops replaying stored data.
+
+        A replay that does not end within REPLAY_STOP_TIMEOUT is terminated.
+
+        Args:
+        - command (str): The command string.
+        - caller: The manager instance invoking this command.
+        - args: Additional positional arguments for the command handler.
+        - kwargs: Additional keyword arguments for the command handler.
+
+        Returns:
+        - dict: The status of the command execution.
+        """
+        process_name = self.get_process_name_from_command(command)
+        process = caller.get_process(process_name)
+        if process and process.is_alive():
+            Manager.send_cmd_rdm.send("END")
+            process.join(self.REPLAY_STOP_TIMEOUT)
+            if process.is_alive():
+                Managerlogger.logger.warning("Data replay did not end, terminating it")
+                process.terminate()
+                process.join()
+            Managerlogger.logger.info("stop-Data_replay command successfully Executed")
+            return self.status_generator(
+                status="success",
+                process=None,
+                process_name=process_name,
+                message="Replay Process is terminated",
+            )
+        return self.status_generator(
+            status="success",
+            process=None,
+            process_name=process_name,
+            message="Replay Process does not exist to be terminated",
+        )
+
+    def start_compaction(self, command, caller, *args, **kwargs):
+        """
+        Starts compressing the sealed day files in the background.
+
+        Args:
+        - command (str): The command string.
+        - caller: The manager instance invoking this command.
+        - args: Additional positional arguments for the command handler.
+        - kwargs: Additional keyword arguments for the command handler.
+
+        Returns:
+        - dict: The status of the command execution.
+        """
+        process_name = self.get_process_name_from_command(command)
+        if self.is_alive(caller, process_name):
+            return self.status_generator(
+                status="failed",
+                process=caller.get_process(process_name),
+                process_name=process_name,
+                message="Compaction ongoing",
+            )
+        from models.db_engine.compactor import Compactor
+
+        while Manager.recv_cmd_cpm.poll():
+            Manager.recv_cmd_cpm.recv()  # END sent to a compactor that had failed
+        process = self.process_generator(
+            process_name, Compactor(), Manager.recv_cmd_cpm, None
+        )
+        process.start()
+        Managerlogger.logger.info("start-Compaction command successfully Executed")
+        return self.status_generator(
+            status="success",
+            process=process,
+            process_name=process.name.lower(),
+            message="Sealed day files are being compressed",
+        )
+
+    def stop_compaction(self, command, caller, *args, **kwargs):
+        """
+        Stops compressing the sealed day files, once the current file is done.
+
+        Args:
+        - command (str): The command string.
+        - caller: The manager instance invoking this command.
+        - args: Additional positional arguments for the command handler.
+        - kwargs: Additional keyword arguments for the command handler.
+
+        Returns:
+        - dict: The status of the command execution.
+        """
+        process_name = self.get_process_name_from_command(command)
+        process = caller.get_process(process_name)
+        if process and process.is_alive():
+            Manager.send_cmd_cpm.send("END")
+            process.join()
+            Managerlogger.logger.info("stop-Compaction command successfully Executed")
+            return self.status_generator(
+                status="success",
+                process=None,
+                process_name=process_name,
+                message="Compaction Process is terminated",
+            )
+        return self.status_generator(
+            status="success",
+            process=None,
+            process_name=process_name,
+            message="Compaction Process does not exist to be terminated",
+        )
+
+    @staticmethod
+    def is_alive(caller, process_name) -> bool:
+        """
+        Checks whether a managed process is running.
+
+        Args:
+        - caller: The manager instance invoking the command.
+        - process_name (str): The name of the process.
+
+        Returns:
+        - bool: True if the process exists and is alive.
+        """
+        process = caller.get_process(process_name)
+        return bool(process and process.is_alive())
+
     @staticmethod
     def get_process_name_from_command(command):
         """
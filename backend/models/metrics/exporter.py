@@ -0,0 +1,61 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from models.metrics.registry import REGISTRY, MetricsRegistry
+from typing import Optional
+from util import env_variables
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the registry of the server in the Prometheus text format on /metrics.
+    """
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.exposition().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass  # scrapes would flood the console
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """
+    MetricsServer is a local HTTP endpoint exposing a MetricsRegistry.
+
+    The address is read from the `metrics_address` and `metrics_port`
+    environment variables and defaults to 127.0.0.1:9108.
+
+    Methods:
+    - serve_in_background() -> threading.Thread: Serve requests in a daemon thread.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        registry: MetricsRegistry = REGISTRY,
+        address: Optional[str] = None,
+        port: Optional[int] = None,
+    ) -> None:
+        env = env_variables()
+        address = address or env.get("metrics_address") or "127.0.0.1"
+        if port is None:
+            port = int(env.get("metrics_port") or 9108)
+        self.registry = registry
+        super().__init__((address, port), MetricsRequestHandler)
+
+    def serve_in_background(self) -> threading.Thread:
+        thread = threading.Thread(
+            target=self.serve_forever, name="metrics-server", daemon=True
+        )
+        thread.start()
+        return thread
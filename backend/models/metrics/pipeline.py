@@ -0,0 +1,149 @@
+from models.metrics.registry import REGISTRY
+from util import get_base_path
+import os
+
+
+def get_data_size(db_path: str = None) -> int:
+    """
+    Get the number of bytes stored in the data directory.
+
+    Args:
+    - db_path (str): The data directory. Defaults to the data directory in the backend.
+
+    Returns:
+    - int: The total size of the files in the data directory.
+    """
+    if db_path is None:
+        db_path = os.path.join(get_base_path(), "data")
+    size = 0
+    for root, dirs, files in os.walk(db_path):
+        for file in files:
+            try:
+                size += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass  # removed while walking
+    return size
+
+
+class PipelineMetrics:
+    """
+    Metrics of the data pipeline, shared by the manager and its child processes.
+
+    Attributes:
+    - samples_collected: Samples gathered by the SensorDataManager.
+    - sensor_read_seconds: Time spent reading each sensor.
+    - pipe_queue_depth: Messages sent on a pipe but not received yet.
+    - samples_stored: Samples written by the StorageManager.
+    - storage_write_seconds: Time spent writing a sample to the database.
+    - storage_bytes_written: Bytes appended to the database.
+    - data_bytes_on_disk: Bytes in the data directory, computed when collected.
+    - publishes: Messages handed to the MQTT client.
+    - acks: Messages acknowledged by the broker.
+    - publish_failures: Messages that were not acknowledged in time.
+    - publish_rate: The message rate each topic is paced at, 0 when not paced.
+    - publish_pacing_seconds: Time publishes waited for the rate limit.
+    - upload_retries: Upload attempts restarted after a failure.
+    - connect_failures: Failed attempts to connect to the broker.
+    - connection_interruptions: Times the connection to the broker was lost.
+    - connection_state: 1 for the current state of the connection to the broker, 0 for the others.
+    - reconnect_delay_seconds: The wait before the next attempt to connect, 0 when connected.
+    - upload_backlog_files: Files waiting to be uploaded.
+    - replay_samples_sent: Stored samples sent through the pipeline again by a replay.
+    - replay_lag_seconds: How far a replay is behind its schedule.
+    - sink_records_sent: Records delivered by each upload sink.
+    - sink_failures: Failed sends of each upload sink.
+    - sink_send_seconds: Time each upload sink takes to send a batch.
+    - lane_records_sent: Records uploaded by the live and the backlog lane.
+    - compacted_files: Sealed day files compressed by the Compactor.
+    - compacted_bytes_saved: Bytes freed by compressing the sealed day files.
+    - staging_flush_seconds: Time spent appending the staged lines to the data file.
+    - staging_bytes_flushed: Bytes appended from the staging area to the data files.
+    """
+
+    samples_collected = REGISTRY.counter(
+        "datalogger_samples_collected_total", "Samples gathered from the sensors"
+    )
+    sensor_read_seconds = REGISTRY.histogram(
+        "datalogger_sensor_read_seconds", "Time spent reading a sensor", ["sensor"]
+    )
+    pipe_queue_depth = REGISTRY.gauge(
+        "datalogger_pipe_queue_depth", "Messages sent on a pipe but not received yet", ["pipe"]
+    )
+    samples_stored = REGISTRY.counter(
+        "datalogger_samples_stored_total", "Samples written to the database"
+    )
+    storage_write_seconds = REGISTRY.histogram(
+        "datalogger_storage_write_seconds", "Time spent writing to the database"
+    )
+    storage_bytes_written = REGISTRY.counter(
+        "datalogger_storage_bytes_written_total", "Bytes appended to the database"
+    )
+    data_bytes_on_disk = REGISTRY.gauge(
+        "datalogger_data_bytes_on_disk", "Bytes stored in the data directory"
+    )
+    publishes = REGISTRY.counter(
+        "datalogger_mqtt_publishes_total", "Messages handed to the MQTT client"
+    )
+    acks = REGISTRY.counter(
+        "datalogger_mqtt_acks_total", "Messages acknowledged by the broker"
+    )
+    publish_failures = REGISTRY.counter(
+        "datalogger_mqtt_publish_failures_total", "Messages not acknowledged in time"
+    )
+    publish_rate = REGISTRY.gauge(
+        "datalogger_mqtt_publish_rate", "Messages per second a topic is paced at", ["topic"]
+    )
+    publish_pacing_seconds = REGISTRY.counter(
+        "datalogger_mqtt_publish_pacing_seconds_total", "Time publishes waited for the rate limit"
+    )
+    upload_retries = REGISTRY.counter(
+        "datalogger_upload_retries_total", "Uploads restarted after a failure"
+    )
+    connect_failures = REGISTRY.counter(
+        "datalogger_mqtt_connect_failures_total", "Failed attempts to connect to the broker"
+    )
+    connection_interruptions = REGISTRY.counter(
+        "datalogger_mqtt_connection_interruptions_total", "Times the connection to the broker was lost"
+    )
+    connection_state = REGISTRY.gauge(
+        "datalogger_mqtt_connection_state", "1 for the current state of the connection", ["state"]
+    )
+    reconnect_delay_seconds = REGISTRY.gauge(
+        "datalogger_mqtt_reconnect_delay_seconds", "Wait before the next attempt to connect"
+    )
+    upload_backlog_files = REGISTRY.gauge(
+        "datalogger_upload_backlog_files", "Files waiting to be uploaded"
+    )
+    replay_samples_sent = REGISTRY.counter(
+        "datalogger_replay_samples_sent_total", "Stored samples sent again by a replay"
+    )
+    replay_lag_seconds = REGISTRY.gauge(
+        "datalogger_replay_lag_seconds", "How far a replay is behind its schedule"
+    )
+    sink_records_sent = REGISTRY.counter(
+        "datalogger_sink_records_sent_total", "Records delivered by an upload sink", ["sink"]
+    )
+    sink_failures = REGISTRY.counter(
+        "datalogger_sink_failures_total", "Failed sends of an upload sink", ["sink"]
+    )
+    sink_send_seconds = REGISTRY.histogram(
+        "datalogger_sink_send_seconds", "Time an upload sink takes to send a batch", ["sink"]
+    )
+    lane_records_sent = REGISTRY.counter(
+        "datalogger_lane_records_sent_total", "Records uploaded by a lane", ["lane"]
+    )
+    compacted_files = REGISTRY.counter(
+        "datalogger_compacted_files_total", "Sealed day files compressed"
+    )
+    compacted_bytes_saved = REGISTRY.counter(
+        "datalogger_compacted_bytes_saved_total", "Bytes freed by compressing day files"
+    )
+    staging_flush_seconds = REGISTRY.histogram(
+        "datalogger_staging_flush_seconds", "Time spent flushing the staged lines to disk"
+    )
+    staging_bytes_flushed = REGISTRY.counter(
+        "datalogger_staging_bytes_flushed_total", "Bytes flushed from the staging area to disk"
+    )
+
+
+PipelineMetrics.data_bytes_on_disk.set_function(get_data_size)
@@ -0,0 +1,500 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import math
+import multiprocessing
+
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def format_value(value: float) -> str:
+    """
+    Format a sample value the way the Prometheus text format expects it.
+
+    Args:
+    - value (float): The value to format.
+
+    Returns:
+    - str: The formatted value.
+    """
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 2**53:
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    """
+    Format label pairs as a Prometheus label set.
+
+    Args:
+    - labels (Sequence[Tuple[str, str]]): The label names and values.
+
+    Returns:
+    - str: The label set, e.g. {sensor="GPS"}, or an empty string.
+    """
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class MetricFamily:
+    """
+    Base class of all metric types.
+
+    The values of a family live in shared memory (multiprocessing.RawArray), so
+    they are updated in place by the child processes the Manager forks and read
+    by whichever process exposes them. Families must therefore be created
+    before the child processes are started, i.e. at import time.
+
+    Every label combination (series) takes one slot of `width` doubles. Slots
+    are claimed on first use by any process and their label values are kept in
+    a shared key table so every process agrees on the slot of a series.
+
+    Attributes:
+    - name (str): The metric name.
+    - documentation (str): The help text of the metric.
+    - labelnames (Tuple[str, ...]): The names of the labels.
+    - max_series (int): The number of label combinations the family can hold.
+    - width (int): The number of doubles stored per series.
+
+    Methods:
+    - labels(*labelvalues: str) -> MetricChild: Get the series of the given label values.
+    - samples() -> List[Tuple[str, List[Tuple[str, str]], float]]: Get the current samples of the family.
+    """
+
+    TYPE = "untyped"
+    KEY_LENGTH = 64
+    SEPARATOR = "\x1f"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        max_series: int = 16,
+        width: int = 1,
+    ) -> None:
+        """
+        Initialize the family and allocate its shared memory.
+
+        Parameters:
+        - name (str): The metric name.
+        - documentation (str): The help text of the metric.
+        - labelnames (Sequence[str]): The names of the labels.
+        - max_series (int): The number of label combinations the family can hold.
+        - width (int): The number of doubles stored per series.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series if self.labelnames else 1
+        self.width = width
+        self.values = multiprocessing.RawArray("d", self.max_series * width)
+        self.keys = multiprocessing.RawArray("c", self.max_series * self.KEY_LENGTH)
+        self.used = multiprocessing.RawValue("i", 0)
+        self.lock = multiprocessing.Lock()
+        self._slots: Dict[str, int] = {}
+        self._children: Dict[Tuple[str, ...], "MetricChild"] = {}
+
+    def labels(self, *labelvalues: str) -> "MetricChild":
+        """
+        Get the series of the given label values.
+
+        Args:
+        - labelvalues (str): One value per label name.
+
+        Returns:
+        - MetricChild: The series, which can be updated with the methods of the metric type.
+
+        Raises:
+        - ValueError: If the number of label values is wrong or the family is full.
+        """
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(
+                    "{} expects labels {}".format(self.name, self.labelnames)
+                )
+            child = MetricChild(self, self._slot(labelvalues))
+            self._children[labelvalues] = child
+        return child
+
+    def _key(self, labelvalues: Sequence[str]) -> str:
+        return self.SEPARATOR.join(str(value) for value in labelvalues)
+
+    def _slot(self, labelvalues: Sequence[str]) -> int:
+        """
+        Find the slot of a series, claiming a new one if needed.
+        """
+        key = self._key(labelvalues)
+        if key in self._slots:
+            return self._slots[key]
+        encoded = key.encode()[: self.KEY_LENGTH]
+        with self.lock:
+            for slot in range(self.used.value):
+                if self._read_key(slot) == encoded:
+                    break
+            else:
+                slot = self.used.value
+                if slot >= self.max_series:
+                    raise ValueError("{} has too many series".format(self.name))
+                start = slot * self.KEY_LENGTH
+                self.keys[start : start + len(encoded)] = encoded
+                self.used.value = slot + 1
+        self._slots[key] = slot
+        return slot
+
+    def _read_key(self, slot: int) -> bytes:
+        start = slot * self.KEY_LENGTH
+        return self.keys[start : start + self.KEY_LENGTH].rstrip(b"\x00")
+
+    def series(self) -> List[Tuple[List[Tuple[str, str]], int]]:
+        """
+        Get the label pairs and the slot of every series in use.
+
+        Returns:
+        - List[Tuple[List[Tuple[str, str]], int]]: The label pairs and slot of each series.
+        """
+        if not self.labelnames:
+            return [([], 0)]
+        result = []
+        for slot in range(self.used.value):
+            labelvalues = self._read_key(slot).decode().split(self.SEPARATOR)
+            result.append((list(zip(self.labelnames, labelvalues)), slot))
+        return result
+
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        """
+        Get the current samples of the family.
+
+        Returns:
+        - List[Tuple[str, List[Tuple[str, str]], float]]: Sample name, labels and value.
+        """
+        return [
+            (self.name, labels, self.values[slot * self.width])
+            for labels, slot in self.series()
+        ]
+
+    def _add(self, slot: int, amount: float, offset: int = 0) -> None:
+        index = slot * self.width + offset
+        with self.lock:
+            self.values[index] += amount
+
+    def _set(self, slot: int, value: float) -> None:
+        self.values[slot * self.width] = value
+
+    def _get(self, slot: int) -> float:
+        return self.values[slot * self.width]
+
+
+class MetricChild:
+    """
+    A single series of a metric family.
+
+    The methods available depend on the type of the family: counters support
+    inc(), gauges inc(), dec() and set(), and histograms and summaries observe().
+    """
+
+    __slots__ = ("family", "slot")
+
+    def __init__(self, family: MetricFamily, slot: int) -> None:
+        self.family = family
+        self.slot = slot
+
+    def inc(self, amount: float = 1) -> None:
+        self.family.inc_slot(self.slot, amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.family.inc_slot(self.slot, -amount)
+
+    def set(self, value: float) -> None:
+        self.family.set_slot(self.slot, value)
+
+    def observe(self, value: float) -> None:
+        self.family.observe_slot(self.slot, value)
+
+    def get(self) -> float:
+        return self.family._get(self.slot)
+
+
+class Counter(MetricFamily):
+    """
+    A counter only goes up, e.g. the number of samples collected.
+    """
+
+    TYPE = "counter"
+
+    def inc(self, amount: float = 1) -> None:
+        self.inc_slot(0, amount)
+
+    def inc_slot(self, slot: int, amount: float) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        self._add(slot, amount)
+
+    def get(self) -> float:
+        return self._get(0)
+
+
+class Gauge(MetricFamily):
+    """
+    A gauge goes up and down, e.g. the number of messages waiting in a pipe.
+
+    A gauge without labels may also be given a function with set_function();
+    its value is then computed whenever the gauge is collected, in the
+    collecting process.
+    """
+
+    TYPE = "gauge"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1) -> None:
+        self.inc_slot(0, amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc_slot(0, -amount)
+
+    def set(self, value: float) -> None:
+        self.set_slot(0, value)
+
+    def inc_slot(self, slot: int, amount: float) -> None:
+        self._add(slot, amount)
+
+    def set_slot(self, slot: int, value: float) -> None:
+        self._set(slot, value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            return float(self.function())
+        return self._get(0)
+
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        if self.function is not None:
+            return [(self.name, [], self.get())]
+        return super().samples()
+
+
+class Histogram(MetricFamily):
+    """
+    A histogram counts observations in fixed buckets, e.g. write latencies.
+
+    Each series stores one count per bucket (plus the +Inf bucket), the sum
+    and the count of the observations.
+    """
+
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        max_series: int = 16,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(
+            name, documentation, labelnames, max_series, width=len(self.buckets) + 3
+        )
+
+    def observe(self, value: float) -> None:
+        self.observe_slot(0, value)
+
+    def observe_slot(self, slot: int, value: float) -> None:
+        base = slot * self.width
+        bucket = bisect_left(self.buckets, value)
+        with self.lock:
+            self.values[base + bucket] += 1
+            self.values[base + self.width - 2] += value
+            self.values[base + self.width - 1] += 1
+
+    def _get(self, slot: int) -> float:
+        return self.values[slot * self.width + self.width - 1]
+
+    def get(self) -> float:
+        return self._get(0)
+
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        samples = []
+        bounds = [format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, slot in self.series():
+            base = slot * self.width
+            cumulative = 0
+            for index, bound in enumerate(bounds):
+                cumulative += self.values[base + index]
+                samples.append(
+                    (self.name + "_bucket", labels + [("le", bound)], cumulative)
+                )
+            samples.append((self.name + "_sum", labels, self.values[base + self.width - 2]))
+            samples.append((self.name + "_count", labels, self.values[base + self.width - 1]))
+        return samples
+
+
+class Summary(MetricFamily):
+    """
+    A summary keeps the latest observations in a rolling window and reports
+    quantiles over them, e.g. the p50/p95/p99 age of samples.
+
+    Each series stores the count and the sum of every observation, the write
+    position of the window and the window itself.
+    """
+
+    TYPE = "summary"
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        max_series: int = 16,
+        window: int = 1024,
+    ) -> None:
+        self.window = window
+        super().__init__(name, documentation, labelnames, max_series, width=window + 3)
+
+    def observe(self, value: float) -> None:
+        self.observe_slot(0, value)
+
+    def observe_slot(self, slot: int, value: float) -> None:
+        base = slot * self.width
+        with self.lock:
+            position = int(self.values[base + 2])
+            self.values[base + 3 + position % self.window] = value
+            self.values[base + 2] = (position + 1) % self.window
+            self.values[base] += 1
+            self.values[base + 1] += value
+
+    def get(self) -> float:
+        return self._get(0)
+
+    def window_values(self, slot: int = 0) -> List[float]:
+        """
+        Get the observations currently in the window of a series.
+        """
+        base = slot * self.width
+        with self.lock:
+            filled = int(min(self.values[base], self.window))
+            return list(self.values[base + 3 : base + 3 + filled])
+
+    def quantiles(self, slot: int = 0) -> Dict[float, float]:
+        """
+        Compute the quantiles of the window of a series (nearest rank).
+
+        Returns:
+        - Dict[float, float]: The value of each quantile, NaN when the window is empty.
+        """
+        values = sorted(self.window_values(slot))
+        if not values:
+            return {quantile: float("nan") for quantile in self.QUANTILES}
+        return {
+            quantile: values[min(len(values) - 1, int(math.ceil(quantile * len(values))) - 1)]
+            for quantile in self.QUANTILES
+        }
+
+    def samples(self) -> List[Tuple[str, List[Tuple[str, str]], float]]:
+        samples = []
+        for labels, slot in self.series():
+            base = slot * self.width
+            for quantile, value in self.quantiles(slot).items():
+                samples.append(
+                    (self.name, labels + [("quantile", format_value(quantile))], value)
+                )
+            samples.append((self.name + "_sum", labels, self.values[base + 1]))
+            samples.append((self.name + "_count", labels, self.values[base]))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    MetricsRegistry keeps the metric families of the application.
+
+    Methods:
+    - counter(name, documentation, labelnames=(), **kwargs) -> Counter: Register a counter.
+    - gauge(name, documentation, labelnames=(), **kwargs) -> Gauge: Register a gauge.
+    - histogram(name, documentation, labelnames=(), **kwargs) -> Histogram: Register a histogram.
+    - summary(name, documentation, labelnames=(), **kwargs) -> Summary: Register a summary.
+    - get(name: str) -> Optional[MetricFamily]: Get a registered family by name.
+    - exposition() -> str: Render every family in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self.families: Dict[str, MetricFamily] = {}
+
+    def register(self, family: MetricFamily) -> MetricFamily:
+        """
+        Register a metric family, returning the existing one if the name is taken.
+        """
+        existing = self.families.get(family.name)
+        if existing is not None:
+            if type(existing) is not type(family):
+                raise ValueError("{} is already registered".format(family.name))
+            return existing
+        self.families[family.name] = family
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames=(), **kwargs) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, **kwargs))
+
+    def gauge(self, name: str, documentation: str, labelnames=(), **kwargs) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, **kwargs))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), **kwargs
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, **kwargs))
+
+    def summary(self, name: str, documentation: str, labelnames=(), **kwargs) -> Summary:
+        return self.register(Summary(name, documentation, labelnames, **kwargs))
+
+    def get(self, name: str) -> Optional[MetricFamily]:
+        return self.families.get(name)
+
+    def exposition(self) -> str:
+        """
+        Render every family in the Prometheus text exposition format (version 0.0.4).
+
+        Returns:
+        - str: The exposition text.
+        """
+        lines = []
+        for family in self.families.values():
+            lines.append("# HELP {} {}".format(family.name, family.documentation))
+            lines.append("# TYPE {} {}".format(family.name, family.TYPE))
+            for name, labels, value in family.samples():
+                lines.append(
+                    "{}{} {}".format(name, format_labels(labels), format_value(value))
+                )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
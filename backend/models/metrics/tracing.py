@@ -0,0 +1,150 @@
+from datetime import datetime
+from models.metrics.registry import REGISTRY
+from typing import Any, Dict, Optional, Tuple
+import time
+
+STAGES = ("collected", "received", "stored", "published", "acked")
+
+
+class TraceMetrics:
+    """
+    Latency metrics of samples moving through the pipeline.
+
+    Attributes:
+    - sample_age_seconds: Age of a sample when it reaches a stage, over a rolling window.
+    """
+
+    sample_age_seconds = REGISTRY.summary(
+        "datalogger_sample_age_seconds",
+        "Age of a sample when it reaches a pipeline stage",
+        ["stage"],
+        window=1024,
+    )
+
+
+class Trace:
+    """
+    Trace follows one sample through the pipeline.
+
+    A trace is started when the sensors are polled and travels with the
+    sample over the pipe to the StorageManager. Every stage the sample reaches
+    is stamped with time.monotonic_ns(), which is shared by all the processes
+    of a boot, and the age of the sample at that stage is recorded in
+    TraceMetrics.sample_age_seconds.
+
+    Attributes:
+    - capture_ns (int): The monotonic time the sample was captured at.
+    - stages (Dict[str, int]): The monotonic time each stage was reached at.
+
+    Methods:
+    - start() -> Trace: Start a trace now.
+    - mark(stage: str) -> float: Stamp a stage and record the age of the sample.
+    """
+
+    __slots__ = ("capture_ns", "stages")
+
+    def __init__(self, capture_ns: int) -> None:
+        self.capture_ns = capture_ns
+        self.stages: Dict[str, int] = {}
+
+    @classmethod
+    def start(cls) -> "Trace":
+        return cls(time.monotonic_ns())
+
+    def mark(self, stage: str) -> float:
+        """
+        Stamp a stage and record the age of the sample at that stage.
+
+        Args:
+        - stage (str): The name of the stage.
+
+        Returns:
+        - float: The age of the sample in seconds.
+        """
+        now = time.monotonic_ns()
+        self.stages[stage] = now
+        age = (now - self.capture_ns) / 1e9
+        record_age(stage, age)
+        return age
+
+
+def record_age(stage: str, age: float) -> None:
+    """
+    Record the age of a sample at a stage.
+
+    Args:
+    - stage (str): The name of the stage.
+    - age (float): The age in seconds.
+    """
+    TraceMetrics.sample_age_seconds.labels(stage).observe(age)
+
+
+def record_age_from_data(stage: str, data: Dict[str, Any]) -> Optional[float]:
+    """
+    Record the age of a stored record at a stage.
+
+    Records read back from the database no longer carry their trace, so their
+    age is measured from the wall clock time stored with them.
+
+    Args:
+    - stage (str): The name of the stage.
+    - data (Dict[str, Any]): The record, with its ts field, or date and time fields.
+
+    Returns:
+    - Optional[float]: The age in seconds, or None if the record has no timestamp.
+    """
+    if data.get("ts") is not None:
+        try:
+            age = (time.time_ns() - int(data["ts"])) / 1e9
+        except (TypeError, ValueError):
+            return None
+        record_age(stage, age)
+        return age
+    try:
+        captured = datetime.fromisoformat("{}T{}".format(data["date"], data["time"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+    age = (datetime.now() - captured).total_seconds()
+    record_age(stage, age)
+    return age
+
+
+def unwrap(message: Any) -> Tuple[Any, Optional[Trace]]:
+    """
+    Split a pipe message into the sample and its trace.
+
+    Args:
+    - message: Either a (sample, trace) pair or an untraced sample.
+
+    Returns:
+    - Tuple[Any, Optional[Trace]]: The sample and its trace, if any.
+    """
+    if (
+        isinstance(message, tuple)
+        and len(message) == 2
+        and isinstance(message[1], Trace)
+    ):
+        return message
+    return message, None
+
+
+def latency_report() -> Dict[str, Dict[str, float]]:
+    """
+    Report the p50/p95/p99 age of samples at every stage seen so far.
+
+    Returns:
+    - Dict[str, Dict[str, float]]: The quantiles and count of each stage, in seconds.
+    """
+    summary = TraceMetrics.sample_age_seconds
+    report = {}
+    for labels, slot in summary.series():
+        quantiles = summary.quantiles(slot)
+        report[labels[0][1]] = {
+            "p50": quantiles[0.5],
+            "p95": quantiles[0.95],
+            "p99": quantiles[0.99],
+            "count": int(summary.values[slot * summary.width]),
+        }
+    order = [stage for stage in STAGES if stage in report]
+    order += [stage for stage in report if stage not in STAGES]
+    return {stage: report[stage] for stage in order}
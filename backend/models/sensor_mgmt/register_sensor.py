@@ -1,7 +1,5 @@
 class SensorModule:
     MODULES = [
         "models.sensors.gps.GPS",
-        "models.sensors.time.Time",
-        "models.sensors.date.Date",
         "models.sensors.ultrasonic.Utrasonic",
     ]
@@ -0,0 +1,281 @@
+from datetime import date, datetime
+from multiprocessing.connection import Connection
+from models.db_engine.db import FileDB
+from models.db_engine.blocks import BlockFile
+from models.db_engine.frames import data_size
+from models.metrics.pipeline import PipelineMetrics
+from models.metrics.tracing import Trace
+from models import ModelLogger
+from typing import Dict, Iterator, List, Optional, Sequence
+from time import monotonic, time_ns
+from util import get_base_path, modify_data_to_dict
+import os
+import select
+
+
+class Replaylogger:
+    """
+    Logger of the replay process.
+    """
+
+    logger = ModelLogger.lazy("data-replay", "replay.log")
+
+
+def parse_replay_args(args: Sequence[str]) -> Dict:
+    """
+    Parse the arguments of the START-DATA_REPLAY command.
+
+    Arguments are key=value pairs:
+    - from, to: The first and last day to replay (YYYY-MM-DD), the whole data directory by default.
+    - speed: A replay speed factor, or `max` to send as fast as the pipe accepts (default 1).
+    - timing: `original` to keep the time between the stored samples, `fixed` to send every `interval` seconds.
+    - interval: The time between two samples with fixed timing, in seconds (default 20).
+    - data: The data directory to replay from, data/ of the backend by default.
+    - restamp: `yes` to replace the timestamp (ts, or date and time) of the samples with the replay time.
+    - loop: `yes` to start over once the last day is replayed.
+
+    Args:
+    - args (Sequence[str]): The command arguments.
+
+    Returns:
+    - Dict: Keyword arguments of ReplayDataManager.
+
+    Raises:
+    - ValueError: If an argument is unknown or invalid.
+    """
+    options = {}
+    for arg in args:
+        key, separator, value = arg.partition("=")
+        if not separator:
+            raise ValueError("Replay arguments are key=value pairs, got {}".format(arg))
+        if key in ("from", "to"):
+            options["start" if key == "from" else "end"] = date.fromisoformat(value)
+        elif key == "speed":
+            options["speed"] = None if value == "max" else float(value)
+            if options["speed"] is not None and options["speed"] <= 0:
+                raise ValueError("The replay speed must be positive")
+        elif key == "timing":
+            if value not in ("original", "fixed"):
+                raise ValueError("The replay timing is original or fixed")
+            options["timing"] = value
+        elif key == "interval":
+            options["interval"] = float(value)
+        elif key == "data":
+            options["data_path"] = value
+        elif key in ("restamp", "loop"):
+            options[key] = value.lower() in ("yes", "true", "1")
+        else:
+            raise ValueError("Unknown replay argument {}".format(key))
+    return options
+
+
+def get_timestamp(data: Dict) -> Optional[datetime]:
+    """
+    The wall clock time a stored sample was captured at, if it has one.
+
+    Samples are stamped in nanoseconds since the epoch (`ts`); the files
+    written before carry a `date` and a `time` instead.
+    """
+    try:
+        if data.get("ts") is not None:
+            return datetime.fromtimestamp(int(data["ts"]) / 1e9)
+        return datetime.fromisoformat("{}T{}".format(data["date"], data["time"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class ReplayDataManager:
+    """
+    Replays stored samples through the pipeline, in place of the SensorDataManager.
+
+    The samples of the day files are sent on the data pipe of the
+    SensorDataManager, with a trace, so the StorageManager and the processes
+    after it handle them like live samples. Samples are sent on a schedule:
+    at the pace they were recorded at (original timing) or every `interval`
+    seconds (fixed timing), sped up by `speed`, or as fast as the pipe
+    accepts them. How far the replay falls behind its schedule is published
+    as the replay lag metric; the trace ages and pipe queue depth tell how far
+    each downstream stage falls behind the replay.
+
+    Attributes:
+    - start (Optional[date]): The first day to replay.
+    - end (Optional[date]): The last day to replay.
+    - speed (Optional[float]): The speed factor, None for as fast as possible.
+    - timing (str): "original" or "fixed".
+    - interval (float): The time between two samples with fixed timing, in seconds.
+    - data_path (str): The data directory to replay from.
+    - restamp (bool): Whether to replace the timestamp of the samples with the replay time.
+    - loop (bool): Whether to start over after the last day.
+
+    Methods:
+    - get_files() -> List[str]: Get the day files to replay, oldest first.
+    - read_samples() -> Iterator[Dict]: Read the stored samples of the day files.
+    - run(comm_pipe: Connection, data_pipe: Connection) -> None: Replay until done or told to stop.
+    - replay(comm_pipe: Connection, data_pipe: Connection) -> Optional[int]: Replay the day files once.
+    """
+
+    def __init__(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        speed: Optional[float] = 1.0,
+        timing: str = "original",
+        interval: float = 20.0,
+        data_path: Optional[str] = None,
+        restamp: bool = False,
+        loop: bool = False,
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.timing = timing
+        self.interval = interval
+        self.data_path = data_path or os.path.join(get_base_path(), "data")
+        self.restamp = restamp
+        self.loop = loop
+
+    def get_files(self) -> List[str]:
+        """
+        Get the day files to replay.
+
+        Returns:
+        - List[str]: The paths of the data/YYYY/MM/DD.txt files between start and end, oldest first, and of the DD.blk files the Compactor made of them.
+        """
+        files = []
+        for root, dirs, names in os.walk(self.data_path):
+            dirs.sort()
+            for name in sorted(names):
+                if not name.endswith((".txt", ".blk")):
+                    continue
+                try:
+                    year, month = os.path.relpath(root, self.data_path).split(os.sep)
+                    day = date(int(year), int(month), int(name.split(".")[0]))
+                except ValueError:
+                    continue
+                if (self.start and day < self.start) or (self.end and day > self.end):
+                    continue
+                files.append(os.path.join(root, name))
+        return files
+
+    def read_samples(self) -> Iterator[Dict]:
+        """
+        Read the stored samples of the day files.
+
+        Files are only read up to the size they had when the replay started:
+        the StorageManager may be appending the replayed samples to one of them.
+
+        Yields:
+        - Dict: The samples, as parsed by modify_data_to_dict(), or typed by the schema for block files.
+        """
+        files = [
+            (path, None if path.endswith(".blk") else data_size(path))
+            for path in self.get_files()
+        ]
+        for path, size in files:
+            if size is None:
+                with BlockFile(path) as blocks:
+                    yield from blocks.records()
+                continue
+            position = 0
+            with FileDB(path, "r") as db:
+                while position < size and (line := db.readline()):
+                    position += len(line.encode())
+                    if line.strip():
+                        yield modify_data_to_dict(line)
+
+    def run(self, comm_pipe: Connection, data_pipe: Connection) -> None:
+        """
+        Replay the stored samples until they are exhausted or "END" is received.
+
+        Args:
+        - comm_pipe (Connection): The communication pipe for receiving commands.
+        - data_pipe (Connection): The data pipe of the SensorDataManager.
+        """
+        Replaylogger.logger.info(
+            "Replaying {} at speed {}".format(self.data_path, self.speed or "max")
+        )
+        sent = 0
+        while True:
+            replayed = self.replay(comm_pipe, data_pipe)
+            if replayed is None:
+                return
+            sent += replayed
+            if not self.loop or not replayed:
+                break
+        Replaylogger.logger.info("Replay finished after {} samples".format(sent))
+
+    def replay(self, comm_pipe: Connection, data_pipe: Connection) -> Optional[int]:
+        """
+        Replay the day files once.
+
+        Args:
+        - comm_pipe (Connection): The communication pipe for receiving commands.
+        - data_pipe (Connection): The data pipe of the SensorDataManager.
+
+        Returns:
+        - Optional[int]: The number of samples sent, None if the replay was stopped.
+        """
+        started = monotonic()
+        first_timestamp = None
+        offset = 0.0
+        sent = 0
+        for index, data in enumerate(self.read_samples()):
+            if self.speed:
+                if self.timing == "fixed":
+                    offset = index * self.interval
+                elif timestamp := get_timestamp(data):
+                    first_timestamp = first_timestamp or timestamp
+                    offset = (timestamp - first_timestamp).total_seconds()
+                due = started + offset / self.speed
+                # waiting on the command pipe keeps the replay responsive to END
+                if comm_pipe.poll(max(due - monotonic(), 0)) and self.stopped(
+                    comm_pipe
+                ):
+                    return None
+                PipelineMetrics.replay_lag_seconds.set(max(monotonic() - due, 0.0))
+            elif comm_pipe.poll() and self.stopped(comm_pipe):
+                return None
+
+            if self.restamp:
+                if "ts" in data:
+                    data["ts"] = time_ns()
+                if "date" in data:
+                    now = datetime.now()
+                    data["date"] = str(now.date())
+                    data["time"] = now.strftime("%H:%M:%S")
+            if self.wait_writable(comm_pipe, data_pipe):
+                return None
+            data_pipe.send((data, Trace.start()))
+            PipelineMetrics.pipe_queue_depth.labels("sensor_to_storage").inc()
+            PipelineMetrics.replay_samples_sent.inc()
+            sent += 1
+        return sent
+
+    def wait_writable(self, comm_pipe: Connection, data_pipe: Connection) -> bool:
+        """
+        Wait until the data pipe has room for a sample or "END" is received.
+
+        A send on a full data pipe would block until the StorageManager reads
+        it, and the replay would not see END meanwhile.
+
+        Returns:
+        - bool: True if the replay must stop.
+        """
+        while True:
+            readable, writable, _ = select.select([comm_pipe], [data_pipe], [])
+            if readable and self.stopped(comm_pipe):
+                return True
+            if writable:
+                return False
+
+    def stopped(self, comm_pipe: Connection) -> bool:
+        """
+        Handle a command received while replaying.
+
+        Returns:
+        - bool: True if the replay must stop.
+        """
+        if comm_pipe.recv() == "END":
+            Replaylogger.logger.info("Replay stopped")
+            return True
+        return False
@@ -1,9 +1,13 @@
-from typing import Optional, List
-from time import sleep
+from typing import Any, Optional, List, Tuple, Union
+from time import monotonic, perf_counter, time_ns
 from multiprocessing.connection import Connection
 from models.db_engine.db import TempDB
 from models.sensor_mgmt.register_sensor import SensorModule
+from models.metrics.pipeline import PipelineMetrics
+from models.metrics.tracing import Trace
+from models.sensors.sample import Sample, SampleBatcher, SampleChunk, SampleReader
 from models import ModelLogger
+from util import env_variables
 import importlib
 import asyncio
 
@@ -13,7 +17,7 @@ class SensorManagerlogger:
     A logger class for SensorManager that customizes the ModelLogger.
     """
 
-    logger = ModelLogger("sensor-manager").customiseLogger()
+    logger = ModelLogger.lazy("sensor-manager")
 
 
 class SensorDataManager:
@@ -21,21 +25,52 @@ class SensorDataManager:
     Manages sensor data collection and temporary storage.
 
     Attributes:
-    - COLLECTION_INTERVAL (Optional[int]): The interval for data collection in seconds.
-    - data (dict): A dictionary to store sensor data.
+    - COLLECTION_INTERVAL (Optional[float]): The pause between two collections in seconds, none if 0.
+    - BATCH_SIZE (int): The most samples sent to the StorageManager in one message, 1 to send every sample on its own.
+    - BATCH_INTERVAL (float): The longest a sample waits for its batch to fill, in seconds.
+    - batch_size (int): BATCH_SIZE, or the sample_batch_size of the .env file.
+    - batch_interval (float): BATCH_INTERVAL, or the sample_batch_interval of the .env file.
+    - data (Optional[Sample]): The last sample collected from the sensors.
+    - reader (SampleReader): Reads the dicts of the sensors into samples of a fixed layout.
+    - seq (int): The sequence number of the next sample, counted from 0 by every collection process.
     - tmp_db (TempDB): An instance of TempDB for temporary data storage.
-    - sensors (list): A list of sensor instances.
+    - sensors (list): A list of sensor instances, created on first use.
     """
 
-    COLLECTION_INTERVAL: Optional[int] = 10
+    COLLECTION_INTERVAL: Optional[float] = 20
+    BATCH_SIZE: int = 1
+    BATCH_INTERVAL: float = 1.0
 
     def __init__(self):
         """
-        Initializes the SensorDataManager with sensor instances and an empty data dictionary.
+        Initializes the SensorDataManager with no sample yet.
+
+        The sensors are only imported and instantiated when they are first
+        used, i.e. in the data collection process rather than in the manager.
         """
-        self.data = {}
+        self.data: Optional[Sample] = None
+        self.reader = SampleReader()
+        self.seq = 0
         self.tmp_db = TempDB()
-        self.sensors = self.get_sensor_instances()
+        self._sensors: Optional[List] = None
+        env = env_variables()
+        self.batch_size = int(env.get("sample_batch_size") or self.BATCH_SIZE)
+        self.batch_interval = float(
+            env.get("sample_batch_interval") or self.BATCH_INTERVAL
+        )
+
+    @property
+    def sensors(self) -> List:
+        """
+        The sensor instances, created the first time they are needed.
+        """
+        if self._sensors is None:
+            self._sensors = self.get_sensor_instances()
+        return self._sensors
+
+    @sensors.setter
+    def sensors(self, sensors: List) -> None:
+        self._sensors = sensors
 
     def get_sensor_instances(self) -> List:
         """
@@ -45,37 +80,45 @@ class SensorDataManager:
         - List: A list of sensor instances.
         """
         sensor_instances = []
-        try:
-            getattr(self, "sensors")
-        except AttributeError:
-            sensor_modules = self.get_sensor_modules()
-            sensor_classes = self.extract_sensor_classes(sensor_modules)
-            for cls in sensor_classes:
-                sensor_instances.append(cls())
+        sensor_modules = self.get_sensor_modules()
+        sensor_classes = self.extract_sensor_classes(sensor_modules)
+        for cls in sensor_classes:
+            sensor_instances.append(cls())
         return sensor_instances
 
     def clear_data(self) -> None:
         """
         Clears the collected sensor data.
         """
-        self.data = {}
+        self.data = None
 
-    def get_data_from_sensors(self) -> dict:
+    def get_data_from_sensors(self) -> Sample:
         """
-        Collects data from all sensor instances and updates the data attribute.
+        Collects data from all sensor instances into a sample and sets the data attribute.
+
+        The sample is stamped first, at capture, with the time in nanoseconds
+        since the epoch (`ts`) and its sequence number (`seq`), see
+        models.sensors.schema.STAMP.
 
         Returns:
-        - dict: The collected sensor data.
+        - Sample: The collected sensor data.
 
         Raises:
         - NotImplementedError: If a sensor's get_data method is not implemented.
         """
-        self.clear_data()
+        readings = [{"ts": time_ns(), "seq": self.seq}]
+        self.seq += 1
         try:
             for sensor in self.sensors:
-                self.data.update(sensor.get_data())
+                start = perf_counter()
+                readings.append(sensor.get_data())
+                PipelineMetrics.sensor_read_seconds.labels(
+                    sensor.__class__.__name__
+                ).observe(perf_counter() - start)
         except NotImplementedError as e:
             raise e
+        self.data = self.reader.read(readings)
+        PipelineMetrics.samples_collected.inc()
         return self.data
 
     def extract_sensor_classes(self, sensor_modules: List[str]) -> List:
@@ -109,6 +152,32 @@ class SensorDataManager:
         """
         return SensorModule.MODULES
 
+    def forward(
+        self,
+        data_pipe: Connection,
+        messages: List[Tuple[Union[Sample, SampleChunk], Any]],
+        send_data: bool,
+    ) -> int:
+        """
+        Save samples or chunks to the temporary database, and send them with their trace to the StorageManager.
+
+        Args:
+        - data_pipe (Connection): The data pipe for sending collected data.
+        - messages (List[Tuple[Union[Sample, SampleChunk], Any]]): The samples or chunks and their trace.
+        - send_data (bool): Whether data storage is on.
+
+        Returns:
+        - int: The number of lines added to the temporary database.
+        """
+        lines = 0
+        for data, trace in messages:
+            self.tmp_db.save_to_tmp_db(data)
+            lines += len(data) if isinstance(data, SampleChunk) else 1
+            if send_data:
+                data_pipe.send((data.pack(), trace))
+                PipelineMetrics.pipe_queue_depth.labels("sensor_to_storage").inc()
+        return lines
+
     def run(self, comm_pipe: Connection, data_pipe: Connection) -> None:
         """
         Continuously collects data from sensors and manages temporary storage
@@ -121,10 +190,23 @@ class SensorDataManager:
         Commands:
         - "END": Stops data collection and exits the loop.
         - "START": Initiates data storage.
-        - "STOP": Stops data storage.
+        - "STOP": Stops data storage, acknowledged with "STOPPED" once the pending chunk is sent.
+
+        With a batch_size above 1, the samples are saved and sent in chunks
+        of up to batch_size samples, at least every batch_interval seconds:
+        between two collections, the process waits for a command no longer
+        than the pending chunk is due. The pending chunk is flushed when
+        storage starts or stops, so that a chunk is either stored or not as
+        a whole.
         """
         send_data = False
+        batcher = (
+            SampleBatcher(self.batch_size, self.batch_interval)
+            if self.batch_size > 1
+            else None
+        )
         db_lines = self.tmp_db.get_current_no_of_lines()
+        next_collection = 0.0
         while True:
             if comm_pipe.poll():
                 command = comm_pipe.recv()
@@ -132,21 +214,41 @@ class SensorDataManager:
                     SensorManagerlogger.logger.info(
                         "Data Collection From Sensor Stopped"
                     )
+                    if batcher is not None:
+                        self.forward(data_pipe, batcher.flush(), send_data)
                     exit()
-                elif command == "START":
+                elif command in ("START", "STOP") and batcher is not None:
+                    db_lines += self.forward(data_pipe, batcher.flush(), send_data)
+                if command == "START":
                     SensorManagerlogger.logger.info("Data storage initiated")
                     send_data = True
                 elif command == "STOP":
                     SensorManagerlogger.logger.info("Data storage stopped")
                     send_data = False
-
+                    comm_pipe.send("STOPPED")
+
+            if batcher is not None and batcher.due():
+                db_lines += self.forward(data_pipe, batcher.flush(), send_data)
+            now = monotonic()
+            if now < next_collection:
+                wake = next_collection
+                if batcher is not None and batcher.deadline() is not None:
+                    wake = min(wake, batcher.deadline())
+                comm_pipe.poll(max(0.0, wake - now))
+                continue
+
+            trace = Trace.start()
             self.get_data_from_sensors()
-            self.tmp_db.save_to_tmp_db(self.data)
-            if send_data:
-                data_pipe.send(self.data)
+            trace.mark("collected")
+            if batcher is None:
+                messages = [(self.data, trace)]
+            else:
+                messages = batcher.add(self.data, trace)
+            saved = self.forward(data_pipe, messages, send_data)
             if db_lines >= TempDB.MAX_DB_LINES:
                 self.tmp_db.clean_up_tmp_db()
                 db_lines = 0
 
-            db_lines += 1
-            sleep(20)
+            db_lines += saved
+            if self.COLLECTION_INTERVAL:
+                next_collection = monotonic() + self.COLLECTION_INTERVAL
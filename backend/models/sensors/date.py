@@ -1,3 +1,4 @@
+from models.sensors.schema import Field, RecordSchema
 from models.sensors.sensor import Sensor
 import datetime
 
@@ -12,6 +13,8 @@ class Date(Sensor):
     - get_data() -> dict: Retrieves the current date.
     """
 
+    schema = RecordSchema([Field("date", str)])
+
     def get_data(self) -> dict:
         """
         Retrieves the current date.
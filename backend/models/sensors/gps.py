@@ -1,11 +1,13 @@
 from typing import Dict, Optional
 from models.exceptions.exception import GPSConnectionError, GPSDataError
+from models.sensors.schema import Field, RecordSchema
 from models.sensors.sensor import Sensor
 from models import ModelLogger
-from util import is_internet_connected, get_base_path
-import gpsd
-import requests
-import os
+from util import is_internet_connected
+from util.lazy import lazy_import
+
+gpsd = lazy_import("gpsd")
+requests = lazy_import("requests")
 
 
 class GPSlogger:
@@ -15,9 +17,7 @@ class GPSlogger:
     Attributes:
     - logger: A customized logger instance for the GPS module, logging to gps.log.
     """
-    logger = ModelLogger("gps").customiseLogger(
-        filename=os.path.join(get_base_path(), "logs", "gps.log")
-    )
+    logger = ModelLogger.lazy("gps", "gps.log")
 
 class OnlineGPS:
     """
@@ -73,6 +73,7 @@ class GPS(Sensor):
     This class implements a way of consistently getting the relevant GPS data in dictionary format.
 
     Attributes:
+    - schema (RecordSchema): Longitude and latitude in degrees, altitude in meters and speed in meters per second.
     - GPSResponse: Optional[gpsd.GpsResponse] = None
     - data: Dict[str, Optional[float]]: Dictionary to store longitude, latitude, altitude, and speed.
 
@@ -86,6 +87,15 @@ class GPS(Sensor):
     - get_data() -> Dict[str, Optional[float]]: Retrieves GPS data and handles fallback to online GPS.
     """
 
+    schema = RecordSchema(
+        [
+            Field("longitude", float, "deg"),
+            Field("latitude", float, "deg"),
+            Field("altitude", float, "m"),
+            Field("speed", float, "m/s"),
+        ]
+    )
+
     def __init__(self, logger=None) -> None:
         """
         Constructor attempts to connect to the GPS device and sets up the data attribute to store data.
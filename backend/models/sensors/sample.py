@@ -0,0 +1,420 @@
+from typing import (
+    Any,
+    Callable,
+    Container,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from itertools import chain
+from time import monotonic
+from operator import itemgetter
+
+
+def tuple_getter(keys: Sequence) -> Callable[[Any], Tuple]:
+    """
+    Compile the lookup of several keys or indices at once.
+
+    Args:
+    - keys (Sequence): The keys of a dict or the indices of a sequence.
+
+    Returns:
+    - Callable[[Any], Tuple]: Returns the values at the keys, always as a tuple.
+    """
+    if len(keys) > 1:
+        return itemgetter(*keys)
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda data: (data[key],)
+    return lambda data: ()
+
+
+class SampleLayout:
+    """
+    The fields of a sample, each at a fixed index.
+
+    Layouts are shared: SampleLayout.of() returns the same layout for the
+    same fields, so the samples of a run all point to one layout and only
+    carry their values.
+
+    Attributes:
+    - keys (Tuple[str, ...]): The field names, in order.
+    - index (Dict[str, int]): The index of every field.
+    - line (str): The format of the stored line of a sample, `key={}` pairs joined by commas.
+
+    Methods:
+    - of(keys: Sequence[str]) -> SampleLayout: The shared layout of some fields.
+    """
+
+    __slots__ = ("keys", "index", "line")
+
+    _layouts: Dict[Tuple[str, ...], "SampleLayout"] = {}
+
+    def __init__(self, keys: Sequence[str]) -> None:
+        self.keys = tuple(keys)
+        self.index = {key: index for index, key in enumerate(self.keys)}
+        self.line = (
+            ",".join(
+                key.replace("{", "{{").replace("}", "}}") + "={}" for key in self.keys
+            )
+            + "\n"
+        )
+
+    @classmethod
+    def of(cls, keys: Sequence[str]) -> "SampleLayout":
+        keys = tuple(keys)
+        layout = cls._layouts.get(keys)
+        if layout is None:
+            layout = cls._layouts[keys] = cls(keys)
+        return layout
+
+    def __repr__(self) -> str:
+        return "SampleLayout({!r})".format(self.keys)
+
+
+class Sample:
+    """
+    One reading of all the sensors, stored as a row of values.
+
+    A sample holds its values in the order of its layout instead of in a
+    dict of its own, so collecting, projecting and storing a sample costs a
+    list rather than a hash table per cycle. It reads like a dict (keys(),
+    items(), get(), sample[key]), and to_dict() gives a real one at the
+    edges, e.g. for JSON.
+
+    Attributes:
+    - layout (SampleLayout): The fields of the sample.
+    - values (Sequence): The values, in the order of the fields.
+
+    Methods:
+    - from_dict(data: Mapping[str, Any]) -> Sample: Build a sample from a dict.
+    - to_dict() -> Dict[str, Any]: The sample as a dict.
+    - to_line() -> str: The stored line of the sample, as FileDB.write_data_line writes it.
+    - pack() -> Tuple: The sample as plain tuples, to send on a pipe.
+    - unpack(message: Any) -> Any: The sample of a packed message, other messages unchanged.
+    """
+
+    __slots__ = ("layout", "values")
+
+    def __init__(self, layout: SampleLayout, values: Sequence) -> None:
+        self.layout = layout
+        self.values = values
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "Sample":
+        return cls(SampleLayout.of(data.keys()), list(data.values()))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.layout.keys, self.values))
+
+    def to_line(self) -> str:
+        return self.layout.line.format(*self.values)
+
+    def pack(self) -> Tuple[Tuple[str, ...], Sequence]:
+        """
+        The sample as plain tuples, to send on a pipe.
+
+        Pickling plain tuples is about twice as fast as pickling the sample
+        itself, which goes through __reduce__ and a lookup of this module.
+        """
+        return self.layout.keys, self.values
+
+    @classmethod
+    def unpack(cls, message: Any) -> Any:
+        """
+        Rebuild a sample packed by pack(), with the shared layout of its fields.
+
+        Args:
+        - message: A packed sample, or a message to return unchanged, e.g. a dict.
+
+        Returns:
+        - Any: The sample, or the message.
+        """
+        if type(message) is tuple:
+            return cls(SampleLayout.of(message[0]), message[1])
+        return message
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.layout.keys
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self.layout.keys, self.values)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self.layout.index.get(key)
+        return default if index is None else self.values[index]
+
+    def __getitem__(self, key: str) -> Any:
+        return self.values[self.layout.index[key]]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.layout.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.layout.keys)
+
+    def __len__(self) -> int:
+        return len(self.layout.keys)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Sample):
+            return self.layout.keys == other.layout.keys and list(self.values) == list(
+                other.values
+            )
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __reduce__(self):
+        # the layout is looked up again when unpickled
+        return self.unpack, (self.pack(),)
+
+    def __repr__(self) -> str:
+        return "Sample({!r})".format(self.to_dict())
+
+
+class SampleReader:
+    """
+    Reads the dicts returned by the sensors into samples.
+
+    The layout is compiled from the first readings and reused every cycle:
+    as long as the sensors return the same fields in the same order, their
+    values are chained into a single list, without a dict for the sample.
+    The reader compiles itself again when a sensor returns other fields.
+
+    Attributes:
+    - layout (Optional[SampleLayout]): The layout of the samples, None until the first reading.
+
+    Methods:
+    - read(readings: Sequence[Dict[str, Any]]) -> Sample: Build the sample of a cycle.
+    """
+
+    __slots__ = ("layout", "keys")
+
+    def __init__(self) -> None:
+        self.layout: Optional[SampleLayout] = None
+        self.keys: List[str] = []
+
+    def read(self, readings: Sequence[Dict[str, Any]]) -> Sample:
+        """
+        Build the sample of a cycle.
+
+        Args:
+        - readings (Sequence[Dict[str, Any]]): The dict of every sensor, in order.
+
+        Returns:
+        - Sample: The sample, with the fields of the sensors in order.
+        """
+        keys = list(chain.from_iterable(readings))
+        if keys != self.keys:
+            merged: Dict[str, Any] = {}
+            for data in readings:
+                merged.update(data)
+            self.keys = keys
+            self.layout = SampleLayout.of(merged)
+            if len(merged) != len(keys):
+                # sensors sharing a field, the last one wins
+                self.keys = []
+                return Sample(self.layout, list(merged.values()))
+        return Sample(
+            self.layout, list(chain.from_iterable(map(dict.values, readings)))
+        )
+
+
+class SampleChunk:
+    """
+    Consecutive samples of one layout, stored by column.
+
+    A chunk holds a list of values per field, so the samples of a chunk are
+    sent on a pipe as one message and projected by picking columns.
+
+    Attributes:
+    - layout (SampleLayout): The fields of the samples.
+    - columns (Sequence[Sequence]): The values of every field, in the order of the fields.
+
+    Methods:
+    - from_samples(samples: Sequence[Sample]) -> SampleChunk: Build a chunk from samples of one layout.
+    - rows() -> Iterator[Tuple]: The values of every sample.
+    - samples() -> Iterator[Sample]: The samples.
+    - to_lines() -> str: The stored lines of the samples, as one string.
+    - pack() -> Tuple: The chunk as plain tuples, to send on a pipe.
+    """
+
+    __slots__ = ("layout", "columns")
+
+    def __init__(self, layout: SampleLayout, columns: Sequence[Sequence]) -> None:
+        self.layout = layout
+        self.columns = columns
+
+    @classmethod
+    def from_samples(cls, samples: Sequence[Sample]) -> "SampleChunk":
+        return cls(samples[0].layout, list(zip(*[sample.values for sample in samples])))
+
+    def rows(self) -> Iterator[Tuple]:
+        return zip(*self.columns)
+
+    def samples(self) -> Iterator[Sample]:
+        layout = self.layout
+        return (Sample(layout, row) for row in self.rows())
+
+    def to_lines(self) -> str:
+        line = self.layout.line
+        return "".join([line.format(*row) for row in self.rows()])
+
+    def pack(self) -> Tuple[Tuple[str, ...], Sequence[Sequence], int]:
+        return self.layout.keys, self.columns, len(self)
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def __repr__(self) -> str:
+        return "SampleChunk({!r}, {} samples)".format(self.layout.keys, len(self))
+
+
+def unpack(message: Any) -> Any:
+    """
+    Rebuild the sample or chunk of a message packed by Sample.pack() or SampleChunk.pack().
+
+    Args:
+    - message: A packed sample or chunk, or a message to return unchanged, e.g. a dict.
+
+    Returns:
+    - Any: The sample, the chunk, or the message.
+    """
+    if type(message) is tuple and len(message) == 3:
+        return SampleChunk(SampleLayout.of(message[0]), message[1])
+    return Sample.unpack(message)
+
+
+class SampleBatcher:
+    """
+    Groups samples into chunks of up to `size` samples or `interval` seconds.
+
+    Every added sample may complete a batch: when it is the `size`th one,
+    when the first sample of the batch is `interval` seconds old, or when
+    its layout differs from the one of the batch, which is then sent first.
+    Samples come no faster than they are collected, so the caller also
+    flushes the batch once it is due, waiting no longer than deadline().
+
+    Attributes:
+    - size (int): The most samples in a chunk.
+    - interval (float): The longest a sample waits in a batch, in seconds.
+
+    Methods:
+    - add(sample: Sample, trace: Any = None) -> List[Tuple[SampleChunk, Any]]: Add a sample, get the completed chunks.
+    - flush() -> List[Tuple[SampleChunk, Any]]: Complete the pending batch.
+    - deadline() -> Optional[float]: When the pending batch is due, in time.monotonic() seconds.
+    - due() -> bool: Whether the pending batch is due.
+    """
+
+    __slots__ = ("size", "interval", "pending", "trace", "started")
+
+    def __init__(self, size: int, interval: float) -> None:
+        self.size = size
+        self.interval = interval
+        self.pending: List[Sample] = []
+        self.trace: Any = None
+        self.started = 0.0
+
+    def add(self, sample: Sample, trace: Any = None) -> List[Tuple[SampleChunk, Any]]:
+        """
+        Add a sample to the batch.
+
+        Args:
+        - sample (Sample): The sample.
+        - trace: The trace of the sample; a chunk travels with the trace of its first sample.
+
+        Returns:
+        - List[Tuple[SampleChunk, Any]]: The completed chunks with their trace, usually none.
+        """
+        ready = []
+        if self.pending and self.pending[0].layout is not sample.layout:
+            ready = self.flush()
+        if not self.pending:
+            self.trace = trace
+            self.started = monotonic()
+        self.pending.append(sample)
+        if (
+            len(self.pending) >= self.size
+            or monotonic() - self.started >= self.interval
+        ):
+            ready.extend(self.flush())
+        return ready
+
+    def deadline(self) -> Optional[float]:
+        return self.started + self.interval if self.pending else None
+
+    def due(self) -> bool:
+        return bool(self.pending) and monotonic() >= self.started + self.interval
+
+    def flush(self) -> List[Tuple[SampleChunk, Any]]:
+        if not self.pending:
+            return []
+        chunk = SampleChunk.from_samples(self.pending)
+        trace = self.trace
+        self.pending = []
+        self.trace = None
+        return [(chunk, trace)]
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+
+class Projection:
+    """
+    A precompiled selection of the fields of samples.
+
+    The indices of the selected fields are resolved once per layout, and a
+    sample is projected by a single getter call, a chunk by picking its
+    columns. Dicts are projected too, into dicts, for the samples replayed
+    from the data files.
+
+    Attributes:
+    - names (Tuple[str, ...]): The selected fields, in order.
+    - keep (Tuple[str, ...]): Fields kept in front of the selected ones when the data has them, e.g. the stamp.
+
+    Raises:
+    - KeyError: When called with a sample or dict missing a selected field.
+    """
+
+    __slots__ = ("names", "keep", "picks", "source", "layout", "pick_values")
+
+    def __init__(self, names: Sequence[str], keep: Sequence[str] = ()) -> None:
+        self.names = tuple(names)
+        self.keep = tuple(name for name in keep if name not in self.names)
+        self.picks: Dict[Tuple[str, ...], Callable[[Any], Tuple]] = {}
+        self.source: Optional[SampleLayout] = None
+        self.layout: Optional[SampleLayout] = None
+        self.pick_values: Optional[Callable[[Any], Tuple]] = None
+
+    def fields(self, present: Container[str]) -> Tuple[str, ...]:
+        """
+        The fields to select from data with the `present` fields.
+        """
+        if not self.keep:
+            return self.names
+        return tuple(name for name in self.keep if name in present) + self.names
+
+    def __call__(
+        self, data: Union[Sample, SampleChunk, Mapping[str, Any]]
+    ) -> Union[Sample, SampleChunk, Dict]:
+        if isinstance(data, (Sample, SampleChunk)):
+            if data.layout is not self.source:
+                index = data.layout.index
+                names = self.fields(index)
+                self.pick_values = tuple_getter([index[name] for name in names])
+                self.layout = SampleLayout.of(names)
+                self.source = data.layout
+            if isinstance(data, SampleChunk):
+                return SampleChunk(self.layout, self.pick_values(data.columns))
+            return Sample(self.layout, self.pick_values(data.values))
+        names = self.fields(data)
+        pick = self.picks.get(names)
+        if pick is None:
+            pick = self.picks[names] = tuple_getter(names)
+        return dict(zip(names, pick(data)))
@@ -0,0 +1,258 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import importlib
+
+
+class Field:
+    """
+    A field of the sensor records, with its type and unit.
+
+    Attributes:
+    - name (str): The key of the field in the records.
+    - type (type): float, int or str.
+    - unit (str): The unit of the values, empty if they have none.
+    - nullable (bool): Whether the field can be None, e.g. when a sensor fails.
+
+    Methods:
+    - parse(text: str) -> Any: Convert a stored value to the type of the field.
+    """
+
+    __slots__ = ("name", "type", "unit", "nullable")
+
+    TYPES = (float, int, str)
+
+    def __init__(
+        self, name: str, type: type = float, unit: str = "", nullable: bool = True
+    ) -> None:
+        if type not in self.TYPES:
+            raise ValueError("{}: unsupported type {}".format(name, type))
+        self.name = name
+        self.type = type
+        self.unit = unit
+        self.nullable = nullable
+
+    def parse(self, text: str) -> Any:
+        """
+        Convert a stored value to the type of the field.
+
+        Values that do not convert, e.g. written before the field was typed,
+        are kept as text rather than failing the whole record.
+
+        Args:
+        - text (str): The stored value, not "None".
+
+        Returns:
+        - Any: The value.
+        """
+        if self.type is str:
+            return text
+        try:
+            return self.type(text)
+        except ValueError:
+            if self.type is int:
+                try:
+                    return int(float(text))
+                except ValueError:
+                    pass
+            return text
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Field) and (
+            self.name,
+            self.type,
+            self.unit,
+            self.nullable,
+        ) == (other.name, other.type, other.unit, other.nullable)
+
+    def __repr__(self) -> str:
+        return "Field({!r}, {}, {!r}{})".format(
+            self.name,
+            self.type.__name__,
+            self.unit,
+            "" if self.nullable else ", nullable=False",
+        )
+
+
+class RecordSchema:
+    """
+    The fields of the sensor records, in the order they are stored.
+
+    Every Sensor subclass declares the fields it returns as its `schema`, and
+    the schemas of the sensors are merged into the schema of the records
+    (see record_schema()). Records stay stringly typed in the data files; the
+    schema turns them back into numbers once, when they are read.
+
+    Attributes:
+    - fields (Dict[str, Field]): The fields by name.
+
+    Methods:
+    - merge(*schemas: RecordSchema) -> RecordSchema: Combine the schemas of several sensors.
+    - parse(data: Dict[str, Optional[str]]) -> Dict[str, Any]: Type the values of a parsed record.
+    - parse_line(line: str) -> Dict[str, Any]: Parse a stored line into a typed record.
+    - dtypes() -> Dict[str, object]: The NumPy types of the fields, for models.db_engine.bulk.
+    """
+
+    def __init__(self, fields: Iterable[Field] = ()) -> None:
+        self.fields: Dict[str, Field] = {}
+        for field in fields:
+            self.add(field)
+
+    def add(self, field: Field) -> None:
+        known = self.fields.get(field.name)
+        if known is not None and known != field:
+            raise ValueError(
+                "{} is declared as {} and {}".format(field.name, known, field)
+            )
+        self.fields[field.name] = field
+
+    @classmethod
+    def merge(cls, *schemas: "RecordSchema") -> "RecordSchema":
+        """
+        Combine the schemas of several sensors.
+
+        Raises:
+        - ValueError: If two schemas declare a field differently.
+        """
+        merged = cls()
+        for schema in schemas:
+            for field in schema.fields.values():
+                merged.add(field)
+        return merged
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.fields
+
+    def __getitem__(self, name: str) -> Field:
+        return self.fields[name]
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def __repr__(self) -> str:
+        return "RecordSchema({!r})".format(list(self.fields.values()))
+
+    def parse(self, data: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        """
+        Type the values of a record parsed by modify_data_to_dict.
+
+        Args:
+        - data (Dict[str, Optional[str]]): The record, with text values.
+
+        Returns:
+        - Dict[str, Any]: The record, with the values of the known fields typed.
+        """
+        fields = self.fields
+        record = {}
+        for key, value in data.items():
+            field = fields.get(key)
+            record[key] = (
+                value if value is None or field is None else field.parse(value)
+            )
+        return record
+
+    def parse_line(self, line: str) -> Dict[str, Any]:
+        """
+        Parse a stored line into a typed record.
+
+        Does the work of modify_data_to_dict and parse() in one pass.
+
+        Args:
+        - line (str): The stored line.
+
+        Returns:
+        - Dict[str, Any]: The record.
+
+        Raises:
+        - ValueError: If the line is malformed.
+        """
+        fields = self.fields
+        record = {}
+        for datum in line.rstrip("\n").split(","):
+            key, value = datum.split("=")
+            key = key.strip()
+            if value == "None":
+                record[key] = None
+                continue
+            value = value.strip()
+            field = fields.get(key)
+            record[key] = value if field is None else field.parse(value)
+        return record
+
+    def dtypes(self) -> Dict[str, object]:
+        """
+        The NumPy types of the fields, as taken by models.db_engine.bulk.
+
+        Integers are read as float64 as well, so that None can be NaN, unless
+        they cannot be None: the timestamps do not fit the 53 bits of a float.
+
+        Returns:
+        - Dict[str, object]: "float64" or "int64" for numbers, str for text, by field name.
+        """
+        return {
+            name: (
+                str
+                if field.type is str
+                else "int64" if field.type is int and not field.nullable else "float64"
+            )
+            for name, field in self.fields.items()
+        }
+
+
+# The SensorDataManager stamps every sample with the wall clock time it was
+# captured at, in nanoseconds since the epoch, and a sequence number counting
+# the samples of the collection process.
+STAMP = RecordSchema(
+    [Field("ts", int, "ns", nullable=False), Field("seq", int, nullable=False)]
+)
+
+STAMP_FIELDS = tuple(STAMP.fields)
+
+_schema: Optional[RecordSchema] = None
+
+
+def sensor_schemas(modules: Sequence[str]) -> List[RecordSchema]:
+    """
+    Find the schemas of the Sensor subclasses of sensor modules.
+
+    Args:
+    - modules (Sequence[str]): Sensor class paths, as listed by SensorModule.MODULES.
+
+    Returns:
+    - List[RecordSchema]: The schemas, in the order of the modules.
+    """
+    from models.sensors.sensor import Sensor
+
+    schemas = []
+    for path in modules:
+        try:
+            module = importlib.import_module(path.rsplit(".", 1)[0])
+        except Exception:
+            continue  # the sensor manager logs the sensors it cannot load
+        for sensor in vars(module).values():
+            if (
+                isinstance(sensor, type)
+                and issubclass(sensor, Sensor)
+                and sensor.__module__ == module.__name__
+                and sensor.schema not in schemas
+            ):
+                schemas.append(sensor.schema)
+    return schemas
+
+
+def record_schema(modules: Optional[Sequence[str]] = None) -> RecordSchema:
+    """
+    The schema of the stored records: the stamp, then the fields of the registered sensors.
+
+    Args:
+    - modules (Optional[Sequence[str]]): Sensor class paths, SensorModule.MODULES by default.
+
+    Returns:
+    - RecordSchema: The schema, cached for the default modules.
+    """
+    global _schema
+    if modules is not None:
+        return RecordSchema.merge(STAMP, *sensor_schemas(modules))
+    if _schema is None:
+        from models.sensor_mgmt.register_sensor import SensorModule
+
+        _schema = RecordSchema.merge(STAMP, *sensor_schemas(SensorModule.MODULES))
+    return _schema
@@ -1,10 +1,19 @@
+from models.sensors.schema import RecordSchema
+
+
 class Sensor:
     """
     Base class for all sensor types.
 
+    Attributes:
+    - schema (RecordSchema): The fields returned by get_data(), with their type and unit.
+
     Methods:
     - get_data(): Abstract method to be implemented by subclasses to retrieve sensor data.
     """
+
+    schema = RecordSchema()
+
     def get_data(self):
         raise NotImplementedError(
             f"get_data function for {self.__class__.__name__} is not implemented"
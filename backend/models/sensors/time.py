@@ -1,3 +1,4 @@
+from models.sensors.schema import Field, RecordSchema
 from models.sensors.sensor import Sensor
 import datetime
 
@@ -13,6 +14,8 @@ class Time(Sensor):
     - get_data() -> dict: Retrieves the current time.
     """
 
+    schema = RecordSchema([Field("time", str)])
+
     def get_data(self) -> dict:
         """
         Retrieves the current time.
@@ -1,9 +1,12 @@
 from typing import Dict, Optional
+from models.sensors.schema import Field, RecordSchema
 from models.sensors.sensor import Sensor
 from models import ModelLogger
-import RPi.GPIO as GPIO
+from util.lazy import lazy_import
 import time
 
+GPIO = lazy_import("RPi.GPIO")
+
 
 class Ultrasoniclogger:
     """
@@ -12,12 +15,14 @@ class Ultrasoniclogger:
     Attributes:
     - logger: A customized logger instance for the GPS module, logging to gps.log.
     """
-    logger = ModelLogger("ultrasonic").customiseLogger()
+    logger = ModelLogger.lazy("ultrasonic")
 
 
 class Ultrasonic(Sensor):
     """Class to interact with an ultrasonic sensor to measure distance."""
 
+    schema = RecordSchema([Field("distance", float, "cm")])
+
     def __init__(self, trigger_pin: int = None, echo_pin: int = None, logger=None) -> None:
         """Initialize the ultrasonic sensor with specified trigger and echo pins."""
         try:
@@ -1,4 +1,5 @@
 #!.venv/bin/python3
+from datetime import datetime
 from models.db_engine.db import TempDB, FileDB
 
 def format_data(data_line):
@@ -25,7 +26,7 @@ def format_data(data_line):
     # Check and format additional information
     additional_info = []
     for key in data_dict:
-        if not key in ['longitude', 'latitude', 'date', 'time']:
+        if not key in ['longitude', 'latitude', 'date', 'time', 'ts', 'seq']:
             additional_info.append(f"  - {key.capitalize()}: {data_dict[key]}")
 
     if additional_info:
@@ -33,6 +34,9 @@ def format_data(data_line):
 
     # Check and format timestamp
     timestamp_info = []
+    if 'ts' in data_dict:
+        timestamp_info.append(f"  - Captured: {datetime.fromtimestamp(int(data_dict['ts']) / 1e9)}")
+        timestamp_info.append(f"  - Sequence: {data_dict.get('seq')}")
     if 'date' in data_dict:
         timestamp_info.append(f"  - Date: {data_dict['date']}")
     if 'time' in data_dict:
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+from benchmarks.broker import StandInBroker, encode_length, topic_matches
+from models.data_manager.cloud_transfer import CloudTransfer
+from models.exceptions.exception import AWSCloudUploadError
+import json
+import logging
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestEncoding(unittest.TestCase):
+    def test_encode_length(self):
+        self.assertEqual(encode_length(0), b"\x00")
+        self.assertEqual(encode_length(127), b"\x7f")
+        self.assertEqual(encode_length(128), b"\x80\x01")
+        self.assertEqual(encode_length(16383), b"\xff\x7f")
+
+    def test_topic_matches(self):
+        self.assertTrue(topic_matches("a/b", "a/b"))
+        self.assertTrue(topic_matches("a/+/c", "a/b/c"))
+        self.assertTrue(topic_matches("a/#", "a/b/c"))
+        self.assertFalse(topic_matches("a/+", "a/b/c"))
+        self.assertFalse(topic_matches("a/b", "a/c"))
+
+
+class TestStandInBroker(unittest.TestCase):
+    def setUp(self):
+        self.broker = StandInBroker(port=0)
+        self.broker.serve_in_background()
+        self.patches = [
+            patch.object(CloudTransfer, "_load_env"),
+            patch.multiple(
+                CloudTransfer,
+                transport="mqtt",
+                mqtt_port=str(self.broker.port),
+                message_topic="datalogger/test",
+                client_id="test",
+                create=True,
+            ),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in reversed(self.patches):
+            patcher.stop()
+        self.broker.stop()
+
+    def test_publish_over_mqtt_transport(self):
+        cloud_transfer = CloudTransfer()
+        cloud_transfer.connect()
+        try:
+            for index in range(3):
+                cloud_transfer.publish({"index": index})
+        finally:
+            cloud_transfer.disconnect()
+        payloads = [json.loads(payload) for payload in self.broker.received_payloads()]
+        self.assertEqual(payloads, [{"index": 0}, {"index": 1}, {"index": 2}])
+        self.assertEqual(self.broker.stats["acks"], 3)
+        self.assertEqual(self.broker.messages[0][0], "datalogger/test")
+
+    def test_lost_publish_times_out(self):
+        self.broker.loss = 1.0
+        cloud_transfer = CloudTransfer()
+        cloud_transfer.connect()
+        try:
+            with self.assertRaises(AWSCloudUploadError):
+                cloud_transfer.publish({"index": 0}, timeout=0.2)
+        finally:
+            cloud_transfer.disconnect()
+        attempts = int(CloudTransfer.publish_retries) + 1
+        self.assertEqual(self.broker.stats["lost"], attempts)
+        self.assertEqual(self.broker.received_payloads(), [])
+
+    def test_unknown_transport(self):
+        with patch.object(CloudTransfer, "transport", "carrier-pigeon"):
+            with self.assertRaises(ValueError):
+                CloudTransfer().build_connection()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+from benchmarks.datagen import day_records, generate
+from datetime import date, datetime
+from models.db_engine.db import MetaDB
+from tempfile import TemporaryDirectory
+from util import modify_data_to_dict
+import logging
+import os
+import random
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestDatagen(unittest.TestCase):
+    def test_generate_tree_and_meta(self):
+        with TemporaryDirectory() as root:
+            files = generate(root, date(2024, 2, 27), 4, interval=3600, workers=2)
+            paths = [os.path.relpath(file[0], root) for file in files]
+            self.assertEqual(
+                paths,
+                [
+                    os.path.join("data", "2024", "02", "27.txt"),
+                    os.path.join("data", "2024", "02", "28.txt"),
+                    os.path.join("data", "2024", "02", "29.txt"),
+                    os.path.join("data", "2024", "03", "01.txt"),
+                ],
+            )
+            self.assertTrue(all(file[1] == 24 for file in files))
+            with open(files[0][0]) as day_file:
+                lines = day_file.readlines()
+            self.assertEqual(len(lines), 24)
+            self.assertEqual(sum(len(line) for line in lines), files[0][2])
+            meta = MetaDB().retrieve_metadata(os.path.join(root, "config", "meta.txt"))
+            self.assertEqual(meta, {"LastUploadFile": files[0][0], "Offset": 0})
+
+    def test_generation_is_deterministic(self):
+        with TemporaryDirectory() as first, TemporaryDirectory() as second:
+            generate(first, date(2024, 1, 1), 2, interval=600, seed=3, workers=1)
+            generate(second, date(2024, 1, 1), 2, interval=600, seed=3, workers=2)
+            for name in ("01.txt", "02.txt"):
+                with open(os.path.join(first, "data", "2024", "01", name)) as a, open(
+                    os.path.join(second, "data", "2024", "01", name)
+                ) as b:
+                    self.assertEqual(a.read(), b.read())
+
+    def test_records_round_trip(self):
+        records = list(day_records(date(2024, 1, 1), 20, random.Random(1), gap_rate=6))
+        self.assertEqual(len(records), 4320)
+        midnight = int(datetime(2024, 1, 1).timestamp()) * 10**9
+        self.assertEqual(records[1]["ts"], midnight + 20 * 10**9)
+        self.assertEqual(records[-1]["ts"], midnight + (24 * 3600 - 20) * 10**9)
+        self.assertEqual([record["seq"] for record in records[:3]], [0, 1, 2])
+        self.assertTrue(any(record["longitude"] is None for record in records))
+        self.assertTrue(any(record["speed"] for record in records))
+        line = ",".join("{}={}".format(key, value) for key, value in records[5].items())
+        parsed = modify_data_to_dict(line)
+        self.assertEqual(list(parsed), list(records[5]))
+        self.assertEqual(int(parsed["ts"]), records[5]["ts"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+from benchmarks.micro import (
+    SIZES,
+    THRESHOLDS_PATH,
+    check_thresholds,
+    run,
+)
+from benchmarks.report import load_report
+import logging
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestMicroBenchmarks(unittest.TestCase):
+    def test_run_reports_every_size(self):
+        report = run(["day", "month"], ops=40, records_per_day=5)
+        results = report["results"]
+        self.assertEqual(len(results), 24)
+        self.assertTrue(all(value > 0 for value in results.values()))
+
+    def test_thresholds_cover_every_result(self):
+        thresholds = load_report(THRESHOLDS_PATH)["results"]
+        report = run(["day"], ops=20, records_per_day=5)
+        self.assertEqual(
+            {name for name in thresholds if name.endswith("_day_us")},
+            set(report["results"]),
+        )
+        self.assertEqual(len(thresholds), len(report["results"]) * len(SIZES))
+
+    def test_check_thresholds(self):
+        failures = check_thresholds(
+            {"a_us": 2.0, "b_us": 1.0}, {"a_us": 1.5, "b_us": 1.5, "c_us": 1}
+        )
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0].startswith("a_us"))
+
+
+if __name__ == "__main__":
+    unittest.main()
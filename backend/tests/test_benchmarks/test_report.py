@@ -0,0 +1,68 @@
+from benchmarks.report import (
+    compare_reports,
+    load_report,
+    make_report,
+    percentiles,
+    write_report,
+)
+from tempfile import TemporaryDirectory
+import logging
+import os
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestReport(unittest.TestCase):
+    def test_write_and_load(self):
+        report = make_report("startup", {"warm_start_seconds": 0.1}, {"runs": [1, 2]})
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results", "startup.json")
+            write_report(report, path)
+            self.assertEqual(load_report(path), report)
+        self.assertEqual(report["benchmark"], "startup")
+        self.assertIn("commit", report)
+
+    def test_compare_lower_is_better(self):
+        baseline = make_report("startup", {"warm_start_seconds": 1.0})
+        rows = compare_reports(
+            baseline, make_report("startup", {"warm_start_seconds": 1.5})
+        )
+        self.assertEqual(rows[0][0], "warm_start_seconds")
+        self.assertAlmostEqual(rows[0][3], 0.5)
+        self.assertTrue(rows[0][4])
+
+        rows = compare_reports(
+            baseline, make_report("startup", {"warm_start_seconds": 0.5})
+        )
+        self.assertFalse(rows[0][4])
+
+    def test_compare_higher_is_better(self):
+        baseline = make_report("pipeline", {"samples_per_second": 100.0})
+        rows = compare_reports(
+            baseline, make_report("pipeline", {"samples_per_second": 70.0})
+        )
+        self.assertTrue(rows[0][4])
+        rows = compare_reports(
+            baseline, make_report("pipeline", {"samples_per_second": 90.0})
+        )
+        self.assertFalse(rows[0][4])
+
+    def test_compare_skips_new_results(self):
+        baseline = make_report("startup", {"warm_start_seconds": 1.0})
+        current = make_report("startup", {"warm_start_seconds": 1.0, "new": 2.0})
+        self.assertEqual(
+            [row[0] for row in compare_reports(baseline, current)],
+            ["warm_start_seconds"],
+        )
+
+    def test_percentiles(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(
+            percentiles(values), {"p50": 51.0, "p95": 95.0, "p99": 99.0, "max": 100.0}
+        )
+        self.assertEqual(percentiles([])["p99"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
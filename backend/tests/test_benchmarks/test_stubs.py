@@ -0,0 +1,77 @@
+from unittest.mock import patch
+from benchmarks.sandbox import Sandbox
+from benchmarks.stubs import (
+    FakeFuture,
+    StubGPS,
+    SyntheticSensor,
+    make_fake_mqtt_modules,
+)
+from models.data_manager import cloud_transfer
+from models.data_manager.cloud_transfer import CloudTransfer
+from models.exceptions.exception import AWSCloudUploadError
+from util import env_variables, get_base_path
+import json
+import logging
+import os
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestSandbox(unittest.TestCase):
+    def test_sandbox_is_the_base_path(self):
+        cwd = os.getcwd()
+        with Sandbox({"metrics_port": "9999"}) as sandbox:
+            self.assertEqual(get_base_path(), sandbox.root)
+            self.assertEqual(env_variables()["metrics_port"], "9999")
+            self.assertTrue(os.path.exists(env_variables()["tmp_db_path"]))
+            self.assertTrue(os.path.exists(sandbox.path("config", "meta.txt")))
+            root = sandbox.root
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertFalse(os.path.exists(root))
+
+
+class TestSyntheticSensor(unittest.TestCase):
+    def test_fields(self):
+        first, second = SyntheticSensor(0, width=3), SyntheticSensor(1, width=3)
+        data = first.get_data()
+        self.assertEqual(list(data), ["s0_v0", "s0_v1", "s0_v2"])
+        self.assertNotEqual(data, first.get_data())
+        self.assertFalse(set(data) & set(second.get_data()))
+
+
+class TestFakeMqtt(unittest.TestCase):
+    def setUp(self):
+        modules = make_fake_mqtt_modules()
+        self.builder = modules["awsiot.mqtt_connection_builder"]
+        patcher = patch.multiple(
+            cloud_transfer,
+            mqtt=modules["awscrt.mqtt"],
+            mqtt_connection_builder=self.builder,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_publish_through_cloud_transfer(self):
+        transfer = CloudTransfer()
+        transfer.connect()
+        self.assertTrue(transfer.connected)
+        transfer.publish(StubGPS().get_data())
+        topic, payload = transfer.mqtt_connection.published[0]
+        self.assertEqual(json.loads(payload)["longitude"], 7.3733)
+
+    def test_publish_timeout(self):
+        transfer = CloudTransfer()
+        transfer.connect()
+        transfer.mqtt_connection.latency = 0.05
+        with self.assertRaises(AWSCloudUploadError):
+            transfer.publish({"distance": 1}, timeout=0.01)
+
+    def test_future_waits_for_latency(self):
+        self.assertEqual(FakeFuture(0.01, "done").result(timeout=1), "done")
+        with self.assertRaises(TimeoutError):
+            FakeFuture(1).result(timeout=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+from unittest.mock import MagicMock, patch
+from models.data_manager.cloud_transfer import (
+    CloudTransfer,
+    CloudTransferManager,
+    ConnectionState,
+    mqtt,
+    on_connection_closed,
+    on_connection_failure,
+    on_connection_interrupted,
+    on_connection_resumed,
+)
+from models.data_manager.encoders import PassThroughEncoder
+from models.data_manager.rate_control import Backoff
+from models.exceptions.exception import AWSCloudConnectionError
+import logging
+import random
+import threading
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestBackoff(unittest.TestCase):
+    def test_delays(self):
+        backoff = Backoff(base=1, cap=8, rng=random.Random(0))
+        delays = [backoff.next_delay() for _ in range(6)]
+        for delay, ceiling in zip(delays, [1, 2, 4, 8, 8, 8]):
+            self.assertGreaterEqual(delay, ceiling / 2)
+            self.assertLessEqual(delay, ceiling)
+        backoff.reset()
+        self.assertLessEqual(backoff.next_delay(), 1)
+
+    def test_jitter(self):
+        delays = {
+            Backoff(base=10, rng=random.Random(seed)).next_delay() for seed in range(5)
+        }
+        self.assertEqual(len(delays), 5)
+
+
+class TestConnectionLifecycle(unittest.TestCase):
+    def setUp(self):
+        self.builder = MagicMock()
+        self.patches = [
+            patch.object(CloudTransfer, "_load_env"),
+            patch(
+                "models.data_manager.cloud_transfer.mqtt_connection_builder",
+                self.builder,
+            ),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+        self.connection = self.builder.mtls_from_path.return_value
+        self.cloud_transfer = CloudTransfer()
+
+    def tearDown(self):
+        for patcher in reversed(self.patches):
+            patcher.stop()
+
+    def test_connection_is_reused(self):
+        self.cloud_transfer.connect()
+        self.assertEqual(self.cloud_transfer.state, ConnectionState.CONNECTED)
+        self.cloud_transfer.disconnect()
+        self.assertEqual(self.cloud_transfer.state, ConnectionState.DISCONNECTED)
+        self.cloud_transfer.connect()
+        self.builder.mtls_from_path.assert_called_once()
+        self.assertEqual(self.connection.connect.call_count, 2)
+
+    def test_failed_connect(self):
+        self.connection.connect.return_value.result.side_effect = RuntimeError
+        with self.assertRaises(AWSCloudConnectionError):
+            self.cloud_transfer.connect()
+        self.assertEqual(self.cloud_transfer.state, ConnectionState.DISCONNECTED)
+
+    def test_timed_out_connect_is_awaited_again(self):
+        future = self.connection.connect.return_value
+        future.result.side_effect = TimeoutError
+        future.done.return_value = False
+        with self.assertRaises(AWSCloudConnectionError):
+            self.cloud_transfer.connect()
+        self.assertEqual(self.cloud_transfer.state, ConnectionState.CONNECTING)
+        future.result.side_effect = None
+        self.cloud_transfer.connect()
+        self.connection.connect.assert_called_once()
+        self.assertEqual(self.cloud_transfer.state, ConnectionState.CONNECTED)
+
+    def test_callbacks_drive_the_state(self):
+        self.cloud_transfer.connect()
+        on_connection_interrupted(self.connection, "link down")
+        self.assertEqual(self.cloud_transfer.state, ConnectionState.INTERRUPTED)
+        self.assertFalse(self.cloud_transfer.connected)
+
+        # failed reconnect attempts of awscrt keep the connection interrupted
+        on_connection_failure(self.connection, mqtt.OnConnectionFailureData(error=1))
+        self.assertEqual(self.cloud_transfer.state, ConnectionState.INTERRUPTED)
+
+        on_connection_resumed(self.connection, mqtt.ConnectReturnCode.ACCEPTED, True)
+        self.assertTrue(self.cloud_transfer.connected)
+
+        on_connection_closed(self.connection, None)
+        self.assertEqual(self.cloud_transfer.state, ConnectionState.DISCONNECTED)
+
+    def test_connect_waits_for_resume(self):
+        self.cloud_transfer.connect()
+        on_connection_interrupted(self.connection, "link down")
+        threading.Timer(
+            0.05,
+            on_connection_resumed,
+            (self.connection, mqtt.ConnectReturnCode.ACCEPTED, True),
+        ).start()
+        self.cloud_transfer.connect()
+        self.assertTrue(self.cloud_transfer.connected)
+        self.connection.connect.assert_called_once()
+
+    def test_publish_passthrough_line(self):
+        self.connection.publish.return_value = (MagicMock(), 1)
+        self.cloud_transfer.connect()
+        message = PassThroughEncoder().message("ts=1,speed=2\n")
+        self.cloud_transfer.publish(message)
+        self.connection.publish.assert_called_once()
+        self.assertEqual(
+            self.connection.publish.call_args.kwargs["payload"],
+            '{"ts": "1", "speed": "2"}',
+        )
+
+
+class TestReconnect(unittest.TestCase):
+    @patch(
+        "models.data_manager.cloud_transfer.is_internet_connected", return_value=True
+    )
+    def test_backs_off_between_attempts(self, mock_is_internet_connected):
+        with patch.object(CloudTransfer, "_load_env"):
+            manager = CloudTransferManager()
+        manager.cloud_transfer.connect = MagicMock(side_effect=AWSCloudConnectionError)
+        pipe = MagicMock()
+        for _ in range(3):
+            manager.reconnect(pipe)
+        delays = [call.args[0] for call in pipe.poll.call_args_list]
+        self.assertEqual(len(delays), 3)
+        self.assertLess(delays[0], delays[2])
+
+        manager.cloud_transfer.connect = MagicMock()
+        manager.reconnect(pipe)
+        self.assertEqual(manager.cloud_transfer.backoff.attempts, 3)
+        self.assertEqual(pipe.poll.call_count, 3)
+
+    @patch(
+        "models.data_manager.cloud_transfer.is_internet_connected", return_value=False
+    )
+    def test_no_handshake_without_internet(self, mock_is_internet_connected):
+        with patch.object(CloudTransfer, "_load_env"):
+            manager = CloudTransferManager()
+        manager.cloud_transfer.connect = MagicMock()
+        manager.reconnect(MagicMock())
+        manager.cloud_transfer.connect.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
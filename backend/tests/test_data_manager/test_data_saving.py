@@ -1,7 +1,10 @@
 from models.data_manager.storage_manager import StorageManager, FileDB
+from models.db_engine.staging import StagedDB
 from multiprocessing.connection import Pipe
 from unittest.mock import MagicMock, patch
 import logging
+import os
+import tempfile
 import unittest
 
 
@@ -11,7 +14,8 @@ logging.disable(logging.CRITICAL)
 class TestDataSavingManager(unittest.TestCase):
     def setUp(self):
         self.mock_filedb = MagicMock(spec=FileDB)
-        self.data_collection_manager = StorageManager()
+        with patch.object(FileDB, "create_file", return_value="/fake/db/path"):
+            self.data_collection_manager = StorageManager()
         self.data_collection_manager.database = self.mock_filedb
 
     def test_set_database_path(self):
@@ -72,6 +76,8 @@ class TestDataSavingManager(unittest.TestCase):
         send_data_pipe, recv_data_pipe = Pipe()
 
         with patch.object(
+            FileDB, "create_file", return_value="/fake/db/path"
+        ), patch.object(
             StorageManager, "save_collected_data", autospec=True
         ) as mock_save_method:
             manager = StorageManager(sensor_names=["sensor1", "sensor2"])
@@ -88,6 +94,49 @@ class TestDataSavingManager(unittest.TestCase):
             manager, {"sensor1": "value1", "sensor2": "value2"}
         )
 
+    def test_staged_saving(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, "data", "2024", "01", "01.txt")
+            staging_path = os.path.join(tmpdir, "shm")
+            os.makedirs(os.path.dirname(db_path))
+            open(db_path, "w").close()
+            env = {"staging_path": staging_path}
+            with patch.object(FileDB, "create_file", return_value=db_path), patch(
+                "models.data_manager.storage_manager.env_variables", return_value=env
+            ), patch("models.db_engine.staging.get_base_path", return_value=tmpdir):
+                manager = StorageManager()
+                # opened in the storage process only
+                self.assertIsNone(manager.staging)
+                self.assertFalse(os.path.exists(staging_path))
+
+                comm_pipe, recv_comm_pipe = Pipe()
+                send_data_pipe, recv_data_pipe = Pipe()
+                send_data_pipe.send({"seq": 1})
+                comm_pipe.send("END")
+                manager.run(recv_comm_pipe, recv_data_pipe)
+                self.assertIsInstance(manager.staging, StagedDB)
+                self.assertIsNone(manager.staging.fd)
+            with open(db_path) as data_file:
+                self.assertEqual(data_file.read(), "seq=1\n")
+
+    def test_stores_data_sent_before_end(self):
+        comm_pipe, recv_comm_pipe = Pipe()
+        send_data_pipe, recv_data_pipe = Pipe()
+        with patch.object(
+            FileDB, "create_file", return_value="/fake/db/path"
+        ), patch.object(
+            StorageManager, "save_collected_data", autospec=True
+        ) as save:
+            manager = StorageManager()
+            for index in range(3):
+                send_data_pipe.send({"index": index})
+            comm_pipe.send("END")
+            manager.run(recv_comm_pipe, recv_data_pipe)
+        self.assertEqual(
+            [call.args[1] for call in save.call_args_list],
+            [{"index": index} for index in range(3)],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
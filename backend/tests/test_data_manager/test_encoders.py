@@ -0,0 +1,90 @@
+from models.data_manager.encoders import (
+    DictEncoder,
+    PassThroughEncoder,
+    TypedEncoder,
+    build_encoder,
+)
+from models.sensors.schema import Field, RecordSchema
+from util import modify_data_to_dict
+import json
+import logging
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+LINES = [
+    "date=2024-01-01,time=00:00:20,current=1.5,voltage=None\n",
+    "longitude=7.3733° E,latitude=6.8429° N\n",
+    "a=None,b=NoneX,c=xNone,d=\n",
+    "None=1,b=None\n",
+    "a=1\n",
+    "a=1",
+    # not plain, parsed instead
+    'a=say "hi",b=c:\\d\n',
+    "a = 1 , b= 2\n",
+    " a=1\n",
+    "a=1\tb\n",
+]
+
+
+class TestPassThroughEncoder(unittest.TestCase):
+    def setUp(self):
+        self.encoder = PassThroughEncoder()
+
+    def test_encode_matches_parser(self):
+        for line in LINES:
+            with self.subTest(line=line):
+                self.assertEqual(
+                    json.loads(self.encoder.encode(line)), modify_data_to_dict(line)
+                )
+
+    def test_encode_batch_matches_parser(self):
+        expected = [modify_data_to_dict(line) for line in LINES]
+        self.assertEqual(json.loads(self.encoder.encode_batch(LINES)), expected)
+        plain = LINES[:5]
+        self.assertEqual(
+            json.loads(self.encoder.encode_batch(plain)), expected[: len(plain)]
+        )
+        self.assertEqual(self.encoder.encode_batch([]), "[]")
+
+    def test_is_plain(self):
+        self.assertTrue(self.encoder.is_plain("a=1,b=2 3"))
+        self.assertFalse(self.encoder.is_plain("a=1,b"))
+        self.assertFalse(self.encoder.is_plain("a=1=2"))
+        self.assertFalse(self.encoder.is_plain("a=1 ,b=2"))
+        self.assertFalse(self.encoder.is_plain(""))
+
+    def test_malformed_line_raises_as_parser(self):
+        with self.assertRaises(ValueError):
+            self.encoder.encode("a=1,b\n")
+
+    def test_message(self):
+        self.assertEqual(self.encoder.message("a=1\n"), '{"a": "1"}')
+        self.assertEqual(DictEncoder().message("a=1\n"), {"a": "1"})
+
+
+class TestTypedEncoder(unittest.TestCase):
+    def test_numbers_stay_numbers(self):
+        encoder = TypedEncoder(RecordSchema([Field("current", float)]))
+        line = "date=2024-01-01,current=1.5\n"
+        self.assertEqual(
+            json.loads(encoder.encode(line)), {"date": "2024-01-01", "current": 1.5}
+        )
+        self.assertEqual(
+            json.loads(encoder.encode_batch([line, "current=None\n"])),
+            [{"date": "2024-01-01", "current": 1.5}, {"current": None}],
+        )
+        self.assertEqual(encoder.message(line)["current"], 1.5)
+
+
+class TestBuildEncoder(unittest.TestCase):
+    def test_build(self):
+        self.assertIsInstance(build_encoder(), DictEncoder)
+        self.assertIsInstance(build_encoder("passthrough"), PassThroughEncoder)
+        self.assertIn("speed", build_encoder("typed").schema)
+        with self.assertRaises(ValueError):
+            build_encoder("msgpack")
+
+
+if __name__ == "__main__":
+    unittest.main()
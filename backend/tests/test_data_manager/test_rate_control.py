@@ -0,0 +1,80 @@
+from unittest.mock import patch
+from models.data_manager.rate_control import RateController, TokenBucket
+import logging
+import time
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_unlimited(self):
+        bucket = TokenBucket(0)
+        self.assertEqual(sum(bucket.reserve() for _ in range(1000)), 0)
+
+    def test_reserve(self):
+        with patch("models.data_manager.rate_control.monotonic", return_value=100.0):
+            bucket = TokenBucket(10, burst=5)
+            waits = [bucket.reserve() for _ in range(7)]
+        self.assertEqual(waits[:5], [0.0] * 5)
+        self.assertAlmostEqual(waits[5], 0.1)
+        self.assertAlmostEqual(waits[6], 0.2)
+
+    def test_cost_larger_than_burst(self):
+        with patch("models.data_manager.rate_control.monotonic", return_value=100.0):
+            bucket = TokenBucket(100, burst=100)
+            self.assertAlmostEqual(bucket.reserve(250), 1.5)
+            self.assertAlmostEqual(bucket.reserve(1), 1.51)
+
+    def test_acquire_paces(self):
+        bucket = TokenBucket(200, burst=1)
+        start = time.monotonic()
+        for _ in range(21):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+class TestRateController(unittest.TestCase):
+    def test_byte_rate(self):
+        controller = RateController(bytes_per_second=1000)
+        controller.acquire("a", 1000)
+        start = time.monotonic()
+        controller.acquire("a", 100)
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        # topics are paced separately
+        start = time.monotonic()
+        controller.acquire("b", 1000)
+        self.assertLess(time.monotonic() - start, 0.05)
+
+    def test_aimd(self):
+        controller = RateController(
+            messages_per_second=100, target_latency=0.5, increase=10, decrease=0.5
+        )
+        self.assertEqual(controller.on_ack("a", 0.1), 100)
+        self.assertEqual(controller.on_ack("a", 1.0), 50)
+        # the publishes in flight during the same congestion do not cut again
+        self.assertEqual(controller.on_timeout("a"), 50)
+        self.assertAlmostEqual(controller.on_ack("a", 0.1), 50.2)
+        self.assertEqual(controller.pacer("a").messages.rate, controller.rate("a"))
+        for _ in range(1000):
+            controller.on_ack("a", 0.1)
+        self.assertEqual(controller.rate("a"), 100)
+
+    def test_timeout_cuts_harder(self):
+        controller = RateController(messages_per_second=100, decrease=0.5)
+        self.assertEqual(controller.on_timeout("a"), 25)
+        controller.pacer("a").last_decrease = float("-inf")
+        controller.min_rate = 10
+        self.assertEqual(controller.on_timeout("a"), 10)
+
+    def test_unpaced_until_congested(self):
+        controller = RateController(decrease=0.5)
+        self.assertEqual(controller.on_ack("a", 0.1), 0)
+        pacer = controller.pacer("a")
+        pacer.sent.extend(100 + index * 0.01 for index in range(11))
+        self.assertAlmostEqual(controller.on_ack("a", 5.0), 50)
+        self.assertAlmostEqual(pacer.messages.rate, 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,247 @@
+from datetime import datetime
+from models.data_manager.scheduler import UploadScheduler
+from models.db_engine.db import MetaDB
+import logging
+import os
+import tempfile
+import time
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class SchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "data")
+        self.meta_path = os.path.join(self.tmpdir.name, "meta.txt")
+        with open(self.meta_path, "w"):
+            pass
+        self.today = datetime.now().strftime("%Y/%m/%d")
+        self.sent = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_day(self, day, count, start=0):
+        path = os.path.join(self.db_path, day + ".txt")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as day_file:
+            for index in range(start, start + count):
+                day_file.write("index={},day={}\n".format(index, day))
+        return path
+
+    def publish(self, line):
+        self.sent.append(line)
+
+    def scheduler(self, **kwargs):
+        return UploadScheduler(self.publish, self.db_path, self.meta_path, **kwargs)
+
+    def drain(self, scheduler):
+        while scheduler.step():
+            pass
+
+    def meta(self):
+        return MetaDB().retrieve_metadata(self.meta_path)
+
+
+class TestUploadScheduler(SchedulerTestCase):
+    def test_live_before_backlog(self):
+        self.write_day("2020/01/01", 5)
+        self.write_day(self.today, 3)
+        scheduler = self.scheduler()
+        self.assertTrue(scheduler.step())  # one backlog record
+        self.write_day(self.today, 2, start=3)
+        self.assertTrue(scheduler.step())
+        self.assertEqual(
+            self.sent[1:],
+            [
+                "index=3,day={}\n".format(self.today),
+                "index=4,day={}\n".format(self.today),
+            ],
+        )
+        self.drain(scheduler)
+        self.assertTrue(scheduler.backlog_done)
+        self.assertEqual(len(self.sent), 10)
+        self.assertEqual(len(set(self.sent)), 10)
+        self.assertEqual(self.sent[-1], "index=2,day={}\n".format(self.today))
+
+    def test_separate_cursors(self):
+        history = self.write_day("2020/01/01", 5)
+        today = self.write_day(self.today, 1)
+        scheduler = self.scheduler()
+        self.write_day(self.today, 1, start=1)
+        scheduler.step()
+        scheduler.step()
+        meta = self.meta()
+        self.assertEqual(meta["Live.LastUploadFile"], today)
+        self.assertEqual(int(meta["Live.Offset"]), os.path.getsize(today))
+        self.assertEqual(meta["LastUploadFile"], history)
+        self.assertEqual(int(meta["Offset"]), len("index=0,day=2020/01/01\n"))
+
+        # once drained, the legacy cursor follows the live lane
+        self.drain(scheduler)
+        self.write_day(self.today, 1, start=2)
+        scheduler.step()
+        meta = self.meta()
+        self.assertEqual(meta["LastUploadFile"], today)
+        self.assertEqual(int(meta["Offset"]), os.path.getsize(today))
+
+    def test_resume_after_failure(self):
+        self.write_day("2020/01/01", 5)
+        self.write_day(self.today, 2)
+        calls = []
+
+        def flaky(line):
+            calls.append(line)
+            if len(calls) == 3:
+                raise RuntimeError("timed out")
+            self.sent.append(line)
+
+        scheduler = UploadScheduler(flaky, self.db_path, self.meta_path)
+        self.write_day(self.today, 3, start=2)
+        with self.assertRaises(RuntimeError):
+            self.drain(scheduler)
+        self.assertEqual(len(self.sent), 2)
+
+        # a restart on the same day resumes both lanes
+        self.drain(self.scheduler())
+        self.assertEqual(len(self.sent), 10)
+        self.assertEqual(len(set(self.sent)), 10)
+
+    def test_restart_on_a_later_day(self):
+        old = self.write_day("2020/01/01", 3)
+        self.write_day("2020/01/02", 2)
+        MetaDB().save_metadata(
+            self.meta_path,
+            {
+                "LastUploadFile": old,
+                "Offset": os.path.getsize(old),
+                "Live.LastUploadFile": old,
+                "Live.Offset": os.path.getsize(old),
+                "Live.StartFile": old,
+                "Live.StartOffset": 0,
+            },
+        )
+        self.write_day(self.today, 1)
+        self.drain(self.scheduler())
+        self.assertEqual(
+            self.sent,
+            [
+                "index=0,day=2020/01/02\n",
+                "index=1,day=2020/01/02\n",
+                "index=0,day={}\n".format(self.today),
+            ],
+        )
+
+    def test_restart_without_backlog_cursor(self):
+        # a first run that never connected saved only the live lane
+        old = self.write_day("2020/01/01", 2)
+        MetaDB().save_metadata(
+            self.meta_path,
+            {
+                "Live.LastUploadFile": old,
+                "Live.Offset": 0,
+                "Live.StartFile": old,
+                "Live.StartOffset": 0,
+            },
+        )
+        self.write_day(self.today, 1)
+        self.drain(self.scheduler())
+        self.assertEqual(
+            self.sent,
+            [
+                "index=0,day=2020/01/01\n",
+                "index=1,day=2020/01/01\n",
+                "index=0,day={}\n".format(self.today),
+            ],
+        )
+
+    def test_restart_skips_what_the_live_lane_sent(self):
+        old = self.write_day("2020/01/01", 2)
+        self.write_day("2020/01/02", 2)
+        live = self.write_day("2020/01/03", 2)
+        MetaDB().save_metadata(
+            self.meta_path,
+            {
+                "LastUploadFile": old,
+                "Offset": 0,
+                "Live.LastUploadFile": live,
+                "Live.Offset": len("index=0,day=2020/01/03\n"),
+                "Live.StartFile": os.path.join(self.db_path, "2020/01/02.txt"),
+                "Live.StartOffset": 0,
+            },
+        )
+        self.write_day(self.today, 1)
+        scheduler = self.scheduler()
+        self.assertEqual(len(scheduler.sent), 1)
+        scheduler.step()
+
+        # the range stays skipped after another restart
+        self.drain(self.scheduler())
+        self.assertEqual(
+            self.sent,
+            [
+                "index=0,day=2020/01/01\n",
+                "index=1,day=2020/01/01\n",
+                "index=1,day=2020/01/03\n",
+                "index=0,day={}\n".format(self.today),
+            ],
+        )
+        self.assertEqual(self.meta()["Backlog.Sent"], "")
+
+
+class TestBacklogBudget(SchedulerTestCase):
+    def publish(self, line):
+        time.sleep(0.01)
+        super().publish(line)
+
+    def test_share(self):
+        self.write_day("2020/01/01", 5)
+        scheduler = self.scheduler(backlog_share=0.25)
+        self.assertTrue(scheduler.step())
+        # the backlog waits three times as long as it sent
+        self.assertFalse(scheduler.step())
+        self.assertGreater(scheduler.idle_time(), 0.02)
+        self.write_day(self.today, 1)
+        self.assertTrue(scheduler.step())
+        self.assertEqual(len(self.sent), 2)
+
+    def test_rate(self):
+        self.write_day("2020/01/01", 20)
+        scheduler = self.scheduler(backlog_rate=100, batch_size=5)
+        start = time.monotonic()
+        while len(self.sent) < 20:
+            if not scheduler.step():
+                time.sleep(scheduler.idle_time())
+        # every batch but the last waits for its records to fit the rate
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_batches_fit_the_latency_target(self):
+        self.write_day("2020/01/01", 50)
+        scheduler = self.scheduler(latency_target=0.1)
+        scheduler.step()
+        self.assertLessEqual(scheduler.backlog_batch_size(), 10)
+        self.assertGreater(scheduler.backlog_batch_size(), 1)
+
+
+class TestFromEnv(SchedulerTestCase):
+    def test_settings(self):
+        scheduler = UploadScheduler.from_env(
+            self.publish,
+            {
+                "live_latency_target": "0.5",
+                "backlog_share": "0.2",
+                "upload_batch_size": "7",
+            },
+            db_path=self.db_path,
+            meta_path=self.meta_path,
+        )
+        self.assertEqual(scheduler.latency_target, 0.5)
+        self.assertEqual(scheduler.backlog_share, 0.2)
+        self.assertEqual(scheduler.backlog_rate, 0)
+        self.assertEqual(scheduler.batch_size, 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,239 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+from models.data_manager.cloud_transfer import CloudTransfer
+from models.data_manager.encoders import DictEncoder, PassThroughEncoder
+from models.data_manager.sinks import (
+    FileSpoolSink,
+    HttpSink,
+    MqttSink,
+    Sink,
+    SinkWorker,
+    build_sinks,
+    next_data_file,
+)
+from models.exceptions.exception import SinkError
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class ListSink(Sink):
+    def __init__(self, name, delay=0.0, failures=0, **kwargs):
+        super().__init__(name, **kwargs)
+        self.delay = delay
+        self.failures = failures
+        self.lines = []
+
+    def send(self, lines):
+        time.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise SinkError("down")
+        self.lines.extend(lines)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class SinkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "data")
+        self.meta_path = os.path.join(self.tmpdir.name, "meta.txt")
+        with open(self.meta_path, "w"):
+            pass
+        self.workers = []
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.stop()
+            worker.join(5)
+        self.tmpdir.cleanup()
+
+    def write_day(self, day, count, start=0):
+        path = os.path.join(self.db_path, day + ".txt")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as day_file:
+            for index in range(start, start + count):
+                day_file.write("index={},day={}\n".format(index, day))
+        return path
+
+    def start_worker(self, sink):
+        worker = SinkWorker(sink, self.db_path, self.meta_path, poll_interval=0.01)
+        self.workers.append(worker)
+        worker.start()
+        return worker
+
+
+class TestNextDataFile(SinkTestCase):
+    def test_date_order(self):
+        paths = [
+            self.write_day(day, 1)
+            for day in ("2023/12/31", "2024/01/01", "2024/01/02", "2024/02/01")
+        ]
+        self.assertEqual(next_data_file(self.db_path), paths[0])
+        for current, expected in zip(paths, paths[1:] + [None]):
+            self.assertEqual(next_data_file(self.db_path, current), expected)
+
+
+class TestSinkWorker(SinkTestCase):
+    def test_slow_sink_does_not_hold_back_fast_sink(self):
+        self.write_day("2024/01/01", 50)
+        self.write_day("2024/01/02", 50)
+        fast = ListSink("fast", batch_size=10)
+        slow = ListSink("slow", delay=0.5, batch_size=10)
+        self.start_worker(fast)
+        self.start_worker(slow)
+        self.assertTrue(wait_until(lambda: len(fast.lines) == 100))
+        self.assertLess(len(slow.lines), 100)
+        self.assertEqual(fast.lines[0], "index=0,day=2024/01/01\n")
+        self.assertEqual(fast.lines[-1], "index=49,day=2024/01/02\n")
+
+    def test_retries_and_keeps_cursor(self):
+        path = self.write_day("2024/01/01", 5)
+        sink = ListSink("flaky", failures=2, retry_delay=0.01, batch_size=2)
+        worker = self.start_worker(sink)
+        self.assertTrue(wait_until(lambda: len(sink.lines) == 5))
+        worker.stop()
+        worker.join(5)
+        self.assertEqual(len(set(sink.lines)), 5)
+
+        with open(self.meta_path) as meta:
+            saved = meta.read()
+        self.assertIn("flaky.LastUploadFile={}".format(path), saved)
+        self.assertIn("flaky.Offset={}".format(os.path.getsize(path)), saved)
+
+        # A new worker resumes from the saved cursor
+        self.write_day("2024/01/01", 2, start=5)
+        resumed = ListSink("flaky")
+        self.start_worker(resumed)
+        self.assertTrue(wait_until(lambda: len(resumed.lines) == 2))
+        self.assertEqual(resumed.lines[0], "index=5,day=2024/01/01\n")
+
+    def test_skips_partial_line(self):
+        path = self.write_day("2024/01/01", 1)
+        with open(path, "a") as day_file:
+            day_file.write("index=1,da")
+        sink = ListSink("partial")
+        self.start_worker(sink)
+        self.assertTrue(wait_until(lambda: len(sink.lines) == 1))
+        with open(path, "a") as day_file:
+            day_file.write("y=2024/01/01\n")
+        self.assertTrue(wait_until(lambda: len(sink.lines) == 2))
+        self.assertEqual(sink.lines[1], "index=1,day=2024/01/01\n")
+
+    def test_starts_from_legacy_cursor(self):
+        self.write_day("2024/01/01", 3)
+        path = self.write_day("2024/01/02", 3)
+        with open(self.meta_path, "w") as meta:
+            meta.write("LastUploadFile={}\nOffset=0\n".format(path))
+        sink = ListSink("new")
+        self.start_worker(sink)
+        self.assertTrue(wait_until(lambda: len(sink.lines) == 3))
+        self.assertTrue(all("2024/01/02" in line for line in sink.lines))
+
+    def test_mqtt_sink_passthrough_moves_cursor(self):
+        path = self.write_day("2024/01/01", 3)
+        builder = MagicMock()
+        connection = builder.mtls_from_path.return_value
+        connection.publish.return_value = (MagicMock(), 1)
+        with patch.object(CloudTransfer, "_load_env"), patch(
+            "models.data_manager.cloud_transfer.mqtt_connection_builder", builder
+        ):
+            sink = MqttSink(cloud_transfer=CloudTransfer(), encoder="passthrough")
+            worker = self.start_worker(sink)
+            self.assertTrue(
+                wait_until(lambda: worker.cursor.offset == os.path.getsize(path))
+            )
+        self.assertEqual(connection.publish.call_count, 3)
+        self.assertEqual(
+            connection.publish.call_args.kwargs["payload"],
+            '{"index": "2", "day": "2024/01/01"}',
+        )
+
+
+class TestSinks(unittest.TestCase):
+    def test_file_spool_sink(self):
+        with tempfile.TemporaryDirectory() as spool:
+            sink = FileSpoolSink("spool", path=spool)
+            sink.send(["a=1\n", "a=2\n"])
+            sink.send(["a=3\n"])
+            files = sorted(os.listdir(spool))
+            self.assertEqual(len(files), 2)
+            with open(os.path.join(spool, files[0])) as batch:
+                self.assertEqual(batch.read(), "a=1\na=2\n")
+
+    def test_http_sink_keeps_connection_alive(self):
+        received, connections = [], []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                connections.append(self.client_address)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                received.append(json.loads(body))
+                status = 500 if len(received) == 3 else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            sink = HttpSink(
+                "http", url="http://127.0.0.1:{}/bulk".format(server.server_port)
+            )
+            sink.send(["a=1,b=x\n", "a=2,b=None\n"])
+            sink.send(["a=3,b=y\n"])
+            with self.assertRaises(SinkError):
+                sink.send(["a=4,b=z\n"])
+            sink.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(received[0], [{"a": "1", "b": "x"}, {"a": "2", "b": None}])
+        self.assertEqual(len(received), 3)
+        self.assertEqual(len(connections), 1)
+
+    def test_build_sinks(self):
+        with tempfile.TemporaryDirectory() as spool:
+            sinks = build_sinks(
+                {
+                    "sinks": "http, spool",
+                    "http_url": "http://localhost:8080/bulk",
+                    "http_batch_size": "500",
+                    "http_encoder": "passthrough",
+                    "spool_path": spool,
+                }
+            )
+        self.assertEqual([sink.name for sink in sinks], ["http", "spool"])
+        self.assertEqual(sinks[0].batch_size, 500)
+        self.assertEqual(sinks[0].path, "/bulk")
+        self.assertIsInstance(sinks[0].encoder, PassThroughEncoder)
+        self.assertIsInstance(sinks[1].encoder, DictEncoder)
+        self.assertEqual(build_sinks({}), [])
+        with self.assertRaises(ValueError):
+            build_sinks({"sinks": "carrier-pigeon"})
+
+
+if __name__ == "__main__":
+    unittest.main()
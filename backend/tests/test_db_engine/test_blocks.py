@@ -0,0 +1,91 @@
+from models.db_engine.blocks import BlockFile, BlockWriter, compress_day
+from models.sensors.schema import Field, RecordSchema
+from unittest.mock import patch
+import logging
+import os
+import tempfile
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+T0 = 1_704_067_200 * 10**9
+SCHEMA = RecordSchema(
+    [
+        Field("ts", int, "ns", nullable=False),
+        Field("seq", int, nullable=False),
+        Field("speed", float, "m/s"),
+    ]
+)
+
+
+def record(seq):
+    return {"ts": T0 + seq * 10**9, "seq": seq, "speed": None if seq % 5 else seq / 4}
+
+
+class TestBlockFile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "01.blk")
+        self.records = [record(seq) for seq in range(250)]
+        with BlockWriter(self.path, block_rows=100) as writer:
+            for data in self.records:
+                writer.add(data)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_directory(self):
+        with BlockFile(self.path) as blocks:
+            self.assertEqual(len(blocks), 250)
+            self.assertEqual([info.rows for info in blocks.blocks], [100, 100, 50])
+            self.assertEqual(blocks.blocks[1].first_ts, T0 + 100 * 10**9)
+            self.assertEqual(blocks.blocks[1].last_ts, T0 + 199 * 10**9)
+            self.assertEqual(list(blocks.records()), self.records)
+
+    def test_random_access(self):
+        with BlockFile(self.path) as blocks, patch.object(
+            BlockFile, "read_block", autospec=True, side_effect=BlockFile.read_block
+        ) as read_block:
+            self.assertEqual(list(blocks.records(95, 105)), self.records[95:105])
+            self.assertEqual([call[0][1] for call in read_block.call_args_list], [0, 1])
+            read_block.reset_mock()
+            found = list(blocks.time_range(T0 + 210 * 10**9, T0 + 215 * 10**9))
+            self.assertEqual(found, self.records[210:215])
+            self.assertEqual([call[0][1] for call in read_block.call_args_list], [2])
+            self.assertEqual(
+                blocks.read_block(2, ["seq"])["seq"], list(range(200, 250))
+            )
+
+    def test_fields_change(self):
+        with BlockWriter(self.path) as writer:
+            writer.add({"time": "00:00:00", "speed": 1.0})
+            writer.add(record(0))
+            writer.add(record(1))
+        with BlockFile(self.path) as blocks:
+            self.assertEqual(len(blocks.blocks), 2)
+            self.assertGreater(blocks.blocks[0].first_ts, blocks.blocks[0].last_ts)
+            self.assertEqual(len(list(blocks.time_range())), 2)
+            self.assertEqual(next(blocks.records()), {"time": "00:00:00", "speed": 1.0})
+
+    def test_not_a_block_file(self):
+        with open(self.path, "r+b") as block_file:
+            block_file.truncate(os.path.getsize(self.path) - 1)
+        with self.assertRaises(ValueError):
+            BlockFile(self.path)
+
+    def test_compress_day(self):
+        day = os.path.join(self.tmpdir.name, "02.txt")
+        with open(day, "w") as day_file:
+            for data in self.records:
+                day_file.write(",".join("{}={}".format(*item) for item in data.items()))
+                day_file.write("\n")
+            day_file.write("ts=1,seq=")  # still being written
+        target = compress_day(day, schema=SCHEMA)
+        self.assertEqual(target, os.path.join(self.tmpdir.name, "02.blk"))
+        with BlockFile(target) as blocks:
+            self.assertEqual(list(blocks.records()), self.records)
+        self.assertLess(os.path.getsize(target), os.path.getsize(day) / 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
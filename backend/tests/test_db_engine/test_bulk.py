@@ -0,0 +1,150 @@
+from models.db_engine.bulk import (
+    find_time,
+    line_range,
+    parse_buffer,
+    read_columns,
+    read_time_range,
+    sort_by_time,
+    to_structured,
+)
+import logging
+import numpy as np
+import os
+import tempfile
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+DAY = (
+    b"date=2024-01-01,time=00:00:00,current=1.5,voltage=None,place=7.3\xc2\xb0 E\n"
+    b"date=2024-01-01,time=00:00:20,current=-2,voltage=48,place=None\n"
+    b"date=2024-01-01,time=00:00:40,current=0.25,voltage=47.5,place=7.4\xc2\xb0 E\n"
+)
+
+
+class TestParseBuffer(unittest.TestCase):
+    def test_typed_columns(self):
+        columns = parse_buffer(DAY)
+        self.assertEqual(list(columns), ["date", "time", "current", "voltage", "place"])
+        np.testing.assert_array_equal(columns["current"], [1.5, -2, 0.25])
+        np.testing.assert_array_equal(columns["voltage"], [np.nan, 48, 47.5])
+        self.assertEqual(columns["time"].tolist(), ["00:00:00", "00:00:20", "00:00:40"])
+        self.assertEqual(columns["place"].tolist(), ["7.3° E", None, "7.4° E"])
+
+    def test_dtypes(self):
+        columns = parse_buffer(DAY, dtypes={"date": "datetime64[D]", "current": "f4"})
+        self.assertEqual(columns["date"].dtype, np.dtype("datetime64[D]"))
+        self.assertEqual(columns["current"].dtype, np.float32)
+        with self.assertRaises(ValueError):
+            parse_buffer(DAY, dtypes={"time": float})
+
+    def test_byte_ranges_split_on_lines(self):
+        middle = len(DAY) // 2
+        self.assertEqual(line_range(DAY, 0, middle)[1], DAY.index(b"\n", middle) + 1)
+        halves = [parse_buffer(DAY, 0, middle), parse_buffer(DAY, middle)]
+        times = sum((half["time"].tolist() for half in halves), [])
+        self.assertEqual(times, ["00:00:00", "00:00:20", "00:00:40"])
+
+    def test_partial_last_line_is_left_out(self):
+        columns = parse_buffer(DAY + b"date=2024-01-01,time=00:01")
+        self.assertEqual(len(columns["time"]), 3)
+        self.assertEqual(parse_buffer(b"a=1"), {})
+        self.assertEqual(parse_buffer(b""), {})
+
+    def test_lines_with_different_fields(self):
+        columns = parse_buffer(b"a=1,b=x\nb=y,a=2,c=3\na=None\n")
+        np.testing.assert_array_equal(columns["a"], [1, 2, np.nan])
+        self.assertEqual(columns["b"].tolist(), ["x", "y", None])
+        np.testing.assert_array_equal(columns["c"], [np.nan, 3, np.nan])
+
+    def test_same_field_count_different_keys(self):
+        columns = parse_buffer(b"a=1,b=2\na=3,c=4\n")
+        self.assertEqual(list(columns), ["a", "b", "c"])
+
+    def test_malformed_line(self):
+        with self.assertRaises(ValueError):
+            parse_buffer(b"a=1,b\n")
+
+
+class TestReadColumns(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "01.txt")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_memory_mapped_file(self):
+        with open(self.path, "wb") as day_file:
+            day_file.write(DAY)
+        columns = read_columns(self.path, start=1)
+        self.assertEqual(columns["time"].tolist(), ["00:00:20", "00:00:40"])
+        open(self.path, "w").close()
+        self.assertEqual(read_columns(self.path), {})
+
+    def test_structured(self):
+        records = to_structured(parse_buffer(DAY))
+        self.assertEqual(
+            records.dtype.names, ("date", "time", "current", "voltage", "place")
+        )
+        self.assertEqual(records["current"][2], 0.25)
+        self.assertTrue(records["voltage"].mask[0])
+        self.assertTrue(records["place"].mask[1])
+        self.assertFalse(records["current"].mask.any())
+
+
+# a second between samples, from 2024-01-01T00:00:00Z
+T0 = 1_704_067_200 * 10**9
+STAMPED = b"".join(
+    b"ts=%d,seq=%d,speed=%d\n" % (T0 + seq * 10**9, seq, seq) for seq in range(100)
+)
+
+
+class TestTimeRange(unittest.TestCase):
+    def test_find_time(self):
+        self.assertEqual(find_time(STAMPED, 0), 0)
+        self.assertEqual(find_time(STAMPED, T0 + 10**11), len(STAMPED))
+        for seq in (1, 37, 99):
+            position = find_time(STAMPED, T0 + seq * 10**9)
+            self.assertTrue(
+                STAMPED[position:].startswith(b"ts=%d," % (T0 + seq * 10**9))
+            )
+            # between two samples, the later one
+            self.assertEqual(find_time(STAMPED, T0 + seq * 10**9 - 1), position)
+
+    def test_lines_without_stamp_come_first(self):
+        buffer = b"time=23:59:59,speed=1\n" * 3 + STAMPED
+        self.assertEqual(find_time(buffer, T0), 3 * 22)
+        columns = parse_buffer(buffer)
+        self.assertEqual(columns["ts"].dtype, np.int64)
+        self.assertTrue(columns["ts"].mask[:3].all())
+
+    def test_read_time_range(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "01.txt")
+            with open(path, "wb") as day_file:
+                day_file.write(STAMPED)
+            columns = read_time_range(path, T0 + 10 * 10**9, T0 + 20 * 10**9)
+            self.assertEqual(columns["seq"].tolist(), list(range(10, 20)))
+            # the stamp does not fit a float64
+            self.assertEqual(columns["ts"].dtype, np.int64)
+            self.assertEqual(columns["ts"][0], T0 + 10 * 10**9)
+            self.assertEqual(len(read_time_range(path, end_ns=T0)), 0)
+            self.assertEqual(len(read_time_range(path, T0 + 95 * 10**9)["ts"]), 5)
+
+    def test_sort_by_time(self):
+        columns = {
+            "ts": np.array([T0 + 2, T0, T0 + 2, T0]),
+            "seq": np.array([2, 0, 2, 1]),
+            "speed": np.array([2.0, 0.0, 2.5, 1.0]),
+        }
+        ordered = sort_by_time(columns)
+        self.assertEqual(ordered["seq"].tolist(), [0, 1, 2])
+        self.assertEqual(ordered["speed"].tolist(), [0.0, 1.0, 2.0])
+        self.assertEqual(len(sort_by_time(columns, unique=False)["ts"]), 4)
+        with self.assertRaises(KeyError):
+            sort_by_time({"seq": columns["seq"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+from models.db_engine.codecs import (
+    BITPACK,
+    DECIMAL,
+    DELTA,
+    NULLS,
+    PLAIN,
+    RLE,
+    XOR,
+    BitReader,
+    BitWriter,
+    decode_column,
+    encode_column,
+    encode_decimal,
+    encode_xor,
+)
+import logging
+import math
+import random
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+T0 = 1_704_067_200 * 10**9
+
+
+def round_trip(test, values):
+    encoded = encode_column(values)
+    decoded = decode_column(encoded, len(values))
+    test.assertEqual(len(decoded), len(values))
+    for value, back in zip(values, decoded):
+        if isinstance(value, float) and math.isnan(value):
+            test.assertTrue(math.isnan(back))
+        else:
+            test.assertEqual(type(back), type(value))
+            test.assertEqual(back, value)
+    return encoded
+
+
+class TestBits(unittest.TestCase):
+    def test_round_trip(self):
+        writer = BitWriter()
+        fields = [(1, 1), (0, 3), (2**64 - 1, 64), (5, 7), (0, 0), (2**40 + 3, 41)]
+        for value, width in fields:
+            writer.write(value, width)
+        reader = BitReader(writer.getvalue())
+        self.assertEqual(
+            [reader.read(width) for _, width in fields], [v for v, _ in fields]
+        )
+        with self.assertRaises(ValueError):
+            reader.read(64)
+
+
+class TestCodecs(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(7)
+
+    def test_stamps(self):
+        stamps = [
+            T0 + index * 20 * 10**9 + self.rng.randint(-5000, 5000)
+            for index in range(1000)
+        ]
+        encoded = round_trip(self, stamps)
+        self.assertEqual(encoded[0], DELTA)
+        # 20 bytes as text
+        self.assertLess(len(encoded), 3 * len(stamps))
+        steady = [T0 + index * 10**9 for index in range(1000)]
+        self.assertLess(len(round_trip(self, steady)), 150)
+
+    def test_floats(self):
+        latitudes = [51.2 + index * 1e-5 for index in range(500)]
+        encoded = round_trip(self, latitudes)
+        self.assertEqual(encoded[0], XOR)
+        round_trip(self, [0.0, -0.0, math.inf, -math.inf, math.nan, 1e308, 5e-324])
+
+    def test_small_integers(self):
+        encoded = round_trip(self, [self.rng.randint(0, 100) for _ in range(1000)])
+        self.assertEqual(encoded[0], BITPACK)
+        self.assertLess(len(encoded), 1000)
+        round_trip(self, [0, -(2**63), 2**63 - 1])
+        round_trip(self, [2**70, -(2**70), 1])
+
+    def test_decimals(self):
+        distances = [round(self.rng.uniform(0, 1000), 2) for _ in range(1000)]
+        encoded = round_trip(self, distances)
+        self.assertEqual(encoded[0], DECIMAL)
+        self.assertLess(len(encoded), len(encode_xor(distances)) / 2)
+        self.assertIsNone(encode_decimal([1.5, -0.0]))
+        self.assertIsNone(encode_decimal([1 / 3]))
+        round_trip(self, [0.1, 0.2, 0.30000000000000004, 1e-9, -5.5])
+
+    def test_runs(self):
+        stuck = [None] * 100 + [math.pi] * 800 + [None] * 100
+        encoded = round_trip(self, stuck)
+        self.assertEqual(encoded[0], RLE)
+        self.assertLess(len(encoded), 20)
+        stuck = [None] * 100 + [7.25] * 800 + [None] * 100
+        self.assertLess(len(round_trip(self, stuck)), 20)
+        dates = ["2024-01-01"] * 999 + ["2024-01-02"]
+        self.assertEqual(round_trip(self, dates)[0], RLE)
+
+    def test_nulls(self):
+        speeds = [None if index % 7 == 0 else index * 0.5 for index in range(100)]
+        encoded = round_trip(self, speeds)
+        self.assertEqual(encoded[0], DECIMAL | NULLS)
+        self.assertEqual(round_trip(self, [None] * 10)[0], RLE)
+        round_trip(self, [None])
+        round_trip(self, [None, 3, None])
+
+    def test_mixed_values(self):
+        values = ["7.3° E", None, 1, 2.5, "", True]
+        decoded = decode_column(encode_column(values), len(values))
+        self.assertEqual(decoded, ["7.3° E", None, 1, 2.5, "", "True"])
+        self.assertEqual(encode_column(["a", "b"])[0], PLAIN)
+        self.assertEqual(decode_column(b"", 0), [])
+
+    def test_corrupted(self):
+        encoded = encode_column([T0 + index for index in range(100)])
+        with self.assertRaises(ValueError):
+            decode_column(encoded[:3], 100)
+        with self.assertRaises(ValueError):
+            decode_column(bytes([0x7F]) + encoded[1:], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+from datetime import date
+from models.db_engine.bulk import read_columns, read_time_range
+from models.db_engine.compactor import Compactor
+from models.db_engine.db import FileDB, MetaDB
+from models.db_engine.frames import is_compressed
+from models.sensor_mgmt.replay import ReplayDataManager
+from multiprocessing import Pipe
+from unittest.mock import patch
+from time import time
+import logging
+import os
+import tempfile
+import threading
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+T0 = 1_704_067_200 * 10**9
+
+
+class TestCompactor(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.meta_path = os.path.join(self.tmpdir.name, "meta.txt")
+        open(self.meta_path, "w").close()
+        self.compactor = Compactor(self.tmpdir.name, self.meta_path)
+        self.compactor.seal_after = 60
+        self.today = date(2024, 1, 3)
+        self.old = self.day_file(1, idle=3600)
+        self.recent = self.day_file(2, idle=10)
+        self.current = self.day_file(3, idle=3600)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def day_file(self, day, idle):
+        path = os.path.join(self.tmpdir.name, "2024", "01", "{:02d}.txt".format(day))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as data_file:
+            data_file.writelines(
+                "ts={},seq={},speed=1.5\n".format(T0 + seq * 10**9, seq)
+                for seq in range(500)
+            )
+        os.utime(path, (time() - idle, time() - idle))
+        return path
+
+    def test_sealed_files(self):
+        self.assertEqual(self.compactor.sealed_files(self.today), [self.old])
+
+    def test_compact(self):
+        size = os.path.getsize(self.old)
+        compressed, saved = self.compactor.compact(self.today)
+        self.assertEqual(compressed, 1)
+        self.assertEqual(saved, size - os.path.getsize(self.old))
+        self.assertTrue(is_compressed(self.old))
+        self.assertFalse(is_compressed(self.recent))
+        self.assertFalse(is_compressed(self.current))
+        self.assertEqual(self.compactor.sealed_files(self.today), [])
+
+    def test_stops_on_command(self):
+        recv, send = Pipe()
+        send.send("END")
+        self.assertEqual(self.compactor.compact(self.today, recv), (0, 0))
+        self.assertFalse(is_compressed(self.old))
+        self.assertEqual(recv.recv(), "END")
+
+    def test_blocks_once_uploaded(self):
+        self.compactor.format = "blocks"
+        # nothing uploaded yet: compressed into frames meanwhile
+        self.compactor.compact(self.today)
+        self.assertTrue(is_compressed(self.old))
+
+        MetaDB().save_metadata(
+            self.meta_path, {"LastUploadFile": self.recent, "Offset": 0}
+        )
+        self.assertEqual(self.compactor.sealed_files(self.today), [self.old])
+        self.assertEqual(self.compactor.compact(self.today)[0], 1)
+        blocks = self.old[:-4] + ".blk"
+        self.assertFalse(os.path.exists(self.old))
+        self.assertTrue(os.path.exists(blocks))
+        self.assertFalse(is_compressed(self.recent))
+
+        columns = read_columns(blocks)
+        self.assertEqual(list(columns["seq"]), list(range(500)))
+        columns = read_time_range(blocks, T0 + 10 * 10**9, T0 + 20 * 10**9)
+        self.assertEqual(list(columns["seq"]), list(range(10, 20)))
+        self.assertEqual(list(columns["speed"]), [1.5] * 10)
+
+        replay = ReplayDataManager(speed=None, data_path=self.tmpdir.name)
+        self.assertEqual(replay.get_files()[0], blocks)
+        samples = list(replay.read_samples())
+        self.assertEqual(len(samples), 1500)
+        self.assertEqual(samples[0], {"ts": T0, "seq": 0, "speed": 1.5})
+
+    def test_no_blocks_before_backlog_upload(self):
+        self.compactor.format = "blocks"
+        # a live lane started today, the backlog lane has not sent anything
+        MetaDB().save_metadata(
+            self.meta_path,
+            {
+                "Live.LastUploadFile": self.current,
+                "Live.Offset": 0,
+                "Live.StartFile": self.current,
+                "Live.StartOffset": 0,
+            },
+        )
+        self.assertEqual(self.compactor.compact(self.today)[0], 1)
+        self.assertTrue(is_compressed(self.old))
+        self.assertFalse(os.path.exists(self.old[:-4] + ".blk"))
+        self.assertEqual(self.compactor.sealed_files(self.today), [])
+
+    def test_upload_cursors(self):
+        meta = {"LastUploadFile": self.recent}
+        self.assertTrue(self.compactor.is_uploaded(self.old, meta))
+        self.assertFalse(self.compactor.is_uploaded(self.recent, meta))
+
+        # a sink behind the backlog lane
+        meta["http.LastUploadFile"] = self.old
+        self.assertFalse(self.compactor.is_uploaded(self.old, meta))
+        del meta["http.LastUploadFile"]
+
+        # sent by an earlier live lane, ahead of the backlog lane
+        meta = {
+            "LastUploadFile": self.old,
+            "Backlog.Sent": "{}|5|{}|0".format(self.old, self.current),
+        }
+        self.assertFalse(self.compactor.is_uploaded(self.old, meta))
+        self.assertTrue(self.compactor.is_uploaded(self.recent, meta))
+
+    def test_append_during_compaction_is_kept(self):
+        MetaDB().save_metadata(
+            self.meta_path, {"LastUploadFile": self.recent, "Offset": 0}
+        )
+        for compact_format in Compactor.FORMATS:
+            with self.subTest(compact_format):
+                self.compactor.format = compact_format
+                os.utime(self.old, (time() - 3600, time() - 3600))
+                # a StorageManager started on that day appends to it
+                db = FileDB(self.old, "a")
+                db.open(mode="a")
+                compaction = threading.Thread(
+                    target=self.compactor.compact, args=(self.today,)
+                )
+                compaction.start()
+                compaction.join(0.5)
+                self.assertTrue(compaction.is_alive())
+                db.write("ts={},seq=500,speed=1.5\n".format(T0))
+                db.close()
+                compaction.join(5)
+                with FileDB(self.old, "r") as db:
+                    lines = db.readlines()
+                self.assertEqual(lines[-1], "ts={},seq=500,speed=1.5\n".format(T0))
+                self.assertFalse(os.path.exists(self.old[:-4] + ".blk"))
+
+    def test_unknown_format(self):
+        with patch(
+            "models.db_engine.compactor.env_variables",
+            return_value={"compact_format": "zip"},
+        ):
+            with self.assertRaises(ValueError):
+                Compactor(self.tmpdir.name, self.meta_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
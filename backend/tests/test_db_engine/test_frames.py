@@ -0,0 +1,173 @@
+from models.data_manager.sinks import DataCursor
+from models.db_engine.bulk import read_columns
+from models.db_engine.db import FileDB, MetaDB
+from models.db_engine.frames import (
+    FrameReader,
+    compress_file,
+    data_size,
+    decompress_file,
+    is_compressed,
+    is_past_day_file,
+    open_data_file,
+)
+from datetime import date
+import logging
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+logging.disable(logging.CRITICAL)
+
+
+def data_line(seq):
+    return "ts={},seq={},speed={}\n".format(1_704_067_200 * 10**9 + seq, seq, seq % 7)
+
+
+class TestFrames(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "01.txt")
+        self.text = "".join(data_line(seq) for seq in range(2000))
+        with open(self.path, "w") as data_file:
+            data_file.write(self.text)
+        self.mtime = os.stat(self.path).st_mtime_ns
+        self.size = compress_file(self.path, frame_size=4096)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_compress(self):
+        self.assertTrue(is_compressed(self.path))
+        self.assertEqual(os.path.getsize(self.path), self.size)
+        self.assertLess(self.size, len(self.text) / 3)
+        self.assertEqual(os.stat(self.path).st_mtime_ns, self.mtime)
+        self.assertEqual(data_size(self.path), len(self.text))
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    def test_frames_end_on_lines(self):
+        with FrameReader(self.path) as reader:
+            self.assertGreater(len(reader.sizes), 1)
+            for index in range(len(reader.sizes)):
+                self.assertTrue(reader.frame(index).endswith(b"\n"))
+
+    def test_seek(self):
+        offset = self.text.index(data_line(1234))
+        with open_data_file(self.path) as data_file:
+            data_file.seek(offset)
+            self.assertEqual(data_file.readline().decode(), data_line(1234))
+            self.assertEqual(data_file.tell(), offset + len(data_line(1234)))
+            data_file.seek(0)
+            self.assertEqual(data_file.read().decode(), self.text)
+
+    def test_read_frames(self):
+        start = self.text.index(data_line(500))
+        end = self.text.index(data_line(510))
+        with FrameReader(self.path) as reader:
+            base, text = reader.read_frames(start, end)
+        self.assertLessEqual(base, start)
+        self.assertEqual(text.decode(), self.text[base : base + len(text)])
+        self.assertGreaterEqual(base + len(text), end)
+
+    def test_decompress(self):
+        decompress_file(self.path)
+        self.assertFalse(is_compressed(self.path))
+        with open(self.path) as data_file:
+            self.assertEqual(data_file.read(), self.text)
+
+    def test_changed_while_compressed(self):
+        path = os.path.join(self.tmpdir.name, "02.txt")
+        with open(path, "w") as data_file:
+            data_file.write(self.text)
+        real_stat = os.stat
+        calls = []
+
+        def stat(target, *args, **kwargs):
+            calls.append(target)
+            if len(calls) == 2:
+                with open(path, "a") as data_file:
+                    data_file.write(data_line(2000))
+            return real_stat(target, *args, **kwargs)
+
+        with unittest.mock.patch("models.db_engine.frames.os.stat", stat):
+            self.assertIsNone(compress_file(path))
+        self.assertFalse(is_compressed(path))
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+    def test_not_compressed(self):
+        with self.assertRaises(ValueError):
+            FrameReader(os.path.join(os.path.dirname(__file__), "test_frames.py"))
+
+
+class TestCompressedReaders(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "2024", "01", "01.txt")
+        os.makedirs(os.path.dirname(self.path))
+        self.lines = [data_line(seq) for seq in range(1000)]
+        with open(self.path, "w") as data_file:
+            data_file.writelines(self.lines)
+        compress_file(self.path, frame_size=2048)
+        self.offset = sum(len(line) for line in self.lines[:600])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_file_db(self):
+        with FileDB(self.path, "r") as db:
+            self.assertEqual(db.readlines(), self.lines)
+
+    def test_meta_db_offset(self):
+        db = MetaDB()
+        db.open(self.path, "r")
+        try:
+            self.assertEqual(db.readlines(self.offset), self.lines[600:])
+            self.assertEqual(db.meta["Offset"], data_size(self.path))
+        finally:
+            db.close()
+
+    def test_append_thaws(self):
+        with FileDB(self.path, "a") as db:
+            db.write(data_line(1000))
+        self.assertFalse(is_compressed(self.path))
+        with open(self.path) as data_file:
+            self.assertEqual(data_file.readlines(), self.lines + [data_line(1000)])
+
+    def test_only_past_days_checked(self):
+        today = os.path.join(self.tmpdir.name, date.today().strftime("%Y/%m/%d.txt"))
+        tmp_db = os.path.join(self.tmpdir.name, "tmp_db")
+        os.makedirs(os.path.dirname(today), exist_ok=True)
+        with unittest.mock.patch(
+            "models.db_engine.db.is_compressed", return_value=False
+        ) as check:
+            for path in (today, tmp_db):
+                with FileDB(path, "a") as db:
+                    db.write(data_line(0))
+            check.assert_not_called()
+            with FileDB(self.path, "r"):
+                pass
+            check.assert_called_once_with(self.path)
+
+    def test_is_past_day_file(self):
+        today = date(2024, 1, 2)
+        self.assertTrue(is_past_day_file(self.path, today))
+        self.assertFalse(is_past_day_file(self.path, date(2024, 1, 1)))
+        self.assertFalse(is_past_day_file("/data/2024/01/tmp_db", today))
+        self.assertFalse(is_past_day_file("/data/meta.txt", today))
+
+    def test_read_columns(self):
+        end = sum(len(line) for line in self.lines[700:])
+        columns = read_columns(self.path, self.offset, self.offset + end // 3)
+        self.assertEqual(columns["seq"][0], 600)
+        columns = read_columns(self.path, self.offset)
+        self.assertEqual(list(columns["seq"]), list(range(600, 1000)))
+
+    def test_cursor(self):
+        cursor = DataCursor(self.tmpdir.name, self.path, self.offset)
+        lines, offset = cursor.read(10)
+        self.assertEqual(lines, self.lines[600:610])
+        self.assertEqual(offset, sum(len(line) for line in self.lines[:610]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+from models.db_engine.db import TempDB
+from models.db_engine.staging import (
+    MARKER,
+    StagedDB,
+    flush_staged,
+    recover_staged,
+    staged_file,
+)
+from unittest.mock import patch
+import logging
+import os
+import tempfile
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+def data_line(seq):
+    return "ts={},seq={},speed=1.5\n".format(1_704_067_200 * 10**9 + seq, seq)
+
+
+class TestStagedDB(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "data")
+        self.staging_path = os.path.join(self.tmpdir.name, "shm")
+        self.target = os.path.join(self.db_path, "2024", "01", "01.txt")
+        os.makedirs(os.path.dirname(self.target))
+        with open(self.target, "w") as data_file:
+            data_file.write(data_line(0))
+        self.db = StagedDB(self.target, self.staging_path, self.db_path)
+        self.staged = staged_file(self.staging_path, self.db_path, self.target)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def read(self, path):
+        with open(path) as data_file:
+            return data_file.read()
+
+    def test_stages_until_flushed(self):
+        self.db.write_data_line({"ts": 1, "seq": 1})
+        self.assertEqual(self.read(self.target), data_line(0))
+        self.assertEqual(self.read(self.staged), "ts=1,seq=1\n")
+        self.assertEqual(self.db.flush(), len("ts=1,seq=1\n"))
+        self.assertEqual(self.read(self.target), data_line(0) + "ts=1,seq=1\n")
+        self.assertEqual(self.read(self.staged), "")
+        self.assertEqual(self.db.flush(), 0)
+
+    def test_due_on_size(self):
+        self.db.flush_size = len(data_line(1)) * 3
+        for seq in range(1, 3):
+            self.db.write(data_line(seq))
+            self.assertFalse(self.db.due())
+        self.db.write(data_line(3))
+        self.assertTrue(self.db.due())
+
+    def test_due_on_interval(self):
+        self.assertFalse(self.db.due())
+        with patch("models.db_engine.staging.monotonic", return_value=100.0):
+            self.db.write(data_line(1))
+        with patch("models.db_engine.staging.monotonic", return_value=104.0):
+            self.assertFalse(self.db.due())
+        with patch("models.db_engine.staging.monotonic", return_value=105.0):
+            self.assertTrue(self.db.due())
+
+    def test_writes_after_flush(self):
+        self.db.write(data_line(1))
+        self.db.flush()
+        self.db.write(data_line(2))
+        self.db.close()
+        self.assertEqual(self.read(self.target), "".join(map(data_line, range(3))))
+
+    def test_recover_after_crash(self):
+        self.db.write(data_line(1))
+        self.db.fd.close()  # the process dies, the staging directory stays
+        self.db.fd = None
+        with open(self.staged, "a") as staged:
+            staged.write("ts=2,se")
+        self.assertEqual(
+            recover_staged(self.staging_path, self.db_path), len(data_line(1))
+        )
+        self.assertEqual(self.read(self.target), data_line(0) + data_line(1))
+        self.assertEqual(self.read(self.staged), "")
+
+    def test_interrupted_flush(self):
+        self.db.write(data_line(1))
+        # the lines were appended but the staged file was not emptied
+        with open(self.staged + MARKER, "w") as marker:
+            marker.write(str(len(data_line(0))))
+        with open(self.target, "a") as data_file:
+            data_file.write(data_line(1)[:10])
+        flush_staged(self.staged, self.target)
+        self.assertEqual(self.read(self.target), data_line(0) + data_line(1))
+        self.assertFalse(os.path.exists(self.staged + MARKER))
+
+    def test_crash_after_staged_file_emptied(self):
+        self.db.write(data_line(1))
+        with patch("models.db_engine.staging.os.remove", side_effect=OSError("killed")):
+            with self.assertRaises(OSError):
+                self.db.flush()
+        self.assertTrue(os.path.exists(self.staged + MARKER))
+        self.db.fd.close()
+        self.db.fd = None
+        recover_staged(self.staging_path, self.db_path)
+        self.assertEqual(self.read(self.target), data_line(0) + data_line(1))
+        self.assertFalse(os.path.exists(self.staged + MARKER))
+
+    def test_outside_data_directory(self):
+        with self.assertRaises(ValueError):
+            staged_file(self.staging_path, self.db_path, self.tmpdir.name + ".txt")
+
+
+class TestStagedTempDB(unittest.TestCase):
+    def test_tmp_db_in_staging(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = {"tmp_db_path": "./tmp/tmp_db", "staging_path": tmpdir}
+            with patch("models.db_engine.db.env_variables", return_value=env):
+                self.assertEqual(TempDB().tmp_db_path, os.path.join(tmpdir, "tmp_db"))
+
+
+if __name__ == "__main__":
+    unittest.main()
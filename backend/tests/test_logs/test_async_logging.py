@@ -0,0 +1,112 @@
+from util.logger import (
+    AsyncHandler,
+    BaseLogger,
+    LogWriter,
+    SizeAndTimeRotatingFileHandler,
+    ThrottleFilter,
+)
+from unittest.mock import patch
+import logging
+import os
+import tempfile
+import threading
+import unittest
+
+
+class TestAsyncLogging(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "test.log")
+        self.disabled = logging.root.manager.disable
+        logging.disable(logging.NOTSET)
+
+    def read_lines(self, filename=None):
+        with open(filename or self.filename) as fd:
+            return fd.read().splitlines()
+
+    def test_records_are_written_by_the_writer_thread(self):
+        writers = []
+        target = logging.FileHandler(self.filename, delay=True)
+        target.emit = lambda record, emit=target.emit: (
+            writers.append(threading.current_thread().name),
+            emit(record),
+        )
+        logger = BaseLogger("async-test")
+        logger.addHandler(AsyncHandler(target))
+        logger.warning("hello %s", "world")
+        self.assertTrue(LogWriter.get().flush())
+        self.assertTrue(self.read_lines()[0].endswith("hello world"))
+        self.assertEqual(writers, ["log-writer"])
+        target.close()
+
+    def test_stopped_writer_writes_synchronously(self):
+        writer = LogWriter()
+        writer.stop()
+        target = logging.FileHandler(self.filename, delay=True)
+        record = logging.makeLogRecord({"msg": "after exit"})
+        writer.put(target, record)
+        self.assertTrue(writer.flush(timeout=0))
+        self.assertEqual(self.read_lines(), ["after exit"])
+        target.close()
+
+    def test_rotation_by_size(self):
+        handler = SizeAndTimeRotatingFileHandler(self.filename, max_bytes=50, backup_count=2)
+        logger = BaseLogger("size-test")
+        logger.addHandler(handler)
+        for index in range(10):
+            logger.warning("message number %d", index)
+        handler.close()
+        self.assertTrue(os.path.exists(self.filename + ".1"))
+        self.assertTrue(os.path.exists(self.filename + ".2"))
+        self.assertFalse(os.path.exists(self.filename + ".3"))
+
+    def test_rotation_by_time(self):
+        handler = SizeAndTimeRotatingFileHandler(self.filename, interval=60)
+        logger = BaseLogger("time-test")
+        logger.addHandler(handler)
+        logger.warning("first")
+        with patch("util.logger.time.time", return_value=handler.rollover_at + 1):
+            logger.warning("second")
+        handler.close()
+        self.assertEqual(len(self.read_lines(self.filename + ".1")), 1)
+        self.assertEqual(self.read_lines(), ["second"])
+
+    def test_rotated_by_another_process(self):
+        handler = SizeAndTimeRotatingFileHandler(self.filename, max_bytes=30, backup_count=2)
+        logger = BaseLogger("shared-test")
+        logger.addHandler(handler)
+        logger.warning("first message")
+        os.rename(self.filename, self.filename + ".1")  # another process rotated
+        logger.warning("second message, long enough to rotate")
+        handler.close()
+        self.assertFalse(os.path.exists(self.filename + ".2"))
+        self.assertEqual(self.read_lines(self.filename + ".1"), ["first message"])
+
+    def test_throttle_filter_sampling(self):
+        log_filter = ThrottleFilter()
+        record = logging.LogRecord("x", logging.INFO, "file.py", 1, "msg", None, None)
+        record.sample = 10
+        passed = sum(log_filter.filter(record) for _ in range(100))
+        self.assertEqual(passed, 10)
+
+    def test_throttle_filter_rate_limit(self):
+        log_filter = ThrottleFilter()
+        record = logging.LogRecord("x", logging.INFO, "file.py", 1, "msg", None, None)
+        record.per_second = 2
+        with patch("util.logger.time.monotonic", return_value=100.0):
+            passed = sum(log_filter.filter(record) for _ in range(10))
+        self.assertEqual(passed, 2)
+        with patch("util.logger.time.monotonic", return_value=101.0):
+            self.assertTrue(log_filter.filter(record))
+
+    def test_unthrottled_records_pass(self):
+        record = logging.LogRecord("x", logging.INFO, "file.py", 1, "msg", None, None)
+        self.assertTrue(ThrottleFilter().filter(record))
+
+    def tearDown(self):
+        logging.disable(self.disabled)
+        self.tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+from models import ModelLogger, LazyLogger
+import logging
+import os
+import tempfile
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestLazyLogger(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "logs", "lazy.log")
+
+    def test_declaring_a_logger_touches_nothing(self):
+        class Holder:
+            logger = ModelLogger.lazy("lazy-declared", self.filename)
+
+        self.assertIsInstance(Holder.__dict__["logger"], LazyLogger)
+        self.assertNotIn("lazy-declared", ModelLogger._loggers)
+        self.assertFalse(os.path.exists(os.path.dirname(self.filename)))
+
+        logger = Holder.logger
+        self.assertIs(Holder.logger, logger)
+        self.assertIs(ModelLogger.get("lazy-declared"), logger)
+        self.assertTrue(os.path.isdir(os.path.dirname(self.filename)))
+
+    def test_loggers_of_a_file_share_one_handler(self):
+        first = ModelLogger.get("lazy-first", self.filename)
+        second = ModelLogger.get("lazy-second", self.filename)
+        self.assertEqual(len(first.handlers), 1)
+        self.assertIs(first.handlers[0], second.handlers[0])
+
+    def test_customise_logger_is_idempotent(self):
+        logger = ModelLogger.get("lazy-idempotent", self.filename)
+        logger.customiseLogger(filename=self.filename)
+        logger.customiseLogger(filename=self.filename)
+        self.assertEqual(len(logger.handlers), 1)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+from models.manager.manager import CommandHandler, Manager
+from unittest.mock import MagicMock, call, patch
+import logging
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestStopDataSaving(unittest.TestCase):
+    def setUp(self):
+        self.handler = CommandHandler()
+        self.caller = MagicMock()
+        self.pipes = MagicMock()
+        patchers = [
+            patch.object(Manager, "send_cmd_sdm", self.pipes.sdm),
+            patch.object(Manager, "send_cmd_dsm", self.pipes.dsm),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_collection_stops_before_storage(self):
+        # a stale acknowledgement, then the one of this STOP
+        self.pipes.sdm.poll.side_effect = [True, False, True]
+        process = MagicMock()
+        process.is_alive.side_effect = [True, True, False]
+        self.caller.get_process.side_effect = lambda name: (
+            None if name == "data_replay" else process
+        )
+        status = self.handler.execute_command("STOP-DATA_SAVING", self.caller)
+        self.assertEqual(status["status"], "success")
+        sends = [
+            entry
+            for entry in self.pipes.mock_calls
+            if entry in (call.sdm.send("STOP"), call.dsm.send("END"))
+        ]
+        self.assertEqual(sends, [call.sdm.send("STOP"), call.dsm.send("END")])
+        self.assertEqual(self.pipes.sdm.recv.call_count, 2)
+        # the END was only sent once the STOP was acknowledged
+        self.assertLess(
+            self.pipes.mock_calls.index(call.sdm.poll(CommandHandler.STOP_TIMEOUT)),
+            self.pipes.mock_calls.index(call.dsm.send("END")),
+        )
+
+    def test_no_stop_queued_without_collection(self):
+        process = MagicMock()
+        process.is_alive.side_effect = [True, False]
+        self.caller.get_process.side_effect = lambda name: (
+            process if name == "data_saving" else None
+        )
+        status = self.handler.execute_command("STOP-DATA_SAVING", self.caller)
+        self.assertEqual(status["status"], "success")
+        self.pipes.sdm.send.assert_not_called()
+        self.pipes.dsm.send.assert_called_once_with("END")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+from models.manager.control import ControlServer, ControlClient, parse_request
+from unittest.mock import MagicMock
+import logging
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestParseRequest(unittest.TestCase):
+    def test_plain_text_request(self):
+        command, args = parse_request("start-data_saving longitude latitude\n")
+        self.assertEqual(command, "START-DATA_SAVING")
+        self.assertEqual(args, ["longitude", "latitude"])
+
+    def test_json_request(self):
+        command, args = parse_request('{"command": "STATUS", "args": []}')
+        self.assertEqual(command, "STATUS")
+        self.assertEqual(args, [])
+
+    def test_empty_request(self):
+        with self.assertRaises(ValueError):
+            parse_request("   \n")
+
+
+class TestControlServer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, "control.sock")
+        self.manager = MagicMock()
+        self.manager.get_status.return_value = {"status": "success", "processes": {}}
+        self.manager.handle_command.return_value = {
+            "status": "success",
+            "process": object(),
+            "process_name": "data_collection",
+            "message": "Data is being collected",
+        }
+        self.server = ControlServer(self.manager, self.socket_path)
+        self.thread = self.server.serve_in_background()
+
+    def test_status_query(self):
+        with ControlClient(self.socket_path, timeout=5) as client:
+            response = client.request("STATUS")
+        self.assertEqual(response, {"status": "success", "processes": {}})
+        self.manager.handle_command.assert_not_called()
+
+    def test_command_is_forwarded_without_process(self):
+        with ControlClient(self.socket_path, timeout=5) as client:
+            response = client.request("START-DATA_SAVING", "longitude")
+        self.manager.handle_command.assert_called_once_with(
+            "START-DATA_SAVING", "longitude"
+        )
+        self.assertNotIn("process", response)
+        self.assertEqual(response["process_name"], "data_collection")
+
+    def test_connection_query(self):
+        from models.metrics.pipeline import PipelineMetrics
+
+        process = MagicMock()
+        process.is_alive.return_value = True
+        self.manager.get_process.return_value = process
+        PipelineMetrics.connection_state.labels("disconnected").set(0)
+        PipelineMetrics.connection_state.labels("interrupted").set(1)
+        try:
+            with ControlClient(self.socket_path, timeout=5) as client:
+                response = client.request("CONNECTION")
+        finally:
+            PipelineMetrics.connection_state.labels("interrupted").set(0)
+        self.assertEqual(response["state"], "interrupted")
+        self.assertTrue(response["running"])
+        self.manager.get_process.assert_called_with("cloud_transfer")
+
+    def test_unknown_command(self):
+        with ControlClient(self.socket_path, timeout=5) as client:
+            response = client.request("REBOOT")
+        self.assertEqual(response["status"], "failed")
+
+    def test_queries_are_answered_while_a_command_blocks(self):
+        release = threading.Event()
+
+        def slow_command(command, *args):
+            release.wait(5)
+            return {"status": "success", "process_name": "cloud_transfer"}
+
+        self.manager.handle_command.side_effect = slow_command
+        results = {}
+
+        def send_command():
+            with ControlClient(self.socket_path, timeout=5) as client:
+                results["command"] = client.request("STOP-CLOUD_TRANSFER")
+
+        sender = threading.Thread(target=send_command)
+        sender.start()
+        time.sleep(0.1)
+        with ControlClient(self.socket_path, timeout=5) as client:
+            self.assertEqual(client.request("PING")["message"], "pong")
+        self.assertNotIn("command", results)
+        release.set()
+        sender.join(5)
+        self.assertEqual(results["command"]["status"], "success")
+
+    def tearDown(self):
+        self.server.stop()
+        self.thread.join(5)
+        self.tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+from util import get_base_path
+from util.importtime import measure_import, total_import_time
+import unittest
+
+# Modules app.py loads before the first command is received
+STARTUP_MODULES = [
+    "models.manager.manager",
+    "models.manager.control",
+    "models.metrics.exporter",
+    "models.metrics.pipeline",
+    "models.metrics.tracing",
+]
+# Dependencies that must only be loaded by the component using them
+HEAVY_MODULES = ["awscrt", "awsiot", "gpsd", "requests", "RPi", "pynput", "numpy"]
+# Generous budget: a desktop imports these in about 0.1 s
+STARTUP_BUDGET_US = 1_000_000
+
+
+class TestImportTime(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.report = measure_import(STARTUP_MODULES, cwd=get_base_path())
+
+    def test_heavy_dependencies_are_deferred(self):
+        imported = {name.split(".")[0] for name in self.report}
+        self.assertEqual(imported & set(HEAVY_MODULES), set())
+
+    def test_pipeline_components_are_deferred(self):
+        for module in (
+            "models.sensor_mgmt.sensor_manager",
+            "models.data_manager.storage_manager",
+            "models.data_manager.cloud_transfer",
+            "models.sensors.gps",
+        ):
+            self.assertNotIn(module, self.report)
+
+    def test_startup_import_budget(self):
+        self.assertLess(
+            total_import_time(self.report, STARTUP_MODULES), STARTUP_BUDGET_US
+        )
+
+    def test_sensor_modules_defer_hardware_libraries(self):
+        report = measure_import(
+            ["models.sensors.gps", "models.sensors.ultrasonic"], cwd=get_base_path()
+        )
+        imported = {name.split(".")[0] for name in report}
+        self.assertEqual(imported & {"gpsd", "requests", "RPi"}, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
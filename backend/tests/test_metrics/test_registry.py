@@ -0,0 +1,112 @@
+from models.metrics.registry import MetricsRegistry, format_value
+from models.metrics.exporter import MetricsServer
+from multiprocessing import Process
+from urllib.request import urlopen
+import logging
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+def increment(counter, gauge, times):
+    for _ in range(times):
+        counter.inc()
+        gauge.labels("child").inc()
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        counter = self.registry.counter("samples_total", "Samples")
+        counter.inc()
+        counter.inc(2)
+        self.assertEqual(counter.get(), 3)
+        with self.assertRaises(ValueError):
+            counter.inc(-1)
+
+    def test_register_returns_existing_family(self):
+        counter = self.registry.counter("samples_total", "Samples")
+        self.assertIs(self.registry.counter("samples_total", "Samples"), counter)
+        with self.assertRaises(ValueError):
+            self.registry.gauge("samples_total", "Samples")
+
+    def test_labelled_gauge(self):
+        gauge = self.registry.gauge("depth", "Depth", ["pipe"])
+        gauge.labels("a").inc(3)
+        gauge.labels("a").dec()
+        gauge.labels("b").set(7)
+        self.assertEqual(gauge.labels("a").get(), 2)
+        self.assertEqual(gauge.labels("b").get(), 7)
+        with self.assertRaises(ValueError):
+            gauge.labels("a", "b")
+
+    def test_too_many_series(self):
+        gauge = self.registry.gauge("depth", "Depth", ["pipe"], max_series=1)
+        gauge.labels("a")
+        with self.assertRaises(ValueError):
+            gauge.labels("b")
+
+    def test_gauge_function(self):
+        gauge = self.registry.gauge("size", "Size")
+        gauge.set_function(lambda: 42)
+        self.assertEqual(gauge.get(), 42)
+
+    def test_histogram(self):
+        histogram = self.registry.histogram("latency", "Latency", buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value)
+        samples = {
+            (name, tuple(labels)): value for name, labels, value in histogram.samples()
+        }
+        self.assertEqual(samples[("latency_bucket", (("le", "0.1"),))], 2)
+        self.assertEqual(samples[("latency_bucket", (("le", "1"),))], 3)
+        self.assertEqual(samples[("latency_bucket", (("le", "+Inf"),))], 4)
+        self.assertEqual(samples[("latency_count", ())], 4)
+        self.assertAlmostEqual(samples[("latency_sum", ())], 5.65)
+
+    def test_values_are_shared_with_child_processes(self):
+        counter = self.registry.counter("samples_total", "Samples")
+        gauge = self.registry.gauge("depth", "Depth", ["pipe"])
+        process = Process(target=increment, args=(counter, gauge, 5))
+        process.start()
+        process.join()
+        self.assertEqual(counter.get(), 5)
+        self.assertEqual(gauge.labels("child").get(), 5)
+
+    def test_exposition(self):
+        self.registry.counter("samples_total", "Samples").inc()
+        self.registry.gauge("depth", "Depth", ["pipe"]).labels('a"b').set(1.5)
+        text = self.registry.exposition()
+        self.assertIn("# HELP samples_total Samples\n", text)
+        self.assertIn("# TYPE samples_total counter\nsamples_total 1\n", text)
+        self.assertIn('depth{pipe="a\\"b"} 1.5\n', text)
+
+    def test_format_value(self):
+        self.assertEqual(format_value(float("inf")), "+Inf")
+        self.assertEqual(format_value(float("nan")), "NaN")
+        self.assertEqual(format_value(3.0), "3")
+        self.assertEqual(format_value(0.25), "0.25")
+
+
+class TestMetricsServer(unittest.TestCase):
+    def test_metrics_endpoint(self):
+        registry = MetricsRegistry()
+        registry.counter("samples_total", "Samples").inc()
+        server = MetricsServer(registry, "127.0.0.1", 0)
+        server.serve_in_background()
+        try:
+            url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+            with urlopen(url, timeout=5) as response:
+                body = response.read().decode()
+                content_type = response.headers["Content-Type"]
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn("samples_total 1", body)
+        self.assertTrue(content_type.startswith("text/plain; version=0.0.4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from models.metrics.registry import MetricsRegistry
+from models.metrics.tracing import (
+    Trace,
+    TraceMetrics,
+    latency_report,
+    record_age_from_data,
+    unwrap,
+)
+from unittest.mock import patch
+import logging
+import time
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+class TestSummary(unittest.TestCase):
+    def test_quantiles_over_rolling_window(self):
+        summary = MetricsRegistry().summary("age", "Age", window=100)
+        for value in range(1, 201):
+            summary.observe(value)
+        quantiles = summary.quantiles()
+        # only the latest 100 observations (101..200) are kept
+        self.assertEqual(quantiles[0.5], 150)
+        self.assertEqual(quantiles[0.95], 195)
+        self.assertEqual(quantiles[0.99], 199)
+        self.assertEqual(summary.get(), 200)
+
+    def test_exposition(self):
+        registry = MetricsRegistry()
+        registry.summary("age", "Age", ["stage"]).labels("stored").observe(0.5)
+        text = registry.exposition()
+        self.assertIn("# TYPE age summary\n", text)
+        self.assertIn('age{stage="stored",quantile="0.99"} 0.5\n', text)
+        self.assertIn('age_count{stage="stored"} 1\n', text)
+
+
+class TestTrace(unittest.TestCase):
+    def test_mark_records_age(self):
+        trace = Trace(capture_ns=1_000_000_000)
+        with patch(
+            "models.metrics.tracing.time.monotonic_ns", return_value=3_500_000_000
+        ):
+            age = trace.mark("unit-test")
+        self.assertEqual(age, 2.5)
+        self.assertEqual(trace.stages, {"unit-test": 3_500_000_000})
+        self.assertEqual(latency_report()["unit-test"]["p99"], 2.5)
+
+    def test_unwrap(self):
+        trace = Trace.start()
+        self.assertEqual(unwrap(({"a": 1}, trace)), ({"a": 1}, trace))
+        self.assertEqual(unwrap({"a": 1}), ({"a": 1}, None))
+        self.assertEqual(unwrap((1, 2)), ((1, 2), None))
+
+    def test_record_age_from_data(self):
+        captured = datetime.now() - timedelta(seconds=30)
+        data = {
+            "date": captured.strftime("%Y-%m-%d"),
+            "time": captured.strftime("%H:%M:%S"),
+        }
+        age = record_age_from_data("published", data)
+        self.assertGreaterEqual(age, 29)
+        self.assertLess(age, 40)
+        self.assertIsNone(record_age_from_data("published", {"speed": "1"}))
+
+    def test_record_age_from_stamp(self):
+        data = {"ts": str(time.time_ns() - 30 * 10**9), "seq": "0"}
+        age = record_age_from_data("published", data)
+        self.assertGreaterEqual(age, 30)
+        self.assertLess(age, 40)
+
+    def test_report_keeps_pipeline_order(self):
+        for stage in ("stored", "collected"):
+            TraceMetrics.sample_age_seconds.labels(stage).observe(0.1)
+        stages = list(latency_report())
+        self.assertLess(stages.index("collected"), stages.index("stored"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,249 @@
+from unittest.mock import MagicMock, patch
+from benchmarks.datagen import generate
+from datetime import date, datetime
+from models.manager.manager import CommandHandler, Manager
+from models.sensor_mgmt.replay import ReplayDataManager, parse_replay_args
+from models.metrics.tracing import unwrap
+from multiprocessing import Pipe
+from tempfile import TemporaryDirectory
+from time import monotonic
+import logging
+import os
+import threading
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+
+def receive_all(pipe):
+    samples = []
+    while pipe.poll():
+        samples.append(unwrap(pipe.recv()))
+    return samples
+
+
+class TestReplayArgs(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(
+            parse_replay_args(
+                [
+                    "from=2024-01-02",
+                    "to=2024-01-03",
+                    "speed=max",
+                    "timing=fixed",
+                    "loop=yes",
+                ]
+            ),
+            {
+                "start": date(2024, 1, 2),
+                "end": date(2024, 1, 3),
+                "speed": None,
+                "timing": "fixed",
+                "loop": True,
+            },
+        )
+        self.assertEqual(parse_replay_args(["speed=10"]), {"speed": 10.0})
+
+    def test_invalid(self):
+        for args in (
+            ["speed"],
+            ["speed=0"],
+            ["timing=late"],
+            ["colour=red"],
+            ["from=today"],
+        ):
+            with self.assertRaises(ValueError):
+                parse_replay_args(args)
+
+
+class TestReplayDataManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.data_path = os.path.join(self.tmpdir.name, "data")
+        self.comm_send, self.comm_recv = Pipe()
+        self.data_send, self.data_recv = Pipe()
+
+    def write_day(self, name, lines):
+        directory = os.path.join(self.data_path, "2024", "01")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, name), "w") as day_file:
+            day_file.writelines(line + "\n" for line in lines)
+
+    def run_and_receive(self, replay):
+        thread = threading.Thread(
+            target=replay.run, args=(self.comm_recv, self.data_send)
+        )
+        thread.start()
+        samples = []
+        while thread.is_alive() or self.data_recv.poll():
+            if self.data_recv.poll(0.01):
+                samples.append(unwrap(self.data_recv.recv()))
+        thread.join()
+        return samples
+
+    def test_get_files_between_days(self):
+        generate(self.tmpdir.name, date(2024, 1, 30), 4, interval=3600, workers=1)
+        replay = ReplayDataManager(
+            start=date(2024, 1, 31), end=date(2024, 2, 1), data_path=self.data_path
+        )
+        files = [os.path.relpath(path, self.data_path) for path in replay.get_files()]
+        self.assertEqual(
+            files,
+            [
+                os.path.join("2024", "01", "31.txt"),
+                os.path.join("2024", "02", "01.txt"),
+            ],
+        )
+
+    def test_replay_at_max_speed(self):
+        generate(self.tmpdir.name, date(2024, 1, 1), 2, interval=3600, workers=1)
+        replay = ReplayDataManager(speed=None, data_path=self.data_path)
+        samples = self.run_and_receive(replay)
+        self.assertEqual(len(samples), 48)
+        midnight = int(datetime(2024, 1, 1).timestamp())
+        self.assertEqual(int(samples[0][0]["ts"]), midnight * 10**9)
+        self.assertEqual(int(samples[-1][0]["ts"]), (midnight + 47 * 3600) * 10**9)
+        self.assertEqual(samples[-1][0]["seq"], "23")
+        self.assertTrue(all(trace is not None for _, trace in samples))
+
+    def test_files_are_read_up_to_their_initial_size(self):
+        self.write_day("01.txt", ["distance=1,time=10:00:00,date=2024-01-01"] * 2)
+        path = os.path.join(self.data_path, "2024", "01", "01.txt")
+        samples = ReplayDataManager(speed=None, data_path=self.data_path).read_samples()
+        next(samples)
+        with open(path, "a") as day_file:
+            day_file.write("distance=2,time=10:00:00,date=2024-01-01\n")
+        self.assertEqual([sample["distance"] for sample in samples], ["1"])
+
+    def test_original_timing(self):
+        self.write_day(
+            "01.txt",
+            [
+                "distance=1,time=10:00:00,date=2024-01-01",
+                "distance=2,time=10:00:10,date=2024-01-01",
+                "distance=3,time=10:00:30,date=2024-01-01",
+            ],
+        )
+        replay = ReplayDataManager(speed=200, data_path=self.data_path)
+        start = monotonic()
+        replay.run(self.comm_recv, self.data_send)
+        self.assertGreaterEqual(monotonic() - start, 0.15)
+        self.assertEqual(
+            [s["distance"] for s, _ in receive_all(self.data_recv)], ["1", "2", "3"]
+        )
+
+    def test_original_timing_of_stamped_samples(self):
+        first = int(datetime(2024, 1, 1, 10).timestamp()) * 10**9
+        self.write_day(
+            "01.txt",
+            [
+                "ts={},seq=0,distance=1".format(first),
+                "ts={},seq=1,distance=2".format(first + 20 * 10**9),
+            ],
+        )
+        replay = ReplayDataManager(speed=200, restamp=True, data_path=self.data_path)
+        start = monotonic()
+        replay.run(self.comm_recv, self.data_send)
+        self.assertGreaterEqual(monotonic() - start, 0.1)
+        samples = [sample for sample, _ in receive_all(self.data_recv)]
+        self.assertGreater(samples[0]["ts"], first + 20 * 10**9)
+        self.assertLess(samples[0]["ts"], samples[1]["ts"])
+        self.assertNotIn("date", samples[0])
+
+    def test_fixed_timing_and_restamp(self):
+        self.write_day("01.txt", ["distance=1,time=10:00:00,date=2020-01-01"] * 3)
+        replay = ReplayDataManager(
+            speed=100,
+            timing="fixed",
+            interval=5,
+            restamp=True,
+            data_path=self.data_path,
+        )
+        start = monotonic()
+        replay.run(self.comm_recv, self.data_send)
+        self.assertGreaterEqual(monotonic() - start, 0.1)
+        samples = receive_all(self.data_recv)
+        self.assertEqual(samples[0][0]["date"], str(datetime.now().date()))
+
+    def test_end_stops_the_replay(self):
+        self.write_day("01.txt", ["distance=1,time=10:00:00,date=2024-01-01"] * 3)
+        self.comm_send.send("END")
+        ReplayDataManager(speed=1, data_path=self.data_path).run(
+            self.comm_recv, self.data_send
+        )
+        self.assertEqual(receive_all(self.data_recv), [])
+
+    def test_end_stops_the_replay_on_a_full_pipe(self):
+        self.write_day("01.txt", ["distance=1,time=10:00:00,date=2024-01-01"] * 5000)
+        replay = ReplayDataManager(speed=None, data_path=self.data_path)
+        thread = threading.Thread(
+            target=replay.run, args=(self.comm_recv, self.data_send)
+        )
+        thread.start()
+        # nothing reads the data pipe
+        threading.Timer(0.2, self.comm_send.send, ("END",)).start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertLess(len(receive_all(self.data_recv)), 5000)
+
+
+class TestReplayCommands(unittest.TestCase):
+    def setUp(self):
+        self.handler = CommandHandler()
+        self.caller = MagicMock()
+
+    def test_refused_while_collecting(self):
+        self.caller.get_process.return_value.is_alive.return_value = True
+        status = self.handler.execute_command("START-DATA_REPLAY", self.caller)
+        self.assertEqual(status["status"], "failed")
+        self.assertEqual(status["message"], "Data collection ongoing")
+
+        status = self.handler.execute_command("START-DATA_COLLECTION", self.caller)
+        self.assertEqual(status["message"], "Data replay ongoing")
+
+    def test_refused_without_data_saving(self):
+        self.caller.get_process.side_effect = lambda name: None
+        status = self.handler.execute_command("START-DATA_REPLAY", self.caller)
+        self.assertEqual(status["status"], "failed")
+        self.assertEqual(status["message"], "Data saving is not running")
+
+    def test_stop_data_saving_stops_the_replay(self):
+        processes = {"data_saving": MagicMock(), "data_replay": MagicMock()}
+        processes["data_saving"].is_alive.side_effect = [True, False]
+        processes["data_replay"].is_alive.side_effect = [True, False]
+        self.caller.get_process.side_effect = processes.get
+        with patch.object(Manager, "send_cmd_rdm") as rdm, patch.object(
+            Manager, "send_cmd_dsm"
+        ), patch.object(Manager, "send_cmd_sdm") as sdm:
+            sdm.poll.return_value = False
+            status = self.handler.execute_command("STOP-DATA_SAVING", self.caller)
+        self.assertEqual(status["status"], "success")
+        rdm.send.assert_called_once_with("END")
+        processes["data_replay"].join.assert_called_once_with(
+            CommandHandler.REPLAY_STOP_TIMEOUT
+        )
+
+    def test_stuck_replay_is_terminated(self):
+        process = self.caller.get_process.return_value
+        process.is_alive.return_value = True
+        with patch.object(Manager, "send_cmd_rdm"):
+            status = self.handler.execute_command("STOP-DATA_REPLAY", self.caller)
+        self.assertEqual(status["status"], "success")
+        process.terminate.assert_called_once()
+
+    def test_bad_arguments(self):
+        self.caller.get_process.return_value = None
+        status = self.handler.execute_command(
+            "START-DATA_REPLAY", self.caller, "speed=fast"
+        )
+        self.assertEqual(status["status"], "failed")
+
+    def test_stop_without_replay(self):
+        self.caller.get_process.return_value = None
+        status = self.handler.execute_command("STOP-DATA_REPLAY", self.caller)
+        self.assertEqual(status["status"], "success")
+
+
+if __name__ == "__main__":
+    unittest.main()
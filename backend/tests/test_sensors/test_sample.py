@@ -0,0 +1,340 @@
+from models.data_manager.storage_manager import StorageManager
+from models.db_engine.db import FileDB, TempDB
+from models.metrics.tracing import Trace
+from models.sensor_mgmt.sensor_manager import SensorDataManager
+from models.sensors.sample import (
+    Projection,
+    Sample,
+    SampleBatcher,
+    SampleChunk,
+    SampleLayout,
+    SampleReader,
+    unpack,
+)
+from multiprocessing import Pipe
+from unittest.mock import MagicMock, patch
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+GPS = {"longitude": 7.3, "latitude": 51.2, "altitude": None, "speed": 0.0}
+
+
+class TestSample(unittest.TestCase):
+    def test_reads_like_a_dict(self):
+        sample = Sample.from_dict({"date": "2024-01-01", **GPS})
+        self.assertEqual(sample["latitude"], 51.2)
+        self.assertIsNone(sample.get("distance"))
+        self.assertIn("speed", sample)
+        self.assertEqual(list(sample), ["date", *GPS])
+        self.assertEqual(sample, {"date": "2024-01-01", **GPS})
+        self.assertEqual(sample.to_dict(), {"date": "2024-01-01", **GPS})
+        with self.assertRaises(KeyError):
+            sample["distance"]
+        with self.assertRaises(AttributeError):
+            sample.extra = 1
+
+    def test_layouts_are_shared(self):
+        first = Sample.from_dict(GPS)
+        second = pickle.loads(pickle.dumps(Sample.from_dict(dict(GPS))))
+        self.assertIs(first.layout, second.layout)
+        self.assertIs(SampleLayout.of(GPS), first.layout)
+        self.assertEqual(first, second)
+
+    def test_packed(self):
+        sample = Sample.from_dict(GPS)
+        message = pickle.loads(pickle.dumps((sample.pack(), None)))[0]
+        self.assertIs(Sample.unpack(message).layout, sample.layout)
+        self.assertEqual(Sample.unpack(message), GPS)
+        self.assertIs(Sample.unpack(GPS), GPS)
+
+    def test_written_line(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "01.txt")
+            with FileDB(path, "w") as db:
+                db.write_data_line(Sample.from_dict(GPS))
+                db.write_data_line(GPS)
+                db.write_data_line({"a{}": "{0}"})
+            with open(path) as day_file:
+                first, second, third = day_file.readlines()
+        self.assertEqual(first, second)
+        self.assertEqual(Sample.from_dict({"a{}": "{0}"}).to_line(), third)
+
+
+class TestSampleReader(unittest.TestCase):
+    def test_compiled_once(self):
+        reader = SampleReader()
+        first = reader.read([{"date": "2024-01-01"}, GPS])
+        with patch.object(SampleLayout, "of") as layout_of:
+            second = reader.read([{"date": "2024-01-02"}, dict(GPS, speed=1.5)])
+        layout_of.assert_not_called()
+        self.assertIs(first.layout, second.layout)
+        self.assertEqual(second, {"date": "2024-01-02", **GPS, "speed": 1.5})
+        # the sample keeps its values when the sensor updates its dict
+        gps = dict(GPS)
+        third = reader.read([{"date": "2024-01-03"}, gps])
+        gps["speed"] = 3.0
+        self.assertEqual(third["speed"], 0.0)
+
+    def test_sensor_fields_change(self):
+        reader = SampleReader()
+        reader.read([{"date": "2024-01-01"}, GPS])
+        sample = reader.read([{"date": "2024-01-01"}, {"distance": 12.5}])
+        self.assertEqual(sample, {"date": "2024-01-01", "distance": 12.5})
+        sample = reader.read([{"date": "2024-01-01"}])
+        self.assertEqual(sample.keys(), ("date",))
+        # same fields in another order
+        sample = reader.read([{"speed": 1, "latitude": 2}])
+        self.assertEqual(sample.keys(), ("speed", "latitude"))
+        sample = reader.read([{"latitude": 2, "speed": 1}])
+        self.assertEqual(sample.keys(), ("latitude", "speed"))
+
+    def test_shared_field(self):
+        reader = SampleReader()
+        sample = reader.read([{"time": "00:00:00", "a": 1}, {"time": "00:00:20"}])
+        self.assertEqual(sample, {"time": "00:00:20", "a": 1})
+        self.assertEqual(sample.keys(), ("time", "a"))
+
+
+class TestProjection(unittest.TestCase):
+    def test_sample(self):
+        projection = Projection(["speed", "longitude"])
+        projected = projection(Sample.from_dict(GPS))
+        self.assertIsInstance(projected, Sample)
+        self.assertEqual(projected.keys(), ("speed", "longitude"))
+        self.assertEqual(projected, {"speed": 0.0, "longitude": 7.3})
+        with self.assertRaises(KeyError):
+            projection(Sample.from_dict({"speed": 1}))
+
+    def test_dict(self):
+        projection = Projection(["latitude"])
+        self.assertEqual(projection(GPS), {"latitude": 51.2})
+        with self.assertRaises(KeyError):
+            projection({"longitude": 7.3})
+
+    def test_keeps_the_stamp(self):
+        projection = Projection(["speed"], keep=["ts", "seq"])
+        sample = Sample.from_dict({"ts": 10, "seq": 0, **GPS})
+        self.assertEqual(projection(sample).keys(), ("ts", "seq", "speed"))
+        self.assertEqual(projection(GPS), {"speed": 0.0})
+        self.assertEqual(
+            projection({"seq": 1, "ts": 10, "speed": 2}),
+            {"ts": 10, "seq": 1, "speed": 2},
+        )
+        chunk = projection(SampleChunk.from_samples([sample]))
+        self.assertEqual(chunk.layout.keys, ("ts", "seq", "speed"))
+        selected = Projection(["seq", "speed"], keep=["ts", "seq"])(sample)
+        self.assertEqual(selected.keys(), ("ts", "seq", "speed"))
+
+    def test_storage_manager(self):
+        with patch.object(FileDB, "create_file"):
+            manager = StorageManager(["latitude", "speed"])
+        projected = manager.get_data_from_specified_sensor(Sample.from_dict(GPS))
+        self.assertEqual(projected, {"latitude": 51.2, "speed": 0.0})
+
+
+class TestSampleChunk(unittest.TestCase):
+    def setUp(self):
+        self.samples = [Sample.from_dict(dict(GPS, speed=speed)) for speed in range(3)]
+        self.chunk = SampleChunk.from_samples(self.samples)
+
+    def test_columns(self):
+        self.assertEqual(len(self.chunk), 3)
+        self.assertEqual(list(self.chunk.columns[3]), [0, 1, 2])
+        self.assertEqual(list(self.chunk.samples()), self.samples)
+        self.assertEqual(
+            self.chunk.to_lines(), "".join(sample.to_line() for sample in self.samples)
+        )
+
+    def test_packed(self):
+        message = pickle.loads(pickle.dumps(self.chunk.pack()))
+        chunk = unpack(message)
+        self.assertIsInstance(chunk, SampleChunk)
+        self.assertIs(chunk.layout, self.chunk.layout)
+        self.assertEqual(list(chunk.samples()), self.samples)
+        self.assertEqual(unpack(self.samples[0].pack()), self.samples[0])
+        self.assertIs(unpack(GPS), GPS)
+
+    def test_projection(self):
+        chunk = Projection(["speed", "latitude"])(self.chunk)
+        self.assertEqual(chunk.layout.keys, ("speed", "latitude"))
+        self.assertEqual(
+            list(chunk.samples()),
+            [{"speed": speed, "latitude": 51.2} for speed in range(3)],
+        )
+
+
+class TestSampleBatcher(unittest.TestCase):
+    def test_size(self):
+        batcher = SampleBatcher(3, 60)
+        ready = [
+            batcher.add(Sample.from_dict({"a": index}), index) for index in range(7)
+        ]
+        self.assertEqual([len(chunks) for chunks in ready], [0, 0, 1, 0, 0, 1, 0])
+        chunk, trace = ready[2][0]
+        self.assertEqual(list(chunk.columns[0]), [0, 1, 2])
+        self.assertEqual(trace, 0)
+        self.assertEqual(ready[5][0][1], 3)
+        ((chunk, trace),) = batcher.flush()
+        self.assertEqual(list(chunk.columns[0]), [6])
+        self.assertEqual(batcher.flush(), [])
+
+    def test_interval(self):
+        batcher = SampleBatcher(100, 0.01)
+        self.assertEqual(batcher.add(Sample.from_dict({"a": 1})), [])
+        time.sleep(0.02)
+        ((chunk, _),) = batcher.add(Sample.from_dict({"a": 2}))
+        self.assertEqual(len(chunk), 2)
+
+    def test_deadline(self):
+        batcher = SampleBatcher(100, 60)
+        self.assertIsNone(batcher.deadline())
+        self.assertFalse(batcher.due())
+        start = time.monotonic()
+        batcher.add(Sample.from_dict({"a": 1}))
+        self.assertAlmostEqual(batcher.deadline(), start + 60, delta=1)
+        self.assertFalse(batcher.due())
+        batcher.interval = 0
+        self.assertTrue(batcher.due())
+
+    def test_layout_change(self):
+        batcher = SampleBatcher(100, 60)
+        batcher.add(Sample.from_dict({"a": 1}))
+        ((chunk, _),) = batcher.add(Sample.from_dict({"b": 2}))
+        self.assertEqual(chunk.layout.keys, ("a",))
+        ((chunk, _),) = batcher.flush()
+        self.assertEqual(chunk.layout.keys, ("b",))
+
+
+class TestPipeline(unittest.TestCase):
+    def test_collected_sample(self):
+        with patch.object(TempDB, "get_tmp_db_path", return_value="tmp.txt"):
+            manager = SensorDataManager()
+        gps, distance = MagicMock(), MagicMock()
+        gps.get_data.return_value = GPS
+        distance.get_data.return_value = {"distance": 12.5}
+        manager.sensors = [gps, distance]
+        before = time.time_ns()
+        sample = manager.get_data_from_sensors()
+        self.assertIsInstance(sample, Sample)
+        self.assertIs(manager.data, sample)
+        self.assertEqual(sample.keys(), ("ts", "seq", *GPS, "distance"))
+        self.assertEqual(
+            sample, {"ts": sample["ts"], "seq": 0, **GPS, "distance": 12.5}
+        )
+        self.assertLessEqual(before, sample["ts"])
+        second = manager.get_data_from_sensors()
+        self.assertIs(second.layout, sample.layout)
+        self.assertEqual(second["seq"], 1)
+        self.assertLessEqual(sample["ts"], second["ts"])
+
+    def test_stored_sample(self):
+        comm_pipe, recv_comm_pipe = Pipe()
+        send_data_pipe, recv_data_pipe = Pipe()
+        with patch.object(FileDB, "create_file"), patch.object(
+            StorageManager, "save_collected_data", autospec=True
+        ) as save:
+            manager = StorageManager(sensor_names=["speed", "latitude"])
+            send_data_pipe.send((Sample.from_dict(GPS).pack(), Trace.start()))
+            comm_pipe.send("END")
+            manager.run(recv_comm_pipe, recv_data_pipe)
+        stored = save.call_args[0][1]
+        self.assertIsInstance(stored, Sample)
+        self.assertEqual(stored, {"speed": 0.0, "latitude": 51.2})
+
+    def test_batched(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp_path = os.path.join(tmpdir, "tmp.txt")
+            open(tmp_path, "w").close()
+            with patch.object(TempDB, "get_tmp_db_path", return_value=tmp_path):
+                manager = SensorDataManager()
+            manager.COLLECTION_INTERVAL = 0
+            manager.batch_size = 4
+            comm_pipe, recv_comm_pipe = Pipe()
+            send_data_pipe, recv_data_pipe = Pipe()
+            gps = MagicMock()
+            readings = [dict(GPS, speed=speed) for speed in range(10)]
+
+            def get_data():
+                # storage stops after 5 samples, collection after 7
+                if len(gps.get_data.mock_calls) == 5:
+                    comm_pipe.send("STOP")
+                if len(gps.get_data.mock_calls) == 7:
+                    comm_pipe.send("END")
+                return readings[len(gps.get_data.mock_calls) - 1]
+
+            gps.get_data.side_effect = get_data
+            manager.sensors = [gps]
+            comm_pipe.send("START")
+            with self.assertRaises(SystemExit):
+                manager.run(recv_comm_pipe, send_data_pipe)
+            # acknowledged once the pending chunk is sent
+            self.assertEqual(comm_pipe.recv(), "STOPPED")
+            chunks = []
+            while recv_data_pipe.poll():
+                message, trace = recv_data_pipe.recv()
+                self.assertIsInstance(trace, Trace)
+                chunks.append(unpack(message))
+            with open(tmp_path) as tmp_file:
+                saved = tmp_file.readlines()
+
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 1])
+        sent = [sample["speed"] for chunk in chunks for sample in chunk.samples()]
+        self.assertEqual(sent, [0, 1, 2, 3, 4])
+        # every sample is saved to the temporary database, sent or not
+        self.assertEqual(len(saved), 7)
+
+        with tempfile.TemporaryDirectory() as tmpdir, patch.object(
+            FileDB, "create_file", return_value=os.path.join(tmpdir, "01.txt")
+        ):
+            storage = StorageManager(["speed"])
+            for chunk in chunks:
+                storage.save_collected_data(
+                    storage.get_data_from_specified_sensor(chunk)
+                )
+            with open(storage.db_path) as day_file:
+                stored = day_file.read()
+        lines = stored.splitlines()
+        self.assertEqual(len(lines), 5)
+        for seq, line in enumerate(lines):
+            ts, rest = line.split(",", 1)
+            self.assertTrue(ts.startswith("ts="))
+            self.assertEqual(rest, "seq={},speed={}".format(seq, seq))
+
+    def test_batch_sent_on_its_deadline(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp_path = os.path.join(tmpdir, "tmp.txt")
+            open(tmp_path, "w").close()
+            with patch.object(TempDB, "get_tmp_db_path", return_value=tmp_path):
+                manager = SensorDataManager()
+            manager.COLLECTION_INTERVAL = 60
+            manager.batch_size = 10
+            manager.batch_interval = 0.05
+            comm_pipe, recv_comm_pipe = Pipe()
+            send_data_pipe, recv_data_pipe = Pipe()
+            gps = MagicMock()
+            gps.get_data.return_value = GPS
+            manager.sensors = [gps]
+            comm_pipe.send("START")
+            timer = threading.Timer(0.5, comm_pipe.send, ["END"])
+            timer.start()
+            start = time.monotonic()
+            with self.assertRaises(SystemExit):
+                manager.run(recv_comm_pipe, send_data_pipe)
+            timer.join()
+            # the next collection was 60 s away
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertTrue(recv_data_pipe.poll())
+            message, _ = recv_data_pipe.recv()
+            self.assertEqual(len(unpack(message)), 1)
+            self.assertEqual(gps.get_data.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
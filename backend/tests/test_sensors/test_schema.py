@@ -0,0 +1,99 @@
+from models.db_engine.bulk import parse_buffer
+from models.db_engine.db import TempDB
+from models.sensors.gps import GPS
+from models.sensors.schema import Field, RecordSchema, record_schema
+from unittest.mock import patch
+from util import modify_data_to_dict
+import logging
+import numpy as np
+import os
+import tempfile
+import unittest
+
+logging.disable(logging.CRITICAL)
+
+LINE = "altitude=213.2,longitude=None,time=00:00:20,date=2024-01-01,count=7,note=a\n"
+
+
+class TestRecordSchema(unittest.TestCase):
+    def setUp(self):
+        self.schema = RecordSchema(
+            [
+                Field("altitude", float, "m"),
+                Field("longitude", float, "deg"),
+                Field("time", str),
+                Field("date", str),
+                Field("count", int),
+            ]
+        )
+
+    def test_parse_line(self):
+        record = self.schema.parse_line(LINE)
+        self.assertEqual(
+            record,
+            {
+                "altitude": 213.2,
+                "longitude": None,
+                "time": "00:00:20",
+                "date": "2024-01-01",
+                "count": 7,
+                "note": "a",
+            },
+        )
+        self.assertEqual(record, self.schema.parse(modify_data_to_dict(LINE)))
+
+    def test_values_that_do_not_convert_stay_text(self):
+        record = self.schema.parse_line("altitude=high,count=7.0\n")
+        self.assertEqual(record, {"altitude": "high", "count": 7})
+
+    def test_merge(self):
+        merged = RecordSchema.merge(GPS.schema, RecordSchema([Field("time", str)]))
+        self.assertEqual(
+            list(merged.fields), ["longitude", "latitude", "altitude", "speed", "time"]
+        )
+        self.assertEqual(merged["speed"].unit, "m/s")
+        with self.assertRaises(ValueError):
+            RecordSchema.merge(merged, RecordSchema([Field("time", float)]))
+        with self.assertRaises(ValueError):
+            Field("position", tuple)
+
+    def test_record_schema_of_registered_sensors(self):
+        schema = record_schema()
+        self.assertEqual(list(schema.fields)[:2], ["ts", "seq"])
+        for name in ("longitude", "latitude", "altitude", "speed"):
+            self.assertIn(name, schema)
+        self.assertNotIn("date", schema)
+        self.assertEqual(schema.dtypes()["ts"], "int64")
+        self.assertEqual(schema.dtypes()["speed"], "float64")
+        schema = record_schema(["models.sensors.date.Date"])
+        self.assertIs(schema["date"].type, str)
+        self.assertEqual(len(schema), 3)
+        self.assertEqual(len(record_schema(["models.sensors.missing.Sensor"])), 2)
+
+    def test_bulk_columns(self):
+        columns = parse_buffer(
+            b"time=1,altitude=2\ntime=3,altitude=None\n", schema=self.schema
+        )
+        self.assertEqual(columns["time"].tolist(), ["1", "3"])
+        np.testing.assert_array_equal(columns["altitude"], [2, np.nan])
+
+
+class TestTempDBRecords(unittest.TestCase):
+    def test_latest_record(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "tmp_db")
+            open(path, "w").close()
+            with patch.object(TempDB, "get_tmp_db_path", return_value=path):
+                tmp_db = TempDB()
+                self.assertIsNone(tmp_db.latest_record())
+                tmp_db.save_to_tmp_db({"speed": 1.5, "time": "00:00:20"})
+                tmp_db.save_to_tmp_db({"speed": None, "time": "00:00:40"})
+                self.assertEqual(
+                    tmp_db.latest_record(), {"speed": None, "time": "00:00:40"}
+                )
+                tmp_db.save_to_tmp_db({"speed": 2, "time": "00:01:00"})
+                self.assertEqual(tmp_db.latest_record()["speed"], 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
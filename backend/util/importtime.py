@@ -0,0 +1,56 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+import subprocess
+import sys
+
+
+def parse_importtime(output: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse the report printed by `python -X importtime`.
+
+    Args:
+    - output (str): The standard error of the interpreter.
+
+    Returns:
+    - Dict[str, Tuple[int, int]]: The self and cumulative import time of each module, in microseconds.
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure_import(
+    modules: Sequence[str], cwd: Optional[str] = None, env: Optional[dict] = None
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Import modules in a fresh interpreter and report what they imported.
+
+    Args:
+    - modules (Sequence[str]): The modules to import.
+    - cwd (Optional[str]): The working directory of the interpreter.
+    - env (Optional[dict]): Extra environment variables of the interpreter.
+
+    Returns:
+    - Dict[str, Tuple[int, int]]: The self and cumulative import time of every module imported.
+    """
+    code = "; ".join("import {}".format(module) for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        env=dict(os.environ, **(env or {})),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def total_import_time(report: Dict[str, Tuple[int, int]], modules: List[str]) -> int:
+    """
+    Sum the cumulative import time of top level modules, in microseconds.
+    """
+    return sum(report[module][1] for module in modules if module in report)
@@ -0,0 +1,55 @@
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is only imported when one of its attributes is used.
+
+    Setting or deleting attributes is forwarded to the real module, so the
+    stand-in can be patched like the module itself.
+    """
+
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value) -> None:
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr: str) -> None:
+        delattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return "<lazy module '{}' ({})>".format(self.__name__, state)
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Defer the import of a module until it is used.
+
+    Heavy dependencies (the AWS SDK, gpsd, requests, RPi.GPIO) should be
+    imported this way so that starting the application, or a child process
+    that does not use them, does not pay for them.
+
+    Args:
+    - name (str): The dotted name of the module.
+
+    Returns:
+    - LazyModule: A stand-in for the module.
+    """
+    return LazyModule(name)
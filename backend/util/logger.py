@@ -1,6 +1,219 @@
 import logging
+import logging.handlers
+import multiprocessing.util
 from util import get_base_path
+from typing import Dict, Optional, Tuple
 import os
+import queue
+import threading
+import time
+
+
+class LogWriter:
+    """
+    LogWriter is the single thread of a process that formats and writes log records.
+
+    Handlers wrapped in an AsyncHandler only enqueue their records, so logging
+    in the hot paths never waits on the disk. A writer is started lazily in
+    every process that logs (threads do not survive a fork) and drained when
+    the process exits.
+
+    Methods:
+    - get() -> LogWriter: Get the writer of the current process.
+    - put(handler, record) -> None: Queue a record for a handler.
+    - flush(timeout: float = 5) -> bool: Wait until the queued records are written.
+    - stop(timeout: float = 5) -> None: Write the queued records and stop the thread.
+    """
+
+    _instance: Optional["LogWriter"] = None
+    _lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+        multiprocessing.util.Finalize(None, self.stop, exitpriority=100)
+
+    @classmethod
+    def get(cls) -> "LogWriter":
+        writer = cls._instance
+        if writer is None or writer.pid != os.getpid():
+            with cls._lock:
+                writer = cls._instance
+                if writer is None or writer.pid != os.getpid():
+                    writer = cls._instance = cls()
+        return writer
+
+    @classmethod
+    def _after_fork(cls) -> None:
+        global _file_handlers_lock
+        cls._lock = threading.Lock()
+        _file_handlers_lock = threading.Lock()
+
+    def put(self, handler: logging.Handler, record: logging.LogRecord) -> None:
+        if self.thread.is_alive():
+            self.queue.put((handler, record))
+        else:
+            # stopped at exit, before logging.shutdown() and late loggers
+            handler.handle(record)
+
+    def flush(self, timeout: float = 5) -> bool:
+        if not self.thread.is_alive():
+            return True
+        done = threading.Event()
+        self.queue.put((None, done))
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 5) -> None:
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            handler, record = item
+            if handler is None:
+                record.set()
+                continue
+            handler.handle(record)
+            if self.queue.empty():
+                handler.flush()
+
+
+os.register_at_fork(after_in_child=LogWriter._after_fork)
+
+
+class AsyncHandler(logging.Handler):
+    """
+    AsyncHandler hands records over to the LogWriter of the process.
+
+    The wrapped handler does the formatting and the writing on the writer
+    thread. Records are formatted late, so messages should not be built from
+    objects that are mutated after the call.
+    """
+
+    def __init__(self, target: logging.Handler) -> None:
+        super().__init__(target.level)
+        self.target = target
+
+    def emit(self, record: logging.LogRecord) -> None:
+        LogWriter.get().put(self.target, record)
+
+    def setFormatter(self, fmt: logging.Formatter) -> None:
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def flush(self) -> None:
+        LogWriter.get().flush()
+
+    def close(self) -> None:
+        self.target.close()
+        super().close()
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    A RotatingFileHandler that also rotates when the file gets older than an interval.
+
+    Several processes may write to the same log file. When another process
+    has already rotated it, the handler only reopens the new file.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 5 * 1024 * 1024,
+        interval: float = 24 * 60 * 60,
+        backup_count: int = 5,
+    ) -> None:
+        super().__init__(
+            filename, maxBytes=max_bytes, backupCount=backup_count, delay=True
+        )
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        if self.stream and self._rotated_elsewhere():
+            self.stream.close()
+            self.stream = self._open()
+        else:
+            super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+    def _rotated_elsewhere(self) -> bool:
+        try:
+            return os.fstat(self.stream.fileno()).st_ino != os.stat(self.baseFilename).st_ino
+        except OSError:
+            return True
+
+
+class ThrottleFilter(logging.Filter):
+    """
+    ThrottleFilter thins out per-record messages.
+
+    A call passing extra={"sample": n} is logged once every n calls, and a
+    call passing extra={"per_second": r} at most r times per second. Calls are
+    told apart by their call site; other records pass untouched.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.counts: Dict[Tuple[str, int], int] = {}
+        self.tokens: Dict[Tuple[str, int], Tuple[float, float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = getattr(record, "sample", None)
+        rate = getattr(record, "per_second", None)
+        if not every and not rate:
+            return True
+        key = (record.pathname, record.lineno)
+        if every:
+            count = self.counts.get(key, 0)
+            self.counts[key] = count + 1
+            return count % every == 0
+        now = time.monotonic()
+        tokens, last = self.tokens.get(key, (rate, now))
+        tokens = min(rate, tokens + (now - last) * rate)
+        if tokens < 1:
+            self.tokens[key] = (tokens, now)
+            return False
+        self.tokens[key] = (tokens - 1, now)
+        return True
+
+
+_file_handlers: Dict[str, AsyncHandler] = {}
+_file_handlers_lock = threading.Lock()
+
+
+def get_file_handler(
+    filename: str,
+    max_bytes: int = 5 * 1024 * 1024,
+    interval: float = 24 * 60 * 60,
+    backup_count: int = 5,
+) -> AsyncHandler:
+    """
+    Get the handler writing to a log file, creating it the first time.
+
+    Loggers writing to the same file share one handler, hence one open file.
+    """
+    filename = os.path.abspath(filename)
+    with _file_handlers_lock:
+        handler = _file_handlers.get(filename)
+        if handler is None:
+            handler = AsyncHandler(
+                SizeAndTimeRotatingFileHandler(filename, max_bytes, interval, backup_count)
+            )
+            _file_handlers[filename] = handler
+    return handler
 
 
 class BaseLogger(logging.Logger):
@@ -9,16 +222,26 @@ class BaseLogger(logging.Logger):
             "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
         )
         super().__init__(name)
+        self.addFilter(ThrottleFilter())
 
     def setFormatter(self, format: str) -> None:
         self.format = logging.Formatter(format)
+        for handler in self.handlers:
+            handler.setFormatter(self.format)
 
     def getFormatter(self) -> logging.Formatter:
         return self.format
 
-    def setFileHandler(self, filename: str) -> None:
-        file_handler = logging.FileHandler(filename)
-        file_handler.setFormatter(self.getFormatter())
+    def setFileHandler(
+        self,
+        filename: str,
+        max_bytes: int = 5 * 1024 * 1024,
+        interval: float = 24 * 60 * 60,
+        backup_count: int = 5,
+    ) -> None:
+        file_handler = get_file_handler(filename, max_bytes, interval, backup_count)
+        if file_handler.formatter is None:
+            file_handler.setFormatter(self.getFormatter())
         self.addHandler(file_handler)
 
     def setStreamHandler(self) -> None: